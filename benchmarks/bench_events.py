@@ -0,0 +1,116 @@
+import argparse
+import json
+import logging
+import os
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+sys.path.append(SRC)
+
+# Representative payloads, field for field as Binance sends them
+ORDER_TRADE_UPDATE = {
+    "e": "ORDER_TRADE_UPDATE", "T": 1700000000000, "E": 1700000000001,
+    "o": {"s": "BTCUSDT", "c": "twap-1234abcd-c1", "S": "BUY", "o": "LIMIT", "f": "GTC", "q": "0.010",
+          "p": "90000.10", "ap": "0", "sp": "0", "x": "NEW", "X": "NEW", "i": 123456789, "l": "0", "z": "0",
+          "L": "0", "n": "0", "N": "USDT", "T": 1700000000000, "t": 0, "b": "0", "a": "0", "m": False,
+          "R": False, "wt": "CONTRACT_PRICE", "ot": "LIMIT", "ps": "BOTH", "cp": False, "rp": "0", "pP": False,
+          "si": 0, "ss": 0, "V": "NONE", "pm": "NONE", "gtd": 0},
+}
+ACCOUNT_UPDATE = {
+    "e": "ACCOUNT_UPDATE", "E": 1700000000001, "T": 1700000000000,
+    "a": {"m": "ORDER", "B": [{"a": "USDT", "wb": "1000.0", "cw": "1000.0", "bc": "0"}],
+          "P": [{"s": "BTCUSDT", "pa": "0.01", "ep": "90000", "cr": "0", "up": "0", "mt": "cross", "iw": "0",
+                 "ps": "BOTH"}]},
+}
+AGG_TRADE = {"e": "aggTrade", "E": 1700000000001, "s": "BTCUSDT", "a": 1, "p": "90000.1", "q": "0.005", "f": 1,
+             "l": 1, "T": 1700000000000, "m": True}
+DEPTH_UPDATE = {"e": "depthUpdate", "E": 1700000000001, "T": 1700000000000, "s": "BTCUSDT", "U": 1, "u": 2,
+                "pu": 0, "b": [["90000.0", "1.0"]] * 5, "a": [["90000.2", "1.0"]] * 5}
+
+
+def _user_stream():
+    """A user stream with the consumers a busy daemon has: OCO, journal and grid on orders, account state."""
+    from utils.user_stream import UserDataStream
+
+    stream = UserDataStream(client=object())
+    tracked = {}
+
+    def oco(update):
+        tracked.get(update.order_id)
+
+    def journal(update):
+        if update.client_order_id in tracked and update.status != "NEW":
+            update.filled_qty
+
+    def grid(update):
+        if update.client_order_id not in tracked:
+            return
+
+    for handler in (oco, journal, grid):
+        stream.subscribe('ORDER_TRADE_UPDATE', handler)
+    stream.subscribe('ACCOUNT_UPDATE', lambda update: None)
+    return stream
+
+
+def _market_stream():
+    from utils.market_stream import MarketStream
+
+    stream = MarketStream()
+    # Registered directly so no socket is opened
+    stream._handlers['btcusdt@aggTrade'] = (lambda trade: trade.quantity,)
+    stream._handlers['btcusdt@depth@100ms'] = (lambda update: None,)
+    return stream
+
+
+def bench(cases, n: int, rounds: int) -> dict:
+    """
+    Events per second through decode and dispatch, on the calling thread.
+    Cases run interleaved in short rounds and keep their best round, so a
+    noisy (shared, single core) machine slows every case alike.
+    """
+    per_round = max(n // rounds, 1)
+    best = {name: 0.0 for name, _, _ in cases}
+    for _ in range(rounds):
+        for name, on_message, message in cases:
+            start = time.perf_counter()
+            for _ in range(per_round):
+                on_message(None, message)
+            best[name] = max(best[name], per_round / (time.perf_counter() - start))
+    return {name: round(rate) for name, rate in best.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Websocket event decode + dispatch throughput, one core")
+    parser.add_argument("--events", type=int, default=200000, help="Events per type")
+    parser.add_argument("--rounds", type=int, default=40, help="Rounds the events are split into")
+    parser.add_argument("--output", type=str, help="Optional JSON result file")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    from utils import events
+
+    user, market = _user_stream(), _market_stream()
+    unsubscribed = dict(ORDER_TRADE_UPDATE, e="TRADE_LITE")
+    cases = [
+        ("ORDER_TRADE_UPDATE", user._on_message, json.dumps(ORDER_TRADE_UPDATE)),
+        ("ACCOUNT_UPDATE", user._on_message, json.dumps(ACCOUNT_UPDATE)),
+        ("aggTrade", market._on_message, json.dumps(AGG_TRADE)),
+        ("depthUpdate", market._on_message, json.dumps(DEPTH_UPDATE)),
+        ("unsubscribed", user._on_message, json.dumps(unsubscribed)),
+    ]
+
+    decoder = "orjson" if events.orjson is not None else "json"
+    print(f"decoder: {decoder}")
+    results = bench(cases, args.events, args.rounds)
+    for name, rate in results.items():
+        print(f"{name:<20}{rate:>12,} events/s")
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"decoder": decoder, "events_per_sec": results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
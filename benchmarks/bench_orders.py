@@ -0,0 +1,261 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+sys.path.append(SRC)
+
+STRATEGIES = ["market", "limit", "stop_limit", "grid", "twap", "oco"]
+STARTUP_MODULES = {
+    "market": "market_orders",
+    "limit": "limit_orders",
+    "stop_limit": "advanced.stop_limit",
+    "grid": "advanced.grid",
+    "twap": "advanced.twap",
+    "oco": "advanced.oco",
+}
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _configure_environment(port: int, workdir: str, respect_rate_limits: bool):
+    """Must run before anything imports utils.config."""
+    os.environ["USE_SIMULATOR"] = "True"
+    os.environ["SIMULATOR_URL"] = f"http://127.0.0.1:{port}"
+    os.environ.setdefault("BINANCE_API_KEY", "bench")
+    os.environ.setdefault("BINANCE_SECRET_KEY", "bench")
+    os.environ["SYMBOL_CACHE_PATH"] = os.path.join(workdir, "exchange_info.json")
+    # Benchmark orders stay out of the real execution store (and its TCA)
+    os.environ["EXECUTION_STORE_PATH"] = os.path.join(workdir, "executions")
+    if not respect_rate_limits:
+        # Measure the code path, not our own throttling
+        os.environ["RATE_LIMIT_WEIGHT_1M"] = "10000000"
+        os.environ["RATE_LIMIT_ORDERS_10S"] = "10000000"
+        os.environ["RATE_LIMIT_ORDERS_1M"] = "10000000"
+
+
+def _summary(samples_ms, wall_seconds: float, orders: int, peak_bytes: int, errors: int) -> dict:
+    ordered = sorted(samples_ms)
+    return {
+        "samples": len(ordered),
+        "p50_ms": round(statistics.median(ordered), 3) if ordered else None,
+        "p99_ms": round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))], 3) if ordered else None,
+        "max_ms": round(ordered[-1], 3) if ordered else None,
+        "orders_per_sec": round(orders / wall_seconds, 1) if wall_seconds else None,
+        "peak_memory_kb": round(peak_bytes / 1024, 1),
+        "errors": errors,
+    }
+
+
+def _timed(fn, iterations: int, orders_per_call: int = 1, failures=lambda result: result is None):
+    """Runs fn(i) `iterations` times; `failures(result)` is the number of failed orders in one call."""
+    samples, errors = [], 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        result = fn(i)
+        samples.append((time.perf_counter() - t0) * 1000)
+        errors += int(failures(result))
+    wall = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return _summary(samples, wall, iterations * orders_per_call, peak, errors)
+
+
+def bench_market(server, n: int) -> dict:
+    from market_orders import place_market_order
+    return _timed(lambda i: place_market_order("BTCUSDT", "BUY" if i % 2 else "SELL", 0.001), n)
+
+
+# 0.002 BTC keeps every order above the simulator's 100 USDT MIN_NOTIONAL, and all
+# limit prices stay inside its PERCENT_PRICE band (mark 90000 +/- 5%)
+QTY = 0.002
+
+
+def bench_limit(server, n: int) -> dict:
+    from limit_orders import place_limit_order
+    result = _timed(lambda i: place_limit_order("BTCUSDT", "BUY", QTY, 88000 + i % 100), n)
+    server.sim.cancel_open_orders("BTCUSDT")
+    return result
+
+
+def bench_stop_limit(server, n: int) -> dict:
+    from advanced.stop_limit import place_stop_limit
+    result = _timed(lambda i: place_stop_limit("BTCUSDT", "SELL", QTY, 88000, 87900), n)
+    server.sim.cancel_open_orders("BTCUSDT")
+    return result
+
+
+def bench_grid(server, n: int, levels: int) -> dict:
+    from advanced.grid import place_grid_orders
+
+    def _one(_):
+        results = place_grid_orders("BTCUSDT", 86000, 94000, levels, QTY)
+        server.sim.cancel_open_orders("BTCUSDT")
+        return results
+
+    def _failed(results):
+        return levels if results is None else sum(not r['ok'] for r in results.values())
+    return _timed(_one, max(1, n // levels), orders_per_call=levels, failures=_failed)
+
+
+def bench_twap(server, n: int, chunks: int) -> dict:
+    from advanced.twap import execute_twap
+
+    def _failed(parent):
+        # A run that errored out or left quantity unexecuted counts as one failure
+        return parent is None or parent.remaining > 0
+
+    # duration 0 -> no sleeping between chunks: measures pure per-chunk submit cost
+    return _timed(lambda _: execute_twap("BTCUSDT", "BUY", QTY * chunks, 0, chunks),
+                  max(1, n // chunks), orders_per_call=chunks, failures=_failed)
+
+
+def bench_oco(server, n: int) -> dict:
+    """Measures the fill -> sibling-cancel path: time from the triggering trade to pair completion."""
+    from advanced.oco import OCOEngine
+    from market_orders import place_market_order
+
+    engine = OCOEngine()
+    engine.start()
+    time.sleep(0.2)
+
+    samples, errors = [], 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    for i in range(n):
+        price = 90000.0
+        server.sim.print_trade("BTCUSDT", price)
+        place_market_order("BTCUSDT", "BUY", 0.001)
+        pair = engine.add_pair("BTCUSDT", 0.001, price + 100, price - 100)
+        t0 = time.perf_counter()
+        server.sim.print_trade("BTCUSDT", price + 150)
+        if pair.done.wait(5):
+            samples.append((time.perf_counter() - t0) * 1000)
+        else:
+            errors += 1
+    wall = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    engine.stop()
+    engine.stream.stop()
+    server.sim.print_trade("BTCUSDT", 90000.0)
+    return _summary(samples, wall, n * 3, peak, errors)
+
+
+def measure_startup(module: str, repeats: int = 3) -> float:
+    """Cold interpreter start + import of a strategy module, in milliseconds (best of N)."""
+    best = float("inf")
+    env = dict(os.environ, PYTHONPATH=SRC)
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        subprocess.run([sys.executable, "-c", f"import {module}"], env=env, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        best = min(best, (time.perf_counter() - t0) * 1000)
+    return round(best, 1)
+
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(current: dict, baseline_path: str):
+    with open(baseline_path) as f:
+        baseline = json.load(f)
+
+    print(f"\nComparison against {baseline.get('commit')} ({baseline_path})")
+    print(f"{'strategy':<12}{'metric':<16}{'baseline':>12}{'current':>12}{'change':>10}")
+    for name, metrics in current["results"].items():
+        base = baseline.get("results", {}).get(name, {})
+        for metric in ("p50_ms", "p99_ms", "orders_per_sec", "startup_ms"):
+            old, new = base.get(metric), metrics.get(metric)
+            if old is None or new is None:
+                continue
+            change = (new - old) / old * 100 if old else 0.0
+            print(f"{name:<12}{metric:<16}{old:>12}{new:>12}{change:>9.1f}%")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency/throughput benchmarks for every order path")
+    parser.add_argument("--orders", type=int, default=200, help="Orders per strategy")
+    parser.add_argument("--latency-ms", type=float, default=2.0, help="Injected one-way REST latency")
+    parser.add_argument("--grid-levels", type=int, default=50)
+    parser.add_argument("--twap-chunks", type=int, default=20)
+    parser.add_argument("--only", type=str, nargs="*", choices=STRATEGIES, help="Subset of strategies")
+    parser.add_argument("--output", type=str, help="Result file (default: benchmarks/results/<commit>.json)")
+    parser.add_argument("--compare", type=str, help="Earlier result file to compare against")
+    parser.add_argument("--with-logging", action="store_true", help="Keep strategy logging enabled")
+    parser.add_argument("--respect-rate-limits", action="store_true", help="Keep the client-side rate limiter")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="bench-")
+    port = _free_port()
+    _configure_environment(port, workdir, args.respect_rate_limits)
+    os.chdir(workdir)
+
+    from simulator.server import serve
+    server = serve(port=port, latency=args.latency_ms / 1000)
+    if not args.with_logging:
+        logging.disable(logging.CRITICAL)
+
+    runners = {
+        "market": lambda: bench_market(server, args.orders),
+        "limit": lambda: bench_limit(server, args.orders),
+        "stop_limit": lambda: bench_stop_limit(server, args.orders),
+        "grid": lambda: bench_grid(server, args.orders, args.grid_levels),
+        "twap": lambda: bench_twap(server, args.orders, args.twap_chunks),
+        "oco": lambda: bench_oco(server, min(args.orders, 100)),
+    }
+
+    results = {}
+    for name in args.only or STRATEGIES:
+        results[name] = runners[name]()
+        results[name]["startup_ms"] = measure_startup(STARTUP_MODULES[name])
+        r = results[name]
+        print(f"{name:<12} p50 {r['p50_ms']:>8} ms  p99 {r['p99_ms']:>8} ms  "
+              f"{r['orders_per_sec']:>8} orders/s  startup {r['startup_ms']:>7} ms  "
+              f"peak {r['peak_memory_kb']:>8} KB  errors {r['errors']}")
+
+    server.shutdown()
+
+    report = {
+        "commit": _git_commit(),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": vars(args),
+        "results": results,
+    }
+    output = args.output or os.path.join(ROOT, "benchmarks", "results", f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+    if args.compare:
+        compare(report, args.compare)
+
+
+if __name__ == "__main__":
+    main()
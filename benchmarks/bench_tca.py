@@ -0,0 +1,108 @@
+import argparse
+import json
+import logging
+import os
+import shutil
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SRC = os.path.join(ROOT, "src")
+sys.path.append(SRC)
+
+
+def write_store(path: str, fills: int, seed: int = 1):
+    """
+    A synthetic execution store: TWAP runs of 20 market children and grid
+    runs of limit orders filling in up to 3 parts, across 3 symbols.
+    Columns are written directly in the store's on-disk format.
+    """
+    from utils.execution_store import TABLES, STRINGS_FILE
+
+    rng = np.random.default_rng(seed)
+    symbols = ["BTCUSDT", "ETHUSDT", "SOLUSDT"]
+    runs = [f"twap-{i:08x}" for i in range(fills // 40)] + [f"grid-{i:08x}" for i in range(fills // 400)]
+    strings = symbols + runs + ["MARKET", "LIMIT"]
+    code = {s: i + 1 for i, s in enumerate(strings)}
+
+    n_orders = fills // 2
+    run = rng.integers(0, len(runs), n_orders)
+    is_grid = run >= fills // 40
+    order_time = 1_700_000_000_000 + np.sort(rng.integers(0, 30 * 86_400_000, n_orders))
+    arrival = 50_000 * np.exp(rng.normal(0, 0.01, n_orders))
+    orders = {
+        'time': order_time,
+        'symbol': rng.integers(0, 3, n_orders) + code["BTCUSDT"],
+        'strategy': run + code[runs[0]],
+        'order_type': np.where(is_grid, code["LIMIT"], code["MARKET"]),
+        'side': rng.choice([-1, 1], n_orders),
+        'order_id': np.arange(1, n_orders + 1),
+        'quantity': np.full(n_orders, 0.01),
+        'price': np.where(is_grid, arrival, np.nan),
+        'arrival': np.where(is_grid, np.nan, arrival),
+        'latency_ms': rng.lognormal(1.5, 0.5, n_orders),
+    }
+
+    # Every order gets 0-3 fills (2 on average), so fill rates stay below 1
+    parts = rng.choice([0, 1, 2, 3, 4], n_orders, p=[0.05, 0.15, 0.6, 0.1, 0.1]).clip(max=3)
+    of = np.repeat(np.arange(n_orders), parts)[:fills]
+    slip = rng.normal(1.0, 3.0, len(of)) / 10000
+    fill_price = np.where(is_grid[of], orders['price'][of], arrival[of] * (1 + orders['side'][of] * slip))
+    fill_table = {
+        'time': order_time[of] + rng.integers(1, 50, len(of)),
+        'symbol': orders['symbol'][of],
+        'strategy': orders['strategy'][of],
+        'side': orders['side'][of],
+        'maker': is_grid[of].astype(np.int8),
+        'order_id': orders['order_id'][of],
+        'price': fill_price,
+        'quantity': np.full(len(of), 0.01) / np.maximum(parts[of], 1),
+        'fee': fill_price * 0.01 * np.where(is_grid[of], 0.0002, 0.0004),
+    }
+
+    for table, columns in (('orders', orders), ('fills', fill_table)):
+        os.makedirs(os.path.join(path, table), exist_ok=True)
+        for column, dtype in TABLES[table].items():
+            np.asarray(columns[column], dtype=dtype).tofile(os.path.join(path, table, column + ".bin"))
+    with open(os.path.join(path, STRINGS_FILE), "w") as f:
+        f.write("".join(s + "\n" for s in strings))
+    return len(of), n_orders
+
+
+def main():
+    parser = argparse.ArgumentParser(description="TCA over a synthetic execution store, one core")
+    parser.add_argument("--fills", type=int, default=2_000_000, help="Fills in the synthetic store")
+    parser.add_argument("--rounds", type=int, default=3, help="Timed runs per grouping (best is kept)")
+    parser.add_argument("--output", type=str, help="Optional JSON result file")
+    args = parser.parse_args()
+
+    logging.disable(logging.CRITICAL)
+    from tca import analyze
+
+    path = tempfile.mkdtemp(prefix="bench_tca_")
+    try:
+        fills, orders = write_store(path, args.fills)
+        print(f"store: {fills:,} fills, {orders:,} orders")
+        results = {}
+        for by in ("kind", "strategy", "symbol"):
+            best = float("inf")
+            for _ in range(args.rounds):
+                start = time.perf_counter()
+                rows = analyze(path, by)
+                best = min(best, time.perf_counter() - start)
+            results[by] = {'seconds': round(best, 3), 'groups': len(rows) - 1,
+                           'fills_per_sec': round(fills / best)}
+            print(f"--by {by:<10}{best:>8.3f} s  {len(rows) - 1:>8,} groups  {fills / best:>14,.0f} fills/s")
+    finally:
+        shutil.rmtree(path, ignore_errors=True)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({'fills': fills, 'orders': orders, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,6 +1,206 @@
-def main():
-    print("Hello from cli-trader!")
+"""
+Command-line front end for the trading daemon.
+
+Only json, os and socket are imported up front, so a command costs an
+interpreter start plus one round trip over the daemon's Unix socket.
+argparse (help and error messages), the `daemon` subcommand and `--local`
+runs that bypass the daemon are all imported lazily.
+"""
+import json
+import os
+import socket
+import sys
+
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "src")
+# Must match the daemon's DAEMON_SOCKET
+DAEMON_SOCKET = os.getenv("DAEMON_SOCKET", os.path.join(".state", "daemon.sock"))
+
+# subcommand -> (help, positional arguments, options)
+COMMANDS = {
+    'market': ("Market order", [("symbol", str), ("side", str), ("quantity", float)], [("--transport", str, None)]),
+    'limit': ("Limit order", [("symbol", str), ("side", str), ("quantity", float), ("price", float)],
+              [("--transport", str, None)]),
+    'stop-limit': ("Stop-limit order", [("symbol", str), ("side", str), ("quantity", float),
+                                        ("stop_price", float), ("limit_price", float)], [("--transport", str, None)]),
+    'oco': ("OCO bracket, protected by the daemon",
+            [("symbol", str), ("quantity", float), ("tp_price", float), ("sl_price", float)],
+            [("--side", str, "SELL"), ("--transport", str, None)]),
+    'twap': ("TWAP execution on the daemon's scheduler",
+             [("symbol", str), ("side", str), ("quantity", float), ("minutes", float), ("slices", int)],
+             [("--jitter", float, 0.0), ("--max-impact-bps", float, None), ("--transport", str, None)]),
+    'pov': ("POV execution on the daemon's scheduler",
+            [("symbol", str), ("side", str), ("quantity", float), ("participation", float)],
+            [("--min-slice", float, 0.0), ("--min-interval", float, 1.0), ("--max-minutes", float, None),
+             ("--max-impact-bps", float, None), ("--transport", str, None)]),
+    'grid': ("Grid of limit orders",
+             [("symbol", str), ("lower_price", float), ("upper_price", float), ("levels", int),
+              ("qty_per_grid", float)],
+             [("--spacing", str, "arithmetic")]),
+    'book': ("Top of the local order book", [("symbol", str)], [("--bps", float, 10.0)]),
+    'account': ("Balances, positions and margin from the daemon's account cache", [], [("--symbol", str, None)]),
+    'kill': ("Stop all strategies, cancel every open order and close every position",
+             [], [("--symbols", str, None), ("--timeout", float, None)]),
+    'status': ("Daemon status", [], []),
+    'ping': ("Check the daemon is up", [], []),
+    'shutdown': ("Stop the daemon", [], []),
+}
+
+# Commands whose local run returns None when the order was not placed
+SINGLE_ORDER_COMMANDS = {'market', 'limit', 'stop-limit', 'grid'}
+
+
+def send_command(command: str, args: dict, path: str = DAEMON_SOCKET, timeout: float = 30.0) -> dict:
+    """Sends one command to the daemon and returns its decoded response."""
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        sock.connect(path)
+        sock.sendall(json.dumps({'cmd': command, 'args': args}).encode() + b"\n")
+        with sock.makefile("rb") as reader:
+            line = reader.readline()
+    if not line:
+        return {'ok': False, 'error': "Daemon closed the connection"}
+    return json.loads(line)
+
+
+def run_local(command: str, args: dict):
+    """Runs a command in this process, importing only the module it needs."""
+    sys.path.insert(0, SRC_DIR)
+    if command == 'market':
+        from market_orders import place_market_order
+        return place_market_order(**args)
+    if command == 'limit':
+        from limit_orders import place_limit_order
+        return place_limit_order(**args)
+    if command == 'stop-limit':
+        from advanced.stop_limit import place_stop_limit
+        return place_stop_limit(**args)
+    if command == 'grid':
+        from advanced.grid import place_grid_orders
+        return place_grid_orders(args['symbol'], args['lower_price'], args['upper_price'], args['levels'],
+                                 args['qty_per_grid'], spacing=args['spacing'])
+    if command == 'oco':
+        from advanced.oco import OCOManager
+        return OCOManager(args['symbol'], args['quantity'], args['tp_price'], args['sl_price'], args['side'],
+                          transport=args['transport']).start()
+    if command in ('twap', 'pov'):
+        from advanced.scheduler import TWAPOrder, POVOrder, run_parents
+        if command == 'twap':
+            parent = TWAPOrder(args['symbol'], args['side'], args['quantity'], args['minutes'] * 60, args['slices'],
+                               jitter=args['jitter'], max_impact_bps=args['max_impact_bps'], transport=args['transport'])
+        else:
+            parent = POVOrder(args['symbol'], args['side'], args['quantity'], args['participation'],
+                              min_slice=args['min_slice'], min_interval=args['min_interval'],
+                              max_duration=args['max_minutes'] * 60 if args['max_minutes'] else None,
+                              max_impact_bps=args['max_impact_bps'], transport=args['transport'])
+        return run_parents([parent])
+    if command == 'kill':
+        from utils.kill_switch import KillSwitch, KILL_SWITCH_TIMEOUT
+        from utils.journal import get_journal
+        kill_switch = KillSwitch(journal=get_journal(), timeout=args['timeout'] or KILL_SWITCH_TIMEOUT)
+        return kill_switch.trigger(args['symbols'].upper().split(",") if args['symbols'] else None)
+    raise SystemExit(f"'{command}' needs the daemon")
+
+
+def parse_fast(argv):
+    """
+    Parses `[--socket PATH] [--local] <command> args...` without argparse,
+    which alone costs more than the rest of the CLI. Returns None for
+    anything it does not handle (help, errors, `daemon`) so argparse can.
+    """
+    socket_path, local = DAEMON_SOCKET, False
+    i = 0
+    while i < len(argv) and argv[i].startswith("-"):
+        if argv[i] == "--local":
+            local, i = True, i + 1
+        elif argv[i] == "--socket" and i + 1 < len(argv):
+            socket_path, i = argv[i + 1], i + 2
+        else:
+            return None
+    if i == len(argv) or argv[i] not in COMMANDS:
+        return None
+
+    command = argv[i]
+    _, positionals, options = COMMANDS[command]
+    option_types = {flag: arg_type for flag, arg_type, _ in options}
+    args = {flag[2:].replace("-", "_"): default for flag, _, default in options}
+    values = []
+    rest = argv[i + 1:]
+    j = 0
+    try:
+        while j < len(rest):
+            token = rest[j]
+            if token in option_types and j + 1 < len(rest):
+                args[token[2:].replace("-", "_")] = option_types[token](rest[j + 1])
+                j += 2
+            elif token.startswith("--") or token == "-h":
+                return None
+            else:
+                values.append(token)
+                j += 1
+        if len(values) != len(positionals):
+            return None
+        for (name, arg_type), value in zip(positionals, values):
+            args[name] = arg_type(value)
+    except ValueError:
+        return None
+    return command, socket_path, local, args
+
+
+def build_parser() -> "argparse.ArgumentParser":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Binance Futures trading bot CLI")
+    parser.add_argument("--socket", type=str, default=DAEMON_SOCKET, help="Daemon socket path")
+    parser.add_argument("--local", action="store_true", help="Run in this process instead of the daemon")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    daemon = sub.add_parser("daemon", help="Run the trading daemon in the foreground")
+    daemon.add_argument("--symbols", type=str, default=None, help="Comma-separated symbols to warm up")
+
+    for name, (help_text, positionals, options) in COMMANDS.items():
+        command = sub.add_parser(name, help=help_text)
+        for arg, arg_type in positionals:
+            command.add_argument(arg, type=arg_type)
+        for flag, arg_type, default in options:
+            command.add_argument(flag, type=arg_type, default=default)
+    return parser
+
+
+def main(argv=None) -> int:
+    argv = sys.argv[1:] if argv is None else argv
+    parsed = parse_fast(argv)
+    if parsed is None:
+        args = vars(build_parser().parse_args(argv))
+        parsed = args.pop('command'), args.pop('socket'), args.pop('local'), args
+    command, socket_path, local, args = parsed
+
+    if command == 'daemon':
+        sys.path.insert(0, SRC_DIR)
+        from daemon import run_daemon
+        run_daemon(socket_path, args['symbols'].upper().split(",") if args['symbols'] else None)
+        return 0
+
+    if local:
+        result = run_local(command, args)
+        if command == 'kill':
+            print(json.dumps(result, indent=2, default=str))
+            return 0 if result['flat'] else 1
+        return 1 if command in SINGLE_ORDER_COMMANDS and result is None else 0
+
+    try:
+        response = send_command(command, args, socket_path)
+    except (FileNotFoundError, ConnectionRefusedError):
+        print(f"No daemon listening on {socket_path}. Start one with `python main.py daemon`, "
+              f"or add --local to run without it.", file=sys.stderr)
+        return 2
+
+    if not response.get('ok'):
+        code = f" ({response['code']})" if 'code' in response else ""
+        print(f"Error{code}: {response.get('error')}", file=sys.stderr)
+        return 1
+    print(json.dumps(response['result'], indent=2, default=str))
+    return 1 if command == 'kill' and not response['result']['flat'] else 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
@@ -1,19 +1,75 @@
 import argparse
 import sys
 import os
+import time
+
+import numpy as np
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from utils.config import get_client, setup_logger
-from utils.validation import validate_symbol, validate_positive_float, get_symbol_precision
-from binance.error import ClientError
+from utils.validation import validate_symbol, validate_positive_float, get_symbol_precision, get_symbol_info
+from utils.bulk_orders import place_orders_bulk, MAX_BATCH_SIZE
+from utils.journal import get_journal
+from utils.execution_store import get_execution_store
+from utils.order_book import reference_price
+from utils.rules import get_rules
+from utils.account_state import current_account_state
 
 logger = setup_logger("grid_strategy")
 
-def place_grid_orders(symbol: str, lower_price: float, upper_price: float, grid_levels: int, qty_per_grid: float):
+SPACINGS = ("arithmetic", "geometric")
+
+def build_ladder(lower_price: float, upper_price: float, grid_levels: int, tick_size: float,
+                 spacing: str = "arithmetic") -> np.ndarray:
+    """
+    Computes grid_levels + 1 price levels between two bounds, snapped to the tick size.
+
+    Arithmetic ladders have a constant price step, geometric ladders a constant
+    percentage step. Levels are returned as a sorted int64 array of whole
+    ticks (price / tick_size); levels that collapse onto the same tick are merged.
+    """
+    if spacing not in SPACINGS:
+        raise ValueError(f"Invalid spacing: {spacing}. Must be one of {', '.join(SPACINGS)}.")
+    if grid_levels <= 0:
+        raise ValueError("Grid levels must be > 0")
+    if not 0 < lower_price < upper_price:
+        raise ValueError("Need 0 < lower_price < upper_price")
+
+    if spacing == "geometric":
+        prices = np.geomspace(lower_price, upper_price, grid_levels + 1)
+    else:
+        prices = np.linspace(lower_price, upper_price, grid_levels + 1)
+    ticks = np.unique(np.rint(prices / tick_size).astype(np.int64))
+    if len(ticks) < 2:
+        raise ValueError("Grid range is narrower than one tick")
+    return ticks
+
+def check_grid_margin(account_state, symbol: str, orders) -> float:
+    """
+    Raises ValueError if resting the given orders needs more initial margin
+    than the account has available. The larger side counts, since the
+    exchange nets opposite orders. Returns the margin required.
+    """
+    buy = sum(float(o['price']) * float(o['quantity']) for o in orders if o['side'] == "BUY")
+    sell = sum(float(o['price']) * float(o['quantity']) for o in orders if o['side'] == "SELL")
+    leverage = account_state.leverage_of(symbol)
+    required = max(buy, sell) / leverage
+    available = account_state.available_balance()
+    if required > available:
+        raise ValueError(f"Grid needs about {required:.2f} {account_state.asset} initial margin at {leverage}x, "
+                         f"{available:.2f} available")
+    return required
+
+def place_grid_orders(symbol: str, lower_price: float, upper_price: float, grid_levels: int, qty_per_grid: float,
+                      retries: int = 1, journal=None, spacing: str = "arithmetic"):
     """
     Places a neutral grid of LIMIT orders.
     Buys below current price, Sells above current price.
+
+    Levels are packed into batchOrders requests that are sent concurrently.
+    Returns a map of grid level -> placement result so failed levels can be retried.
+    Placement is journaled; resume_grid() finishes a run that was interrupted mid-way.
     """
     try:
         client = get_client()
@@ -22,45 +78,130 @@ def place_grid_orders(symbol: str, lower_price: float, upper_price: float, grid_
         # Get symbol precision from exchange
         price_precision, qty_precision = get_symbol_precision(client, symbol)
         
-        # Get current price
-        ticker = client.ticker_price(symbol=symbol)
-        current_price = float(ticker['price'])
+        # Current price: local order book mid when one is running, REST ticker otherwise
+        current_price = reference_price(client, symbol)
         
-        logger.info(f"Current Price: {current_price}. Grid Range: {lower_price} - {upper_price}")
-        logger.info(f"Using precision: Price={price_precision}, Quantity={qty_precision}")
+        logger.info("Current Price: %s. Grid Range: %s - %s", current_price, lower_price, upper_price)
+        logger.info("Using precision: Price=%s, Quantity=%s", price_precision, qty_precision)
         
-        price_step = (upper_price - lower_price) / grid_levels
-        
-        orders_placed = 0
+        rules = get_rules(client, symbol)
+        quantity = float(rules.quantize_qty(qty_per_grid))
+        if quantity != qty_per_grid:
+            logger.warning("Quantity per grid rounded down to %s (step size %s)", quantity, rules.step_size)
+
+        tick_size = float(get_symbol_info(client, symbol)['tick_size'])
+        ticks = build_ladder(lower_price, upper_price, grid_levels, tick_size, spacing)
+        prices = ticks * tick_size
 
-        for i in range(grid_levels + 1):
-            level_price = lower_price + (i * price_step)
-            level_price = round(level_price, price_precision)
-            
-            if abs(level_price - current_price) < (price_step * 0.1):
-                logger.info(f"Skipping level {i+1} @ {level_price} (too close to current price)")
-                continue
-                
-            side = "BUY" if level_price < current_price else "SELL"
-            
-            try:
-                logger.info(f"Placing Grid Level {i+1}: {side} {qty_per_grid} @ {level_price}")
-                client.new_order(
-                    symbol=symbol,
-                    side=side,
-                    type="LIMIT",
-                    timeInForce="GTC",
-                    quantity=qty_per_grid,
-                    price=level_price
-                )
+        # A level closer to the current price than 10% of its spacing would fill immediately
+        gaps = np.diff(prices)
+        local_gap = np.minimum(np.append(gaps, gaps[-1]), np.insert(gaps, 0, gaps[0]))
+        too_close = np.abs(prices - current_price) < local_gap * 0.1
+        sides = np.where(prices < current_price, "BUY", "SELL")
+
+        grid_orders = {}
+
+        for i in np.flatnonzero(too_close):
+            logger.info("Skipping level %s @ %s (too close to current price)", i + 1, rules.price_from_ticks(ticks[i]))
+
+        for i in np.flatnonzero(~too_close):
+            grid_orders[int(i) + 1] = {
+                'symbol': symbol,
+                'side': str(sides[i]),
+                'type': "LIMIT",
+                'timeInForce': "GTC",
+                'quantity': quantity,
+                'price': float(rules.price_from_ticks(ticks[i])),
+            }
+
+        # Sized against the cached account when a long-running process keeps one (no REST call otherwise)
+        account_state = current_account_state()
+        if account_state is not None:
+            check_grid_margin(account_state, symbol, grid_orders.values())
+
+        journal = journal if journal is not None else get_journal()
+        strategy_id = None
+        if journal:
+            strategy_id = journal.start_strategy("grid", {
+                'symbol': symbol, 'lower_price': lower_price, 'upper_price': upper_price,
+                'grid_levels': grid_levels, 'qty_per_grid': qty_per_grid, 'spacing': spacing,
+            })
+            for level, params in grid_orders.items():
+                params['newClientOrderId'] = journal.intent(strategy_id, f"l{level}", dict(params))
+            # Write-ahead: the intents are on disk before any level can be live on the exchange
+            journal.flush()
+
+        logger.info("Submitting %s grid levels in batches of %s", len(grid_orders), MAX_BATCH_SIZE)
+        start = time.perf_counter()
+        results = place_orders_bulk(client, grid_orders, retries=retries)
+        latency_ms = round((time.perf_counter() - start) * 1000, 2)
+        if journal:
+            _journal_results(journal, grid_orders, results)
+            _finish_if_settled(journal, strategy_id, results)
+        store = get_execution_store()
+        if store:
+            for result in results.values():
+                if result['ok']:
+                    store.record_response(result['order'], latency_ms=latency_ms, strategy=strategy_id or "grid")
+
+        orders_placed = 0
+        for level, result in sorted(results.items()):
+            params = grid_orders[level]
+            if result['ok']:
                 orders_placed += 1
-            except ClientError as e:
-                logger.error(f"Failed to place level {level_price}: {e.error_message}")
+                order_id = result['order']['orderId']
+                logger.info("Grid Level %s: %s %s @ %s | ID %s", level, params['side'], quantity, params['price'],
+                            order_id, extra={'order_id': order_id, 'symbol': symbol, 'level': level})
+            else:
+                logger.error("Failed to place level %s: %s", params['price'], result['msg'],
+                             extra={'symbol': symbol, 'level': level, 'error_code': result['code']})
 
-        logger.info(f"Grid Setup Complete. Total Orders Placed: {orders_placed}")
+        logger.info("Grid Setup Complete. Total Orders Placed: %s/%s", orders_placed, len(grid_orders))
+        return results
 
     except Exception as e:
-        logger.error(f"Grid Strategy Error: {e}")
+        logger.error("Grid Strategy Error: %s", e)
+
+def resume_grid(record, journal=None):
+    """Places the levels of an interrupted grid run that never reached the exchange."""
+    client = get_client()
+    journal = journal if journal is not None else get_journal()
+
+    missing = {}
+    for order in record.orders.values():
+        if order.status == "LOST":
+            missing[order.tag] = dict(order.params, newClientOrderId=order.client_order_id)
+
+    logger.info("Resuming grid %s: %s of %s levels still to place.", record.strategy_id, len(missing),
+                len(record.orders))
+    results = place_orders_bulk(client, missing, retries=1) if missing else {}
+    if journal:
+        _journal_results(journal, missing, results)
+        _finish_if_settled(journal, record.strategy_id, results)
+
+    for tag, result in sorted(results.items()):
+        if not result['ok']:
+            logger.error("Failed to place level %s: %s", missing[tag]['price'], result['msg'],
+                         extra={'symbol': missing[tag]['symbol'], 'error_code': result['code']})
+    return results
+
+def _journal_results(journal, orders: dict, results: dict):
+    for key, result in results.items():
+        client_order_id = orders[key]['newClientOrderId']
+        if result['ok']:
+            journal.ack(client_order_id, result['order'])
+        elif result['code'] is not None:
+            journal.reject(client_order_id, result['code'], result['msg'])
+        # No code: transport failure, outcome unknown - left as an intent for reconciliation
+
+def _finish_if_settled(journal, strategy_id: str, results: dict):
+    """Ends the run unless a level's outcome is still unknown; recover.py reconciles and finishes it then."""
+    unknown = [key for key, result in results.items() if not result['ok'] and result['code'] is None]
+    if unknown:
+        logger.warning("Grid %s: %s level(s) with unknown outcome; run left open for recover.py", strategy_id,
+                       len(unknown))
+        return
+    journal.finish(strategy_id)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Place Static Grid Orders")
@@ -69,6 +210,9 @@ if __name__ == "__main__":
     parser.add_argument("upper_price", type=float, help="Upper bound of grid")
     parser.add_argument("levels", type=int, help="Number of grid levels")
     parser.add_argument("qty_per_grid", type=float, help="Quantity per grid level")
+    parser.add_argument("--spacing", type=str, default="arithmetic", choices=SPACINGS,
+                        help="Constant price step (arithmetic) or constant percentage step (geometric)")
     
     args = parser.parse_args()
-    place_grid_orders(args.symbol, args.lower_price, args.upper_price, args.levels, args.qty_per_grid)
\ No newline at end of file
+    place_grid_orders(args.symbol, args.lower_price, args.upper_price, args.levels, args.qty_per_grid,
+                      spacing=args.spacing)
\ No newline at end of file
@@ -0,0 +1,392 @@
+import argparse
+import itertools
+import sys
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from utils.config import get_client, setup_logger
+from utils.validation import validate_symbol, validate_positive_float, get_symbol_info
+from utils.bulk_orders import place_orders_bulk, cancel_orders_bulk
+from utils.rules import get_rules
+from utils.account_state import get_account_state
+from utils.user_stream import get_user_stream
+from utils.events import OrderUpdate
+from utils.order_book import reference_price
+from utils.execution_store import get_execution_store
+from utils.submission import lookup_order
+from advanced.grid import build_ladder, check_grid_margin, SPACINGS
+
+logger = setup_logger("grid_engine")
+
+SIDE_CODES = {"BUY": 0, "SELL": 1}
+CLOSED_STATUSES = ("CANCELED", "EXPIRED", "REJECTED")
+OPEN_STATUSES = ("NEW", "PARTIALLY_FILLED")
+
+
+class LiveOrder:
+    """One engine order resting at a ladder level."""
+
+    __slots__ = ("ticks", "side", "client_order_id", "order_id")
+
+    def __init__(self, ticks: int, side: str, client_order_id: str, order_id: Optional[int] = None):
+        self.ticks = ticks
+        self.side = side
+        self.client_order_id = client_order_id
+        self.order_id = order_id
+
+    @property
+    def key(self) -> int:
+        return self.ticks * 2 + SIDE_CODES[self.side]
+
+
+class GridEngine:
+    """
+    Long-running grid that re-arms itself after every fill.
+
+    The ladder (arithmetic or geometric) is an int64 array of price ticks.
+    One level - the gap - is kept empty at the last traded level, with BUY
+    orders below it and SELL orders above (at most `window` per side, 0 =
+    all). A fill moves the gap to the filled level and the live orders are
+    synced to the new target, which for a filled BUY means a SELL one level
+    up and for a filled SELL a BUY one level down. Re-centring swaps the
+    ladder and runs the same sync, so only orders whose level or side is no
+    longer wanted are cancelled and only missing ones are placed. An order
+    whose placement had an unknown outcome keeps its level and is looked up
+    by clientOrderId before the next sync.
+
+    All state changes run on one worker thread, in event order.
+    """
+
+    def __init__(self, symbol: str, lower_price: float, upper_price: float, grid_levels: int, qty_per_grid: float,
+                 spacing: str = "arithmetic", window: int = 0, grid_id: Optional[str] = None, client=None,
+                 stream=None, account_state=None):
+        self.symbol = validate_symbol(symbol)
+        self.lower_price = validate_positive_float(lower_price, "Lower price")
+        self.upper_price = validate_positive_float(upper_price, "Upper price")
+        self.grid_levels = grid_levels
+        self.quantity = validate_positive_float(qty_per_grid, "Quantity per grid")
+        self.spacing = spacing
+        self.window = window
+        # clientOrderId prefix; open orders carrying it are adopted on start
+        self.grid_id = grid_id or f"dg{self.symbol}"
+        self.client = client or get_client()
+        self.stream = stream or get_user_stream()
+        # Defaults to the process-wide state of the default account, loaded on start()
+        self.account_state = account_state
+
+        self.tick_size = float(get_symbol_info(self.client, self.symbol)['tick_size'])
+        self.rules = get_rules(self.client, self.symbol)
+        self.quantity = float(self.rules.quantize_qty(self.quantity))
+
+        self.ladder = np.empty(0, dtype=np.int64)
+        self.gap = 0
+        self.live: Dict[int, LiveOrder] = {}
+        self._by_client_id: Dict[str, LiveOrder] = {}
+        self._seq = itertools.count(1)
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="grid-engine")
+        self._stopped = threading.Event()
+        self.fills = 0
+        self.store = get_execution_store()
+
+    # -- public API ----------------------------------------------------------
+
+    def start(self, adopt: bool = True):
+        """Builds the ladder, adopts this grid's open orders (after a restart) and syncs the book."""
+        self.ladder = build_ladder(self.lower_price, self.upper_price, self.grid_levels, self.tick_size, self.spacing)
+        self.gap = self._nearest_level(self._current_ticks())
+        logger.info("Grid %s: %s levels %s-%s (%s), gap at %s", self.grid_id, len(self.ladder),
+                    self._price(self.ladder[0]), self._price(self.ladder[-1]), self.spacing,
+                    self._price(self.ladder[self.gap]))
+
+        self.stream.subscribe('ORDER_TRADE_UPDATE', self._on_order_update)
+        if self.store:
+            self.store.track_stream(self.stream)
+        self.stream.start()
+        self._worker.submit(self._start, adopt).result()
+
+    def recenter(self, lower_price: float, upper_price: float, grid_levels: Optional[int] = None,
+                 spacing: Optional[str] = None) -> dict:
+        """Moves the grid to a new range, touching only orders that differ. Returns the sync counts."""
+        return self._worker.submit(self._recenter, lower_price, upper_price, grid_levels, spacing).result()
+
+    def wait_idle(self):
+        """Returns once every order update received so far has been handled."""
+        self._worker.submit(lambda: None).result()
+
+    def stop(self, cancel: bool = True):
+        """Stops reacting to fills; cancels every engine order unless cancel=False."""
+        self._stopped.set()
+        self.stream.unsubscribe('ORDER_TRADE_UPDATE', self._on_order_update)
+        if self.store:
+            self.store.untrack_stream(self.stream)
+        if cancel:
+            self._worker.submit(self._cancel_all).result()
+        self._worker.shutdown()
+
+    # -- worker thread -------------------------------------------------------
+
+    def _start(self, adopt: bool):
+        if adopt:
+            self._adopt()
+        if self.account_state is None:
+            self.account_state = get_account_state()
+        want_ticks, want_sides = self._desired()
+        check_grid_margin(self.account_state, self.symbol, [
+            {'side': "SELL" if side else "BUY", 'price': self._price(ticks), 'quantity': self.quantity}
+            for ticks, side in zip(want_ticks, want_sides) if ticks not in self.live])
+        self._sync()
+
+    def _recenter(self, lower_price, upper_price, grid_levels, spacing) -> dict:
+        self.lower_price, self.upper_price = lower_price, upper_price
+        self.grid_levels = grid_levels or self.grid_levels
+        self.spacing = spacing or self.spacing
+        self.ladder = build_ladder(self.lower_price, self.upper_price, self.grid_levels, self.tick_size, self.spacing)
+        self.gap = self._nearest_level(self._current_ticks())
+        logger.info("Re-centring grid %s on %s-%s", self.grid_id, lower_price, upper_price)
+        return self._sync()
+
+    def _adopt(self):
+        prefix = f"{self.grid_id}-"
+        last_seq = 0
+        for order in self.client.get_orders(symbol=self.symbol):
+            client_order_id = order.get('clientOrderId', "")
+            if not client_order_id.startswith(prefix):
+                continue
+            ticks = int(round(float(order['price']) / self.tick_size))
+            live = LiveOrder(ticks, order['side'], client_order_id, order['orderId'])
+            self.live[ticks] = live
+            self._by_client_id[client_order_id] = live
+            last_seq = max(last_seq, int(client_order_id[len(prefix):] or 0))
+        self._seq = itertools.count(last_seq + 1)
+        if self.live:
+            logger.info("Adopted %s open orders of grid %s", len(self.live), self.grid_id)
+
+    def _desired(self):
+        """Target book for the current gap: (ticks, side codes) of every level that should hold an order."""
+        idx = np.arange(len(self.ladder))
+        buy = idx < self.gap
+        sell = idx > self.gap
+        if self.window:
+            buy &= idx >= self.gap - self.window
+            sell &= idx <= self.gap + self.window
+        wanted = buy | sell
+        return self.ladder[wanted], np.where(buy, 0, 1)[wanted]
+
+    def _sync(self) -> dict:
+        """Cancels live orders the target does not contain, then places the target orders that are missing."""
+        self._resolve_pending()
+        want_ticks, want_sides = self._desired()
+        want_keys = want_ticks * 2 + want_sides
+
+        orders = list(self.live.values())
+        live_keys = np.fromiter((o.key for o in orders), dtype=np.int64, count=len(orders))
+        keep = np.isin(live_keys, want_keys)
+        stale = [o for o, kept in zip(orders, keep) if not kept]
+
+        cancelled = self._cancel(stale)
+
+        missing = want_keys[~np.isin(want_keys, live_keys)]
+        placed = self._place([(int(k) // 2, "SELL" if k % 2 else "BUY") for k in missing])
+
+        counts = {'kept': int(keep.sum()), 'cancelled': cancelled, 'placed': placed}
+        if stale or len(missing):
+            logger.info("Grid %s synced: kept %s, cancelled %s, placed %s", self.grid_id, counts['kept'],
+                        cancelled, placed)
+        return counts
+
+    def _place(self, levels: List[tuple]) -> int:
+        orders = {}
+        for ticks, side in levels:
+            if ticks in self.live:
+                # A cancel failed, the level is still occupied
+                continue
+            client_order_id = f"{self.grid_id}-{next(self._seq)}"
+            live = LiveOrder(ticks, side, client_order_id)
+            # Registered before sending so a fill that beats the ack is still recognised
+            self.live[ticks] = live
+            self._by_client_id[client_order_id] = live
+            orders[client_order_id] = {
+                'symbol': self.symbol,
+                'side': side,
+                'type': "LIMIT",
+                'timeInForce': "GTC",
+                'quantity': self.quantity,
+                'price': self._price(ticks),
+                'newClientOrderId': client_order_id,
+            }
+        if not orders:
+            return 0
+
+        placed = 0
+        start = time.perf_counter()
+        results = place_orders_bulk(self.client, orders, retries=1)
+        latency_ms = round((time.perf_counter() - start) * 1000, 2)
+        for client_order_id, result in results.items():
+            live = self._by_client_id.get(client_order_id)
+            if result['ok']:
+                placed += 1
+                if live is not None:
+                    live.order_id = result['order']['orderId']
+                if self.store:
+                    self.store.record_response(result['order'], latency_ms=latency_ms, strategy=self.grid_id)
+            elif result['code'] is None:
+                # May be live: keeps the level, and is looked up by clientOrderId on the next sync
+                logger.warning("Grid level %s %s has an unknown outcome: %s", orders[client_order_id]['side'],
+                               orders[client_order_id]['price'], result['msg'], extra={'symbol': self.symbol})
+            else:
+                logger.error("Grid level %s %s failed: %s", orders[client_order_id]['side'],
+                             orders[client_order_id]['price'], result['msg'],
+                             extra={'symbol': self.symbol, 'error_code': result['code']})
+                self._forget(client_order_id)
+        return placed
+
+    def _resolve_pending(self):
+        """Settles orders whose placement had an unknown outcome: open ones are tracked, absent ones forgotten."""
+        for order in [o for o in self.live.values() if o.order_id is None]:
+            try:
+                found = lookup_order(self.client, self.symbol, order.client_order_id)
+            except Exception as e:
+                logger.warning("Grid order %s is still unknown: %s", order.client_order_id, e,
+                               extra={'symbol': self.symbol})
+                continue
+            if found is not None and found.get('status') in OPEN_STATUSES:
+                order.order_id = found['orderId']
+                logger.info("Grid order %s is live; tracking it", order.client_order_id,
+                            extra={'order_id': order.order_id, 'symbol': self.symbol})
+                continue
+            self._forget(order.client_order_id)
+            if found is not None and found.get('status') == "FILLED":
+                # Filled before its event could be matched: the gap moves as for any fill
+                self.fills += 1
+                idx = int(np.searchsorted(self.ladder, order.ticks))
+                if idx < len(self.ladder) and self.ladder[idx] == order.ticks:
+                    self.gap = idx
+
+    def _cancel(self, orders: List[LiveOrder]) -> int:
+        if not orders:
+            return 0
+        # Forget first: the CANCELED events for these must not trigger a re-sync
+        by_id = {}
+        for order in orders:
+            if order.order_id is None:
+                # Outcome still unknown: stays tracked until a lookup settles it
+                continue
+            self._forget(order.client_order_id)
+            by_id[order.order_id] = order
+
+        cancelled = 0
+        for order_id, result in cancel_orders_bulk(self.client, self.symbol, list(by_id)).items():
+            if result['ok']:
+                cancelled += 1
+            elif result['code'] != -2011:
+                logger.error("Cancel of grid order %s failed: %s", order_id, result['msg'],
+                             extra={'order_id': order_id, 'symbol': self.symbol, 'error_code': result['code']})
+                # Still resting: keep tracking it
+                order = by_id[order_id]
+                self.live[order.ticks] = order
+                self._by_client_id[order.client_order_id] = order
+        return cancelled
+
+    def _cancel_all(self):
+        self._resolve_pending()
+        cancelled = self._cancel(list(self.live.values()))
+        logger.info("Grid %s stopped: cancelled %s orders after %s fills", self.grid_id, cancelled, self.fills)
+        if self.live:
+            logger.error("Grid %s: %s order(s) with an unknown outcome may still rest: %s", self.grid_id,
+                         len(self.live), ", ".join(o.client_order_id for o in self.live.values()),
+                         extra={'symbol': self.symbol})
+
+    def _handle_fill(self, client_order_id: str, update: OrderUpdate):
+        order = self._forget(client_order_id)
+        if order is None:
+            return
+        self.fills += 1
+        logger.info("Grid fill: %s %s @ %s", update.side, update.filled_qty, update.avg_price,
+                    extra={'order_id': update.order_id, 'symbol': self.symbol})
+
+        idx = int(np.searchsorted(self.ladder, order.ticks))
+        if idx < len(self.ladder) and self.ladder[idx] == order.ticks:
+            self.gap = idx
+        if not self._stopped.is_set():
+            self._sync()
+
+    def _handle_closed(self, client_order_id: str, status: str):
+        order = self._forget(client_order_id)
+        if order is None:
+            return
+        logger.warning("Grid order %s was %s outside the engine; re-arming level.", client_order_id, status)
+        if not self._stopped.is_set():
+            self._sync()
+
+    def _forget(self, client_order_id: str) -> Optional[LiveOrder]:
+        order = self._by_client_id.pop(client_order_id, None)
+        if order is not None and self.live.get(order.ticks) is order:
+            del self.live[order.ticks]
+        return order
+
+    # -- helpers -------------------------------------------------------------
+
+    def _on_order_update(self, update: OrderUpdate):
+        client_order_id = update.client_order_id
+        if client_order_id not in self._by_client_id:
+            return
+        status = update.status
+        if status == 'FILLED':
+            self._worker.submit(self._handle_fill, client_order_id, update)
+        elif status in CLOSED_STATUSES:
+            self._worker.submit(self._handle_closed, client_order_id, status)
+
+    def _current_ticks(self) -> int:
+        price = reference_price(self.client, self.symbol)
+        return int(round(price / self.tick_size))
+
+    def _nearest_level(self, ticks: int) -> int:
+        idx = int(np.searchsorted(self.ladder, ticks))
+        if idx == 0:
+            return 0
+        if idx == len(self.ladder):
+            return len(self.ladder) - 1
+        return idx if self.ladder[idx] - ticks < ticks - self.ladder[idx - 1] else idx - 1
+
+    def _price(self, ticks) -> float:
+        return float(self.rules.price_from_ticks(ticks))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a self-refilling grid until stopped")
+    parser.add_argument("symbol", type=str, help="Trading pair (e.g., BTCUSDT)")
+    parser.add_argument("lower_price", type=float, help="Lower bound of grid")
+    parser.add_argument("upper_price", type=float, help="Upper bound of grid")
+    parser.add_argument("levels", type=int, help="Number of grid levels")
+    parser.add_argument("qty_per_grid", type=float, help="Quantity per grid level")
+    parser.add_argument("--spacing", type=str, default="arithmetic", choices=SPACINGS)
+    parser.add_argument("--window", type=int, default=0, help="Max live orders per side (0 = every level)")
+    parser.add_argument("--follow", action="store_true", help="Re-centre the range when price leaves it")
+    parser.add_argument("--keep-orders", action="store_true", help="Leave orders resting on exit")
+
+    args = parser.parse_args()
+    engine = GridEngine(args.symbol, args.lower_price, args.upper_price, args.levels, args.qty_per_grid,
+                        spacing=args.spacing, window=args.window)
+    try:
+        engine.start()
+        logger.info("Grid running. Press Ctrl+C to stop.")
+        width = args.upper_price - args.lower_price
+        while True:
+            time.sleep(5)
+            if not args.follow:
+                continue
+            price = reference_price(engine.client, engine.symbol)
+            if not engine.lower_price <= price <= engine.upper_price:
+                engine.recenter(price - width / 2, price + width / 2)
+    except KeyboardInterrupt:
+        logger.warning("Stopping grid...")
+    finally:
+        engine.stop(cancel=not args.keep_orders)
+        engine.stream.stop()
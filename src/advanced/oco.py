@@ -1,160 +1,501 @@
-import time
+import csv
 import sys
 import os
-import logging
-import json
-from typing import Dict
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from utils.config import get_client, setup_logger, API_KEY
-from utils.validation import validate_positive_float, validate_symbol
+from utils.config import get_client, setup_logger
+from utils.validation import validate_positive_float, validate_symbol, validate_side
+from utils.user_stream import get_user_stream, STREAM_RESUMED
+from utils.events import OrderUpdate
+from utils.metrics import get_metrics
+from utils.journal import get_journal
+from utils.execution_store import get_execution_store
+from utils.account_state import get_account_state
+from utils.ws_trading import get_order_transport
+from utils.bulk_orders import cancel_orders_bulk, MAX_CONCURRENT_BATCHES
 from binance.error import ClientError
-from binance.websocket.um_futures.websocket_client import UMFuturesWebsocketClient
 
 logger = setup_logger("oco_ws_manager")
 
-class OCOManager:
+# Fills for order ids we have not indexed yet (the fill raced our own REST ack)
+EARLY_FILL_BUFFER = 10000
+
+
+class OCOPair:
+    """One take-profit / stop-loss bracket managed by an OCOEngine."""
+
     def __init__(self, symbol, quantity, tp_price, sl_price, side="SELL"):
-        self.client = get_client()
         self.symbol = validate_symbol(symbol)
         self.quantity = validate_positive_float(quantity, "Quantity")
         self.tp_price = validate_positive_float(tp_price, "Take Profit")
         self.sl_price = validate_positive_float(sl_price, "Stop Loss")
-        self.side = side
+        self.side = validate_side(side)
 
         self.tp_order_id = None
         self.sl_order_id = None
-        self.is_done = False
-        self.listen_key = None
-        self.ws_client = None
+        self.filled_order_id = None
+        self.strategy_id = None
+        self.done = threading.Event()
+        self.lock = threading.Lock()
+
+    def sibling(self, order_id):
+        return self.sl_order_id if order_id == self.tp_order_id else self.tp_order_id
+
+    def __repr__(self):
+        return f"OCOPair({self.symbol} {self.side} {self.quantity} TP={self.tp_price} SL={self.sl_price})"
+
+
+class OCOEngine:
+    """
+    Manages any number of OCO pairs, across symbols, over one user-data stream.
+
+    Fills are routed through an orderId -> pair index, so each
+    ORDER_TRADE_UPDATE costs one dict lookup regardless of how many pairs are
+    open. Completion is signalled through events rather than polling.
+    Every pair is journaled so restore_pair() can re-protect it after a restart.
+    New pairs are checked against the cached position, since both legs are
+    reduce-only and the exchange rejects them without a position to close.
+    With transport='ws', legs and the sibling cancel after a fill go over the
+    websocket trading API (falling back to REST), saving the HTTP round trip
+    on the path that decides how long both legs are live at once.
+    """
+
+    def __init__(self, client=None, stream=None, journal=None, account_state=None, transport=None):
+        self.client = client or get_client()
+        self.stream = stream or get_user_stream()
+        self.journal = journal if journal is not None else get_journal()
+        self.store = get_execution_store()
+        # Defaults to the process-wide state of the default account, loaded on start()
+        self.account_state = account_state
+        # 'rest' or 'ws'; None uses ORDER_TRANSPORT
+        self.transport = transport
+        self.orders = self.client
+        self.pairs: List[OCOPair] = []
+        self._by_order: Dict[int, OCOPair] = {}
+        self._early_fills: "OrderedDict[int, bool]" = OrderedDict()
+        self._open = 0
+        self._lock = threading.Lock()
+        self._all_done = threading.Event()
+        self._all_done.set()
+        self.metrics = get_metrics()
 
     def start(self):
-        try:
-            self._start_user_stream()
-            self._place_orders()
+        self.stream.subscribe('ORDER_TRADE_UPDATE', self._on_order_update)
+        self.stream.subscribe(STREAM_RESUMED, self._on_stream_resumed)
+        if self.journal:
+            self.journal.track_stream(self.stream)
+        if self.store:
+            self.store.track_stream(self.stream)
+        self.stream.start()
+        self.orders = get_order_transport(self.client, self.transport)
+        if self.account_state is None:
+            self.account_state = get_account_state()
 
-            logger.info("Monitoring orders via WebSocket. Press Ctrl+C to stop manually.")
-            while not self.is_done:
-                time.sleep(1)
+    def stop(self):
+        self.stream.unsubscribe('ORDER_TRADE_UPDATE', self._on_order_update)
+        self.stream.unsubscribe(STREAM_RESUMED, self._on_stream_resumed)
+        if self.journal:
+            self.journal.untrack_stream(self.stream)
+        if self.store:
+            self.store.untrack_stream(self.stream)
 
-        except KeyboardInterrupt:
-            logger.warning("Manual interruption. Cancelling open orders...")
-            self._cancel_all()
-        except Exception as e:
-            logger.error(f"Critical Error: {e}")
-            self._cancel_all()
-        finally:
-            self._cleanup()
+    @property
+    def open_pairs(self) -> int:
+        return self._open
 
-    def _start_user_stream(self):
-        logger.info("Connecting to Binance WebSocket...")
-
-        self.listen_key = self.client.new_listen_key()['listenKey']
-        logger.info(f"Listen Key retrieved: {self.listen_key[:10]}...")
-
-        self.ws_client = UMFuturesWebsocketClient(on_message=self._on_ws_message)
-
-        is_testnet = os.getenv("USE_TESTNET", "False").lower() == "true"
-        ws_url = "wss://stream.binancefuture.com" if is_testnet else "wss://fstream.binance.com"
-
-        self.ws_client.user_data(
-            listen_key=self.listen_key,
-            id=1
-        )
-        logger.info("WebSocket connection started.")
-
-    def _place_orders(self):
-        logger.info(f"Placing OCO Orders for {self.quantity} {self.symbol}...")
-
-        tp_order = self.client.new_order(
-            symbol=self.symbol,
-            side=self.side,
-            type="LIMIT",
-            quantity=self.quantity,
-            price=self.tp_price,
-            timeInForce="GTC",
-            reduceOnly="true"
-        )
-        self.tp_order_id = tp_order['orderId']
-        logger.info(f"TP Placed: ID {self.tp_order_id} @ {self.tp_price}")
-
-        sl_order = self.client.new_order(
-            symbol=self.symbol,
-            side=self.side,
-            type="STOP_MARKET",
-            quantity=self.quantity,
-            stopPrice=self.sl_price,
-            reduceOnly="true"
-        )
-        self.sl_order_id = sl_order['orderId']
-        logger.info(f"SL Placed: ID {self.sl_order_id} Trigger @ {self.sl_price}")
-
-    def _on_ws_message(self, _, message):
+    def add_pair(self, symbol, quantity, tp_price, sl_price, side="SELL") -> OCOPair:
+        """Places both legs of a new bracket and starts protecting it."""
+        pair = OCOPair(symbol, quantity, tp_price, sl_price, side)
+        self._check_position(pair)
+        if self.journal:
+            pair.strategy_id = self.journal.start_strategy("oco", {
+                'symbol': pair.symbol, 'quantity': pair.quantity, 'tp_price': pair.tp_price,
+                'sl_price': pair.sl_price, 'side': pair.side,
+            })
+        self._register(pair)
+
+        logger.info("Placing OCO Orders for %s %s...", pair.quantity, pair.symbol)
         try:
-            data = json.loads(message) if isinstance(message, str) else message
+            self._place_leg(pair, is_tp=True, tag="tp")
+            self._place_leg(pair, is_tp=False, tag="sl")
+        except Exception:
+            # Unindexed first, so the CANCELED events of our own cleanup are not taken for external closes
+            self._finish(pair)
+            self._cancel_pair(pair)
+            raise
 
-            if data.get('e') == 'ORDER_TRADE_UPDATE':
-                order_data = data.get('o', {})
-                order_id = order_data.get('i')
-                status = order_data.get('X')
+        return pair
 
-                if order_id in [self.tp_order_id, self.sl_order_id]:
-                    logger.info(f"Update for Order {order_id}: {status}")
+    def _check_position(self, pair: OCOPair):
+        """Refuses a bracket with no position for its reduce-only legs to close."""
+        if self.account_state is None:
+            return
+        position = self.account_state.position(pair.symbol)
+        if (position.amount > 0) != (pair.side == "SELL") or position.amount == 0:
+            # The ACCOUNT_UPDATE of a fill we just made may still be in flight
+            position = self.account_state.refresh_position(pair.symbol)
+        closing = position.amount > 0 if pair.side == "SELL" else position.amount < 0
+        if not closing:
+            raise ValueError(f"No {'long' if pair.side == 'SELL' else 'short'} {pair.symbol} position for "
+                             f"reduce-only {pair.side} legs to close (position: {position.amount})")
+        if pair.quantity > abs(position.amount):
+            logger.warning("OCO quantity %s exceeds the %s position of %s; the legs only close the position",
+                           pair.quantity, pair.symbol, position.amount, extra={'symbol': pair.symbol})
 
-                    if status == 'FILLED':
-                        logger.info(f"Order {order_id} FILLED. Cancelling sibling.")
-                        self._handle_fill(filled_id=order_id)
-        except Exception as e:
-            logger.error(f"WS Parse Error: {e}")
+    def restore_pair(self, record) -> Optional[OCOPair]:
+        """
+        Resumes protecting a pair rebuilt (and reconciled) from the order journal.
+
+        Legs still open on the exchange are re-indexed. If only one leg is
+        left, the missing one is placed again. If a leg filled while we were
+        down, its sibling is cancelled and the pair is closed.
+        """
+        params = record.params
+        legs = {}
+        for order in record.orders.values():
+            # Later attempts of the same leg (tp, tp1, ...) supersede earlier ones
+            legs[order.tag.rstrip("0123456789")] = order
+        tp, sl = legs.get("tp"), legs.get("sl")
+
+        if any(leg and leg.unknown for leg in (tp, sl)):
+            # A leg may be live: placing it again could double the exit. The run stays unfinished for a later recovery
+            logger.error("OCO %s: a leg's outcome is unknown, not re-protected.", record.strategy_id)
+            return None
+
+        filled = next((leg for leg in (tp, sl) if leg and leg.status == "FILLED"), None)
+        if filled:
+            other = sl if filled is tp else tp
+            logger.info("OCO %s: %s filled while offline.", record.strategy_id, filled.client_order_id)
+            if other and other.is_open:
+                self._cancel_order(other.symbol, other.order_id)
+            if self.journal:
+                self.journal.finish(record.strategy_id)
+            return None
+
+        if not any(leg and leg.is_open for leg in (tp, sl)):
+            logger.warning("OCO %s: no leg is live any more, nothing to protect.", record.strategy_id)
+            if self.journal:
+                self.journal.finish(record.strategy_id)
+            return None
+
+        pair = OCOPair(params['symbol'], params['quantity'], params['tp_price'], params['sl_price'], params['side'])
+        pair.strategy_id = record.strategy_id
+        self._register(pair)
+
+        for leg, is_tp in ((tp, True), (sl, False)):
+            if leg and leg.is_open:
+                self._index(pair, leg.order_id, is_tp=is_tp)
+            else:
+                name = "tp" if is_tp else "sl"
+                attempt = sum(1 for order in record.orders.values() if order.tag.startswith(name))
+                logger.warning("OCO %s: %s leg is missing, placing it again.", record.strategy_id, name.upper())
+                try:
+                    self._place_leg(pair, is_tp=is_tp, tag=f"{name}{attempt}")
+                except Exception:
+                    self._finish(pair)
+                    self._cancel_pair(pair)
+                    raise
 
-    def _handle_fill(self, filled_id):
+        logger.info("Re-protecting %s (TP %s, SL %s)", pair, pair.tp_order_id, pair.sl_order_id)
+        return pair
+
+    def _register(self, pair: OCOPair):
+        with self._lock:
+            self.pairs.append(pair)
+            self._open += 1
+            self._all_done.clear()
+
+    def _place_leg(self, pair: OCOPair, is_tp: bool, tag: str):
+        if is_tp:
+            order = {'symbol': pair.symbol, 'side': pair.side, 'type': "LIMIT", 'quantity': pair.quantity,
+                     'price': pair.tp_price, 'timeInForce': "GTC", 'reduceOnly': "true"}
+        else:
+            order = {'symbol': pair.symbol, 'side': pair.side, 'type': "STOP_MARKET", 'quantity': pair.quantity,
+                     'stopPrice': pair.sl_price, 'reduceOnly': "true"}
+
+        client_order_id = None
+        if self.journal:
+            client_order_id = self.journal.intent(pair.strategy_id, tag, order)
+            # Write-ahead: the intent is on disk before the leg can exist on the exchange
+            self.journal.flush()
+        start = time.perf_counter()
         try:
-            target_to_cancel = self.sl_order_id if filled_id == self.tp_order_id else self.tp_order_id
+            response = self.orders.new_order(newClientOrderId=client_order_id, **order)
+        except ClientError as e:
+            if self.journal:
+                self.journal.reject(client_order_id, e.error_code, e.error_message)
+            raise
+        if self.journal:
+            self.journal.ack(client_order_id, response)
+        if self.store:
+            self.store.record_response(response, latency_ms=round((time.perf_counter() - start) * 1000, 2),
+                                       strategy=pair.strategy_id or "oco")
+
+        self._index(pair, response['orderId'], is_tp=is_tp)
+        if is_tp:
+            logger.info("TP Placed: ID %s @ %s", pair.tp_order_id, pair.tp_price,
+                        extra={'order_id': pair.tp_order_id, 'symbol': pair.symbol})
+        else:
+            logger.info("SL Placed: ID %s Trigger @ %s", pair.sl_order_id, pair.sl_price,
+                        extra={'order_id': pair.sl_order_id, 'symbol': pair.symbol})
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until every pair has completed. Returns False on timeout."""
+        return self._all_done.wait(timeout)
+
+    def cancel_all(self):
+        """Cancels the legs of every open pair: DELETE batchOrders per symbol, symbols in parallel."""
+        legs: Dict[str, List[int]] = defaultdict(list)
+        for pair in self.abandon_all():
+            legs[pair.symbol] += [oid for oid in (pair.tp_order_id, pair.sl_order_id) if oid]
+        if not legs:
+            return
+
+        with ThreadPoolExecutor(max_workers=min(len(legs), MAX_CONCURRENT_BATCHES)) as pool:
+            for symbol, results in pool.map(lambda item: (item[0], cancel_orders_bulk(self.client, *item)),
+                                            legs.items()):
+                for order_id, result in results.items():
+                    if result['ok']:
+                        logger.info("Cancelled %s", order_id)
+                    elif result['code'] != -2011:
+                        # -2011: already filled or cancelled
+                        logger.error("Cancel failed for %s: %s", order_id, result['msg'],
+                                     extra={'order_id': order_id, 'symbol': symbol, 'error_code': result['code']})
+
+    def abandon_all(self) -> List[OCOPair]:
+        """
+        Stops protecting every open pair without touching its legs, for when
+        something else cancels them (cancel_all, the kill switch). Returns the
+        pairs that were open.
+        """
+        pairs = [pair for pair in list(self.pairs) if not pair.done.is_set()]
+        for pair in pairs:
+            # Unindex first so our own CANCELED events are not mistaken for external ones
+            self._finish(pair)
+        return pairs
 
-            if target_to_cancel:
-                logger.info(f"Cancelling Order ID {target_to_cancel}...")
-                self.client.cancel_order(symbol=self.symbol, orderId=target_to_cancel)
+    def _index(self, pair: OCOPair, order_id: int, is_tp: bool):
+        with pair.lock:
+            if is_tp:
+                pair.tp_order_id = order_id
+            else:
+                pair.sl_order_id = order_id
+            already_filled = pair.filled_order_id is not None
+
+        with self._lock:
+            self._by_order[order_id] = pair
+            raced_fill = self._early_fills.pop(order_id, None)
+
+        if already_filled:
+            # The other leg filled while this one was being placed
+            self._cancel_order(pair.symbol, order_id)
+        elif raced_fill:
+            self._handle_fill(pair, order_id)
+
+    def _on_order_update(self, update: OrderUpdate):
+        order_id = update.order_id
+        status = update.status
+
+        # Lookup and buffering under one lock, so a fill racing _index() lands on one side or the other
+        with self._lock:
+            pair = self._by_order.get(order_id)
+            if pair is None:
+                if status == 'FILLED':
+                    self._early_fills[order_id] = True
+                    if len(self._early_fills) > EARLY_FILL_BUFFER:
+                        self._early_fills.popitem(last=False)
+                return
+
+        logger.info("Update for Order %s: %s", order_id, status,
+                    extra={'order_id': order_id, 'symbol': pair.symbol, 'status': status})
+        if status == 'FILLED':
+            logger.info("Order %s FILLED. Cancelling sibling.", order_id)
+            self._handle_fill(pair, order_id, update.trade_time)
+        elif status in ('CANCELED', 'EXPIRED', 'REJECTED'):
+            self._handle_external_close(pair, order_id, status)
+
+    def _on_stream_resumed(self, _):
+        """
+        Catches up on legs that filled or closed while the user stream was
+        down: one open-orders query per symbol, then a lookup of each leg
+        that is no longer open. Fills are handled before closes, so a pair
+        whose stop filled and whose TP then expired still completes as filled.
+        """
+        with self._lock:
+            legs: Dict[str, List[tuple]] = defaultdict(list)
+            for order_id, pair in self._by_order.items():
+                legs[pair.symbol].append((order_id, pair))
+        if not legs:
+            return
+        logger.warning("User data stream resumed; reconciling %s OCO leg(s) over REST",
+                       sum(len(symbol_legs) for symbol_legs in legs.values()))
+
+        closed = []
+        for symbol, symbol_legs in legs.items():
+            try:
+                open_ids = {order['orderId'] for order in self.client.get_orders(symbol=symbol)}
+                for order_id, pair in symbol_legs:
+                    if order_id not in open_ids:
+                        closed.append((pair, order_id, self.client.query_order(symbol=symbol, orderId=order_id)))
+            except Exception as e:
+                logger.error("OCO reconciliation failed: %s", e, extra={'symbol': symbol})
+
+        for pair, order_id, order in sorted(closed, key=lambda item: item[2]['status'] != 'FILLED'):
+            if order['status'] == 'FILLED':
+                logger.info("Order %s FILLED while the stream was down. Cancelling sibling.", order_id,
+                            extra={'order_id': order_id, 'symbol': pair.symbol})
+                self._handle_fill(pair, order_id)
+            elif order['status'] in ('CANCELED', 'EXPIRED', 'REJECTED'):
+                self._handle_external_close(pair, order_id, order['status'])
+
+    def _handle_fill(self, pair: OCOPair, filled_id, fill_time_ms: Optional[int] = None):
+        with pair.lock:
+            if pair.filled_order_id is not None:
+                return
+            pair.filled_order_id = filled_id
+            target_to_cancel = pair.sibling(filled_id)
+
+        if target_to_cancel:
+            logger.info("Cancelling Order ID %s...", target_to_cancel)
+            if self._cancel_order(pair.symbol, target_to_cancel):
                 logger.info("Sibling cancelled. OCO complete.")
+            if fill_time_ms:
+                # Recorded even on -2011: either way the sibling is no longer live
+                self.metrics.observe('oco_fill_to_cancel_seconds', max(time.time() - fill_time_ms / 1000, 0.0),
+                                     symbol=pair.symbol)
 
-            self.is_done = True
+        self._finish(pair)
 
-        except ClientError as e:
-            if -2011 not in [e.error_code]:
-                logger.error(f"Cancel failed: {e}")
-            self.is_done = True
+    def _handle_external_close(self, pair: OCOPair, order_id, status: str):
+        """
+        A leg went away without filling (manual cancel, expiry). The pair is
+        no longer managed, but the other leg is left on the exchange as a plain
+        order rather than cancelled: pulling the TP by hand must not leave the
+        position without its stop.
+        """
+        with pair.lock:
+            if pair.filled_order_id is not None or pair.done.is_set():
+                return
+            remaining = pair.sibling(order_id)
+
+        logger.warning("Order %s of %s was %s outside the OCO engine; order %s stays open as a plain order",
+                       order_id, pair, status, remaining, extra={'order_id': order_id, 'symbol': pair.symbol})
+        self._finish(pair)
 
-    def _cancel_all(self):
-        for oid in [self.tp_order_id, self.sl_order_id]:
+    def _cancel_pair(self, pair: OCOPair):
+        for oid in [pair.tp_order_id, pair.sl_order_id]:
             if oid:
-                try:
-                    self.client.cancel_order(symbol=self.symbol, orderId=oid)
-                    logger.info(f"Cancelled {oid}")
-                except:
-                    pass
+                if self._cancel_order(pair.symbol, oid):
+                    logger.info("Cancelled %s", oid)
+
+    def _cancel_order(self, symbol: str, order_id) -> bool:
+        try:
+            self.orders.cancel_order(symbol=symbol, orderId=order_id)
+            return True
+        except ClientError as e:
+            # -2011: already filled or cancelled
+            if e.error_code != -2011:
+                logger.error("Cancel failed for %s: %s", order_id, e.error_message,
+                             extra={'order_id': order_id, 'symbol': symbol, 'error_code': e.error_code})
+        except Exception as e:
+            logger.error("Cancel failed for %s: %s", order_id, e)
+        return False
+
+    def _finish(self, pair: OCOPair):
+        with self._lock:
+            if pair.done.is_set():
+                return
+            for oid in (pair.tp_order_id, pair.sl_order_id):
+                self._by_order.pop(oid, None)
+            pair.done.set()
+            self._open -= 1
+            if self.journal and pair.strategy_id:
+                self.journal.finish(pair.strategy_id)
+            if self._open == 0:
+                self._all_done.set()
+
+
+class OCOManager:
+    """Runs one or more OCO pairs from the command line until all complete."""
+
+    def __init__(self, symbol=None, quantity=None, tp_price=None, sl_price=None, side="SELL", pairs=None,
+                 transport=None):
+        self.engine = OCOEngine(transport=transport)
+        self.pair_specs = list(pairs or [])
+        if symbol is not None:
+            self.pair_specs.insert(0, (symbol, quantity, tp_price, sl_price, side))
+
+    def start(self):
+        try:
+            self.engine.start()
+            for spec in self.pair_specs:
+                self.engine.add_pair(*spec)
+
+            logger.info("Monitoring %s OCO pair(s) via WebSocket. Press Ctrl+C to stop manually.", self.engine.open_pairs)
+            self.engine.wait()
+
+        except KeyboardInterrupt:
+            logger.warning("Manual interruption. Cancelling open orders...")
+            self.engine.cancel_all()
+        except Exception as e:
+            logger.error("Critical Error: %s", e)
+            self.engine.cancel_all()
+        finally:
+            self._cleanup()
 
     def _cleanup(self):
-        if self.ws_client:
-            self.ws_client.stop()
+        self.engine.stop()
+        self.engine.stream.stop()
         logger.info("Manager stopped.")
 
+
+def load_pairs(path: str) -> List[tuple]:
+    """Reads OCO pairs from a CSV file with columns: symbol,quantity,tp_price,sl_price[,side]."""
+    pairs = []
+    with open(path, newline='') as f:
+        for row in csv.DictReader(f):
+            pairs.append((
+                row['symbol'],
+                float(row['quantity']),
+                float(row['tp_price']),
+                float(row['sl_price']),
+                row.get('side') or "SELL",
+            ))
+    return pairs
+
+
 if __name__ == "__main__":
     import argparse
 
     parser = argparse.ArgumentParser(description="Real-time WebSocket OCO Manager")
-    parser.add_argument("symbol", type=str)
-    parser.add_argument("quantity", type=float)
-    parser.add_argument("tp_price", type=float)
-    parser.add_argument("sl_price", type=float)
+    parser.add_argument("symbol", type=str, nargs="?")
+    parser.add_argument("quantity", type=float, nargs="?")
+    parser.add_argument("tp_price", type=float, nargs="?")
+    parser.add_argument("sl_price", type=float, nargs="?")
     parser.add_argument("--side", type=str, default="SELL")
+    parser.add_argument("--book", type=str, help="CSV of pairs: symbol,quantity,tp_price,sl_price[,side]")
+    parser.add_argument("--transport", type=str, choices=["rest", "ws"], default=None,
+                        help="Order entry over REST or the websocket API (default: ORDER_TRANSPORT)")
 
     args = parser.parse_args()
+    if args.symbol is None and not args.book:
+        parser.error("give symbol quantity tp_price sl_price, or --book FILE")
+    if args.symbol is not None and None in (args.quantity, args.tp_price, args.sl_price):
+        parser.error("symbol requires quantity, tp_price and sl_price")
 
     manager = OCOManager(
         args.symbol,
         args.quantity,
         args.tp_price,
         args.sl_price,
-        args.side
+        args.side,
+        pairs=load_pairs(args.book) if args.book else None,
+        transport=args.transport
     )
     manager.start()
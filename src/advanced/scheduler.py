@@ -0,0 +1,461 @@
+import argparse
+import asyncio
+import functools
+import random
+import sys
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from decimal import Decimal
+from typing import List, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
+
+from utils.config import get_client, setup_logger
+from utils.validation import validate_side, validate_positive_float, validate_symbol
+from utils.journal import get_journal
+from utils.execution_store import get_execution_store
+from utils.market_stream import get_market_stream
+from utils.order_book import get_order_book, local_mid, reference_price
+from utils.rules import get_rules, RuleViolation, SymbolRules
+from utils.ws_trading import get_order_transport
+from utils.submission import submit_order, new_client_order_id, SubmissionError
+from utils.events import AggTrade
+from binance.error import ClientError
+
+logger = setup_logger("exec_scheduler")
+
+# Child orders are sent from this many threads, so one slow ack never delays another parent's slice
+SCHEDULER_WORKERS = int(os.getenv("SCHEDULER_WORKERS", "8"))
+# Extra slices a TWAP may send after its last deadline to make up quantity of failed slices
+CATCH_UP_SLICES = 3
+
+
+class MonotonicClock:
+    """
+    Time source of the scheduler. Deadlines are absolute monotonic timestamps,
+    so a slow acknowledgement shortens the next wait instead of shifting the
+    whole schedule. Any object with now() and sleep_until() can be injected
+    instead, e.g. to drive the scheduler from simulated time.
+    """
+
+    def now(self) -> float:
+        return time.monotonic()
+
+    async def sleep_until(self, deadline: float):
+        delay = deadline - self.now()
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+
+class ParentOrder:
+    """A large order worked as a series of child market orders."""
+
+    kind = "parent"
+
+    def __init__(self, symbol: str, side: str, total_quantity: float, executed_qty: float = 0.0,
+                 strategy_id: Optional[str] = None, max_impact_bps: Optional[float] = None,
+                 transport: Optional[str] = None, unknown_qty: float = 0.0):
+        self.symbol = validate_symbol(symbol)
+        self.side = validate_side(side)
+        self.total_quantity = validate_positive_float(total_quantity, "Total quantity")
+        self.executed_qty = executed_qty
+        self.failed_qty = 0.0
+        # Sent with an unknown outcome (may have filled): never sent again, settled through the journal
+        self.unknown_qty = unknown_qty
+        self.children = 0
+        self.strategy_id = strategy_id
+        # Caps each child at the opposite-side liquidity within this many bps of the mid
+        self.max_impact_bps = max_impact_bps
+        # 'rest' or 'ws' for the children; None uses ORDER_TRANSPORT
+        self.transport = transport
+        # Symbol filters and order transport, loaded by the scheduler before the first child
+        self.rules: Optional[SymbolRules] = None
+        self.orders = None
+        # Reference price when the scheduler took the parent on, the benchmark for its fills
+        self.arrival_price: Optional[float] = None
+
+    @property
+    def remaining(self) -> float:
+        return self.shortfall(self.total_quantity)
+
+    def shortfall(self, target: float) -> float:
+        """
+        Quantity that brings the executed quantity, plus any quantity whose
+        outcome is unknown, up to `target`, in exact decimal arithmetic and
+        rounded down to the market lot step once the rules are loaded (a
+        leftover below one step is never sent).
+        """
+        gap = Decimal(str(round(target, 12))) - Decimal(str(self.executed_qty)) - Decimal(str(self.unknown_qty))
+        if gap <= 0:
+            return 0.0
+        return float(self.rules.quantize_qty(gap, market=True) if self.rules else gap)
+
+    def journal_params(self) -> dict:
+        return {'symbol': self.symbol, 'side': self.side, 'total_quantity': self.total_quantity,
+                'max_impact_bps': self.max_impact_bps, 'transport': self.transport}
+
+    def __repr__(self):
+        return f"{self.kind.upper()}({self.side} {self.executed_qty}/{self.total_quantity} {self.symbol})"
+
+
+class TWAPOrder(ParentOrder):
+    """
+    Sends `slices` children at evenly spaced absolute deadlines over `duration_seconds`.
+
+    Each slice tops the parent up to its scheduled cumulative quantity, so
+    quantity of a failed slice is caught up by the next one. `jitter` moves
+    every deadline after the first by up to +/- that fraction of the interval.
+    """
+
+    kind = "twap"
+
+    def __init__(self, symbol: str, side: str, total_quantity: float, duration_seconds: float, slices: int,
+                 jitter: float = 0.0, first_slice: int = 0, **kwargs):
+        super().__init__(symbol, side, total_quantity, **kwargs)
+        if slices <= 0:
+            raise ValueError("Slices must be > 0")
+        if not 0 <= jitter < 0.5:
+            raise ValueError("Jitter must be in [0, 0.5)")
+        self.duration_seconds = duration_seconds
+        self.slices = slices
+        self.jitter = jitter
+        self.first_slice = first_slice
+
+    @property
+    def interval(self) -> float:
+        return self.duration_seconds / self.slices
+
+    def journal_params(self) -> dict:
+        # Same shape as execute_twap's, so resume_twap() can pick either up
+        return {**super().journal_params(), 'duration_minutes': self.duration_seconds / 60,
+                'chunks': self.slices, 'jitter': self.jitter}
+
+
+class POVOrder(ParentOrder):
+    """
+    Participation of volume: keeps executed quantity at `participation` of the
+    market volume traded since the start, read from the live aggTrade stream.
+
+    Children are sent when the shortfall reaches `min_slice`, at most one per
+    `min_interval` seconds. Stops after `max_duration` seconds, if given.
+    """
+
+    kind = "pov"
+
+    def __init__(self, symbol: str, side: str, total_quantity: float, participation: float,
+                 min_slice: float = 0.0, min_interval: float = 1.0, max_duration: Optional[float] = None,
+                 market_volume: float = 0.0, **kwargs):
+        super().__init__(symbol, side, total_quantity, **kwargs)
+        if not 0 < participation < 1:
+            raise ValueError("Participation must be between 0 and 1")
+        self.participation = participation
+        self.min_slice = min_slice
+        self.min_interval = min_interval
+        self.max_duration = max_duration
+        self.market_volume = market_volume
+        self._wakeup: Optional[asyncio.Event] = None
+
+    def journal_params(self) -> dict:
+        return {**super().journal_params(), 'participation': self.participation, 'min_slice': self.min_slice,
+                'min_interval': self.min_interval, 'max_duration': self.max_duration}
+
+    def on_trade(self, quantity: float):
+        """Called on the event loop for every market trade of the symbol."""
+        self.market_volume += quantity
+        self._wakeup.set()
+
+
+class ExecutionScheduler:
+    """
+    Works many parent orders concurrently on one asyncio event loop.
+
+    Waiting happens on the loop against absolute deadlines; child orders are
+    sent from a thread pool, and every child is journaled like a TWAP chunk
+    and recorded, with its fill, in the execution store.
+    """
+
+    def __init__(self, client=None, clock=None, journal=None, market_stream=None, store=None):
+        self.client = client or get_client()
+        self.clock = clock or MonotonicClock()
+        self.journal = journal if journal is not None else get_journal()
+        self.store = store if store is not None else get_execution_store()
+        self.market_stream = market_stream
+        self._executor = ThreadPoolExecutor(max_workers=SCHEDULER_WORKERS, thread_name_prefix="exec-scheduler")
+
+    async def run(self, parents: List[ParentOrder]) -> List[ParentOrder]:
+        """Works every parent to completion; a parent that fails does not stop the others."""
+        results = await asyncio.gather(*(self.execute(p) for p in parents), return_exceptions=True)
+        for parent, result in zip(parents, results):
+            if isinstance(result, ClientError):
+                logger.error("%s failed: %s", parent, result.error_message, extra={'symbol': parent.symbol})
+            elif isinstance(result, BaseException):
+                logger.error("%s failed: %s", parent, result, extra={'symbol': parent.symbol})
+        return parents
+
+    async def execute(self, parent: ParentOrder) -> ParentOrder:
+        loop = asyncio.get_running_loop()
+        parent.rules = await loop.run_in_executor(self._executor, get_rules, self.client, parent.symbol)
+        parent.orders = await loop.run_in_executor(self._executor, get_order_transport, self.client, parent.transport)
+        executable = float(parent.rules.quantize_qty(parent.total_quantity, market=True))
+        if executable != parent.total_quantity:
+            logger.warning("%s total %s is not a multiple of step size %s; only %s can be executed", parent.kind.upper(),
+                           parent.total_quantity, parent.rules.market_step_size, executable,
+                           extra={'symbol': parent.symbol})
+        if self.journal and parent.strategy_id is None:
+            parent.strategy_id = self.journal.start_strategy(parent.kind, parent.journal_params())
+        if parent.max_impact_bps:
+            await loop.run_in_executor(self._executor, get_order_book, parent.symbol, self.client)
+        if self.store and parent.arrival_price is None:
+            try:
+                parent.arrival_price = await loop.run_in_executor(self._executor, reference_price, self.client,
+                                                                  parent.symbol)
+            except ClientError as e:
+                logger.warning("No arrival price for %s: %s", parent, e.error_message,
+                               extra={'symbol': parent.symbol})
+
+        try:
+            if isinstance(parent, TWAPOrder):
+                await self._work_twap(parent)
+            elif isinstance(parent, POVOrder):
+                await self._work_pov(parent)
+            else:
+                raise ValueError(f"Unsupported parent order: {parent.kind}")
+        except asyncio.CancelledError:
+            # Journal run stays unfinished, so recover.py can continue it
+            logger.info("Partial execution of %s: %s/%s", parent.strategy_id or parent.kind, parent.executed_qty,
+                        parent.total_quantity, extra={'symbol': parent.symbol})
+            raise
+
+        if parent.unknown_qty:
+            # Journal run stays unfinished, so recover.py settles the unknown children
+            logger.warning("%s: %s %s has an unknown outcome and was not resent", parent.strategy_id or parent.kind,
+                           parent.unknown_qty, parent.symbol, extra={'symbol': parent.symbol})
+        elif self.journal:
+            self.journal.finish(parent.strategy_id)
+        logger.info("%s completed. Total executed: %s/%s", parent.kind.upper(), parent.executed_qty,
+                    parent.total_quantity, extra={'symbol': parent.symbol})
+        return parent
+
+    def close(self):
+        self._executor.shutdown(wait=False)
+
+    async def _work_twap(self, parent: TWAPOrder):
+        interval = parent.interval
+        # A resumed run sends its next slice immediately and keeps the original spacing after it
+        start = self.clock.now() - parent.first_slice * interval
+        i = parent.first_slice
+        while parent.remaining > 0:
+            deadline = start + i * interval
+            if i < parent.slices:
+                if i > parent.first_slice and parent.jitter:
+                    deadline += random.uniform(-parent.jitter, parent.jitter) * interval
+                if i == parent.slices - 1:
+                    quantity = parent.remaining
+                else:
+                    # Rounded down, so intermediate slices never run ahead of the schedule
+                    target = parent.total_quantity * (i + 1) / parent.slices
+                    quantity = parent.shortfall(target)
+            elif i < parent.slices + CATCH_UP_SLICES:
+                quantity = parent.remaining
+            else:
+                break
+
+            await self.clock.sleep_until(deadline)
+            if quantity > 0:
+                if i < parent.slices:
+                    logger.info("Executing Chunk %s/%s: %s %s", i + 1, parent.slices, quantity, parent.symbol)
+                else:
+                    logger.info("Executing catch-up chunk: %s %s", quantity, parent.symbol)
+                await self._send_child(parent, f"c{i}", quantity)
+            i += 1
+
+    async def _work_pov(self, parent: POVOrder):
+        loop = asyncio.get_running_loop()
+        parent._wakeup = asyncio.Event()
+        stream_name = f"{parent.symbol.lower()}@aggTrade"
+
+        def on_agg_trade(trade: AggTrade):
+            loop.call_soon_threadsafe(parent.on_trade, trade.quantity)
+
+        stream = self.market_stream or get_market_stream()
+        stream.subscribe(stream_name, on_agg_trade)
+        end = self.clock.now() + parent.max_duration if parent.max_duration else None
+        try:
+            while parent.remaining > 0:
+                timeout = None if end is None else end - self.clock.now()
+                if timeout is not None and timeout <= 0:
+                    logger.warning("POV window over with %s %s unexecuted", parent.remaining, parent.symbol,
+                                   extra={'symbol': parent.symbol})
+                    break
+                try:
+                    await asyncio.wait_for(parent._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    continue
+                parent._wakeup.clear()
+
+                target = min(parent.total_quantity, parent.participation * parent.market_volume)
+                quantity = parent.shortfall(target)
+                if quantity <= 0 or (quantity < parent.min_slice and quantity < parent.remaining):
+                    continue
+                sent_at = self.clock.now()
+                await self._send_child(parent, f"p{parent.children}", quantity)
+                await self.clock.sleep_until(sent_at + parent.min_interval)
+        finally:
+            stream.unsubscribe(stream_name, on_agg_trade)
+
+    async def _send_child(self, parent: ParentOrder, tag: str, quantity: float) -> bool:
+        if parent.max_impact_bps:
+            quantity = self._cap_to_liquidity(parent, quantity)
+            if quantity <= 0:
+                logger.info("Child %s of %s deferred: no liquidity within %s bps", tag,
+                            parent.strategy_id or parent.kind, parent.max_impact_bps, extra={'symbol': parent.symbol})
+                return False
+        try:
+            # A child under minQty or min notional is held back; a later slice tops it up
+            parent.rules.check(quantity, order_type="MARKET", reference=local_mid(parent.symbol))
+        except RuleViolation as e:
+            logger.warning("Child %s of %s held back: %s", tag, parent.strategy_id or parent.kind, e,
+                           extra={'symbol': parent.symbol})
+            return False
+        order = {'symbol': parent.symbol, 'side': parent.side, 'type': "MARKET", 'quantity': quantity}
+        loop = asyncio.get_running_loop()
+        if self.journal:
+            client_order_id = self.journal.intent(parent.strategy_id, tag, order)
+            # Write-ahead: the intent is on disk before the child can exist on the exchange
+            await loop.run_in_executor(self._executor, self.journal.flush)
+        else:
+            client_order_id = new_client_order_id(parent.kind)
+        parent.children += 1
+
+        start = time.perf_counter()
+        try:
+            # RESULT: the response carries the fill (executedQty, avgPrice), not just the ack
+            response = await loop.run_in_executor(
+                self._executor, functools.partial(submit_order, parent.orders, newClientOrderId=client_order_id,
+                                                  newOrderRespType="RESULT", **order))
+        except SubmissionError as e:
+            if e.unknown:
+                # May have filled: held as unknown so no later slice sends it again; the journal reconciles it
+                parent.unknown_qty = float(Decimal(str(parent.unknown_qty)) + Decimal(str(quantity)))
+                logger.error("Child %s of %s has an unknown outcome: %s", tag, parent.strategy_id or parent.kind, e,
+                             extra={'symbol': parent.symbol})
+                return False
+            parent.failed_qty += quantity
+            if self.journal:
+                self.journal.lost(client_order_id)
+            if self.store:
+                self.store.record_order(parent.symbol, parent.side, "MARKET", quantity, arrival=parent.arrival_price,
+                                        strategy=parent.strategy_id or parent.kind)
+            logger.error("Child %s of %s failed: %s", tag, parent.strategy_id or parent.kind, e,
+                         extra={'symbol': parent.symbol})
+            return False
+        except ClientError as e:
+            parent.failed_qty += quantity
+            if self.journal:
+                self.journal.reject(client_order_id, e.error_code, e.error_message)
+            if self.store:
+                self.store.record_order(parent.symbol, parent.side, "MARKET", quantity, arrival=parent.arrival_price,
+                                        strategy=parent.strategy_id or parent.kind)
+            logger.error("Child %s of %s failed: %s", tag, parent.strategy_id or parent.kind, e.error_message,
+                         extra={'symbol': parent.symbol, 'error_code': e.error_code})
+            return False
+
+        latency_ms = round((time.perf_counter() - start) * 1000, 2)
+        # The actual fill: what a partly filled or EXPIRED child left undone, a later slice makes up
+        filled = Decimal(str(response['executedQty']))
+        parent.executed_qty = float(Decimal(str(parent.executed_qty)) + filled)
+        if filled < Decimal(str(quantity)):
+            logger.warning("Child %s of %s filled %s of %s (%s)", tag, parent.strategy_id or parent.kind, filled,
+                           quantity, response.get('status'), extra={'symbol': parent.symbol})
+        if self.journal:
+            self.journal.ack(client_order_id, response)
+        if self.store:
+            self.store.record_response(response, parent.arrival_price, latency_ms, parent.strategy_id or parent.kind)
+        logger.info("Child %s filled. Order ID: %s | AvgPrice: %s", tag, response['orderId'],
+                    response.get('avgPrice', 'N/A'),
+                    extra={'order_id': response['orderId'], 'symbol': parent.symbol, 'latency_ms': latency_ms})
+        return True
+
+    @staticmethod
+    def _cap_to_liquidity(parent: ParentOrder, quantity: float) -> float:
+        """Child size limited to what the local book shows within max_impact_bps; uncapped until it syncs."""
+        book = get_order_book(parent.symbol)
+        if not book.synced:
+            return quantity
+        bid_qty, ask_qty = book.depth_within(parent.max_impact_bps)
+        available = ask_qty if parent.side == "BUY" else bid_qty
+        return min(quantity, float(parent.rules.quantize_qty(available, market=True)))
+
+
+def pov_from_record(record) -> Optional[POVOrder]:
+    """Rebuilds the unexecuted rest of a POV run from the (reconciled) order journal."""
+    params = record.params
+    executed_qty = float(sum(Decimal(str(o.executed_qty)) for o in record.orders.values() if o.placed))
+    # Children reconciliation could not settle may have filled: held back, not chased again
+    unknown_qty = float(sum(Decimal(str(o.params['quantity'])) for o in record.orders.values() if o.unknown))
+    if executed_qty + unknown_qty >= params['total_quantity']:
+        return None
+    # Participation restarts from the executed quantity: volume missed while down is not chased
+    parent = POVOrder(params['symbol'], params['side'], params['total_quantity'], params['participation'],
+                      min_slice=params['min_slice'], min_interval=params['min_interval'],
+                      max_duration=params['max_duration'], market_volume=executed_qty / params['participation'],
+                      executed_qty=executed_qty, unknown_qty=unknown_qty, strategy_id=record.strategy_id,
+                      max_impact_bps=params.get('max_impact_bps'), transport=params.get('transport'))
+    parent.children = len(record.orders)
+    return parent
+
+
+def run_parents(parents: List[ParentOrder], client=None, journal=None, clock=None) -> List[ParentOrder]:
+    """Blocking helper: works the parents on a fresh event loop and returns them."""
+    scheduler = ExecutionScheduler(client, clock=clock, journal=journal)
+    try:
+        return asyncio.run(scheduler.run(parents))
+    finally:
+        scheduler.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Work a parent order with the execution scheduler")
+    sub = parser.add_subparsers(dest="algo", required=True)
+
+    twap = sub.add_parser("twap", help="Evenly spaced slices on absolute deadlines")
+    twap.add_argument("symbol", type=str, help="Trading pair (e.g., BTCUSDT)")
+    twap.add_argument("side", type=str, help="BUY or SELL")
+    twap.add_argument("total_qty", type=float, help="Total quantity to execute")
+    twap.add_argument("duration_min", type=float, help="Total duration in minutes")
+    twap.add_argument("slices", type=int, help="Number of child orders")
+    twap.add_argument("--jitter", type=float, default=0.0, help="Random deadline shift, fraction of the interval")
+    twap.add_argument("--max-impact-bps", type=float, default=None, help="Cap children at book depth within N bps")
+    twap.add_argument("--transport", type=str, choices=["rest", "ws"], default=None,
+                      help="Child orders over REST or the websocket API (default: ORDER_TRANSPORT)")
+
+    pov = sub.add_parser("pov", help="Follow a share of the live traded volume")
+    pov.add_argument("symbol", type=str, help="Trading pair (e.g., BTCUSDT)")
+    pov.add_argument("side", type=str, help="BUY or SELL")
+    pov.add_argument("total_qty", type=float, help="Total quantity to execute")
+    pov.add_argument("participation", type=float, help="Target share of market volume (e.g., 0.1)")
+    pov.add_argument("--min-slice", type=float, default=0.0, help="Smallest child order")
+    pov.add_argument("--min-interval", type=float, default=1.0, help="Seconds between child orders")
+    pov.add_argument("--max-minutes", type=float, default=None, help="Give up after this many minutes")
+    pov.add_argument("--max-impact-bps", type=float, default=None, help="Cap children at book depth within N bps")
+    pov.add_argument("--transport", type=str, choices=["rest", "ws"], default=None,
+                     help="Child orders over REST or the websocket API (default: ORDER_TRANSPORT)")
+
+    args = parser.parse_args()
+    try:
+        if args.algo == "twap":
+            parent = TWAPOrder(args.symbol, args.side, args.total_qty, args.duration_min * 60, args.slices,
+                               jitter=args.jitter, max_impact_bps=args.max_impact_bps, transport=args.transport)
+        else:
+            parent = POVOrder(args.symbol, args.side, args.total_qty, args.participation, min_slice=args.min_slice,
+                              min_interval=args.min_interval,
+                              max_duration=args.max_minutes * 60 if args.max_minutes else None,
+                              max_impact_bps=args.max_impact_bps, transport=args.transport)
+        run_parents([parent])
+    except ValueError as e:
+        logger.error("Validation Error: %s", e)
+    except KeyboardInterrupt:
+        logger.warning("Execution interrupted by user.")
+    finally:
+        get_market_stream().stop()
@@ -1,16 +1,23 @@
 import argparse
 import sys
 import os
+import time
+from typing import Optional
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
 from utils.config import get_client, setup_logger
 from utils.validation import validate_side, validate_positive_float, validate_symbol
+from utils.rules import get_rules, RuleViolation
+from utils.order_book import local_mid
+from utils.ws_trading import get_order_transport
+from utils.submission import submit_order, SubmissionError
 from binance.error import ClientError
 
 logger = setup_logger("stop_limit")
 
-def place_stop_limit(symbol: str, side: str, quantity: float, stop_price: float, limit_price: float):
+def place_stop_limit(symbol: str, side: str, quantity: float, stop_price: float, limit_price: float,
+                     transport: Optional[str] = None):
     """
     Executes a Stop-Limit Order.
     """
@@ -21,10 +28,15 @@ def place_stop_limit(symbol: str, side: str, quantity: float, stop_price: float,
         quantity = validate_positive_float(quantity, "Quantity")
         stop_price = validate_positive_float(stop_price, "Stop Price")
         limit_price = validate_positive_float(limit_price, "Limit Price")
+        get_rules(client, symbol).check(quantity, limit_price, order_type="STOP", stop_price=stop_price,
+                                        reference=local_mid(symbol))
 
-        logger.info(f"Placing STOP-LIMIT: Trigger @ {stop_price}, Limit @ {limit_price}")
+        logger.info("Placing STOP-LIMIT: Trigger @ %s, Limit @ %s", stop_price, limit_price)
 
-        response = client.new_order(
+        orders = get_order_transport(client, transport)
+        start = time.perf_counter()
+        response = submit_order(
+            orders,
             symbol=symbol,
             side=side,
             type="STOP",
@@ -33,14 +45,20 @@ def place_stop_limit(symbol: str, side: str, quantity: float, stop_price: float,
             stopPrice=stop_price,
             timeInForce="GTC"
         )
-        
-        logger.info(f"Stop-Limit Registered: ID {response['orderId']}")
+        latency_ms = round((time.perf_counter() - start) * 1000, 2)
+
+        logger.info("Stop-Limit Registered: ID %s", response['orderId'],
+                    extra={'order_id': response['orderId'], 'symbol': symbol, 'latency_ms': latency_ms})
         return response
 
     except ClientError as error:
-        logger.error(f"API Error: {error.error_message}")
+        logger.error("API Error: %s", error.error_message, extra={'symbol': symbol, 'error_code': error.error_code})
+    except RuleViolation as e:
+        logger.error("Rejected locally: %s", e, extra={'symbol': symbol})
+    except SubmissionError as e:
+        logger.error("Submission Error: %s", e, extra={'symbol': symbol})
     except Exception as e:
-        logger.error(f"Error: {e}")
+        logger.error("Error: %s", e)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Place a Stop-Limit Order")
@@ -49,6 +67,9 @@ if __name__ == "__main__":
     parser.add_argument("quantity", type=float)
     parser.add_argument("stop_price", type=float)
     parser.add_argument("limit_price", type=float)
+    parser.add_argument("--transport", type=str, choices=["rest", "ws"], default=None,
+                        help="Send over REST or the websocket API (default: ORDER_TRANSPORT)")
     
     args = parser.parse_args()
-    place_stop_limit(args.symbol, args.side, args.quantity, args.stop_price, args.limit_price)
\ No newline at end of file
+    place_stop_limit(args.symbol, args.side, args.quantity, args.stop_price, args.limit_price,
+                     args.transport)
\ No newline at end of file
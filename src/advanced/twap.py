@@ -1,75 +1,91 @@
 import argparse
 import sys
 import os
-import time
+from decimal import Decimal
+from typing import Optional
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))))
 
-from utils.config import get_client, setup_logger
-from utils.validation import validate_side, validate_positive_float, validate_symbol, get_symbol_precision
+from utils.config import setup_logger
+from utils.journal import get_journal
+from advanced.scheduler import TWAPOrder, run_parents
 from binance.error import ClientError
 
 logger = setup_logger("twap_algo")
 
-def execute_twap(symbol: str, side: str, total_quantity: float, duration_minutes: int, chunks: int):
+def execute_twap(symbol: str, side: str, total_quantity: float, duration_minutes: int, chunks: int, journal=None,
+                 jitter: float = 0.0):
     """
     Executes a Time-Weighted Average Price (TWAP) strategy.
-    Splits a large order into smaller market orders executed at regular intervals.
+    Splits a large order into smaller market orders sent at fixed deadlines
+    (optionally jittered); a failed chunk's quantity is added to the next one.
+    Every chunk is journaled, so an interrupted run can be continued with resume_twap().
+    Returns the worked TWAPOrder, or None if the run could not be carried out.
     """
     try:
-        client = get_client()
-        symbol = validate_symbol(symbol)
-        side = validate_side(side)
-        
-        if chunks <= 0: 
-            raise ValueError("Chunks must be > 0")
-        
-        # Get symbol precision from exchange
-        price_precision, qty_precision = get_symbol_precision(client, symbol)
-        
-        chunk_size = round(total_quantity / chunks, qty_precision)
-        interval_seconds = (duration_minutes * 60) / chunks
+        parent = TWAPOrder(symbol, side, total_quantity, duration_minutes * 60, chunks, jitter=jitter)
 
-        logger.info(f"Starting TWAP: {total_quantity} {symbol} over {duration_minutes}m in {chunks} chunks.")
-        logger.info(f"Execution Plan: {chunk_size} {symbol} every {interval_seconds:.1f} seconds.")
-        logger.info(f"Using quantity precision: {qty_precision} decimals")
+        logger.info("Starting TWAP: %s %s over %sm in %s chunks.", total_quantity, parent.symbol, duration_minutes, chunks)
+        logger.info("Execution Plan: %s %s every %.1f seconds.", total_quantity / chunks, parent.symbol,
+                    parent.interval)
 
-        executed_qty = 0.0
-
-        for i in range(chunks):
-            # For the last chunk, use remaining quantity to handle rounding
-            if i == chunks - 1:
-                chunk_size = round(total_quantity - executed_qty, qty_precision)
-
-            logger.info(f"Executing Chunk {i+1}/{chunks}: {chunk_size} {symbol}")
-            
-            # Execute Market Order for chunk
-            try:
-                response = client.new_order(
-                    symbol=symbol, 
-                    side=side, 
-                    type="MARKET", 
-                    quantity=chunk_size
-                )
-                executed_qty += chunk_size
-                logger.info(f"Chunk {i+1} filled. Order ID: {response['orderId']}")
-            except ClientError as e:
-                logger.error(f"Chunk {i+1} failed: {e.error_message}")
-                # Continue with remaining chunks
-            
-            if i < chunks - 1:
-                logger.info(f"Sleeping for {interval_seconds:.1f}s...")
-                time.sleep(interval_seconds)
-        
-        logger.info(f"TWAP Strategy Completed. Total executed: {executed_qty}/{total_quantity}")
+        return run_parents([parent], journal=journal)[0]
 
     except ClientError as error:
-        logger.error(f"API Error: {error.error_message}")
+        logger.error("API Error: %s", error.error_message)
     except KeyboardInterrupt:
         logger.warning("TWAP Interrupted by User.")
-        logger.info(f"Partial execution: {executed_qty}/{total_quantity}")
     except Exception as e:
-        logger.error(f"Unexpected Error: {e}")
+        logger.error("Unexpected Error: %s", e)
+
+def twap_from_record(record, journal=None) -> Optional[TWAPOrder]:
+    """
+    Rebuilds the remaining part of a TWAP run from the (reconciled) order journal.
+    Chunks that reached the exchange count with their filled quantity, and
+    chunks reconciliation could not settle are held back (never resent); the
+    schedule picks up after the last chunk that was sent. Returns None if
+    every chunk was already sent.
+    """
+    params = record.params
+    chunks = params['chunks']
+
+    executed_qty = Decimal(0)
+    unknown_qty = Decimal(0)
+    next_chunk = 0
+    for tag, order in record.orders_by_tag().items():
+        index = int(tag[1:])
+        if order.placed:
+            executed_qty += Decimal(str(order.executed_qty))
+        elif order.unknown:
+            unknown_qty += Decimal(str(order.params['quantity']))
+        if order.placed or order.unknown or order.status == "REJECTED":
+            next_chunk = max(next_chunk, index + 1)
+
+    if unknown_qty:
+        logger.warning("TWAP %s: %s %s in chunks with an unknown outcome is held back.", record.strategy_id,
+                       unknown_qty, params['symbol'])
+    if next_chunk >= chunks:
+        logger.info("TWAP %s had already sent all %s chunks.", record.strategy_id, chunks)
+        if unknown_qty:
+            # Run stays unfinished, so a later recovery can settle those chunks
+            return None
+        journal = journal if journal is not None else get_journal()
+        if journal:
+            journal.finish(record.strategy_id)
+        return None
+
+    logger.info("Resuming TWAP %s at chunk %s/%s (executed %s/%s %s).", record.strategy_id, next_chunk + 1, chunks,
+                executed_qty, params['total_quantity'], params['symbol'])
+    return TWAPOrder(params['symbol'], params['side'], params['total_quantity'], params['duration_minutes'] * 60,
+                     chunks, jitter=params.get('jitter', 0.0), first_slice=next_chunk, executed_qty=float(executed_qty),
+                     unknown_qty=float(unknown_qty), strategy_id=record.strategy_id,
+                     max_impact_bps=params.get('max_impact_bps'), transport=params.get('transport'))
+
+def resume_twap(record, journal=None):
+    """Continues one TWAP run rebuilt from the order journal."""
+    parent = twap_from_record(record, journal)
+    if parent is not None:
+        run_parents([parent], journal=journal)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Execute TWAP Strategy")
@@ -78,6 +94,7 @@ if __name__ == "__main__":
     parser.add_argument("total_qty", type=float, help="Total quantity to execute")
     parser.add_argument("duration_min", type=int, help="Total duration in minutes")
     parser.add_argument("chunks", type=int, help="Number of split orders")
+    parser.add_argument("--jitter", type=float, default=0.0, help="Random deadline shift, fraction of the interval")
     
     args = parser.parse_args()
-    execute_twap(args.symbol, args.side, args.total_qty, args.duration_min, args.chunks)
\ No newline at end of file
+    execute_twap(args.symbol, args.side, args.total_qty, args.duration_min, args.chunks, jitter=args.jitter)
\ No newline at end of file
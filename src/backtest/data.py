@@ -0,0 +1,95 @@
+import itertools
+import os
+from typing import Optional
+
+import numpy as np
+
+# One row per trade: exchange time (ms), price and quantity, in time order
+TRADE_DTYPE = np.dtype([('time', '<i8'), ('price', '<f8'), ('qty', '<f8')])
+# Rows parsed per np.loadtxt call while converting a CSV, bounding memory use
+CSV_CHUNK_ROWS = 1_000_000
+
+# Column layouts of the data.binance.vision futures dumps
+AGG_TRADE_COLUMNS = 7   # agg_trade_id, price, quantity, first_trade_id, last_trade_id, transact_time, is_buyer_maker
+KLINE_COLUMNS = 12      # open_time, open, high, low, close, volume, close_time, quote_volume, count, ...
+
+
+def load_trades(path: str) -> np.ndarray:
+    """
+    Returns the trades of a file as a TRADE_DTYPE array.
+
+    Binary .npy files are memory-mapped, so loading is instant and processes
+    replaying the same file share its pages. A CSV (aggTrades or klines) is
+    converted to a .npy next to it on first use and mapped from then on.
+    """
+    if not path.endswith(".npy"):
+        binary = os.path.splitext(path)[0] + ".npy"
+        if not os.path.exists(binary) or os.path.getmtime(binary) < os.path.getmtime(path):
+            convert_csv(path, binary)
+        path = binary
+
+    trades = np.load(path, mmap_mode='r')
+    if trades.dtype != TRADE_DTYPE:
+        raise ValueError(f"{path} is not a trade file (dtype {trades.dtype}, expected {TRADE_DTYPE})")
+    return trades
+
+
+def convert_csv(csv_path: str, npy_path: Optional[str] = None) -> str:
+    """
+    Converts an aggTrades or klines CSV (with or without header) into a .npy
+    trade file, chunk by chunk. Every kline becomes four trades carrying a
+    quarter of its volume: open, then the extreme nearer the open (low for a
+    rising bar, high for a falling one), the other extreme, and close.
+    Returns the path written.
+    """
+    npy_path = npy_path or os.path.splitext(csv_path)[0] + ".npy"
+    with open(csv_path) as f:
+        first = f.readline()
+        has_header = not first.split(",")[0].strip().lstrip("-").isdigit()
+        columns = len(first.split(","))
+        rows = sum(1 for _ in f) + (0 if has_header else 1)
+
+    if columns == AGG_TRADE_COLUMNS:
+        usecols, per_row = (5, 1, 2), 1
+    elif columns == KLINE_COLUMNS:
+        usecols, per_row = (0, 1, 2, 3, 4, 5, 6), 4
+    else:
+        raise ValueError(f"{csv_path}: expected {AGG_TRADE_COLUMNS} (aggTrades) or {KLINE_COLUMNS} (klines) "
+                         f"columns, got {columns}")
+
+    out = np.lib.format.open_memmap(npy_path + ".tmp", mode='w+', dtype=TRADE_DTYPE, shape=(rows * per_row,))
+    with open(csv_path) as f:
+        if has_header:
+            next(f)
+        written = 0
+        for start in range(0, rows, CSV_CHUNK_ROWS):
+            chunk = np.loadtxt(itertools.islice(f, min(CSV_CHUNK_ROWS, rows - start)), delimiter=",",
+                               usecols=usecols, ndmin=2)
+            trades = _klines_to_trades(chunk) if per_row == 4 else _agg_trades(chunk)
+            out[written:written + len(trades)] = trades
+            written += len(trades)
+    out.flush()
+    del out
+    os.replace(npy_path + ".tmp", npy_path)
+    return npy_path
+
+
+def _agg_trades(chunk: np.ndarray) -> np.ndarray:
+    trades = np.empty(len(chunk), dtype=TRADE_DTYPE)
+    trades['time'] = chunk[:, 0]
+    trades['price'] = chunk[:, 1]
+    trades['qty'] = chunk[:, 2]
+    return trades
+
+
+def _klines_to_trades(chunk: np.ndarray) -> np.ndarray:
+    open_time, o, h, l, c, volume, close_time = chunk.T
+    rising = c >= o
+    prices = np.column_stack([o, np.where(rising, l, h), np.where(rising, h, l), c])
+    times = open_time[:, None] + (close_time - open_time)[:, None] * np.array([0.0, 1 / 3, 2 / 3, 1.0])
+
+    trades = np.empty(prices.size, dtype=TRADE_DTYPE)
+    trades['time'] = times.ravel()
+    trades['price'] = prices.ravel()
+    trades['qty'] = np.repeat(volume / 4, 4)
+    return trades
@@ -0,0 +1,356 @@
+import os
+import random
+import sys
+import time
+from typing import Callable, Dict, Optional
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# A backtest must not write the live order journal, execution store or symbol cache, nor export metrics.
+# Set before anything imports utils.
+os.environ["ORDER_JOURNAL_PATH"] = ""
+os.environ["EXECUTION_STORE_PATH"] = ""
+os.environ["SYMBOL_CACHE_PATH"] = os.path.join(".cache", "backtest_exchange_info.json")
+os.environ["METRICS_PORT"] = "0"
+os.environ["METRICS_SNAPSHOT_PATH"] = ""
+
+import numpy as np
+
+from simulator.client import SimulatedClient, DEFAULT_SYMBOLS
+from simulator.matching import MatchingEngine
+from utils.events import RECORDS, OrderUpdate
+from utils.metadata import get_metadata_store
+from utils.account_state import AccountState
+from advanced.grid_engine import GridEngine
+from advanced.scheduler import TWAPOrder, run_parents
+
+LIMIT_FILLS = ("touch", "through")
+DEFAULT_WALLET = 10000.0
+# Trades checked per vectorized scan for the next crossing; grows while nothing crosses
+SCAN_WINDOW = 4096
+MAX_SCAN_WINDOW = 1 << 22
+
+
+class FillModel:
+    """
+    How replayed trades fill the strategy's orders.
+
+    limit_fill: 'touch' fills a resting order on any trade at its price,
+        'through' only on a trade beyond it (we were not first in the queue)
+    slippage_bps: taker fills (market orders, marketable limits) are this
+        much worse than the last trade
+    """
+
+    def __init__(self, limit_fill: str = "touch", slippage_bps: float = 0.0):
+        if limit_fill not in LIMIT_FILLS:
+            raise ValueError(f"Invalid limit fill: {limit_fill}. Must be one of {', '.join(LIMIT_FILLS)}.")
+        if slippage_bps < 0:
+            raise ValueError("Slippage must be >= 0 bps")
+        self.limit_fill = limit_fill
+        self.slippage_bps = slippage_bps
+
+    @property
+    def through(self) -> bool:
+        return self.limit_fill == "through"
+
+
+class ReplayEngine(MatchingEngine):
+    """MatchingEngine whose taker fills pay the fill model's slippage."""
+
+    def __init__(self, symbols: Dict[str, dict], fill_model: FillModel, **kwargs):
+        super().__init__(symbols, **kwargs)
+        self.fill_model = fill_model
+
+    def _fill(self, order, qty: float, price: float, is_maker: bool):
+        if not is_maker and self.fill_model.slippage_bps:
+            slippage = self.fill_model.slippage_bps / 10000
+            price *= 1 + slippage if order.side == "BUY" else 1 - slippage
+        super()._fill(order, qty, price, is_maker)
+
+
+class SimulatedClock:
+    """
+    Replay time, in epoch seconds. Callable like time.time (matching engine),
+    with timestamp() like ServerClock (account state) and now() /
+    sleep_until() like the scheduler's MonotonicClock. Sleeping replays the
+    trades up to the deadline, so a 60-minute TWAP takes as long as its
+    trades take to replay.
+    """
+
+    def __init__(self, replay: "Replay", start: float):
+        self.replay = replay
+        self._now = start
+
+    def __call__(self) -> float:
+        return self._now
+
+    def now(self) -> float:
+        return self._now
+
+    def timestamp(self) -> int:
+        return int(self._now * 1000)
+
+    def set(self, now: float):
+        self._now = max(self._now, now)
+
+    async def sleep_until(self, deadline: float):
+        self.replay.advance_to(deadline)
+
+
+class ReplayStream:
+    """
+    Stands in for the user-data stream: engine events reach subscribers
+    synchronously, as the same records UserDataStream delivers.
+    """
+
+    def __init__(self):
+        self._handlers: Dict[str, tuple] = {}
+        self.delivered = 0
+
+    def subscribe(self, event_type: str, handler: Callable):
+        self._handlers[event_type] = self._handlers.get(event_type, ()) + (handler,)
+
+    def unsubscribe(self, event_type: str, handler: Callable):
+        handlers = list(self._handlers.get(event_type, ()))
+        if handler in handlers:
+            handlers.remove(handler)
+            self._handlers[event_type] = tuple(handlers)
+
+    def start(self):
+        pass
+
+    def stop(self):
+        pass
+
+    def on_event(self, data: dict):
+        handlers = self._handlers.get(data['e'])
+        if not handlers:
+            return
+        record = RECORDS.get(data['e'])
+        event = record(data) if record is not None else data
+        self.delivered += 1
+        for handler in handlers:
+            handler(event)
+
+
+class Replay:
+    """
+    Plays a trade array for one symbol through an in-process matching engine
+    on simulated time. Strategies run unmodified against `client` (a
+    SimulatedClient), `stream` and `clock`.
+
+    A trade that can neither fill a resting order nor fire a stop only moves
+    the last price, so runs of such trades are skipped with one vectorized
+    scan. Only crossing trades go through the engine, one at a time, each
+    followed by `settle` so the strategy has reacted before the next trade.
+    """
+
+    def __init__(self, trades: np.ndarray, symbol: str, fill_model: Optional[FillModel] = None,
+                 wallet_balance: float = DEFAULT_WALLET, start: Optional[float] = None, spec: Optional[dict] = None):
+        self.symbol = symbol
+        # searchsorted needs a contiguous column (a field of the record array is strided)
+        self.times = np.ascontiguousarray(trades['time'])
+        self.prices = trades['price']
+        self.qtys = trades['qty']
+        self.fill_model = fill_model or FillModel()
+        self.index = int(np.searchsorted(self.times, int(start * 1000))) if start is not None else 0
+        if self.index >= len(self.times):
+            raise ValueError("No trades to replay after the start time")
+
+        spec = spec or DEFAULT_SYMBOLS.get(symbol)
+        if spec is None:
+            raise ValueError(f"No simulated contract spec for {symbol}; pass spec=")
+        symbols = {symbol: dict(spec, price=float(self.prices[self.index]))}
+        self.first = self.index
+        self.clock = SimulatedClock(self, float(self.times[self.index]) / 1000)
+        self.engine = ReplayEngine(symbols, self.fill_model, wallet_balance=wallet_balance, clock=self.clock)
+        self.client = SimulatedClient(symbols, clock=self.clock, engine=self.engine)
+        self.stream = ReplayStream()
+        self.client.add_listener(self.stream.on_event)
+        self.stream.subscribe('ORDER_TRADE_UPDATE', self._on_order_update)
+        # Symbol filters come from the simulated contract, not the live exchange
+        get_metadata_store().refresh(self.client)
+
+        self.start_time = self.clock.now()
+        self.start_balance = wallet_balance
+        self.fills = 0
+        self.fees = 0.0
+        self.filled_qty = {"BUY": 0.0, "SELL": 0.0}
+        self.filled_quote = {"BUY": 0.0, "SELL": 0.0}
+        self.peak_equity = wallet_balance
+        self.max_drawdown = 0.0
+
+    @property
+    def end_time(self) -> float:
+        return float(self.times[-1]) / 1000
+
+    @property
+    def last_price(self) -> float:
+        return self.engine.last_price[self.symbol]
+
+    def advance_to(self, until: float, settle: Optional[Callable[[], None]] = None):
+        """Replays every trade up to `until` (epoch seconds) and moves the clock there."""
+        end = int(np.searchsorted(self.times, int(until * 1000), side='right'))
+        while self.index < end:
+            hit = self._next_cross(end)
+            stop = end if hit is None else hit
+            if stop > self.index:
+                self._mark(self.index, stop)
+                self.engine.last_price[self.symbol] = float(self.prices[stop - 1])
+            if hit is None:
+                self.index = end
+                break
+
+            self.clock.set(float(self.times[hit]) / 1000)
+            self.client.print_trade(self.symbol, float(self.prices[hit]), float(self.qtys[hit]),
+                                    self.fill_model.through)
+            self.index = hit + 1
+            if settle is not None:
+                self._settle(settle)
+            self._mark(hit, hit + 1)
+        self.clock.set(until)
+
+    def average_price(self, side: str) -> float:
+        qty = self.filled_qty[side]
+        return self.filled_quote[side] / qty if qty else 0.0
+
+    def market_vwap(self, start: float, end: float) -> float:
+        """Volume-weighted price of all replayed trades between two times (epoch seconds)."""
+        i, j = np.searchsorted(self.times, [int(start * 1000), int(end * 1000)], side='right')
+        volume = self.qtys[i:j].sum()
+        return float((self.prices[i:j] * self.qtys[i:j]).sum() / volume) if volume else self.last_price
+
+    def summary(self) -> dict:
+        position = self.engine.positions[self.symbol]
+        unrealized = (self.last_price - position.entry_price) * position.amount if position.amount else 0.0
+        realized = self.engine.wallet_balance - self.start_balance
+        return {
+            'trades': self.index - self.first,
+            'days': round((self.clock.now() - self.start_time) / 86400, 3),
+            'fills': self.fills,
+            'volume': round(sum(self.filled_quote.values()), 2),
+            'fees': round(self.fees, 4),
+            'realized_pnl': round(realized, 4),
+            'position': position.amount,
+            'unrealized_pnl': round(unrealized, 4),
+            'pnl': round(realized + unrealized, 4),
+            'max_drawdown': round(self.max_drawdown, 4),
+        }
+
+    def _next_cross(self, end: int) -> Optional[int]:
+        """Index of the first trade before `end` that would fill or trigger anything, or None."""
+        low, high = self.engine.crossing_prices(self.symbol)
+        if low == float("-inf") and high == float("inf"):
+            return None
+        i, window = self.index, SCAN_WINDOW
+        while i < end:
+            j = min(i + window, end)
+            prices = self.prices[i:j]
+            if self.fill_model.through:
+                crossed = (prices < low) | (prices > high)
+            else:
+                crossed = (prices <= low) | (prices >= high)
+            hits = np.flatnonzero(crossed)
+            if len(hits):
+                return i + int(hits[0])
+            i = j
+            window = min(window * 4, MAX_SCAN_WINDOW)
+        return None
+
+    def _settle(self, settle: Callable[[], None]):
+        # The strategy's reaction can cause fills of its own; wait until no new event arrives
+        while True:
+            delivered = self.stream.delivered
+            settle()
+            if self.stream.delivered == delivered:
+                return
+
+    def _mark(self, start: int, end: int):
+        """Tracks drawdown over trades [start, end), using their best and worst price against the position."""
+        position = self.engine.positions[self.symbol]
+        wallet = self.engine.wallet_balance
+        if position.amount:
+            prices = self.prices[start:end]
+            low, high = float(prices.min()), float(prices.max())
+            best, worst = (high, low) if position.amount > 0 else (low, high)
+            best_equity = wallet + (best - position.entry_price) * position.amount
+            worst_equity = wallet + (worst - position.entry_price) * position.amount
+        else:
+            best_equity = worst_equity = wallet
+        self.max_drawdown = max(self.max_drawdown, self.peak_equity - worst_equity)
+        self.peak_equity = max(self.peak_equity, best_equity)
+
+    def _on_order_update(self, update: OrderUpdate):
+        if update.exec_type != "TRADE":
+            return
+        self.fills += 1
+        self.fees += update.commission
+        self.filled_qty[update.side] += update.last_qty
+        self.filled_quote[update.side] += update.last_qty * update.last_price
+
+
+def backtest_grid(trades: np.ndarray, symbol: str, lower_price: float, upper_price: float, grid_levels: int,
+                  qty_per_grid: float, spacing: str = "arithmetic", window: int = 0,
+                  fill_model: Optional[FillModel] = None, wallet_balance: float = DEFAULT_WALLET,
+                  start: Optional[float] = None, end: Optional[float] = None) -> dict:
+    """
+    Runs the self-refilling GridEngine (the same code as a live grid) over
+    the trades between `start` and `end` (epoch seconds, default: all of
+    them) and returns the replay summary. Orders still open at the end are
+    cancelled; the remaining position is valued at the last price.
+    """
+    replay = Replay(trades, symbol, fill_model, wallet_balance, start=start)
+    account_state = AccountState(replay.client, replay.stream)
+    account_state.start()
+    engine = GridEngine(symbol, lower_price, upper_price, grid_levels, qty_per_grid, spacing=spacing, window=window,
+                        grid_id="bt", client=replay.client, stream=replay.stream, account_state=account_state)
+
+    started = time.perf_counter()
+    engine.start(adopt=False)
+    try:
+        replay.advance_to(end if end is not None else replay.end_time, settle=engine.wait_idle)
+    finally:
+        engine.stop(cancel=True)
+    result = replay.summary()
+    result['seconds'] = round(time.perf_counter() - started, 3)
+    return result
+
+
+def backtest_twap(trades: np.ndarray, symbol: str, side: str, total_quantity: float, duration_minutes: float,
+                  slices: int, jitter: float = 0.0, fill_model: Optional[FillModel] = None,
+                  wallet_balance: float = DEFAULT_WALLET, start: Optional[float] = None,
+                  seed: Optional[int] = None) -> dict:
+    """
+    Works one TWAP parent on the execution scheduler (the same code as a live
+    TWAP) from `start` (epoch seconds, default: the first trade) and returns
+    the replay summary plus execution quality: average fill price against
+    the arrival price and the market VWAP over the TWAP window, in bps
+    (positive = worse than the benchmark). `seed` makes jittered deadlines
+    reproducible.
+    """
+    replay = Replay(trades, symbol, fill_model, wallet_balance, start=start)
+    if seed is not None:
+        random.seed(seed)
+    parent = TWAPOrder(symbol, side, total_quantity, duration_minutes * 60, slices, jitter=jitter, transport="rest")
+    arrival = replay.last_price
+    began = replay.clock.now()
+
+    started = time.perf_counter()
+    run_parents([parent], client=replay.client, clock=replay.clock)
+    result = replay.summary()
+
+    side = parent.side
+    average = replay.average_price(side)
+    vwap = replay.market_vwap(began, began + duration_minutes * 60)
+    direction = 1 if side == "BUY" else -1
+    result.update({
+        'executed': parent.executed_qty,
+        'children': parent.children,
+        'avg_price': round(average, 4),
+        'arrival_price': arrival,
+        'market_vwap': round(vwap, 4),
+        'slippage_bps': round(direction * (average - arrival) / arrival * 10000, 3) if average else None,
+        'vs_vwap_bps': round(direction * (average - vwap) / vwap * 10000, 3) if average else None,
+        'seconds': round(time.perf_counter() - started, 3),
+    })
+    return result
@@ -0,0 +1,199 @@
+import argparse
+import itertools
+import json
+import logging
+import multiprocessing
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from backtest.data import convert_csv, load_trades
+from backtest.replay import FillModel, LIMIT_FILLS, backtest_grid, backtest_twap
+from utils.config import setup_logger
+from utils.validation import parse_timestamp
+from advanced.grid_engine import SPACINGS
+
+logger = setup_logger("backtest")
+
+# Columns of the result table, per strategy
+GRID_COLUMNS = ("fills", "volume", "fees", "realized_pnl", "unrealized_pnl", "pnl", "max_drawdown", "seconds")
+TWAP_COLUMNS = ("runs", "avg_slippage_bps", "avg_vs_vwap_bps", "worst_slippage_bps", "fees", "seconds")
+
+# Trade arrays already mapped by this worker process, by path
+_trades: Dict[str, object] = {}
+
+
+def expand(grid: Dict[str, list]) -> List[dict]:
+    """Every combination of the listed parameter values."""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[k] for k in keys))]
+
+
+def run(task: dict) -> dict:
+    """Runs one backtest. Top-level so a process pool can pickle it."""
+    logging.disable(logging.INFO)
+    path, strategy, params = task['path'], task['strategy'], dict(task['params'])
+    trades = _trades.get(path)
+    if trades is None:
+        trades = _trades[path] = load_trades(path)
+    fill_model = FillModel(params.pop('limit_fill', "touch"), params.pop('slippage_bps', 0.0))
+    try:
+        if strategy == "grid":
+            result = backtest_grid(trades, task['symbol'], fill_model=fill_model, start=task.get('start'),
+                                   end=task.get('end'), **params)
+        else:
+            result = backtest_twap(trades, task['symbol'], fill_model=fill_model, start=task.get('start'), **params)
+    except Exception as e:
+        result = {'error': str(e)}
+    return {'params': task['params'], 'start': task.get('start'), **result}
+
+
+def run_all(tasks: List[dict], workers: int) -> List[dict]:
+    """Runs the tasks on `workers` processes (inline for 1), in task order."""
+    if workers <= 1:
+        return [run(task) for task in tasks]
+    # spawn: workers must not inherit the parent's threads or sockets
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn")) as pool:
+        return list(pool.map(run, tasks, chunksize=max(len(tasks) // (workers * 4), 1)))
+
+
+def summarize_twap(results: List[dict]) -> List[dict]:
+    """Folds the runs of each TWAP parameter set (one per start time) into averages."""
+    by_params: Dict[str, list] = {}
+    for result in results:
+        by_params.setdefault(json.dumps(result['params'], sort_keys=True), []).append(result)
+
+    rows = []
+    for runs in by_params.values():
+        done = [r for r in runs if r.get('slippage_bps') is not None]
+        row = {'params': runs[0]['params'], 'runs': len(done)}
+        errors = [r['error'] for r in runs if 'error' in r]
+        if errors:
+            row['error'] = errors[0]
+        if done:
+            row.update({
+                'avg_slippage_bps': round(sum(r['slippage_bps'] for r in done) / len(done), 3),
+                'avg_vs_vwap_bps': round(sum(r['vs_vwap_bps'] for r in done) / len(done), 3),
+                'worst_slippage_bps': max(r['slippage_bps'] for r in done),
+                'fees': round(sum(r['fees'] for r in done), 4),
+                'seconds': round(sum(r['seconds'] for r in done), 3),
+            })
+        rows.append(row)
+    return rows
+
+
+def print_table(rows: List[dict], columns: tuple, sort_key: str, reverse: bool):
+    """One line per parameter set, best first; only parameters that differ between sets are shown."""
+    rows = sorted(rows, key=lambda r: r.get(sort_key, float("-inf") if reverse else float("inf")), reverse=reverse)
+    varying = [k for k in rows[0]['params'] if len({str(r['params'][k]) for r in rows}) > 1] if rows else []
+    labels = [" ".join(f"{k}={row['params'][k]}" for k in varying) or "-" for row in rows]
+    width = max([len(label) for label in labels] + [6]) + 2
+    widths = [max(len(c) + 2, 12) for c in columns]
+    print(f"{'params':<{width}}" + "".join(f"{c:>{w}}" for c, w in zip(columns, widths)))
+    for label, row in zip(labels, rows):
+        if 'error' in row and sort_key not in row:
+            print(f"{label:<{width}}  error: {row['error']}")
+            continue
+        print(f"{label:<{width}}" + "".join(f"{row.get(c, ''):>{w}}" for c, w in zip(columns, widths)))
+
+
+def _prepare(path: str) -> str:
+    """Converts a CSV once, in the parent, so workers only map the binary file."""
+    if path.endswith(".npy"):
+        return path
+    binary = os.path.splitext(path)[0] + ".npy"
+    if not os.path.exists(binary) or os.path.getmtime(binary) < os.path.getmtime(path):
+        logger.info("Converting %s", path)
+        convert_csv(path, binary)
+    return binary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Replay historical trades through the grid engine or TWAP "
+                                                 "on simulated time, sweeping parameters across processes")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    convert = sub.add_parser("convert", help="Convert an aggTrades or klines CSV into a .npy trade file")
+    convert.add_argument("csv", type=str, help="CSV file (data.binance.vision layout)")
+    convert.add_argument("--output", type=str, default=None, help="Target .npy (default: next to the CSV)")
+
+    def add_common(p):
+        p.add_argument("data", type=str, help="Trade file (.npy, or aggTrades / klines CSV)")
+        p.add_argument("symbol", type=str, help="Contract the trades belong to (e.g., BTCUSDT)")
+        p.add_argument("--limit-fill", type=str, nargs="+", default=["touch"], choices=LIMIT_FILLS,
+                       help="touch: a trade at the price fills; through: only a trade beyond it")
+        p.add_argument("--slippage-bps", type=float, nargs="+", default=[0.0], help="Taker fill slippage")
+        p.add_argument("--start", type=str, default=None, help="First day/time to replay, ISO format, UTC")
+        p.add_argument("--workers", type=int, default=os.cpu_count() or 1, help="Processes (1 = run inline)")
+        p.add_argument("--output", type=str, default=None, help="Optional JSON result file")
+
+    grid = sub.add_parser("grid", help="Sweep self-refilling grid parameters")
+    add_common(grid)
+    grid.add_argument("--lower", type=float, nargs="+", required=True, help="Lower bound(s) of the grid")
+    grid.add_argument("--upper", type=float, nargs="+", required=True, help="Upper bound(s) of the grid")
+    grid.add_argument("--levels", type=int, nargs="+", required=True, help="Number(s) of grid levels")
+    grid.add_argument("--qty", type=float, nargs="+", required=True, help="Quantity per grid level")
+    grid.add_argument("--spacing", type=str, nargs="+", default=["arithmetic"], choices=SPACINGS)
+    grid.add_argument("--window", type=int, nargs="+", default=[0], help="Max live orders per side (0 = all)")
+    grid.add_argument("--end", type=str, default=None, help="Last day/time to replay, ISO format, UTC")
+
+    twap = sub.add_parser("twap", help="Sweep TWAP parameters over many start times")
+    add_common(twap)
+    twap.add_argument("side", type=str, help="BUY or SELL")
+    twap.add_argument("total_qty", type=float, help="Total quantity to execute")
+    twap.add_argument("--duration-min", type=float, nargs="+", required=True, help="Duration(s) in minutes")
+    twap.add_argument("--slices", type=int, nargs="+", required=True, help="Number(s) of child orders")
+    twap.add_argument("--jitter", type=float, nargs="+", default=[0.0], help="Deadline jitter, fraction of interval")
+    twap.add_argument("--starts", type=int, default=20, help="Runs per parameter set, spread over the data")
+    twap.add_argument("--seed", type=int, default=1, help="Seed for jittered deadlines")
+
+    args = parser.parse_args()
+    try:
+        if args.command == "convert":
+            logger.info("Wrote %s", convert_csv(args.csv, args.output))
+            sys.exit(0)
+
+        path = _prepare(args.data)
+        trades = load_trades(path)
+        fills = {'limit_fill': args.limit_fill, 'slippage_bps': args.slippage_bps}
+        start = parse_timestamp(args.start)
+
+        if args.command == "grid":
+            params = expand({'lower_price': args.lower, 'upper_price': args.upper, 'grid_levels': args.levels,
+                             'qty_per_grid': args.qty, 'spacing': args.spacing, 'window': args.window, **fills})
+            tasks = [{'path': path, 'strategy': "grid", 'symbol': args.symbol, 'params': p, 'start': start,
+                      'end': parse_timestamp(args.end)} for p in params if p['lower_price'] < p['upper_price']]
+        else:
+            params = expand({'duration_minutes': args.duration_min, 'slices': args.slices, 'jitter': args.jitter,
+                             **fills})
+            first = start if start is not None else trades['time'][0] / 1000
+            longest = max(args.duration_min) * 60
+            span = trades['time'][-1] / 1000 - longest - first
+            if span < 0:
+                raise ValueError("Data is shorter than the longest TWAP duration")
+            starts = [float(first + span * i / max(args.starts - 1, 1)) for i in range(args.starts)]
+            tasks = [{'path': path, 'strategy': "twap", 'symbol': args.symbol, 'start': s,
+                      'params': dict(p, side=args.side, total_quantity=args.total_qty, seed=args.seed + i)}
+                     for p in params for i, s in enumerate(starts)]
+        del trades
+
+        logger.info("Running %s backtest(s) of %s on %s worker(s)", len(tasks), path, args.workers)
+        results = run_all(tasks, args.workers)
+
+        if args.command == "grid":
+            print_table(results, GRID_COLUMNS, "pnl", reverse=True)
+        else:
+            for result in results:
+                for key in ('side', 'total_quantity', 'seed'):
+                    result['params'].pop(key, None)
+            results = summarize_twap(results)
+            print_table(results, TWAP_COLUMNS, "avg_slippage_bps", reverse=False)
+
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(results, f, indent=2)
+    except ValueError as e:
+        logger.error("Validation Error: %s", e)
@@ -0,0 +1,328 @@
+import argparse
+import asyncio
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.config import get_client, setup_logger
+from utils.validation import get_symbol_info
+from utils.journal import get_journal
+from utils.rate_limiter import get_rate_limiter
+from utils.order_book import get_order_book
+from utils.market_stream import get_market_stream
+from utils.account_state import get_account_state
+from utils.ws_trading import close_transports, ORDER_TRANSPORT
+from utils.kill_switch import KillSwitch, DeadManSwitch, KILL_SWITCH_TIMEOUT
+from market_orders import place_market_order
+from limit_orders import place_limit_order
+from advanced.stop_limit import place_stop_limit
+from advanced.oco import OCOEngine
+from advanced.grid import place_grid_orders
+from advanced.scheduler import ExecutionScheduler, TWAPOrder, POVOrder
+from binance.error import ClientError
+
+logger = setup_logger("daemon")
+
+DAEMON_SOCKET = os.getenv("DAEMON_SOCKET", os.path.join(".state", "daemon.sock"))
+# Symbols whose metadata and order book are loaded at startup (comma-separated)
+DAEMON_SYMBOLS = [s.strip().upper() for s in os.getenv("DAEMON_SYMBOLS", "").split(",") if s.strip()]
+# Largest request line accepted from a client
+MAX_REQUEST_BYTES = 64 * 1024
+# Commands that can leave orders resting on a symbol: it gets a dead-man timer first
+ORDER_COMMANDS = {'market', 'limit', 'stop-limit', 'oco', 'twap', 'pov', 'grid'}
+
+
+class CommandError(Exception):
+    """A command that could not be carried out; the message goes back to the CLI."""
+
+
+class TradingDaemon:
+    """
+    Long-lived process that owns the warm pieces every order needs: the pooled
+    exchange client, cached symbol metadata, the user-data stream (OCO engine,
+    account state), the TWAP/POV scheduler loop and order books. Commands arrive as one JSON
+    line per connection on a Unix socket and are answered with one JSON line.
+    Every symbol it trades is covered by the exchange's dead-man timer while
+    the scheduler loop keeps responding; `kill` flattens the account.
+    """
+
+    def __init__(self, socket_path: str = DAEMON_SOCKET, symbols=None):
+        self.socket_path = socket_path
+        self.symbols = list(symbols if symbols is not None else DAEMON_SYMBOLS)
+        self.started = time.time()
+        self.client = None
+        self.journal = None
+        self.oco = None
+        self.account = None
+        self.scheduler = None
+        self.dead_man = None
+        self.parents = {}
+        self._loop = None
+        self._server = None
+
+        self.commands = {
+            'ping': self.cmd_ping,
+            'status': self.cmd_status,
+            'market': self.cmd_market,
+            'limit': self.cmd_limit,
+            'stop-limit': self.cmd_stop_limit,
+            'oco': self.cmd_oco,
+            'twap': self.cmd_twap,
+            'pov': self.cmd_pov,
+            'grid': self.cmd_grid,
+            'book': self.cmd_book,
+            'account': self.cmd_account,
+            'kill': self.cmd_kill,
+            'shutdown': self.cmd_shutdown,
+        }
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def start(self):
+        """Warms every shared component, then serves commands until shutdown."""
+        start = time.perf_counter()
+        # Bound first: a second daemon fails before touching the exchange
+        self._server = _bind(self.socket_path, self)
+        self.client = get_client()
+        self.client.ping()
+        self.journal = get_journal()
+        for symbol in self.symbols:
+            get_symbol_info(self.client, symbol)
+            get_order_book(symbol, self.client)
+
+        self.account = get_account_state()
+        self.oco = OCOEngine(self.client, journal=self.journal, account_state=self.account)
+        self.oco.start()
+
+        self._loop = asyncio.new_event_loop()
+        self.scheduler = ExecutionScheduler(self.client, journal=self.journal)
+        threading.Thread(target=self._loop.run_forever, name="daemon-scheduler", daemon=True).start()
+
+        self.dead_man = DeadManSwitch(self.client, healthy=self._loop_responsive)
+        self.dead_man.start()
+        # Orders left resting by an earlier run are covered too
+        for symbol in {s for s, orders in self.account.orders.items() if orders}:
+            self.dead_man.arm(symbol)
+
+        logger.info("Daemon ready on %s in %.0f ms (warm symbols: %s)", self.socket_path,
+                    (time.perf_counter() - start) * 1000, ", ".join(self.symbols) or "none")
+        try:
+            self._server.serve_forever()
+        finally:
+            self._cleanup()
+
+    def stop(self):
+        if self._server is not None:
+            # shutdown() blocks until serve_forever returns: never call it on the serving thread
+            threading.Thread(target=self._server.shutdown, daemon=True).start()
+
+    def _cleanup(self):
+        self._server.server_close()
+        try:
+            os.unlink(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+        running = [sid for sid, (_, future) in self.parents.items() if not future.done()]
+        if running:
+            logger.warning("Leaving %s execution(s) unfinished for recover.py: %s", len(running), ", ".join(running))
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self.scheduler.close()
+        # Resting orders stay for recover.py: the exchange must not cancel them
+        self.dead_man.stop()
+
+        self.oco.stop()
+        self.oco.stream.stop()
+        get_market_stream().stop()
+        close_transports()
+        logger.info("Daemon stopped.")
+
+    def handle(self, request: dict) -> dict:
+        """Runs one command and wraps its result or error."""
+        command = request.get('cmd')
+        handler = self.commands.get(command)
+        if handler is None:
+            return {'ok': False, 'error': f"Unknown command: {command}"}
+
+        start = time.perf_counter()
+        try:
+            args = request.get('args', {})
+            if command in ORDER_COMMANDS and args.get('symbol'):
+                self.dead_man.arm(args['symbol'])
+            result = handler(**args)
+        except ClientError as e:
+            return {'ok': False, 'error': e.error_message, 'code': e.error_code}
+        except (CommandError, ValueError, TypeError) as e:
+            return {'ok': False, 'error': str(e)}
+        except Exception as e:
+            logger.error("Command %s failed: %s", command, e)
+            return {'ok': False, 'error': f"Internal error: {e}"}
+        return {'ok': True, 'result': result, 'ms': round((time.perf_counter() - start) * 1000, 2)}
+
+    # -- commands ------------------------------------------------------------
+
+    def cmd_ping(self):
+        return {'pid': os.getpid(), 'uptime': round(time.time() - self.started, 1)}
+
+    def cmd_status(self):
+        executions = {sid: {'parent': repr(parent), 'done': future.done()}
+                      for sid, (parent, future) in self.parents.items()}
+        return {
+            'pid': os.getpid(),
+            'uptime': round(time.time() - self.started, 1),
+            'rate_limits': get_rate_limiter().usage(),
+            'clock_offset_ms': self.client.clock.wall_offset_ms(),
+            'oco_open_pairs': self.oco.open_pairs,
+            'oco_transport': self.oco.transport or ORDER_TRANSPORT,
+            'dead_man_symbols': sorted(self.dead_man.symbols),
+            'executions': executions,
+        }
+
+    def cmd_market(self, symbol, side, quantity, transport=None):
+        return _placed(place_market_order(symbol, side, quantity, transport))
+
+    def cmd_limit(self, symbol, side, quantity, price, transport=None):
+        return _placed(place_limit_order(symbol, side, quantity, price, transport))
+
+    def cmd_stop_limit(self, symbol, side, quantity, stop_price, limit_price, transport=None):
+        return _placed(place_stop_limit(symbol, side, quantity, stop_price, limit_price, transport))
+
+    def cmd_oco(self, symbol, quantity, tp_price, sl_price, side="SELL", transport=None):
+        # The daemon keeps protecting the pair after the CLI has returned
+        if transport and transport != (self.oco.transport or ORDER_TRANSPORT):
+            raise CommandError(f"The daemon's OCO engine sends orders over {self.oco.transport or ORDER_TRANSPORT}; "
+                               f"set ORDER_TRANSPORT to change it")
+        pair = self.oco.add_pair(symbol, quantity, tp_price, sl_price, side)
+        return {'strategy_id': pair.strategy_id, 'tp_order_id': pair.tp_order_id, 'sl_order_id': pair.sl_order_id}
+
+    def cmd_twap(self, symbol, side, quantity, minutes, slices, jitter=0.0, max_impact_bps=None, transport=None):
+        return self._submit(TWAPOrder(symbol, side, quantity, minutes * 60, slices, jitter=jitter,
+                                      max_impact_bps=max_impact_bps, transport=transport))
+
+    def cmd_pov(self, symbol, side, quantity, participation, min_slice=0.0, min_interval=1.0, max_minutes=None,
+                max_impact_bps=None, transport=None):
+        return self._submit(POVOrder(symbol, side, quantity, participation, min_slice=min_slice,
+                                     min_interval=min_interval,
+                                     max_duration=max_minutes * 60 if max_minutes else None,
+                                     max_impact_bps=max_impact_bps, transport=transport))
+
+    def cmd_grid(self, symbol, lower_price, upper_price, levels, qty_per_grid, spacing="arithmetic"):
+        results = place_grid_orders(symbol, lower_price, upper_price, levels, qty_per_grid, spacing=spacing)
+        if results is None:
+            raise CommandError("Grid was not placed; see bot.log")
+        placed = sum(1 for r in results.values() if r['ok'])
+        return {'placed': placed, 'failed': len(results) - placed}
+
+    def cmd_book(self, symbol, bps=10.0):
+        book = get_order_book(symbol, self.client)
+        if not book.wait_synced(2):
+            raise CommandError(f"Order book for {symbol.upper()} is not synced yet")
+        bid_qty, ask_qty = book.depth_within(bps)
+        return {'best_bid': book.best_bid(), 'best_ask': book.best_ask(), 'mid': book.mid(),
+                'spread_bps': book.spread_bps(), 'depth_bps': bps, 'bid_qty': bid_qty, 'ask_qty': ask_qty}
+
+    def cmd_account(self, symbol=None):
+        account = self.account
+        positions = {s: {'amount': p.amount, 'entry_price': p.entry_price, 'unrealized_pnl': p.unrealized_pnl}
+                     for s, p in account.positions.items() if p.amount and (symbol is None or s == symbol.upper())}
+        return {'wallet_balance': account.wallet_balance(), 'available_balance': account.available_balance(),
+                'margin_used': account.margin_used, 'positions': positions,
+                'open_orders': {s: len(o) for s, o in account.orders.items() if o}}
+
+    def cmd_kill(self, symbols=None, timeout=None):
+        """Stops every strategy, then cancels all orders and closes all positions (on `symbols` if given)."""
+        for parent, future in self.parents.values():
+            future.cancel()
+        self.oco.abandon_all()
+        kill_switch = KillSwitch(self.client, self.account, self.journal, timeout=timeout or KILL_SWITCH_TIMEOUT)
+        return kill_switch.trigger(symbols.upper().split(",") if symbols else None)
+
+    def cmd_shutdown(self):
+        self.stop()
+        return {'stopping': True}
+
+    def _loop_responsive(self, timeout: float = 5.0) -> bool:
+        """True if the scheduler loop runs a no-op within `timeout` seconds."""
+        try:
+            asyncio.run_coroutine_threadsafe(asyncio.sleep(0), self._loop).result(timeout)
+            return True
+        except Exception:
+            return False
+
+    def _submit(self, parent):
+        """Queues a parent order on the scheduler loop and returns without waiting for it."""
+        if self.journal:
+            parent.strategy_id = self.journal.start_strategy(parent.kind, parent.journal_params())
+        key = parent.strategy_id or f"{parent.kind}-{len(self.parents) + 1}"
+        self.parents[key] = (parent, asyncio.run_coroutine_threadsafe(self.scheduler.execute(parent), self._loop))
+        return {'strategy_id': key}
+
+
+def _placed(response):
+    if response is None:
+        raise CommandError("Order was not placed; see bot.log")
+    return response
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        line = self.rfile.readline(MAX_REQUEST_BYTES)
+        try:
+            request = json.loads(line)
+        except ValueError:
+            response = {'ok': False, 'error': "Malformed request"}
+        else:
+            response = self.server.daemon.handle(request)
+        self.wfile.write(json.dumps(response, default=str).encode() + b"\n")
+
+
+class _Server(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+def _bind(path: str, trading_daemon: TradingDaemon) -> _Server:
+    """Binds the socket, replacing a stale one but refusing to steal a live daemon's."""
+    if os.path.exists(path):
+        probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            probe.connect(path)
+        except OSError:
+            os.unlink(path)
+        else:
+            raise RuntimeError(f"A daemon is already listening on {path}")
+        finally:
+            probe.close()
+
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    server = _Server(path, _RequestHandler)
+    # Anyone who can connect can trade
+    os.chmod(path, 0o600)
+    server.daemon = trading_daemon
+    return server
+
+
+def run_daemon(socket_path: str = DAEMON_SOCKET, symbols=None):
+    trading_daemon = TradingDaemon(socket_path, symbols)
+    signal.signal(signal.SIGTERM, lambda *_: trading_daemon.stop())
+    try:
+        trading_daemon.start()
+    except KeyboardInterrupt:
+        logger.warning("Daemon interrupted.")
+    except RuntimeError as e:
+        logger.error("%s", e)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the trading daemon")
+    parser.add_argument("--socket", type=str, default=DAEMON_SOCKET, help="Unix socket path")
+    parser.add_argument("--symbols", type=str, default=None, help="Comma-separated symbols to warm up")
+
+    args = parser.parse_args()
+    run_daemon(args.socket, args.symbols.upper().split(",") if args.symbols else None)
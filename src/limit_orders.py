@@ -1,16 +1,23 @@
 import argparse
 import sys
 import os
+import time
+from typing import Optional
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.config import get_client, setup_logger
 from utils.validation import validate_side, validate_positive_float, validate_symbol
+from utils.rules import get_rules, RuleViolation
+from utils.order_book import local_mid
+from utils.ws_trading import get_order_transport
+from utils.execution_store import get_execution_store
+from utils.submission import submit_order, SubmissionError
 from binance.error import ClientError
 
 logger = setup_logger("limit_order")
 
-def place_limit_order(symbol: str, side: str, quantity: float, price: float):
+def place_limit_order(symbol: str, side: str, quantity: float, price: float, transport: Optional[str] = None):
     """
     Executes a Limit Order.
     """
@@ -22,10 +29,15 @@ def place_limit_order(symbol: str, side: str, quantity: float, price: float):
         side = validate_side(side)
         quantity = validate_positive_float(quantity, "Quantity")
         price = validate_positive_float(price, "Price")
+        arrival = local_mid(symbol)
+        get_rules(client, symbol).check(quantity, price, reference=arrival)
 
-        logger.info(f"Initiating LIMIT {side} order for {quantity} {symbol} @ {price}")
+        logger.info("Initiating LIMIT %s order for %s %s @ %s", side, quantity, symbol, price)
 
-        response = client.new_order(
+        orders = get_order_transport(client, transport)
+        start = time.perf_counter()
+        response = submit_order(
+            orders,
             symbol=symbol,
             side=side,
             type="LIMIT",
@@ -33,15 +45,25 @@ def place_limit_order(symbol: str, side: str, quantity: float, price: float):
             quantity=quantity,
             price=price
         )
-        
-        logger.info(f"Order Placed: ID {response['orderId']} | Status: {response['status']}")
-        logger.debug(f"Full API Response: {response}")
+        latency_ms = round((time.perf_counter() - start) * 1000, 2)
+        store = get_execution_store()
+        if store:
+            store.record_response(response, arrival, latency_ms, strategy="limit")
+
+        logger.info("Order Placed: ID %s | Status: %s", response['orderId'], response['status'],
+                    extra={'order_id': response['orderId'], 'symbol': symbol, 'latency_ms': latency_ms})
+        logger.debug("Full API Response: %s", response)
         return response
 
     except ClientError as error:
-        logger.error(f"Binance API Error: {error.error_code} - {error.error_message}")
+        logger.error("Binance API Error: %s - %s", error.error_code, error.error_message,
+                     extra={'symbol': symbol, 'error_code': error.error_code})
+    except RuleViolation as e:
+        logger.error("Rejected locally: %s", e, extra={'symbol': symbol})
+    except SubmissionError as e:
+        logger.error("Submission Error: %s", e, extra={'symbol': symbol})
     except Exception as e:
-        logger.error(f"System Error: {str(e)}")
+        logger.error("System Error: %s", e)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Place a Limit Order on Binance Futures")
@@ -49,6 +71,8 @@ if __name__ == "__main__":
     parser.add_argument("side", type=str, help="BUY or SELL")
     parser.add_argument("quantity", type=float, help="Order Quantity")
     parser.add_argument("price", type=float, help="Limit Price")
+    parser.add_argument("--transport", type=str, choices=["rest", "ws"], default=None,
+                        help="Send over REST or the websocket API (default: ORDER_TRANSPORT)")
 
     args = parser.parse_args()
-    place_limit_order(args.symbol, args.side, args.quantity, args.price)
\ No newline at end of file
+    place_limit_order(args.symbol, args.side, args.quantity, args.price, args.transport)
\ No newline at end of file
@@ -1,17 +1,24 @@
 import argparse
 import sys
 import os
+import time
+from typing import Optional
 
 # Adjust path to import utils
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.config import get_client, setup_logger
 from utils.validation import validate_side, validate_positive_float, validate_symbol
+from utils.rules import get_rules, RuleViolation
+from utils.order_book import local_mid
+from utils.ws_trading import get_order_transport
+from utils.execution_store import get_execution_store
+from utils.submission import submit_order, SubmissionError
 from binance.error import ClientError
 
 logger = setup_logger("market_order")
 
-def place_market_order(symbol: str, side: str, quantity: float):
+def place_market_order(symbol: str, side: str, quantity: float, transport: Optional[str] = None):
     """
     Executes a Market Order.
     """
@@ -22,30 +29,49 @@ def place_market_order(symbol: str, side: str, quantity: float):
         symbol = validate_symbol(symbol)
         side = validate_side(side)
         quantity = validate_positive_float(quantity, "Quantity")
+        # Filters are checked locally: an order the exchange would reject costs no round trip
+        arrival = local_mid(symbol)
+        get_rules(client, symbol).check(quantity, order_type="MARKET", reference=arrival)
 
-        logger.info(f"Initiating MARKET {side} order for {quantity} {symbol}")
+        logger.info("Initiating MARKET %s order for %s %s", side, quantity, symbol)
 
-        response = client.new_order(
+        orders = get_order_transport(client, transport)
+        start = time.perf_counter()
+        response = submit_order(
+            orders,
             symbol=symbol,
             side=side,
             type="MARKET",
             quantity=quantity,
+            newOrderRespType="RESULT",
         )
-        
-        logger.info(f"Order Success: ID {response['orderId']} | AvgPrice: {response.get('avgPrice', 'N/A')}")
-        logger.debug(f"Full API Response: {response}")
+        latency_ms = round((time.perf_counter() - start) * 1000, 2)
+        store = get_execution_store()
+        if store:
+            store.record_response(response, arrival, latency_ms, strategy="market")
+
+        logger.info("Order Success: ID %s | AvgPrice: %s", response['orderId'], response.get('avgPrice', 'N/A'),
+                    extra={'order_id': response['orderId'], 'symbol': symbol, 'latency_ms': latency_ms})
+        logger.debug("Full API Response: %s", response)
         return response
 
     except ClientError as error:
-        logger.error(f"Binance API Error: {error.error_code} - {error.error_message}")
+        logger.error("Binance API Error: %s - %s", error.error_code, error.error_message,
+                     extra={'symbol': symbol, 'error_code': error.error_code})
+    except RuleViolation as e:
+        logger.error("Rejected locally: %s", e, extra={'symbol': symbol})
+    except SubmissionError as e:
+        logger.error("Submission Error: %s", e, extra={'symbol': symbol})
     except Exception as e:
-        logger.error(f"System Error: {str(e)}")
+        logger.error("System Error: %s", e)
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description="Place a Market Order on Binance Futures")
     parser.add_argument("symbol", type=str, help="Trading Pair (e.g., BTCUSDT)")
     parser.add_argument("side", type=str, help="BUY or SELL")
     parser.add_argument("quantity", type=float, help="Order Quantity")
+    parser.add_argument("--transport", type=str, choices=["rest", "ws"], default=None,
+                        help="Send over REST or the websocket API (default: ORDER_TRANSPORT)")
 
     args = parser.parse_args()
-    place_market_order(args.symbol, args.side, args.quantity)
\ No newline at end of file
+    place_market_order(args.symbol, args.side, args.quantity, args.transport)
\ No newline at end of file
@@ -0,0 +1,104 @@
+import argparse
+import sys
+import os
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.config import get_client, setup_logger
+from utils.journal import get_journal
+from binance.error import ClientError
+
+logger = setup_logger("recovery")
+
+def recover(dry_run: bool = False):
+    """
+    Rebuilds unfinished strategy runs from the order journal, reconciles them
+    with the exchange, then resumes them: interrupted grids place their
+    missing levels, TWAPs continue their schedule and OCO pairs are
+    re-protected (orphaned legs get a new sibling). TWAP and POV runs continue
+    on the execution scheduler.
+    """
+    journal = get_journal()
+    if journal is None:
+        logger.error("Order journal is disabled (ORDER_JOURNAL_PATH is empty).")
+        return
+
+    start = time.perf_counter()
+    records = journal.load_unfinished()
+    logger.info("Rebuilt %s unfinished run(s) from %s in %.1f ms.", len(records), journal.path,
+                (time.perf_counter() - start) * 1000)
+    if not records:
+        logger.info("Nothing to recover.")
+        return
+
+    try:
+        client = get_client()
+        start = time.perf_counter()
+        journal.reconcile(client, records)
+        logger.info("Reconciled with the exchange in %.1f ms.", (time.perf_counter() - start) * 1000)
+    except ClientError as e:
+        logger.error("Reconciliation failed, nothing resumed: %s", e.error_message)
+        return
+
+    for record in records.values():
+        statuses = ", ".join(f"{o.tag}={o.status}" for o in record.orders.values()) or "no orders"
+        logger.info("%s (%s): %s", record.strategy_id, record.kind, statuses)
+    if dry_run:
+        return
+
+    # Imported here so a dry run does not pull in every strategy module
+    from advanced.grid import resume_grid
+    from advanced.twap import twap_from_record
+    from advanced.scheduler import pov_from_record, run_parents
+    from advanced.oco import OCOEngine
+    from utils.market_stream import get_market_stream
+
+    engine = None
+    oco_records = [r for r in records.values() if r.kind == "oco"]
+    if oco_records:
+        engine = OCOEngine(client, journal=journal)
+        engine.start()
+        for record in oco_records:
+            try:
+                engine.restore_pair(record)
+            except Exception as e:
+                logger.error("Could not re-protect %s: %s", record.strategy_id, e)
+
+    for record in records.values():
+        if record.kind == "grid":
+            resume_grid(record, journal)
+
+    # TWAP and POV runs share one scheduler loop
+    parents = [twap_from_record(r, journal) if r.kind == "twap" else pov_from_record(r)
+               for r in records.values() if r.kind in ("twap", "pov")]
+    parents = [p for p in parents if p is not None]
+    # Daemon thread: Ctrl+C leaves interrupted runs resumable instead of hanging the exit
+    scheduler = threading.Thread(target=run_parents, args=(parents,), kwargs={'client': client, 'journal': journal},
+                                 name="exec-scheduler", daemon=True)
+    if parents:
+        scheduler.start()
+
+    try:
+        while scheduler.is_alive():
+            scheduler.join(0.5)
+        if engine and engine.open_pairs:
+            logger.info("Monitoring %s re-protected OCO pair(s). Press Ctrl+C to stop manually.", engine.open_pairs)
+            engine.wait()
+    except KeyboardInterrupt:
+        logger.warning("Recovery interrupted.")
+        if engine:
+            engine.cancel_all()
+    finally:
+        if engine:
+            engine.stop()
+            engine.stream.stop()
+        get_market_stream().stop()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resume strategies interrupted by a crash or restart")
+    parser.add_argument("--dry-run", action="store_true", help="Only rebuild and reconcile, do not resume")
+
+    args = parser.parse_args()
+    recover(args.dry_run)
@@ -0,0 +1,246 @@
+import itertools
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from binance.error import ClientError
+
+from simulator.matching import MatchingEngine, SimulatedOrderError, fmt
+
+DEFAULT_SYMBOLS = {
+    "BTCUSDT": {"price": 90000.0, "tick_size": "0.10", "step_size": "0.001", "min_notional": "100",
+                "price_precision": 2, "quantity_precision": 3},
+    "ETHUSDT": {"price": 3000.0, "tick_size": "0.01", "step_size": "0.001", "min_notional": "20",
+                "price_precision": 2, "quantity_precision": 3},
+}
+
+
+def build_exchange_info(symbols: Dict[str, dict], server_time: int) -> dict:
+    """Builds a GET /fapi/v1/exchangeInfo payload for the simulated symbols."""
+    entries = []
+    for symbol, spec in symbols.items():
+        entries.append({
+            'symbol': symbol,
+            'pair': symbol,
+            'contractType': "PERPETUAL",
+            'status': "TRADING",
+            'baseAsset': symbol[:-4],
+            'quoteAsset': "USDT",
+            'marginAsset': "USDT",
+            'pricePrecision': spec['price_precision'],
+            'quantityPrecision': spec['quantity_precision'],
+            'orderTypes': ["LIMIT", "MARKET", "STOP", "STOP_MARKET", "TAKE_PROFIT", "TAKE_PROFIT_MARKET"],
+            'timeInForce': ["GTC", "IOC", "FOK", "GTX"],
+            'filters': [
+                {'filterType': "PRICE_FILTER", 'minPrice': spec['tick_size'], 'maxPrice': "4529764", 'tickSize': spec['tick_size']},
+                {'filterType': "LOT_SIZE", 'minQty': spec['step_size'], 'maxQty': "1000", 'stepSize': spec['step_size']},
+                {'filterType': "MARKET_LOT_SIZE", 'minQty': spec['step_size'], 'maxQty': "120", 'stepSize': spec['step_size']},
+                {'filterType': "MAX_NUM_ORDERS", 'limit': 200},
+                {'filterType': "MIN_NOTIONAL", 'notional': spec['min_notional']},
+                {'filterType': "PERCENT_PRICE", 'multiplierUp': "1.0500", 'multiplierDown': "0.9500", 'multiplierDecimal': "4"},
+            ],
+        })
+
+    return {
+        'timezone': "UTC",
+        'serverTime': server_time,
+        'rateLimits': [
+            {'rateLimitType': "REQUEST_WEIGHT", 'interval': "MINUTE", 'intervalNum': 1, 'limit': 2400},
+            {'rateLimitType': "ORDERS", 'interval': "MINUTE", 'intervalNum': 1, 'limit': 1200},
+            {'rateLimitType': "ORDERS", 'interval': "SECOND", 'intervalNum': 10, 'limit': 300},
+        ],
+        'symbols': entries,
+    }
+
+
+class SimulatedClient:
+    """
+    In-process stand-in for UMFutures backed by a MatchingEngine.
+
+    Exposes the subset of the connector's methods the bot uses, with the same
+    argument names and response shapes, and raises binance.error.ClientError
+    with Binance error codes on rejection. `latency` adds a fixed delay to
+    every call to mimic a network round trip. A prepared `engine` (e.g. one
+    with its own fill model) replaces the default MatchingEngine.
+    """
+
+    def __init__(self, symbols: Optional[Dict[str, dict]] = None, latency: float = 0.0,
+                 clock: Callable[[], float] = time.time, wallet_balance: float = 100000.0,
+                 engine: Optional[MatchingEngine] = None):
+        self.symbols = symbols or DEFAULT_SYMBOLS
+        self.latency = latency
+        self.clock = clock
+        self.engine = engine or MatchingEngine(self.symbols, wallet_balance=wallet_balance, clock=clock)
+        self.lock = threading.RLock()
+        self._listen_keys = itertools.count(1)
+        self._countdowns: Dict[str, threading.Timer] = {}
+
+    # -- simulator controls --------------------------------------------------
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        with self.lock:
+            self.engine.add_listener(listener)
+
+    def remove_listener(self, listener: Callable[[dict], None]):
+        with self.lock:
+            self.engine.remove_listener(listener)
+
+    def print_trade(self, symbol: str, price: float, quantity: float = 0.0, through: bool = False):
+        with self.lock:
+            self.engine.print_trade(symbol, price, quantity, through)
+
+    def _call(self, fn, *args, **kwargs):
+        if self.latency:
+            time.sleep(self.latency)
+        with self.lock:
+            try:
+                return fn(*args, **kwargs)
+            except SimulatedOrderError as e:
+                raise ClientError(400, e.code, e.msg, {})
+
+    # -- market data ---------------------------------------------------------
+
+    def time(self):
+        return self._call(lambda: {'serverTime': int(self.clock() * 1000)})
+
+    def exchange_info(self):
+        return self._call(lambda: build_exchange_info(self.symbols, int(self.clock() * 1000)))
+
+    def ticker_price(self, symbol: str = None):
+        def _ticker(sym):
+            return {'symbol': sym, 'price': fmt(self.engine.last_price[sym]), 'time': int(self.clock() * 1000)}
+
+        def _run():
+            if symbol is None:
+                return [_ticker(s) for s in self.symbols]
+            if symbol not in self.symbols:
+                raise SimulatedOrderError(-1121, "Invalid symbol.")
+            return _ticker(symbol)
+        return self._call(_run)
+
+    def depth(self, symbol: str, limit: int = 500, **kwargs):
+        return self._call(self.engine.depth, symbol, int(limit))
+
+    # -- orders --------------------------------------------------------------
+
+    def new_order(self, symbol: str, side: str, type: str, **kwargs):
+        return self._call(lambda: self.engine.submit(symbol, side, type, **kwargs).to_dict())
+
+    def new_batch_order(self, batchOrders: list):
+        def _run():
+            if len(batchOrders) > 5:
+                raise SimulatedOrderError(-1130, "Data sent for paramter 'batchOrders' is not valid.")
+            results = []
+            for params in batchOrders:
+                try:
+                    results.append(self.engine.submit(**params).to_dict())
+                except SimulatedOrderError as e:
+                    results.append({'code': e.code, 'msg': e.msg})
+            return results
+        return self._call(_run)
+
+    def cancel_batch_order(self, symbol: str, orderIdList: list = None, origClientOrderIdList: list = None, **kwargs):
+        def _run():
+            ids = [(oid, None) for oid in orderIdList or []] + [(None, cid) for cid in origClientOrderIdList or []]
+            if len(ids) > 10:
+                raise SimulatedOrderError(-1130, "Data sent for paramter 'orderIdList' is not valid.")
+            results = []
+            for order_id, client_order_id in ids:
+                try:
+                    results.append(self.engine.cancel(symbol, order_id, client_order_id).to_dict())
+                except SimulatedOrderError as e:
+                    results.append({'code': e.code, 'msg': e.msg})
+            return results
+        return self._call(_run)
+
+    def query_order(self, symbol: str, orderId: int = None, origClientOrderId: str = None, **kwargs):
+        return self._call(lambda: self.engine.query(symbol, orderId, origClientOrderId).to_dict())
+
+    def cancel_order(self, symbol: str, orderId: int = None, origClientOrderId: str = None, **kwargs):
+        return self._call(lambda: self.engine.cancel(symbol, orderId, origClientOrderId).to_dict())
+
+    def cancel_open_orders(self, symbol: str, **kwargs):
+        def _run():
+            self.engine.cancel_all(symbol)
+            return {'code': 200, 'msg': "The operation of cancel all open order is done."}
+        return self._call(_run)
+
+    def countdown_cancel_order(self, symbol: str, countdownTime: int, **kwargs):
+        """countdownCancelAll on the wall clock: each call replaces the symbol's timer, 0 stops it."""
+        def _run():
+            if symbol not in self.symbols:
+                raise SimulatedOrderError(-1121, "Invalid symbol.")
+            previous = self._countdowns.pop(symbol, None)
+            if previous is not None:
+                previous.cancel()
+            if int(countdownTime) > 0:
+                timer = threading.Timer(int(countdownTime) / 1000, self._countdown_expired, args=(symbol,))
+                timer.daemon = True
+                self._countdowns[symbol] = timer
+                timer.start()
+            return {'symbol': symbol, 'countdownTime': str(countdownTime)}
+        return self._call(_run)
+
+    def _countdown_expired(self, symbol: str):
+        with self.lock:
+            # A heartbeat may have replaced this timer just as it fired
+            if self._countdowns.get(symbol) is threading.current_thread():
+                del self._countdowns[symbol]
+                self.engine.cancel_all(symbol)
+
+    def get_orders(self, **kwargs):
+        return self._call(lambda: [o.to_dict() for o in self.engine.open_orders(kwargs.get('symbol'))])
+
+    def get_open_orders(self, symbol: str, orderId: int = None, origClientOrderId: str = None, **kwargs):
+        def _run():
+            order = self.engine.query(symbol, orderId, origClientOrderId)
+            if not order.is_open:
+                raise SimulatedOrderError(-2013, "Order does not exist.")
+            return order.to_dict()
+        return self._call(_run)
+
+    # -- account -------------------------------------------------------------
+
+    def get_position_risk(self, **kwargs):
+        def _run():
+            symbols = [kwargs['symbol']] if kwargs.get('symbol') else list(self.symbols)
+            return [self._position(s) for s in symbols]
+        return self._call(_run)
+
+    def account(self, **kwargs):
+        def _run():
+            balance = fmt(self.engine.wallet_balance)
+            return {
+                'totalWalletBalance': balance,
+                'availableBalance': balance,
+                'assets': [{'asset': "USDT", 'walletBalance': balance, 'availableBalance': balance}],
+                'positions': [self._position(s) for s in self.symbols],
+            }
+        return self._call(_run)
+
+    def balance(self, **kwargs):
+        return self._call(lambda: [{'asset': "USDT", 'balance': fmt(self.engine.wallet_balance),
+                                    'availableBalance': fmt(self.engine.wallet_balance)}])
+
+    def _position(self, symbol: str) -> dict:
+        position = self.engine.positions[symbol]
+        mark = self.engine.last_price[symbol]
+        return {
+            'symbol': symbol,
+            'positionAmt': fmt(position.amount),
+            'entryPrice': fmt(position.entry_price),
+            'markPrice': fmt(mark),
+            'unRealizedProfit': fmt((mark - position.entry_price) * position.amount if position.amount else 0.0),
+            'positionSide': "BOTH",
+        }
+
+    # -- user data stream ----------------------------------------------------
+
+    def new_listen_key(self):
+        return self._call(lambda: {'listenKey': f"simListenKey{next(self._listen_keys):050d}"})
+
+    def renew_listen_key(self, listenKey: str):
+        return self._call(lambda: {})
+
+    def close_listen_key(self, listenKey: str):
+        return self._call(lambda: {})
@@ -0,0 +1,561 @@
+import heapq
+import itertools
+import time
+from bisect import insort
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+MAKER_FEE = 0.0002
+TAKER_FEE = 0.0004
+
+RISE_TRIGGERED = {("BUY", "STOP"), ("BUY", "STOP_MARKET"), ("SELL", "TAKE_PROFIT"), ("SELL", "TAKE_PROFIT_MARKET")}
+STOP_TYPES = {"STOP", "STOP_MARKET", "TAKE_PROFIT", "TAKE_PROFIT_MARKET"}
+MARKET_TRIGGER_TYPES = {"STOP_MARKET", "TAKE_PROFIT_MARKET"}
+
+
+class SimulatedOrderError(Exception):
+    """Rejection with the same code/message Binance would return."""
+
+    def __init__(self, code: int, msg: str):
+        super().__init__(f"{code}: {msg}")
+        self.code = code
+        self.msg = msg
+
+
+def fmt(value: float) -> str:
+    """Formats a number the way Binance returns it: a decimal string without float noise."""
+    text = f"{value:.8f}".rstrip('0').rstrip('.')
+    return text if text not in ("", "-0") else "0"
+
+
+class SimOrder:
+    __slots__ = ("order_id", "client_order_id", "symbol", "side", "type", "orig_type", "time_in_force",
+                 "price", "stop_price", "orig_qty", "executed_qty", "cum_quote", "status", "reduce_only",
+                 "update_time", "last_qty", "last_price", "last_fee", "last_is_maker", "trade_id", "exec_type")
+
+    def __init__(self, order_id, client_order_id, symbol, side, order_type, time_in_force,
+                 price, stop_price, quantity, reduce_only, now):
+        self.order_id = order_id
+        self.client_order_id = client_order_id
+        self.symbol = symbol
+        self.side = side
+        self.type = order_type
+        self.orig_type = order_type
+        self.time_in_force = time_in_force
+        self.price = price
+        self.stop_price = stop_price
+        self.orig_qty = quantity
+        self.executed_qty = 0.0
+        self.cum_quote = 0.0
+        self.status = "NEW"
+        self.reduce_only = reduce_only
+        self.update_time = now
+        self.last_qty = 0.0
+        self.last_price = 0.0
+        self.last_fee = 0.0
+        self.last_is_maker = False
+        self.trade_id = 0
+        self.exec_type = "NEW"
+
+    @property
+    def remaining(self) -> float:
+        return round(self.orig_qty - self.executed_qty, 8)
+
+    @property
+    def is_open(self) -> bool:
+        return self.status in ("NEW", "PARTIALLY_FILLED")
+
+    @property
+    def avg_price(self) -> float:
+        return self.cum_quote / self.executed_qty if self.executed_qty else 0.0
+
+    def to_dict(self) -> dict:
+        """REST representation (POST/GET /fapi/v1/order)."""
+        return {
+            'orderId': self.order_id,
+            'symbol': self.symbol,
+            'status': self.status,
+            'clientOrderId': self.client_order_id,
+            'price': fmt(self.price or 0.0),
+            'avgPrice': fmt(self.avg_price),
+            'origQty': fmt(self.orig_qty),
+            'executedQty': fmt(self.executed_qty),
+            'cumQty': fmt(self.executed_qty),
+            'cumQuote': fmt(self.cum_quote),
+            'timeInForce': self.time_in_force,
+            'type': self.type,
+            'reduceOnly': self.reduce_only,
+            'closePosition': False,
+            'side': self.side,
+            'positionSide': "BOTH",
+            'stopPrice': fmt(self.stop_price or 0.0),
+            'workingType': "CONTRACT_PRICE",
+            'priceProtect': False,
+            'origType': self.orig_type,
+            'updateTime': self.update_time,
+        }
+
+    def to_event(self) -> dict:
+        """Websocket representation (the 'o' object of ORDER_TRADE_UPDATE)."""
+        return {
+            's': self.symbol, 'c': self.client_order_id, 'S': self.side, 'o': self.type,
+            'f': self.time_in_force, 'q': fmt(self.orig_qty), 'p': fmt(self.price or 0.0),
+            'ap': fmt(self.avg_price), 'sp': fmt(self.stop_price or 0.0), 'x': self.exec_type,
+            'X': self.status, 'i': self.order_id, 'l': fmt(self.last_qty), 'z': fmt(self.executed_qty),
+            'L': fmt(self.last_price), 'N': "USDT", 'n': fmt(self.last_fee), 'T': self.update_time,
+            't': self.trade_id, 'm': self.last_is_maker, 'R': self.reduce_only, 'wt': "CONTRACT_PRICE",
+            'ot': self.orig_type, 'ps': "BOTH", 'cp': False, 'rp': "0",
+        }
+
+
+class _Book:
+    """Price-time priority book for one symbol: price -> FIFO of resting orders."""
+
+    def __init__(self):
+        self.bids: Dict[float, deque] = {}
+        self.asks: Dict[float, deque] = {}
+        self.bid_prices: List[float] = []   # ascending, best bid last
+        self.ask_prices: List[float] = []   # ascending, best ask first
+        self.update_id = 0
+
+    def add(self, order: SimOrder):
+        levels, prices = (self.bids, self.bid_prices) if order.side == "BUY" else (self.asks, self.ask_prices)
+        queue = levels.get(order.price)
+        if queue is None:
+            queue = levels[order.price] = deque()
+            insort(prices, order.price)
+        queue.append(order)
+
+    def remove(self, order: SimOrder) -> bool:
+        levels, prices = (self.bids, self.bid_prices) if order.side == "BUY" else (self.asks, self.ask_prices)
+        queue = levels.get(order.price)
+        if queue is None:
+            return False
+        try:
+            queue.remove(order)
+        except ValueError:
+            return False
+        if not queue:
+            del levels[order.price]
+            prices.remove(order.price)
+        return True
+
+    def level_qty(self, side: str, price: float) -> float:
+        queue = (self.bids if side == "BUY" else self.asks).get(price)
+        return sum(o.remaining for o in queue) if queue else 0.0
+
+    def depth(self, limit: int) -> dict:
+        bids = [[fmt(p), fmt(self.level_qty("BUY", p))] for p in reversed(self.bid_prices[-limit:])]
+        asks = [[fmt(p), fmt(self.level_qty("SELL", p))] for p in self.ask_prices[:limit]]
+        return {'lastUpdateId': self.update_id, 'bids': bids, 'asks': asks}
+
+
+class _Position:
+    __slots__ = ("amount", "entry_price")
+
+    def __init__(self):
+        self.amount = 0.0
+        self.entry_price = 0.0
+
+
+class MatchingEngine:
+    """
+    In-memory USDT-M futures venue.
+
+    Resting LIMIT orders match by price-time priority. Anything the book
+    cannot fill is filled against an external market at the last trade price
+    (MARKET orders, and LIMIT orders marketable against that price), which
+    stands in for the rest of the exchange. Price moves injected with
+    `print_trade` fill crossed resting orders and trigger stop orders.
+    Order and account changes are published to listeners as Binance
+    ORDER_TRADE_UPDATE / ACCOUNT_UPDATE / aggTrade / depthUpdate events.
+    """
+
+    def __init__(self, symbols: Dict[str, dict], wallet_balance: float = 100000.0,
+                 clock: Callable[[], float] = time.time):
+        self.symbols = symbols
+        self.clock = clock
+        self.wallet_balance = wallet_balance
+        self.last_price: Dict[str, float] = {s: spec['price'] for s, spec in symbols.items()}
+        self.books: Dict[str, _Book] = {s: _Book() for s in symbols}
+        self.positions: Dict[str, _Position] = {s: _Position() for s in symbols}
+        self.orders: Dict[int, SimOrder] = {}
+        self.open_by_client_id: Dict[tuple, SimOrder] = {}
+        self._open_reduce_only: Dict[str, set] = {s: set() for s in symbols}
+        self._rise_triggers: Dict[str, list] = {s: [] for s in symbols}
+        self._fall_triggers: Dict[str, list] = {s: [] for s in symbols}
+        self._order_ids = itertools.count(1)
+        self._trade_ids = itertools.count(1)
+        self._seq = itertools.count()
+        self._listeners: List[Callable[[dict], None]] = []
+        self._depth_changes: Dict[str, dict] = {}
+
+    # -- listeners -----------------------------------------------------------
+
+    def add_listener(self, listener: Callable[[dict], None]):
+        self._listeners.append(listener)
+
+    def remove_listener(self, listener: Callable[[dict], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _now(self) -> int:
+        return int(self.clock() * 1000)
+
+    def _emit(self, event: dict):
+        for listener in self._listeners:
+            listener(event)
+
+    # -- order entry ---------------------------------------------------------
+
+    def submit(self, symbol: str, side: str, type: str, quantity: float = None, price: float = None,
+               stopPrice: float = None, timeInForce: str = None, reduceOnly=False,
+               newClientOrderId: str = None, **_) -> SimOrder:
+        if symbol not in self.symbols:
+            raise SimulatedOrderError(-1121, "Invalid symbol.")
+        if side not in ("BUY", "SELL"):
+            raise SimulatedOrderError(-1117, "Invalid side.")
+        if type not in ("LIMIT", "MARKET") and type not in STOP_TYPES:
+            raise SimulatedOrderError(-1116, "Invalid orderType.")
+        if quantity is None or float(quantity) <= 0:
+            raise SimulatedOrderError(-4003, "Quantity less than or equal to zero.")
+        if type in ("LIMIT", "STOP", "TAKE_PROFIT") and (price is None or float(price) <= 0):
+            raise SimulatedOrderError(-4001, "Price less than 0.")
+        if type in STOP_TYPES and (stopPrice is None or float(stopPrice) <= 0):
+            raise SimulatedOrderError(-4006, "Stop price less than zero.")
+
+        reduce_only = str(reduceOnly).lower() == "true"
+        if reduce_only and not self._reduces(symbol, side):
+            raise SimulatedOrderError(-2022, "ReduceOnly Order is rejected.")
+
+        order_id = next(self._order_ids)
+        client_order_id = newClientOrderId or f"sim_{order_id}"
+        if (symbol, client_order_id) in self.open_by_client_id:
+            raise SimulatedOrderError(-4116, "ClientOrderId is duplicated.")
+
+        order = SimOrder(order_id, client_order_id, symbol, side, type, timeInForce or "GTC",
+                         float(price) if price is not None else None,
+                         float(stopPrice) if stopPrice is not None else None,
+                         float(quantity), reduce_only, self._now())
+        self.orders[order_id] = order
+        self.open_by_client_id[(symbol, client_order_id)] = order
+        if reduce_only:
+            self._open_reduce_only[symbol].add(order)
+        self._publish(order)
+
+        if type in STOP_TYPES:
+            if self._stop_would_trigger(order, self.last_price[symbol]):
+                self._close(order, "REJECTED", "REJECTED")
+                raise SimulatedOrderError(-2021, "Order would immediately trigger.")
+            self._arm_trigger(order)
+        else:
+            self._execute(order)
+
+        self._expire_reduce_only(symbol)
+        self._flush_depth()
+        return order
+
+    def cancel(self, symbol: str, orderId: int = None, origClientOrderId: str = None) -> SimOrder:
+        order = self._find(symbol, orderId, origClientOrderId)
+        if order is None or not order.is_open:
+            raise SimulatedOrderError(-2011, "Unknown order sent.")
+        self._unrest(order)
+        self._close(order, "CANCELED", "CANCELED")
+        self._flush_depth()
+        return order
+
+    def cancel_all(self, symbol: str) -> int:
+        cancelled = 0
+        for order in [o for o in self.open_by_client_id.values() if o.symbol == symbol and o.is_open]:
+            self._unrest(order)
+            self._close(order, "CANCELED", "CANCELED")
+            cancelled += 1
+        self._flush_depth()
+        return cancelled
+
+    def query(self, symbol: str, orderId: int = None, origClientOrderId: str = None) -> SimOrder:
+        order = self._find(symbol, orderId, origClientOrderId)
+        if order is None:
+            raise SimulatedOrderError(-2013, "Order does not exist.")
+        return order
+
+    def open_orders(self, symbol: str = None) -> List[SimOrder]:
+        return [o for o in self.open_by_client_id.values() if o.is_open and (symbol is None or o.symbol == symbol)]
+
+    def depth(self, symbol: str, limit: int = 500) -> dict:
+        return self.books[symbol].depth(limit)
+
+    # -- market simulation ---------------------------------------------------
+
+    def print_trade(self, symbol: str, price: float, quantity: float = 0.0, through: bool = False):
+        """
+        Injects an external trade at `price`: resting orders crossed by it fill
+        at their own limit price and stops whose trigger is crossed fire.
+        With `through`, a trade exactly at a resting level does not fill it
+        (orders queued ahead of ours may have taken that volume).
+        """
+        self.last_price[symbol] = price
+        self._emit_agg_trade(symbol, price, quantity, buyer_is_maker=False)
+        book = self.books[symbol]
+
+        while book.bid_prices and (book.bid_prices[-1] > price or (not through and book.bid_prices[-1] == price)):
+            self._fill_level(book, "BUY", book.bid_prices[-1])
+        while book.ask_prices and (book.ask_prices[0] < price or (not through and book.ask_prices[0] == price)):
+            self._fill_level(book, "SELL", book.ask_prices[0])
+
+        self._run_triggers(symbol)
+        self._expire_reduce_only(symbol)
+        self._flush_depth()
+
+    def crossing_prices(self, symbol: str) -> Tuple[float, float]:
+        """
+        (low, high): a trade at or below `low` or at or above `high` would fill
+        a resting order or fire a stop; any trade strictly between changes
+        nothing but the last price.
+        """
+        book = self.books[symbol]
+        low = book.bid_prices[-1] if book.bid_prices else float("-inf")
+        high = book.ask_prices[0] if book.ask_prices else float("inf")
+        # Heaps may still hold cancelled stops; those only make the range narrower than needed
+        fall, rise = self._fall_triggers[symbol], self._rise_triggers[symbol]
+        if fall:
+            low = max(low, -fall[0][0])
+        if rise:
+            high = min(high, rise[0][0])
+        return low, high
+
+    # -- internals -----------------------------------------------------------
+
+    def _find(self, symbol, order_id, client_order_id) -> Optional[SimOrder]:
+        if order_id is not None:
+            order = self.orders.get(int(order_id))
+            return order if order is not None and order.symbol == symbol else None
+        if client_order_id is not None:
+            order = self.open_by_client_id.get((symbol, client_order_id))
+            if order is not None:
+                return order
+            for order in reversed(list(self.orders.values())):
+                if order.symbol == symbol and order.client_order_id == client_order_id:
+                    return order
+        return None
+
+    def _fill_level(self, book: _Book, side: str, level: float):
+        """Fills every resting order at one price level as the maker side of an external trade."""
+        for order in list((book.bids if side == "BUY" else book.asks)[level]):
+            qty = self._fillable(order)
+            if qty > 0:
+                self._fill(order, qty, level, is_maker=True)
+            if order.is_open:
+                self._close(order, "EXPIRED", "EXPIRED")
+            self._unrest(order)
+
+    def _fillable(self, order: SimOrder) -> float:
+        """Remaining quantity, capped for reduce-only orders at the size of the position."""
+        if order.reduce_only:
+            return min(order.remaining, abs(self.positions[order.symbol].amount))
+        return order.remaining
+
+    def _reduces(self, symbol: str, side: str) -> bool:
+        amount = self.positions[symbol].amount
+        return (amount > 0 and side == "SELL") or (amount < 0 and side == "BUY")
+
+    def _execute(self, order: SimOrder):
+        """Matches an incoming (or just-triggered) order against the book, then the external market."""
+        symbol = order.symbol
+        book = self.books[symbol]
+        is_market = order.type in ("MARKET", "STOP_MARKET", "TAKE_PROFIT_MARKET")
+        limit = None if is_market else order.price
+
+        if order.time_in_force == "GTX" and not is_market and self._crosses(order, limit):
+            self._close(order, "EXPIRED", "EXPIRED")
+            return
+
+        opposite_prices = book.ask_prices if order.side == "BUY" else book.bid_prices
+        opposite = book.asks if order.side == "BUY" else book.bids
+        while self._fillable(order) > 0 and opposite_prices:
+            best = opposite_prices[0] if order.side == "BUY" else opposite_prices[-1]
+            if limit is not None and ((order.side == "BUY" and best > limit) or (order.side == "SELL" and best < limit)):
+                break
+            queue = opposite[best]
+            maker = queue[0]
+            maker_qty = self._fillable(maker)
+            qty = min(maker_qty, self._fillable(order))
+            if qty > 0:
+                self._fill(maker, qty, best, is_maker=True)
+                self._fill(order, qty, best, is_maker=False)
+                self._emit_agg_trade(symbol, best, qty, buyer_is_maker=order.side == "SELL")
+                self.last_price[symbol] = best
+            elif maker_qty <= 0:
+                self._close(maker, "EXPIRED", "EXPIRED")
+            if not maker.is_open:
+                self._unrest(maker)
+
+        if order.is_open:
+            qty = self._fillable(order)
+            if qty > 0 and (is_market or self._crosses(order, limit)):
+                price = self.last_price[symbol]
+                self._fill(order, qty, price, is_maker=False)
+                self._emit_agg_trade(symbol, price, qty, buyer_is_maker=order.side == "SELL")
+            elif qty <= 0 or is_market or order.time_in_force in ("IOC", "FOK"):
+                self._close(order, "EXPIRED", "EXPIRED")
+            else:
+                book.add(order)
+                self._mark_depth(symbol, order.side, order.price)
+
+        self._run_triggers(symbol)
+
+    def _crosses(self, order: SimOrder, limit: float) -> bool:
+        last = self.last_price[order.symbol]
+        return (order.side == "BUY" and limit >= last) or (order.side == "SELL" and limit <= last)
+
+    def _fill(self, order: SimOrder, qty: float, price: float, is_maker: bool):
+        fee = qty * price * (MAKER_FEE if is_maker else TAKER_FEE)
+        order.executed_qty = round(order.executed_qty + qty, 8)
+        order.cum_quote += qty * price
+        order.last_qty = qty
+        order.last_price = price
+        order.last_fee = fee
+        order.last_is_maker = is_maker
+        order.trade_id = next(self._trade_ids)
+        order.update_time = self._now()
+        order.exec_type = "TRADE"
+        order.status = "FILLED" if order.remaining <= 0 else "PARTIALLY_FILLED"
+        if order.status == "FILLED":
+            self.open_by_client_id.pop((order.symbol, order.client_order_id), None)
+            self._open_reduce_only[order.symbol].discard(order)
+
+        self._apply_fill(order.symbol, order.side, qty, price, fee)
+        self._publish(order)
+
+    def _apply_fill(self, symbol: str, side: str, qty: float, price: float, fee: float):
+        position = self.positions[symbol]
+        signed = qty if side == "BUY" else -qty
+        realized = 0.0
+
+        if position.amount == 0 or (position.amount > 0) == (signed > 0):
+            total = abs(position.amount) + qty
+            position.entry_price = (position.entry_price * abs(position.amount) + price * qty) / total
+            position.amount = round(position.amount + signed, 8)
+        else:
+            closing = min(qty, abs(position.amount))
+            direction = 1 if position.amount > 0 else -1
+            realized = (price - position.entry_price) * closing * direction
+            position.amount = round(position.amount + signed, 8)
+            if position.amount == 0:
+                position.entry_price = 0.0
+            elif (position.amount > 0) != (direction > 0):
+                # Flipped through zero: the remainder opens at the fill price
+                position.entry_price = price
+
+        self.wallet_balance += realized - fee
+        if not self._listeners:
+            return
+        self._emit({
+            'e': "ACCOUNT_UPDATE", 'E': self._now(), 'T': self._now(),
+            'a': {
+                'm': "ORDER",
+                'B': [{'a': "USDT", 'wb': fmt(self.wallet_balance), 'cw': fmt(self.wallet_balance), 'bc': fmt(realized - fee)}],
+                'P': [{'s': symbol, 'pa': fmt(position.amount), 'ep': fmt(position.entry_price), 'cr': fmt(realized),
+                       'up': fmt((self.last_price[symbol] - position.entry_price) * position.amount if position.amount else 0.0),
+                       'mt': "cross", 'iw': "0", 'ps': "BOTH"}],
+            },
+        })
+
+    def _expire_reduce_only(self, symbol: str):
+        """Reduce-only orders cannot outlive the position they were protecting."""
+        if self.positions[symbol].amount != 0 or not self._open_reduce_only[symbol]:
+            return
+        for order in list(self._open_reduce_only[symbol]):
+            self._unrest(order)
+            self._close(order, "EXPIRED", "EXPIRED")
+
+    def _unrest(self, order: SimOrder):
+        if order.price is None:
+            return
+        if self.books[order.symbol].remove(order):
+            self._mark_depth(order.symbol, order.side, order.price)
+
+    def _close(self, order: SimOrder, status: str, exec_type: str):
+        order.status = status
+        order.exec_type = exec_type
+        order.last_qty = 0.0
+        order.update_time = self._now()
+        self.open_by_client_id.pop((order.symbol, order.client_order_id), None)
+        self._open_reduce_only[order.symbol].discard(order)
+        self._publish(order)
+
+    def _publish(self, order: SimOrder):
+        if not self._listeners:
+            return
+        now = self._now()
+        self._emit({'e': "ORDER_TRADE_UPDATE", 'E': now, 'T': now, 'o': order.to_event()})
+
+    def _stop_would_trigger(self, order: SimOrder, price: float) -> bool:
+        if (order.side, order.type) in RISE_TRIGGERED:
+            return price >= order.stop_price
+        return price <= order.stop_price
+
+    def _arm_trigger(self, order: SimOrder):
+        if (order.side, order.type) in RISE_TRIGGERED:
+            heapq.heappush(self._rise_triggers[order.symbol], (order.stop_price, next(self._seq), order))
+        else:
+            heapq.heappush(self._fall_triggers[order.symbol], (-order.stop_price, next(self._seq), order))
+
+    def _run_triggers(self, symbol: str):
+        rise = self._rise_triggers[symbol]
+        fall = self._fall_triggers[symbol]
+        while True:
+            price = self.last_price[symbol]
+            if rise and rise[0][0] <= price:
+                order = heapq.heappop(rise)[2]
+            elif fall and -fall[0][0] >= price:
+                order = heapq.heappop(fall)[2]
+            else:
+                return
+            if not order.is_open:
+                continue
+            if order.reduce_only and not self._reduces(symbol, order.side):
+                self._close(order, "EXPIRED", "EXPIRED")
+                continue
+            # Triggered stops become LIMIT/MARKET orders with the same id
+            order.type = "MARKET" if order.orig_type in MARKET_TRIGGER_TYPES else "LIMIT"
+            self._execute(order)
+
+    def _emit_agg_trade(self, symbol: str, price: float, qty: float, buyer_is_maker: bool):
+        if not self._listeners:
+            return
+        now = self._now()
+        trade_id = next(self._trade_ids)
+        self._emit({'e': "aggTrade", 'E': now, 's': symbol, 'a': trade_id, 'p': fmt(price), 'q': fmt(qty),
+                    'f': trade_id, 'l': trade_id, 'T': now, 'm': buyer_is_maker})
+
+    def _mark_depth(self, symbol: str, side: str, price: float):
+        changes = self._depth_changes.setdefault(symbol, {'b': set(), 'a': set()})
+        changes['b' if side == "BUY" else 'a'].add(price)
+
+    def _flush_depth(self):
+        """
+        Publishes one depthUpdate per symbol covering every level touched by the last call.
+
+        Each event advances the book's update id by one. U is set to the previous
+        event's id so a REST snapshot taken between two events satisfies the
+        usual U <= lastUpdateId <= u sync rule.
+        """
+        if not self._depth_changes:
+            return
+        changes, self._depth_changes = self._depth_changes, {}
+        if not self._listeners:
+            for symbol in changes:
+                self.books[symbol].update_id += 1
+            return
+        now = self._now()
+        for symbol, change in changes.items():
+            book = self.books[symbol]
+            previous = book.update_id
+            book.update_id += 1
+            self._emit({
+                'e': "depthUpdate", 'E': now, 'T': now, 's': symbol,
+                'U': previous, 'u': book.update_id, 'pu': previous,
+                'b': [[fmt(p), fmt(book.level_qty("BUY", p))] for p in sorted(change['b'], reverse=True)],
+                'a': [[fmt(p), fmt(book.level_qty("SELL", p))] for p in sorted(change['a'])],
+            })
@@ -0,0 +1,421 @@
+import argparse
+import base64
+import hashlib
+import json
+import os
+import queue
+import random
+import struct
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Set
+from urllib.parse import parse_qsl, urlsplit
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from binance.error import ClientError
+
+from simulator.client import SimulatedClient
+from utils.config import setup_logger
+from utils.rate_limiter import request_cost
+
+logger = setup_logger("simulator")
+
+WS_GUID = "258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+USER_EVENTS = {"ORDER_TRADE_UPDATE", "ACCOUNT_UPDATE"}
+WS_API_PATH = "/ws-fapi/v1"
+# websocket API method -> REST route it is served by
+WS_API_METHODS = {
+    "order.place": ("POST", "/fapi/v1/order"),
+    "order.cancel": ("DELETE", "/fapi/v1/order"),
+    "order.status": ("GET", "/fapi/v1/order"),
+}
+
+
+def _encode_frame(payload: bytes, opcode: int = 0x1) -> bytes:
+    length = len(payload)
+    if length < 126:
+        header = struct.pack("!BB", 0x80 | opcode, length)
+    elif length < 65536:
+        header = struct.pack("!BBH", 0x80 | opcode, 126, length)
+    else:
+        header = struct.pack("!BBQ", 0x80 | opcode, 127, length)
+    return header + payload
+
+
+def _read_frame(rfile):
+    """Reads one (unfragmented) client frame. Returns (opcode, payload) or None on EOF."""
+    header = rfile.read(2)
+    if len(header) < 2:
+        return None
+    opcode = header[0] & 0x0F
+    length = header[1] & 0x7F
+    if length == 126:
+        length = struct.unpack("!H", rfile.read(2))[0]
+    elif length == 127:
+        length = struct.unpack("!Q", rfile.read(8))[0]
+    mask = rfile.read(4) if header[1] & 0x80 else None
+    payload = rfile.read(length)
+    if mask:
+        payload = bytes(b ^ mask[i % 4] for i, b in enumerate(payload))
+    return opcode, payload
+
+
+class _WsConnection:
+    """One websocket client; outbound frames go through a queue so the engine never blocks on a socket."""
+
+    def __init__(self, wfile):
+        self.wfile = wfile
+        self.streams: Set[str] = set()
+        # Connected to the websocket trading API rather than market/user streams
+        self.trading = False
+        self.outbox: "queue.Queue[bytes]" = queue.Queue()
+        self.alive = True
+        threading.Thread(target=self._writer, daemon=True).start()
+
+    def send_json(self, message: dict):
+        self.outbox.put(_encode_frame(json.dumps(message).encode()))
+
+    def send_raw(self, frame: bytes):
+        self.outbox.put(frame)
+
+    def close(self):
+        self.alive = False
+        self.outbox.put(b"")
+
+    def _writer(self):
+        while self.alive:
+            frame = self.outbox.get()
+            if not frame:
+                break
+            try:
+                self.wfile.write(frame)
+                self.wfile.flush()
+            except (OSError, ValueError):
+                # Socket already closed by the handler thread
+                self.alive = False
+
+
+class SimulatorServer(ThreadingHTTPServer):
+    """
+    Serves a SimulatedClient over the Binance USDT-M REST paths, a
+    websocket stream endpoint (/ws) and the websocket trading API
+    (/ws-fapi/v1) on the same port.
+
+    Point BASE_URL at http://host:port and the stream URL at ws://host:port
+    (USE_SIMULATOR=True does this) to run the bot's scripts unchanged.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address, client: SimulatedClient, latency: float = 0.0):
+        super().__init__(address, _Handler)
+        self.sim = client
+        self.latency = latency
+        self.connections: Set[_WsConnection] = set()
+        self.listen_keys: Set[str] = set()
+        self._conn_lock = threading.Lock()
+        self._weight_window = (0, 0, 0)
+        self._weight_lock = threading.Lock()
+        self.walk_stop = threading.Event()
+        client.add_listener(self._broadcast)
+
+        self.routes = {
+            ("GET", "/fapi/v1/ping"): lambda p: {},
+            ("GET", "/fapi/v1/time"): lambda p: self.sim.time(),
+            ("GET", "/fapi/v1/exchangeInfo"): lambda p: self.sim.exchange_info(),
+            ("GET", "/fapi/v1/depth"): lambda p: self.sim.depth(p['symbol'], int(p.get('limit', 500))),
+            ("GET", "/fapi/v2/ticker/price"): lambda p: self.sim.ticker_price(p.get('symbol')),
+            ("POST", "/fapi/v1/order"): lambda p: self.sim.new_order(**p),
+            ("POST", "/fapi/v1/batchOrders"): lambda p: self.sim.new_batch_order(json.loads(p['batchOrders'])),
+            ("DELETE", "/fapi/v1/batchOrders"): lambda p: self.sim.cancel_batch_order(
+                p['symbol'],
+                [int(i) for i in json.loads(p['orderIdList'])] if p.get('orderIdList') else None,
+                json.loads(p['origClientOrderIdList']) if p.get('origClientOrderIdList') else None),
+            ("GET", "/fapi/v1/order"): lambda p: self.sim.query_order(**p),
+            ("DELETE", "/fapi/v1/order"): lambda p: self.sim.cancel_order(**p),
+            ("DELETE", "/fapi/v1/allOpenOrders"): lambda p: self.sim.cancel_open_orders(**p),
+            ("POST", "/fapi/v1/countdownCancelAll"): lambda p: self.sim.countdown_cancel_order(**p),
+            ("GET", "/fapi/v1/openOrders"): lambda p: self.sim.get_orders(**p),
+            ("GET", "/fapi/v1/openOrder"): lambda p: self.sim.get_open_orders(**p),
+            ("GET", "/fapi/v3/positionRisk"): lambda p: self.sim.get_position_risk(**p),
+            ("GET", "/fapi/v3/account"): lambda p: self.sim.account(),
+            ("GET", "/fapi/v3/balance"): lambda p: self.sim.balance(),
+            ("POST", "/fapi/v1/listenKey"): self._new_listen_key,
+            ("PUT", "/fapi/v1/listenKey"): lambda p: {},
+            ("DELETE", "/fapi/v1/listenKey"): lambda p: {},
+            ("POST", "/sim/trade"): lambda p: self.sim.print_trade(p['symbol'], float(p['price']), float(p.get('quantity', 0))) or {},
+        }
+
+    def _new_listen_key(self, params):
+        response = self.sim.new_listen_key()
+        self.listen_keys.add(response['listenKey'])
+        return response
+
+    def record_weight(self, http_method: str, path: str, params: dict) -> Dict[str, str]:
+        """Tracks per-minute weight and order counts so clients see realistic X-MBX-* headers."""
+        if isinstance(params.get('batchOrders'), str):
+            # Arrives JSON-encoded; request_cost counts list items
+            params = {**params, 'batchOrders': json.loads(params['batchOrders'])}
+        weight, orders = request_cost(http_method, path, params)
+        minute = int(time.time() // 60)
+        with self._weight_lock:
+            window, used, order_count = self._weight_window
+            if window != minute:
+                used, order_count = 0, 0
+            self._weight_window = (minute, used + weight, order_count + orders)
+            _, used, order_count = self._weight_window
+        return {"X-MBX-USED-WEIGHT-1M": str(used), "X-MBX-ORDER-COUNT-1M": str(order_count)}
+
+    def stale_timestamp(self, timestamp, recv_window: int) -> bool:
+        """True if a signed request falls outside recvWindow of the exchange clock (-1021)."""
+        if timestamp is None:
+            return False
+        now_ms = self.sim.clock() * 1000
+        return int(timestamp) >= now_ms + 1000 or now_ms - int(timestamp) > recv_window
+
+    def add_connection(self, conn: _WsConnection):
+        with self._conn_lock:
+            self.connections.add(conn)
+
+    def drop_connection(self, conn: _WsConnection):
+        with self._conn_lock:
+            self.connections.discard(conn)
+        conn.close()
+
+    def _broadcast(self, event: dict):
+        event_type = event.get('e')
+        if event_type in USER_EVENTS:
+            wanted = self.listen_keys
+        else:
+            symbol = event.get('s', '').lower()
+            if event_type == 'aggTrade':
+                wanted = {f"{symbol}@aggTrade"}
+            elif event_type == 'depthUpdate':
+                wanted = {f"{symbol}@depth", f"{symbol}@depth@100ms", f"{symbol}@depth@250ms", f"{symbol}@depth@500ms"}
+            else:
+                return
+
+        frame = None
+        with self._conn_lock:
+            targets = [c for c in self.connections if c.streams & wanted]
+        for conn in targets:
+            if frame is None:
+                frame = _encode_frame(json.dumps(event).encode())
+            conn.send_raw(frame)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    # Headers and body go out in separate writes; with Nagle on, delayed ACKs add ~40ms per call
+    disable_nagle_algorithm = True
+    server: SimulatorServer
+
+    def log_message(self, format, *args):
+        logger.debug(f"{self.address_string()} {format % args}")
+
+    def do_GET(self):
+        if self.headers.get("Upgrade", "").lower() == "websocket":
+            self._serve_websocket()
+        else:
+            self._dispatch("GET")
+
+    def do_POST(self):
+        self._dispatch("POST")
+
+    def do_PUT(self):
+        self._dispatch("PUT")
+
+    def do_DELETE(self):
+        self._dispatch("DELETE")
+
+    def _dispatch(self, method: str):
+        if self.server.latency:
+            time.sleep(self.server.latency)
+
+        url = urlsplit(self.path)
+        params = dict(parse_qsl(url.query, keep_blank_values=True))
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            params.update(parse_qsl(self.rfile.read(length).decode(), keep_blank_values=True))
+        # Signatures are not checked, but the timestamp/recvWindow rule is
+        timestamp = params.pop('timestamp', None)
+        params.pop('signature', None)
+        recv_window = int(params.pop('recvWindow', 5000))
+
+        headers = self.server.record_weight(method, url.path, params)
+        if self.server.stale_timestamp(timestamp, recv_window):
+            self._reply(400, {'code': -1021, 'msg': "Timestamp for this request is outside of the recvWindow."},
+                        headers)
+            return
+        route = self.server.routes.get((method, url.path))
+        if route is None:
+            self._reply(404, {'code': -5000, 'msg': f"Path {url.path} is not simulated."}, headers)
+            return
+
+        try:
+            self._reply(200, route(params), headers)
+        except ClientError as e:
+            self._reply(e.status_code, {'code': e.error_code, 'msg': e.error_message}, headers)
+        except (KeyError, TypeError, ValueError) as e:
+            self._reply(400, {'code': -1102, 'msg': f"Mandatory parameter missing or malformed: {e}"}, headers)
+
+    def _reply(self, status: int, body, headers: Dict[str, str]):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for key, value in headers.items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _serve_websocket(self):
+        key = self.headers.get("Sec-WebSocket-Key", "")
+        accept = base64.b64encode(hashlib.sha1((key + WS_GUID).encode()).digest()).decode()
+        self.send_response(101, "Switching Protocols")
+        self.send_header("Upgrade", "websocket")
+        self.send_header("Connection", "Upgrade")
+        self.send_header("Sec-WebSocket-Accept", accept)
+        self.end_headers()
+        self.wfile.flush()
+
+        conn = _WsConnection(self.wfile)
+        path = urlsplit(self.path).path
+        if path == WS_API_PATH:
+            conn.trading = True
+        else:
+            # /ws/<stream> connects straight to a stream; /ws waits for SUBSCRIBE
+            path_stream = path[len("/ws/"):]
+            if path_stream:
+                conn.streams.add(path_stream)
+        self.server.add_connection(conn)
+
+        try:
+            while conn.alive:
+                frame = _read_frame(self.rfile)
+                if frame is None:
+                    break
+                opcode, payload = frame
+                if opcode == 0x8:
+                    conn.send_raw(_encode_frame(b"", 0x8))
+                    break
+                if opcode == 0x9:
+                    conn.send_raw(_encode_frame(payload, 0xA))
+                    continue
+                if opcode == 0x1:
+                    self._on_ws_text(conn, payload)
+        except OSError:
+            pass
+        finally:
+            self.server.drop_connection(conn)
+            self.close_connection = True
+
+    def _on_ws_text(self, conn: _WsConnection, payload: bytes):
+        try:
+            message = json.loads(payload)
+        except ValueError:
+            return
+        method = message.get('method')
+        if conn.trading:
+            if self.server.latency:
+                # Requests are pipelined: each is delayed on its own, not queued behind the previous one
+                threading.Timer(self.server.latency, self._on_api_request, (conn, message)).start()
+            else:
+                self._on_api_request(conn, message)
+            return
+        streams = message.get('params') or []
+        if method == "SUBSCRIBE":
+            conn.streams.update(streams)
+        elif method == "UNSUBSCRIBE":
+            conn.streams.difference_update(streams)
+        conn.send_json({'result': sorted(conn.streams) if method == "LIST_SUBSCRIPTIONS" else None,
+                        'id': message.get('id')})
+
+
+    def _on_api_request(self, conn: _WsConnection, message: dict):
+        """Answers one websocket API request from the REST route it mirrors."""
+        request_id = message.get('id')
+        route_key = WS_API_METHODS.get(message.get('method'))
+        if route_key is None:
+            conn.send_json({'id': request_id, 'status': 400,
+                            'error': {'code': -1000, 'msg': f"Method {message.get('method')} is not simulated."}})
+            return
+
+        params = {key: str(value) for key, value in (message.get('params') or {}).items()}
+        timestamp = params.pop('timestamp', None)
+        for key in ('signature', 'apiKey'):
+            params.pop(key, None)
+        recv_window = int(params.pop('recvWindow', 5000))
+
+        headers = self.server.record_weight(*route_key, params)
+        rate_limits = [
+            {'rateLimitType': "REQUEST_WEIGHT", 'interval': "MINUTE", 'intervalNum': 1, 'limit': 2400,
+             'count': int(headers["X-MBX-USED-WEIGHT-1M"])},
+            {'rateLimitType': "ORDERS", 'interval': "MINUTE", 'intervalNum': 1, 'limit': 1200,
+             'count': int(headers["X-MBX-ORDER-COUNT-1M"])},
+        ]
+        if self.server.stale_timestamp(timestamp, recv_window):
+            status, body = 400, {'code': -1021, 'msg': "Timestamp for this request is outside of the recvWindow."}
+        else:
+            try:
+                status, body = 200, self.server.routes[route_key](params)
+            except ClientError as e:
+                status, body = e.status_code, {'code': e.error_code, 'msg': e.error_message}
+            except (KeyError, TypeError, ValueError) as e:
+                status, body = 400, {'code': -1102, 'msg': f"Mandatory parameter missing or malformed: {e}"}
+
+        response = {'id': request_id, 'status': status, 'rateLimits': rate_limits}
+        if status == 200:
+            response['result'] = body
+        else:
+            response['error'] = body
+        conn.send_json(response)
+
+
+def run_random_walk(client: SimulatedClient, interval: float, volatility: float, stop: threading.Event):
+    """Moves every symbol's price by a Gaussian step each interval so resting orders fill."""
+    while not stop.wait(interval):
+        for symbol in client.symbols:
+            price = client.engine.last_price[symbol]
+            tick = float(client.symbols[symbol]['tick_size'])
+            new_price = round(round(price * (1 + random.gauss(0, volatility)) / tick) * tick, 8)
+            client.print_trade(symbol, new_price, 0.0)
+
+
+def serve(host: str = "127.0.0.1", port: int = 8765, latency: float = 0.0, walk_interval: float = 0.0,
+          volatility: float = 0.0005, client: SimulatedClient = None, clock_skew: float = 0.0) -> SimulatorServer:
+    """
+    Starts a simulator server on a background thread and returns it (call shutdown() to stop).
+    `clock_skew` puts the exchange clock that many seconds ahead of the host's.
+    """
+    client = client or SimulatedClient(clock=lambda: time.time() + clock_skew)
+    server = SimulatorServer((host, port), client, latency=latency)
+    threading.Thread(target=server.serve_forever, name="simulator", daemon=True).start()
+
+    if walk_interval:
+        threading.Thread(target=run_random_walk, args=(client, walk_interval, volatility, server.walk_stop),
+                         daemon=True).start()
+    logger.info(f"Simulated exchange listening on http://{host}:{server.server_address[1]}")
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a local simulated Binance USDT-M futures exchange")
+    parser.add_argument("--host", type=str, default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added to every REST call")
+    parser.add_argument("--walk-ms", type=float, default=0.0, help="Random-walk the price every N ms (0 = static)")
+    parser.add_argument("--volatility", type=float, default=0.0005, help="Per-step random-walk stddev")
+    parser.add_argument("--clock-skew-ms", type=float, default=0.0,
+                        help="Run the exchange clock ahead (or behind, if negative) of the host's")
+
+    args = parser.parse_args()
+    server = serve(args.host, args.port, args.latency_ms / 1000, args.walk_ms / 1000, args.volatility,
+                   clock_skew=args.clock_skew_ms / 1000)
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,272 @@
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+
+from utils.config import setup_logger
+from utils.execution_store import STORE_PATH, load_strings, load_table
+from utils.validation import parse_timestamp
+
+logger = setup_logger("tca")
+
+GROUPINGS = ("kind", "strategy", "symbol")
+# Order ids are unique per symbol; the join key packs both (Binance order ids stay far below 2**44)
+ORDER_ID_BITS = 44
+PERCENTILES = (50, 90, 99)
+
+
+def analyze(path: str = STORE_PATH, by: str = "kind", since: Optional[float] = None, until: Optional[float] = None,
+            symbol: Optional[str] = None, strategy: Optional[str] = None,
+            trades: Optional[np.ndarray] = None) -> List[dict]:
+    """
+    Transaction-cost analysis of the execution store, one row per group plus
+    a total, all in vectorized form:
+
+    - slippage of every fill against its parent's arrival price, in bps
+      (positive = cost), quantity-weighted per group, plus its p50/p90/p99
+    - slippage against the market VWAP over each strategy run (first order to
+      last fill), if a trade array (backtest.data format) for `symbol` is given
+    - fill rate: filled / ordered quantity, and the share of orders with a fill
+    - order acknowledgement latency p50/p90/p99/max
+
+    `since` / `until` are epoch seconds; `strategy` keeps strategy ids that
+    start with it.
+    """
+    strings = np.array(load_strings(path), dtype=object)
+    orders, fills = load_table('orders', path), load_table('fills', path)
+    orders = _select(orders, strings, since, until, symbol, strategy)
+    fills = _select(fills, strings, since, until, symbol, strategy)
+
+    # Group code of every string code: the string itself, or its kind (strategy id up to the first '-')
+    if by == "kind":
+        kinds = np.array([s.split("-", 1)[0] if s else "(none)" for s in strings], dtype=object)
+        names, group_of = np.unique(kinds, return_inverse=True)
+    else:
+        names = np.where(strings == "", "(none)", strings)
+        group_of = np.arange(len(strings))
+    column = 'symbol' if by == "symbol" else 'strategy'
+    order_group = group_of[orders[column]] if len(orders['time']) else np.empty(0, dtype=np.int64)
+    fill_group = group_of[fills[column]] if len(fills['time']) else np.empty(0, dtype=np.int64)
+    groups = len(names)
+
+    # Join every fill to its order (arrival price, ordered quantity)
+    order_keys = (orders['symbol'].astype(np.int64) << ORDER_ID_BITS) | orders['order_id']
+    fill_keys = (fills['symbol'].astype(np.int64) << ORDER_ID_BITS) | fills['order_id']
+    fill_order = np.full(len(fill_keys), -1, dtype=np.int64)
+    if len(order_keys):
+        order_sort = np.argsort(order_keys, kind='stable')
+        sorted_keys = order_keys[order_sort]
+        position = np.minimum(np.searchsorted(sorted_keys, fill_keys), len(sorted_keys) - 1)
+        found = (fills['order_id'] != 0) & (sorted_keys[position] == fill_keys)
+        fill_order[found] = order_sort[position[found]]
+    matched = fill_order >= 0
+
+    price, qty, side = fills['price'], fills['quantity'], fills['side'].astype(np.float64)
+    notional = price * qty
+    arrival = np.full(len(price), np.nan)
+    arrival[matched] = orders['arrival'][fill_order[matched]]
+    slippage = side * (price - arrival) / arrival * 10000
+
+    vwap_slippage = None
+    if trades is not None:
+        vwap = _run_vwap(trades, orders, fills, fill_order)
+        vwap_slippage = side * (price - vwap) / vwap * 10000
+
+    # Filled quantity per order, for fill rates
+    filled = np.bincount(fill_order[matched], weights=qty[matched], minlength=len(order_keys))
+    order_qty = orders['quantity']
+
+    def per_group(values, group, weights=None):
+        return np.bincount(group, weights=values if weights is None else values * weights, minlength=groups)
+
+    has_arrival = ~np.isnan(slippage)
+    stats = {
+        'fills': per_group(np.ones(len(qty)), fill_group),
+        'quantity': per_group(qty, fill_group),
+        'notional': per_group(notional, fill_group),
+        'fees': per_group(np.nan_to_num(fills['fee']), fill_group),
+        'maker_qty': per_group(qty * (fills['maker'] == 1), fill_group),
+        'arrival_qty': per_group(qty * has_arrival, fill_group),
+        'arrival_cost': per_group(np.where(has_arrival, slippage, 0.0) * qty, fill_group),
+        'orders': per_group(np.ones(len(order_qty)), order_group),
+        'ordered_qty': per_group(order_qty, order_group),
+        'filled_qty': per_group(np.minimum(filled, order_qty), order_group),
+        'orders_filled': per_group((filled > 0).astype(np.float64), order_group),
+    }
+    if vwap_slippage is not None:
+        has_vwap = ~np.isnan(vwap_slippage)
+        stats['vwap_qty'] = per_group(qty * has_vwap, fill_group)
+        stats['vwap_cost'] = per_group(np.where(has_vwap, vwap_slippage, 0.0) * qty, fill_group)
+    latency = orders['latency_ms'].astype(np.float64)
+    percentiles = {
+        'arrival_bps': _group_percentiles(slippage, fill_group, groups),
+        'latency_ms': _group_percentiles(latency, order_group, groups, with_max=True),
+    }
+    all_percentiles = {
+        'arrival_bps': _group_percentiles(slippage, np.zeros(len(slippage), dtype=np.int64), 1),
+        'latency_ms': _group_percentiles(latency, np.zeros(len(latency), dtype=np.int64), 1, with_max=True),
+    }
+
+    # Groups with activity, largest notional first, then the total
+    active = np.flatnonzero(stats['fills'] + stats['orders'])
+    active = active[np.argsort(-stats['notional'][active], kind='stable')]
+    stats = {key: np.append(values[active], values.sum()) for key, values in stats.items()}
+    for name, by_group in percentiles.items():
+        for key, values in by_group.items():
+            stats[f"{name}_{key}"] = np.append(values[active], all_percentiles[name][key])
+    return _rows(np.append(names[active], "TOTAL"), stats)
+
+
+def _select(table: Dict[str, np.ndarray], strings: np.ndarray, since, until, symbol, strategy) -> Dict[str, np.ndarray]:
+    """Rows of a table inside the time window and matching the symbol / strategy-prefix filters."""
+    keep = np.ones(len(table['time']), dtype=bool)
+    if since is not None:
+        keep &= table['time'] >= since * 1000
+    if until is not None:
+        keep &= table['time'] < until * 1000
+    if symbol:
+        codes = np.flatnonzero(strings == symbol.upper())
+        keep &= np.isin(table['symbol'], codes)
+    if strategy:
+        codes = np.flatnonzero([s.startswith(strategy) for s in strings])
+        keep &= np.isin(table['strategy'], codes)
+    if keep.all():
+        return table
+    return {column: values[keep] for column, values in table.items()}
+
+
+def _run_vwap(trades: np.ndarray, orders: Dict[str, np.ndarray], fills: Dict[str, np.ndarray],
+              fill_order: np.ndarray) -> np.ndarray:
+    """Per fill: market VWAP over its strategy run, from the run's first order (or fill) to its last fill."""
+    times = np.ascontiguousarray(trades['time'])
+    cum_quote = np.concatenate([[0.0], np.cumsum(trades['price'] * trades['qty'])])
+    cum_qty = np.concatenate([[0.0], np.cumsum(trades['qty'])])
+
+    runs, run_of = np.unique(fills['strategy'], return_inverse=True)
+    start = np.full(len(runs), np.iinfo(np.int64).max)
+    end = np.zeros(len(runs), dtype=np.int64)
+    np.minimum.at(start, run_of, fills['time'])
+    np.maximum.at(end, run_of, fills['time'])
+    placed = fill_order >= 0
+    np.minimum.at(start, run_of[placed], orders['time'][fill_order[placed]])
+
+    i = np.searchsorted(times, start)
+    j = np.searchsorted(times, end, side='right')
+    volume = cum_qty[j] - cum_qty[i]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        vwap = np.where(volume > 0, (cum_quote[j] - cum_quote[i]) / volume, np.nan)
+    return vwap[run_of]
+
+
+def _group_percentiles(values: np.ndarray, group: np.ndarray, groups: int,
+                       with_max: bool = False) -> Dict[str, np.ndarray]:
+    """PERCENTILES (nearest rank) of the non-NaN values of every group, from one sorted copy."""
+    present = ~np.isnan(values)
+    values, group = values[present], group[present]
+    # Sort by value, then stably by group: faster than a two-key lexsort
+    order = np.argsort(values)
+    order = order[np.argsort(group[order], kind='stable')]
+    values, group = values[order], group[order]
+    counts = np.bincount(group, minlength=groups)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+    result = {}
+    for p in PERCENTILES:
+        index = starts + np.floor((counts - 1) * p / 100).astype(np.int64)
+        result[f"p{p}"] = np.where(counts > 0, values[np.clip(index, 0, max(len(values) - 1, 0))]
+                                   if len(values) else np.nan, np.nan)
+    if with_max:
+        result['max'] = np.where(counts > 0, values[np.clip(starts + counts - 1, 0, max(len(values) - 1, 0))]
+                                 if len(values) else np.nan, np.nan)
+    return result
+
+
+def _rows(names: np.ndarray, stats: Dict[str, np.ndarray]) -> List[dict]:
+    """Report rows from per-group sums, computed column by column; NaN (nothing to divide by) becomes None."""
+    with np.errstate(invalid='ignore', divide='ignore'):
+        columns = {
+            'group': names,
+            'fills': stats['fills'],
+            'quantity': np.round(stats['quantity'], 8),
+            'notional': np.round(stats['notional'], 2),
+            'fees': np.round(stats['fees'], 4),
+            'maker_share': np.round(stats['maker_qty'] / stats['quantity'], 3),
+            'avg_price': np.round(stats['notional'] / stats['quantity'], 8),
+            'arrival_bps': np.round(stats['arrival_cost'] / stats['arrival_qty'], 3),
+            'arrival_coverage': np.round(stats['arrival_qty'] / stats['quantity'], 3),
+            'orders': stats['orders'],
+            'fill_rate': np.round(stats['filled_qty'] / stats['ordered_qty'], 3),
+            'orders_filled': np.round(stats['orders_filled'] / stats['orders'], 3),
+        }
+        if 'vwap_cost' in stats:
+            columns['vwap_bps'] = np.round(stats['vwap_cost'] / stats['vwap_qty'], 3)
+    for key, values in stats.items():
+        if key.startswith(("arrival_bps_", "latency_ms_")):
+            columns[key] = np.round(values, 3 if key.startswith("arrival") else 2)
+
+    lists = {}
+    for key, values in columns.items():
+        if key in ('fills', 'orders'):
+            lists[key] = values.astype(np.int64).tolist()
+        elif key == 'group':
+            lists[key] = values.tolist()
+        else:
+            # + 0.0 turns -0.0 into 0.0
+            lists[key] = [None if v != v else v for v in (values + 0.0).tolist()]
+    keys = list(lists)
+    return [dict(zip(keys, row)) for row in zip(*lists.values())]
+
+
+def print_report(rows: List[dict], by: str):
+    columns = ["fills", "notional", "fees", "arrival_bps", "arrival_bps_p50", "arrival_bps_p99"]
+    if any('vwap_bps' in row for row in rows):
+        columns.append("vwap_bps")
+    columns += ["orders", "fill_rate", "orders_filled", "latency_ms_p50", "latency_ms_p99", "latency_ms_max"]
+    width = max([len(str(row['group'])) for row in rows] + [len(by)]) + 2
+    widths = [max(len(c) + 2, 10) for c in columns]
+    print(f"{by:<{width}}" + "".join(f"{c:>{w}}" for c, w in zip(columns, widths)))
+    for row in rows:
+        cells = ["-" if row.get(c) is None else row[c] for c in columns]
+        print(f"{row['group']:<{width}}" + "".join(f"{v:>{w}}" for v, w in zip(cells, widths)))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transaction-cost analysis of recorded orders and fills")
+    parser.add_argument("--by", type=str, choices=GROUPINGS, default="kind",
+                        help="Group by strategy kind (twap, pov, grid, ...), strategy run or symbol")
+    parser.add_argument("--since", type=str, default=None, help="From this day/time, ISO format, UTC")
+    parser.add_argument("--until", type=str, default=None, help="Up to this day/time, ISO format, UTC")
+    parser.add_argument("--symbol", type=str, default=None, help="Only this symbol")
+    parser.add_argument("--strategy", type=str, default=None, help="Only strategy ids starting with this")
+    parser.add_argument("--trades", type=str, default=None,
+                        help="Market trades of --symbol (aggTrades/klines CSV or .npy) for the VWAP benchmark")
+    parser.add_argument("--store", type=str, default=STORE_PATH, help="Execution store directory")
+    parser.add_argument("--output", type=str, default=None, help="Optional JSON result file")
+
+    args = parser.parse_args()
+    try:
+        if not args.store or not os.path.isdir(args.store):
+            raise ValueError(f"No execution store at '{args.store}' (EXECUTION_STORE_PATH)")
+        market = None
+        if args.trades:
+            if not args.symbol:
+                raise ValueError("--trades needs --symbol")
+            from backtest.data import load_trades
+            market = load_trades(args.trades)
+
+        start = time.perf_counter()
+        rows = analyze(args.store, args.by, parse_timestamp(args.since), parse_timestamp(args.until), args.symbol,
+                       args.strategy, market)
+        logger.info("Analyzed %s fill(s) in %.0f ms", rows[-1]['fills'], (time.perf_counter() - start) * 1000)
+        print_report(rows, args.by)
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(rows, f, indent=2)
+    except ValueError as e:
+        logger.error("Validation Error: %s", e)
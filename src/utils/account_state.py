@@ -0,0 +1,275 @@
+import os
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from utils.config import get_client, setup_logger
+from utils.user_stream import get_user_stream, STREAM_RESUMED
+from utils.events import AccountUpdate, ConfigUpdate, OrderUpdate
+
+logger = setup_logger("account_state")
+
+# Leverage assumed for margin until the exchange reports one for the symbol (Binance's default)
+DEFAULT_LEVERAGE = int(os.getenv("DEFAULT_LEVERAGE", "20"))
+OPEN_STATUSES = ("NEW", "PARTIALLY_FILLED")
+EVENTS = ('ACCOUNT_UPDATE', 'ORDER_TRADE_UPDATE', 'ACCOUNT_CONFIG_UPDATE')
+
+
+class Position:
+    """A one-way-mode position. Replaced, never mutated, so readers need no lock."""
+
+    __slots__ = ("symbol", "amount", "entry_price", "unrealized_pnl", "isolated_wallet", "update_time")
+
+    def __init__(self, symbol: str, amount: float = 0.0, entry_price: float = 0.0, unrealized_pnl: float = 0.0,
+                 isolated_wallet: float = 0.0, update_time: int = 0):
+        self.symbol = symbol
+        self.amount = amount
+        self.entry_price = entry_price
+        self.unrealized_pnl = unrealized_pnl
+        self.isolated_wallet = isolated_wallet
+        self.update_time = update_time
+
+    @property
+    def notional(self) -> float:
+        return abs(self.amount) * self.entry_price
+
+    @property
+    def isolated(self) -> bool:
+        return self.isolated_wallet > 0
+
+    def __repr__(self):
+        return f"Position({self.symbol} {self.amount} @ {self.entry_price})"
+
+
+class AccountState:
+    """
+    In-memory view of one account: wallet balances, positions, open orders
+    per symbol and the initial margin they use.
+
+    Seeded once from REST, then kept current from ACCOUNT_UPDATE,
+    ORDER_TRADE_UPDATE and ACCOUNT_CONFIG_UPDATE events; events that arrive
+    while the snapshot is loading are replayed on top of it. Every query is a
+    dict lookup or a precomputed total and never touches the network.
+    """
+
+    def __init__(self, client=None, stream=None, asset: str = "USDT"):
+        self.client = client or get_client()
+        self.stream = stream or get_user_stream()
+        self.asset = asset
+
+        self.positions: Dict[str, Position] = {}
+        self.balances: Dict[str, dict] = {}
+        self.orders: Dict[str, Dict[int, dict]] = defaultdict(dict)
+        self.leverage: Dict[str, int] = {}
+        self._margin: Dict[str, float] = {}
+        self._margin_used = 0.0
+        self._unrealized = 0.0
+        self._buffer: Optional[list] = None
+        self._lock = threading.Lock()
+        self._ready = threading.Event()
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def start(self):
+        for event_type in EVENTS:
+            self.stream.subscribe(event_type, self._on_event)
+        self.stream.subscribe(STREAM_RESUMED, self._on_resumed)
+        self.stream.start()
+        self.reload()
+
+    def stop(self):
+        for event_type in EVENTS:
+            self.stream.unsubscribe(event_type, self._on_event)
+        self.stream.unsubscribe(STREAM_RESUMED, self._on_resumed)
+        self._ready.clear()
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def wait_ready(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def reload(self):
+        """Replaces the state with a REST snapshot (3 requests), replaying events that arrive meanwhile."""
+        with self._lock:
+            self._buffer = []
+        # The exchange client's server clock; SimulatedClient.clock is a plain time source without timestamp()
+        timestamp = getattr(getattr(self.client, 'clock', None), 'timestamp', None)
+        requested_at = timestamp() if timestamp else int(time.time() * 1000)
+        try:
+            account = self.client.account()
+            risks = self.client.get_position_risk()
+            open_orders = self.client.get_orders()
+        except Exception:
+            with self._lock:
+                self._buffer = None
+            raise
+
+        with self._lock:
+            self.balances = {a['asset']: {'wallet': float(a['walletBalance']),
+                                          'cross_wallet': float(a.get('crossWalletBalance', a['walletBalance']))}
+                             for a in account.get('assets', [])}
+            self.positions = {}
+            for risk in risks:
+                if risk.get('positionSide', "BOTH") != "BOTH":
+                    continue
+                symbol = risk['symbol']
+                self.positions[symbol] = _position_from_rest(risk)
+                leverage = _leverage_of(risk)
+                if leverage:
+                    self.leverage[symbol] = leverage
+            self.orders = defaultdict(dict)
+            for order in open_orders:
+                self.orders[order['symbol']][order['orderId']] = _order_from_rest(order)
+
+            # Events older than the request are already part of the snapshot
+            buffered, self._buffer = self._buffer, None
+            for event in buffered:
+                if event.event_time >= requested_at:
+                    self._apply(event)
+            for symbol in set(self.positions) | set(self.orders):
+                self._update_margin(symbol)
+            self._unrealized = sum(p.unrealized_pnl for p in self.positions.values() if not p.isolated)
+        self._ready.set()
+        logger.info("Account state loaded: %s %s wallet, %s open position(s), %s open order(s)",
+                    self.wallet_balance(), self.asset, sum(1 for p in self.positions.values() if p.amount),
+                    sum(len(o) for o in self.orders.values()))
+
+    # -- queries -------------------------------------------------------------
+
+    def position(self, symbol: str) -> Position:
+        """The symbol's position; a flat Position if there is none."""
+        return self.positions.get(symbol) or Position(symbol)
+
+    def position_amount(self, symbol: str) -> float:
+        position = self.positions.get(symbol)
+        return position.amount if position is not None else 0.0
+
+    def wallet_balance(self, asset: Optional[str] = None) -> float:
+        return self.balances.get(asset or self.asset, {}).get('wallet', 0.0)
+
+    def available_balance(self, asset: Optional[str] = None) -> float:
+        """Cross wallet balance plus unrealized PnL of cross positions, minus initial margin in use."""
+        cross_wallet = self.balances.get(asset or self.asset, {}).get('cross_wallet', 0.0)
+        return cross_wallet + self._unrealized - self._margin_used
+
+    @property
+    def margin_used(self) -> float:
+        """Initial margin of cross positions and open (non reduce-only) orders, at each symbol's leverage."""
+        return self._margin_used
+
+    def open_orders(self, symbol: str) -> List[dict]:
+        return list(self.orders.get(symbol, {}).values())
+
+    def leverage_of(self, symbol: str) -> int:
+        return self.leverage.get(symbol, DEFAULT_LEVERAGE)
+
+    def refresh_position(self, symbol: str) -> Position:
+        """Re-reads one position over REST, for when an event may still be in flight."""
+        for risk in self.client.get_position_risk(symbol=symbol):
+            if risk.get('positionSide', "BOTH") == "BOTH":
+                with self._lock:
+                    self.positions[symbol] = _position_from_rest(risk)
+                    self._update_margin(symbol)
+                    self._unrealized = sum(p.unrealized_pnl for p in self.positions.values() if not p.isolated)
+        return self.position(symbol)
+
+    # -- events --------------------------------------------------------------
+
+    def _on_resumed(self, _):
+        logger.warning("User data stream resumed; reloading account state")
+        self.reload()
+
+    def _on_event(self, event):
+        with self._lock:
+            if self._buffer is not None:
+                self._buffer.append(event)
+                return
+            self._apply(event)
+
+    def _apply(self, event):
+        """Applies one user-stream record. Caller holds the lock."""
+        if isinstance(event, OrderUpdate):
+            orders = self.orders[event.symbol]
+            if event.status in OPEN_STATUSES:
+                orders[event.order_id] = {
+                    'orderId': event.order_id, 'clientOrderId': event.client_order_id, 'side': event.side,
+                    'type': event.order_type, 'price': event.price, 'stopPrice': event.stop_price,
+                    'origQty': event.orig_qty, 'executedQty': event.filled_qty, 'reduceOnly': event.reduce_only,
+                    'status': event.status,
+                }
+            else:
+                orders.pop(event.order_id, None)
+            self._update_margin(event.symbol)
+        elif isinstance(event, AccountUpdate):
+            for balance in event.balances:
+                self.balances[balance['a']] = {'wallet': float(balance['wb']), 'cross_wallet': float(balance['cw'])}
+            for p in event.positions:
+                if p.get('ps', "BOTH") != "BOTH":
+                    continue
+                self.positions[p['s']] = Position(p['s'], float(p['pa']), float(p['ep']), float(p['up']),
+                                                  float(p.get('iw', 0)), event.event_time)
+                self._update_margin(p['s'])
+            self._unrealized = sum(p.unrealized_pnl for p in self.positions.values() if not p.isolated)
+        elif isinstance(event, ConfigUpdate) and event.symbol:
+            self.leverage[event.symbol] = event.leverage
+            self._update_margin(event.symbol)
+
+    def _update_margin(self, symbol: str):
+        leverage = self.leverage_of(symbol)
+        position = self.positions.get(symbol)
+        margin = position.notional / leverage if position is not None and not position.isolated else 0.0
+        for order in self.orders.get(symbol, {}).values():
+            if not order['reduceOnly']:
+                price = order['price'] or order['stopPrice']
+                margin += price * (order['origQty'] - order['executedQty']) / leverage
+        self._margin[symbol] = margin
+        self._margin_used = sum(self._margin.values())
+
+
+def _leverage_of(risk: dict) -> Optional[int]:
+    """Leverage from a positionRisk entry: given directly (v2) or implied by notional / initial margin (v3)."""
+    if risk.get('leverage'):
+        return int(risk['leverage'])
+    initial_margin = float(risk.get('positionInitialMargin') or 0)
+    if initial_margin > 0:
+        return round(abs(float(risk.get('notional', 0))) / initial_margin)
+    return None
+
+
+def _position_from_rest(risk: dict) -> Position:
+    return Position(risk['symbol'], float(risk['positionAmt']), float(risk['entryPrice']),
+                    float(risk.get('unRealizedProfit', 0)), float(risk.get('isolatedWallet', 0)),
+                    risk.get('updateTime', 0))
+
+
+def _order_from_rest(order: dict) -> dict:
+    return {
+        'orderId': order['orderId'], 'clientOrderId': order.get('clientOrderId'), 'side': order['side'],
+        'type': order['type'], 'price': float(order.get('price', 0)), 'stopPrice': float(order.get('stopPrice', 0)),
+        'origQty': float(order['origQty']), 'executedQty': float(order.get('executedQty', 0)),
+        'reduceOnly': bool(order.get('reduceOnly')), 'status': order['status'],
+    }
+
+
+_states: Dict[str, AccountState] = {}
+_states_lock = threading.Lock()
+
+
+def get_account_state(account: str = "default") -> AccountState:
+    """Returns the shared, loaded account state for an account; the first call seeds it from REST."""
+    with _states_lock:
+        state = _states.get(account)
+        if state is None:
+            state = AccountState(get_client(account), get_user_stream(account))
+            state.start()
+            _states[account] = state
+        return state
+
+
+def current_account_state(account: str = "default") -> Optional[AccountState]:
+    """The account state if something in this process already loaded it, else None (never loads it)."""
+    state = _states.get(account)
+    return state if state is not None and state.ready else None
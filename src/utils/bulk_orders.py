@@ -0,0 +1,166 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Hashable, List, Tuple
+
+from binance.error import ClientError, ServerError
+
+from utils.rate_limiter import request_priority, PRIORITY_BULK, PRIORITY_CANCEL
+from utils.rules import check_orders, FILTER_FAILURE_CODE
+from utils.order_book import local_mid
+from utils.client_registry import request_timeout
+from utils.clock import RECV_WINDOW
+from utils.submission import lookup_order, new_client_order_id, settle_time, SUBMIT_TIMEOUT, UNKNOWN_STATUS_CODES
+
+# Binance caps /fapi/v1/batchOrders at 5 orders per placement and 10 per cancel
+MAX_BATCH_SIZE = 5
+MAX_CANCEL_BATCH_SIZE = 10
+MAX_CONCURRENT_BATCHES = int(os.getenv("BATCH_MAX_CONCURRENCY", "4"))
+
+# Errors worth re-submitting: -1003 (too many requests) and -1008 (server overloaded) reject an
+# order before it is executed. Unknown outcomes (UNKNOWN_STATUS_CODES, 5xx, timeouts) are only
+# re-submitted once a lookup shows the order never reached the exchange
+RETRYABLE_CODES = {-1003, -1008}
+# A batch carries the client's recvWindow, so it is waited for at least that long: a request
+# given up on can then no longer be accepted by the exchange, and a lookup settles its fate
+BATCH_TIMEOUT = max(SUBMIT_TIMEOUT, RECV_WINDOW / 1000)
+
+
+def _to_wire(params: dict) -> dict:
+    """batchOrders is sent as a JSON array, so every value must already be a string."""
+    return {k: str(v) for k, v in params.items() if v is not None}
+
+
+def _chunk(items: List[Tuple[Hashable, dict]], size: int) -> List[List[Tuple[Hashable, dict]]]:
+    return [items[i:i + size] for i in range(0, len(items), size)]
+
+
+def _send_batch(client, batch: List[Tuple[Hashable, dict]], priority: int) -> Dict[Hashable, dict]:
+    """Sends one batchOrders request and maps each response item back to its key."""
+    try:
+        with request_priority(priority), request_timeout(BATCH_TIMEOUT):
+            response = client.new_batch_order([_to_wire(params) for _, params in batch])
+    except ClientError as e:
+        return {key: {'ok': False, 'code': e.error_code, 'msg': e.error_message,
+                      'retryable': e.error_code in RETRYABLE_CODES} for key, _ in batch}
+    except (ServerError, OSError) as e:
+        # Transport failure, timeout or 5xx: the exchange state is unknown until looked up
+        return {key: {'ok': False, 'code': None, 'msg': str(e), 'retryable': False} for key, _ in batch}
+
+    results = {}
+    for (key, _), item in zip(batch, response):
+        if 'orderId' in item:
+            results[key] = {'ok': True, 'order': item}
+        else:
+            results[key] = {'ok': False, 'code': item.get('code'), 'msg': item.get('msg'),
+                            'retryable': item.get('code') in RETRYABLE_CODES}
+    return results
+
+
+def place_orders_bulk(client, orders: Dict[Hashable, dict], max_concurrency: int = MAX_CONCURRENT_BATCHES,
+                      retries: int = 0, priority: int = PRIORITY_BULK, validate: bool = True) -> Dict[Hashable, dict]:
+    """
+    Places many orders through batchOrders, sending batches concurrently.
+
+    Args:
+        client: Binance futures client instance
+        orders: Mapping of caller-chosen key (e.g., grid level) to new_order parameters
+        max_concurrency: Maximum number of batch requests in flight at once
+        retries: How many times to re-submit orders that failed with a retryable error
+        priority: Rate limiter priority; bulk placement yields to cancels and stops by default
+        validate: Check every order against the symbol's filters first; failures are
+            never sent and come back with code FILTER_FAILURE_CODE
+
+    Returns:
+        Dict mapping every key to {'ok': True, 'order': ...} or
+        {'ok': False, 'code': ..., 'msg': ..., 'retryable': ...}; code None means
+        the order's fate could not be determined
+
+    Every order is sent with a clientOrderId (one is made if it has none). An
+    order whose batch timed out or failed with an unknown outcome is looked up
+    by it: one that reached the exchange is adopted as placed, and only one
+    that did not is retried, so a retry never places an order twice.
+    """
+    results: Dict[Hashable, dict] = {}
+    orders = {key: params if params.get('newClientOrderId') else
+              dict(params, newClientOrderId=new_client_order_id("bulk")) for key, params in orders.items()}
+    pending = list(orders.items())
+    if validate:
+        mids = {symbol: local_mid(symbol) for symbol in {params['symbol'] for params in orders.values()}}
+        reference = {symbol: mid for symbol, mid in mids.items() if mid is not None}
+        for key, reason in check_orders(client, orders, reference).items():
+            results[key] = {'ok': False, 'code': FILTER_FAILURE_CODE, 'msg': f"Rejected locally: {reason}",
+                            'retryable': False}
+        pending = [(key, params) for key, params in pending if key not in results]
+
+    for _ in range(retries + 1):
+        if not pending:
+            break
+
+        batches = _chunk(pending, MAX_BATCH_SIZE)
+        with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(batches)))) as pool:
+            for batch_results in pool.map(lambda b: _send_batch(client, b, priority), batches):
+                results.update(batch_results)
+            unknown = [key for key, _ in pending
+                       if not results[key]['ok'] and (results[key]['code'] is None or
+                                                      results[key]['code'] in UNKNOWN_STATUS_CODES)]
+            for key, result in zip(unknown, pool.map(lambda k: _resolve(client, orders[k], results[k]), unknown)):
+                results[key] = result
+
+        pending = [(key, orders[key]) for key, result in results.items()
+                   if not result['ok'] and result['retryable']]
+
+    return results
+
+
+def _resolve(client, params: dict, result: dict) -> dict:
+    """Settles an order whose batch had an unknown outcome by looking it up until its recvWindow has passed."""
+    try:
+        order = lookup_order(client, params['symbol'], params['newClientOrderId'], settle=settle_time(RECV_WINDOW))
+    except Exception as e:
+        return {'ok': False, 'code': None, 'msg': f"{result['msg']}; lookup failed: {e}", 'retryable': False}
+    if order is not None:
+        return {'ok': True, 'order': order}
+    return dict(result, retryable=True)
+
+
+def failed_orders(orders: Dict[Hashable, dict], results: Dict[Hashable, dict]) -> Dict[Hashable, dict]:
+    """Returns the subset of orders that did not succeed, ready to pass back to place_orders_bulk."""
+    return {key: params for key, params in orders.items() if not results.get(key, {}).get('ok')}
+
+
+def _cancel_batch(client, symbol: str, order_ids: List[int], priority: int) -> Dict[int, dict]:
+    try:
+        with request_priority(priority):
+            response = client.cancel_batch_order(symbol=symbol, orderIdList=order_ids, origClientOrderIdList=None)
+    except ClientError as e:
+        return {oid: {'ok': False, 'code': e.error_code, 'msg': e.error_message} for oid in order_ids}
+    except (ServerError, OSError) as e:
+        return {oid: {'ok': False, 'code': None, 'msg': str(e)} for oid in order_ids}
+
+    results = {}
+    for oid, item in zip(order_ids, response):
+        if 'orderId' in item:
+            results[oid] = {'ok': True, 'order': item}
+        else:
+            results[oid] = {'ok': False, 'code': item.get('code'), 'msg': item.get('msg')}
+    return results
+
+
+def cancel_orders_bulk(client, symbol: str, order_ids: List[int], max_concurrency: int = MAX_CONCURRENT_BATCHES,
+                       priority: int = PRIORITY_CANCEL) -> Dict[int, dict]:
+    """
+    Cancels many orders of one symbol through DELETE batchOrders, sending batches concurrently.
+
+    Returns:
+        Dict mapping every order id to {'ok': True, 'order': ...} or {'ok': False, 'code': ..., 'msg': ...}
+        (-2011 means the order was already filled or cancelled)
+    """
+    results: Dict[int, dict] = {}
+    batches = [order_ids[i:i + MAX_CANCEL_BATCH_SIZE] for i in range(0, len(order_ids), MAX_CANCEL_BATCH_SIZE)]
+    if not batches:
+        return results
+
+    with ThreadPoolExecutor(max_workers=max(1, min(max_concurrency, len(batches)))) as pool:
+        for batch_results in pool.map(lambda b: _cancel_batch(client, symbol, b, priority), batches):
+            results.update(batch_results)
+    return results
@@ -0,0 +1,181 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Tuple
+
+from binance.error import ClientError, ServerError
+from binance.um_futures import UMFutures
+from requests.adapters import HTTPAdapter
+
+from utils.clock import get_server_clock, RECV_WINDOW
+from utils.metrics import get_metrics
+from utils.rate_limiter import get_rate_limiter, request_cost, classify_priority
+
+POOL_MAXSIZE = int(os.getenv("HTTP_POOL_MAXSIZE", "16"))
+
+_local = threading.local()
+
+
+@contextmanager
+def request_timeout(seconds: Optional[float]):
+    """Bounds every REST call made by the current thread inside the block (connect and read, each)."""
+    previous = getattr(_local, "timeout", None)
+    _local.timeout = seconds
+    try:
+        yield
+    finally:
+        _local.timeout = previous
+
+
+class ExchangeClient(UMFutures):
+    """
+    UMFutures client whose session keeps a pool of keep-alive connections.
+
+    The pool is sized so concurrent callers (batch placement, cancels from
+    websocket threads) each get a warm connection instead of blocking or
+    opening a throwaway one. Every request is admitted by the process-wide
+    rate limit scheduler, which is fed the X-MBX-* headers of each response,
+    and its latency and error code are recorded in the metrics registry.
+
+    Signed requests are stamped with the estimated server time after
+    admission, so neither clock skew nor time spent queued in the rate
+    limiter can push them outside recvWindow. A -1021 (timestamp outside
+    recvWindow) was never processed; the clock is resynced and it is resent once.
+    Calls wait forever for a response unless made inside request_timeout().
+    """
+
+    def __init__(self, key=None, secret=None, pool_maxsize: int = POOL_MAXSIZE, **kwargs):
+        super().__init__(key=key, secret=secret, **kwargs)
+        self.adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_maxsize, pool_block=False)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        self.rate_limiter = get_rate_limiter()
+        self.session.hooks['response'].append(self._on_response)
+        self.metrics = get_metrics()
+        self.recv_window = RECV_WINDOW
+        self.clock = get_server_clock(self.base_url, self.time)
+
+    @property
+    def timeout(self) -> Optional[float]:
+        return getattr(_local, "timeout", None) or self._timeout
+
+    @timeout.setter
+    def timeout(self, value: Optional[float]):
+        self._timeout = value
+
+    def sign_request(self, http_method, url_path, payload=None, special=False):
+        if payload is None:
+            payload = {}
+        self._admit(http_method, url_path, payload)
+        try:
+            return self._send(http_method, url_path, self._sign(payload, special), special)
+        except ClientError as e:
+            if e.error_code != -1021:
+                raise
+            self.metrics.inc('clock_resyncs_total', endpoint=url_path)
+            self.clock.sync()
+        self._admit(http_method, url_path, payload)
+        return self._send(http_method, url_path, self._sign(payload, special), special)
+
+    def send_request(self, http_method, url_path, payload=None, special=False):
+        self._admit(http_method, url_path, payload)
+        return self._send(http_method, url_path, payload, special)
+
+    def _sign(self, payload: dict, special: bool) -> dict:
+        payload.pop('signature', None)
+        payload.setdefault('recvWindow', self.recv_window)
+        payload['timestamp'] = self.clock.timestamp()
+        payload['signature'] = self._get_sign(self._prepare_params(payload, special))
+        return payload
+
+    def _admit(self, http_method, url_path, payload):
+        weight, orders = request_cost(http_method, url_path, payload)
+        self.rate_limiter.acquire(weight, orders, classify_priority(http_method, url_path, payload))
+
+    def _send(self, http_method, url_path, payload, special):
+        # Timed after admission so throttling does not show up as exchange latency
+        start = time.perf_counter()
+        try:
+            return super().send_request(http_method, url_path, payload, special)
+        except ClientError as e:
+            self.metrics.inc('exchange_errors_total', method=http_method, endpoint=url_path, code=e.error_code)
+            raise
+        except ServerError:
+            self.metrics.inc('exchange_errors_total', method=http_method, endpoint=url_path, code="server")
+            raise
+        except Exception:
+            self.metrics.inc('exchange_errors_total', method=http_method, endpoint=url_path, code="network")
+            raise
+        finally:
+            self.metrics.observe('exchange_request_seconds', time.perf_counter() - start,
+                                 method=http_method, endpoint=url_path)
+
+    def _on_response(self, response, *args, **kwargs):
+        self.rate_limiter.update_from_headers(response.status_code, response.headers)
+
+    def connection_stats(self) -> List[dict]:
+        """Returns connection reuse counters for every host pool opened by this client."""
+        stats = []
+        pools = self.adapter.poolmanager.pools
+        for pool_key in list(pools.keys()):
+            pool = pools.get(pool_key)
+            if pool is None:
+                continue
+            opened = pool.num_connections
+            requests = pool.num_requests
+            stats.append({
+                'host': f"{pool.scheme}://{pool.host}:{pool.port}",
+                'connections_opened': opened,
+                'requests': requests,
+                'reused': max(requests - opened, 0),
+            })
+        return stats
+
+    def close(self):
+        self.session.close()
+
+
+class ClientRegistry:
+    """
+    Process-wide cache of exchange clients, one per account.
+
+    Credentials are looked up through the resolver the first time an account
+    is requested; every later call returns the same client and connection pool.
+    """
+
+    def __init__(self, resolver: Callable[[str], Tuple[str, str, str]]):
+        self._resolver = resolver
+        self._clients: Dict[str, ExchangeClient] = {}
+        self._lock = threading.Lock()
+
+    def get(self, account: str = "default") -> ExchangeClient:
+        client = self._clients.get(account)
+        if client is not None:
+            return client
+
+        with self._lock:
+            client = self._clients.get(account)
+            if client is None:
+                key, secret, base_url = self._resolver(account)
+                client = ExchangeClient(key=key, secret=secret, base_url=base_url)
+                self._clients[account] = client
+        return client
+
+    def register(self, account: str, client: ExchangeClient):
+        """Adds an explicitly constructed client (e.g., a sub-account key)."""
+        with self._lock:
+            self._clients[account] = client
+
+    def accounts(self) -> List[str]:
+        return list(self._clients.keys())
+
+    def stats(self) -> Dict[str, List[dict]]:
+        return {account: client.connection_stats() for account, client in list(self._clients.items())}
+
+    def close(self):
+        """Closes every pooled connection; later get() calls open fresh clients."""
+        with self._lock:
+            for client in self._clients.values():
+                client.close()
+            self._clients.clear()
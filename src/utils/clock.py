@@ -0,0 +1,110 @@
+import os
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+# recvWindow sent with every signed request, in ms (Binance default: 5000)
+RECV_WINDOW = int(os.getenv("RECV_WINDOW", "2000"))
+# Seconds between background offset refreshes; 0 only resyncs after a -1021
+CLOCK_SYNC_INTERVAL = float(os.getenv("CLOCK_SYNC_INTERVAL", "60"))
+# Server time samples per sync; the one with the lowest round trip is used
+SYNC_SAMPLES = 5
+# Weight of a new sample in the smoothed offset
+SMOOTHING = 0.3
+# A sample this far (ms) from the smoothed offset replaces it outright (clock step, first sync)
+MAX_SMOOTHED_JUMP_MS = 250.0
+
+
+class ServerClock:
+    """
+    Estimates exchange server time from the local monotonic clock.
+
+    Each sync takes a few /time samples and keeps the one with the shortest
+    round trip, taking the server timestamp to belong to the midpoint of the
+    request. The offset is smoothed across syncs, and is anchored to
+    time.monotonic() so steps of the host's wall clock do not affect it. Until
+    the first sync completes, timestamps fall back to the wall clock.
+    """
+
+    def __init__(self, fetch_server_time: Callable[[], dict], samples: int = SYNC_SAMPLES,
+                 interval: float = CLOCK_SYNC_INTERVAL):
+        self._fetch = fetch_server_time
+        self.samples = samples
+        self.interval = interval
+        # server ms = time.monotonic() * 1000 + offset
+        self.offset: Optional[float] = None
+        self.rtt_ms: Optional[float] = None
+        self.synced_at = 0.0
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    def timestamp(self) -> int:
+        """Current server time in ms, as sent in the `timestamp` parameter."""
+        offset = self.offset
+        if offset is None:
+            return int(time.time() * 1000)
+        return int(time.monotonic() * 1000 + offset)
+
+    def wall_offset_ms(self) -> Optional[float]:
+        """How far the server clock is ahead of this host's wall clock, in ms."""
+        if self.offset is None:
+            return None
+        return self.timestamp() - time.time() * 1000
+
+    def sync(self) -> float:
+        """Samples server time and folds the best sample into the offset. Returns the offset."""
+        best_rtt, best_offset = None, None
+        for _ in range(self.samples):
+            sent = time.monotonic()
+            server_ms = self._fetch()['serverTime']
+            received = time.monotonic()
+            rtt = received - sent
+            if best_rtt is None or rtt < best_rtt:
+                # serverTime is truncated to the ms: on average it is half a ms behind
+                best_rtt, best_offset = rtt, server_ms + 0.5 - (sent + received) / 2 * 1000
+
+        with self._lock:
+            if self.offset is None or abs(best_offset - self.offset) > MAX_SMOOTHED_JUMP_MS:
+                self.offset = best_offset
+            else:
+                self.offset += SMOOTHING * (best_offset - self.offset)
+            self.rtt_ms = best_rtt * 1000
+            self.synced_at = time.monotonic()
+        return self.offset
+
+    def start(self):
+        """Syncs from a daemon thread now and then every `interval` seconds."""
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="clock-sync", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _loop(self):
+        while True:
+            try:
+                self.sync()
+            except Exception:
+                # Keep the last offset; a -1021 from the exchange forces a resync
+                pass
+            if not self.interval or self._stop.wait(self.interval):
+                return
+
+
+_clocks: Dict[str, ServerClock] = {}
+_clocks_lock = threading.Lock()
+
+
+def get_server_clock(base_url: str, fetch_server_time: Callable[[], dict]) -> ServerClock:
+    """Returns the shared, started clock for an exchange endpoint; every client of it shares one offset."""
+    with _clocks_lock:
+        clock = _clocks.get(base_url)
+        if clock is None:
+            clock = ServerClock(fetch_server_time)
+            _clocks[base_url] = clock
+            clock.start()
+        return clock
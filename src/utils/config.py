@@ -1,52 +1,91 @@
 import os
+import atexit
 import logging
-from binance.um_futures import UMFutures
+from typing import Tuple
 from dotenv import load_dotenv
 
+from utils.client_registry import ClientRegistry, ExchangeClient
+from utils.metrics import start_exporter, stop_exporter
+from utils.log_pipeline import get_queue_handler, stop_logging
+
+# Registered first so it runs last: shutdown hooks below can still log
+atexit.register(stop_logging)
+
 # Load environment variables
 load_dotenv()
 
 API_KEY = os.getenv("BINANCE_API_KEY")
 SECRET_KEY = os.getenv("BINANCE_SECRET_KEY")
 USE_TESTNET = os.getenv("USE_TESTNET", "True").lower() == "true"
+# Local simulated exchange (python src/simulator/server.py); takes precedence over USE_TESTNET
+USE_SIMULATOR = os.getenv("USE_SIMULATOR", "False").lower() == "true"
+SIMULATOR_URL = os.getenv("SIMULATOR_URL", "http://127.0.0.1:8765")
 
-BASE_URL = "https://testnet.binancefuture.com" if USE_TESTNET else "https://fapi.binance.com"
+if USE_SIMULATOR:
+    BASE_URL = SIMULATOR_URL
+    STREAM_URL = "ws" + SIMULATOR_URL[len("http"):]
+    WS_API_URL = STREAM_URL + "/ws-fapi/v1"
+else:
+    BASE_URL = "https://testnet.binancefuture.com" if USE_TESTNET else "https://fapi.binance.com"
+    STREAM_URL = "wss://stream.binancefuture.com" if USE_TESTNET else "wss://fstream.binance.com"
+    # Websocket trading API (order entry), used when ORDER_TRANSPORT=ws
+    WS_API_URL = "wss://testnet.binancefuture.com/ws-fapi/v1" if USE_TESTNET else "wss://ws-fapi.binance.com/ws-fapi/v1"
 
-def get_client() -> UMFutures:
+def _resolve_credentials(account: str) -> Tuple[str, str, str]:
     """
-    Initializes and returns the Binance USDT-M Futures Client.
+    Looks up API credentials for an account.
+    The default account uses BINANCE_API_KEY / BINANCE_SECRET_KEY, any other
+    account uses BINANCE_API_KEY_<ACCOUNT> / BINANCE_SECRET_KEY_<ACCOUNT>.
     """
-    if not API_KEY or not SECRET_KEY:
-        raise ValueError("API credentials not found in .env file.")
-    
-    return UMFutures(key=API_KEY, secret=SECRET_KEY, base_url=BASE_URL)
+    if account == "default":
+        key, secret = API_KEY, SECRET_KEY
+    else:
+        suffix = account.upper()
+        key = os.getenv(f"BINANCE_API_KEY_{suffix}")
+        secret = os.getenv(f"BINANCE_SECRET_KEY_{suffix}")
 
-def setup_logger(name: str) -> logging.Logger:
+    if not key or not secret:
+        raise ValueError(f"API credentials for account '{account}' not found in .env file.")
+
+    return key, secret, BASE_URL
+
+_registry = ClientRegistry(_resolve_credentials)
+
+def get_client(account: str = "default") -> ExchangeClient:
     """
-    Configures a structured logger that writes to console (INFO) 
-    and file (DEBUG).
+    Returns the shared Binance USDT-M Futures Client for an account.
+    The client and its keep-alive connection pool are created on first use
+    and reused by every later call in the process.
     """
-    logger = logging.getLogger(name)
-    logger.setLevel(logging.DEBUG)
+    return _registry.get(account)
 
-    # Formatter
-    formatter = logging.Formatter(
-        '%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
-    )
+def get_client_registry() -> ClientRegistry:
+    return _registry
 
-    # File Handler (bot.log)
-    file_handler = logging.FileHandler('bot.log')
-    file_handler.setLevel(logging.DEBUG)
-    file_handler.setFormatter(formatter)
+def close_clients():
+    """Closes all pooled exchange connections."""
+    _registry.close()
 
-    # Console Handler
-    console_handler = logging.StreamHandler()
-    console_handler.setLevel(logging.INFO)
-    console_handler.setFormatter(formatter)
+atexit.register(close_clients)
+
+def setup_logger(name: str) -> logging.Logger:
+    """
+    Returns a logger that hands records to the shared background pipeline:
+    bot.log as rotated JSON lines (DEBUG) and the console (INFO).
+    Callers never block on disk I/O; use %-style arguments so messages are
+    only formatted on the logging thread, and `extra=` for structured fields.
+    """
+    logger = logging.getLogger(name)
+    logger.setLevel(logging.DEBUG)
+    # The connector's module-level logging.debug() installs a root handler; don't print twice
+    logger.propagate = False
 
     # Avoid duplicate handlers
     if not logger.handlers:
-        logger.addHandler(file_handler)
-        logger.addHandler(console_handler)
+        logger.addHandler(get_queue_handler())
+
+    return logger
 
-    return logger
\ No newline at end of file
+# Metrics endpoint / snapshot file, only when METRICS_PORT or METRICS_SNAPSHOT_PATH is set
+start_exporter()
+atexit.register(stop_exporter)
@@ -0,0 +1,195 @@
+"""
+Decoding of websocket events into small __slots__ records.
+
+Routing fields (ids, status, symbol) are read once when the record is built;
+every other field stays in the raw payload and is converted only when a
+handler reads it. JSON is decoded with orjson when it is installed.
+"""
+import json
+from typing import Optional
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def loads(message):
+    """Decodes one websocket message (str or bytes)."""
+    if orjson is not None:
+        return orjson.loads(message)
+    return json.loads(message)
+
+
+class OrderUpdate:
+    """ORDER_TRADE_UPDATE for one order."""
+
+    __slots__ = ("event_time", "symbol", "order_id", "client_order_id", "status", "raw")
+
+    def __init__(self, event: dict):
+        o = event['o']
+        self.event_time = event.get('E', 0)
+        self.symbol = o['s']
+        self.order_id = o['i']
+        self.client_order_id = o['c']
+        self.status = o['X']
+        self.raw = o
+
+    @property
+    def side(self) -> str:
+        return self.raw['S']
+
+    @property
+    def order_type(self) -> str:
+        return self.raw['o']
+
+    @property
+    def orig_type(self) -> str:
+        """Type the order was placed as; a triggered STOP_MARKET reports order_type MARKET."""
+        return self.raw.get('ot') or self.raw['o']
+
+    @property
+    def exec_type(self) -> str:
+        return self.raw['x']
+
+    @property
+    def price(self) -> float:
+        return float(self.raw['p'])
+
+    @property
+    def stop_price(self) -> float:
+        return float(self.raw.get('sp', 0))
+
+    @property
+    def orig_qty(self) -> float:
+        return float(self.raw['q'])
+
+    @property
+    def filled_qty(self) -> float:
+        return float(self.raw.get('z', 0))
+
+    @property
+    def avg_price(self) -> float:
+        return float(self.raw.get('ap', 0))
+
+    @property
+    def last_qty(self) -> float:
+        return float(self.raw.get('l', 0))
+
+    @property
+    def last_price(self) -> float:
+        return float(self.raw.get('L', 0))
+
+    @property
+    def commission(self) -> float:
+        return float(self.raw.get('n', 0))
+
+    @property
+    def is_maker(self) -> bool:
+        return bool(self.raw.get('m'))
+
+    @property
+    def reduce_only(self) -> bool:
+        return bool(self.raw.get('R'))
+
+    @property
+    def trade_time(self) -> int:
+        return self.raw.get('T') or self.event_time
+
+    def __repr__(self):
+        return f"OrderUpdate({self.symbol} {self.order_id} {self.client_order_id} {self.status})"
+
+
+class AccountUpdate:
+    """ACCOUNT_UPDATE: changed balances and positions (raw entries, fields 'a'/'wb'/'cw' and 's'/'pa'/'ep'/...)."""
+
+    __slots__ = ("event_time", "reason", "balances", "positions")
+
+    def __init__(self, event: dict):
+        update = event['a']
+        self.event_time = event.get('E', 0)
+        self.reason = update.get('m')
+        self.balances = update.get('B', ())
+        self.positions = update.get('P', ())
+
+    def __repr__(self):
+        return f"AccountUpdate({self.reason}, {len(self.balances)} balance(s), {len(self.positions)} position(s))"
+
+
+class ConfigUpdate:
+    """ACCOUNT_CONFIG_UPDATE; `symbol`/`leverage` are None for multi-assets mode changes."""
+
+    __slots__ = ("event_time", "symbol", "leverage")
+
+    def __init__(self, event: dict):
+        config = event.get('ac')
+        self.event_time = event.get('E', 0)
+        self.symbol = config['s'] if config else None
+        self.leverage: Optional[int] = int(config['l']) if config else None
+
+    def __repr__(self):
+        return f"ConfigUpdate({self.symbol} x{self.leverage})"
+
+
+class AggTrade:
+    """aggTrade: one aggregated market trade."""
+
+    __slots__ = ("event_time", "symbol", "raw")
+
+    def __init__(self, event: dict):
+        self.event_time = event.get('E', 0)
+        self.symbol = event['s']
+        self.raw = event
+
+    @property
+    def price(self) -> float:
+        return float(self.raw['p'])
+
+    @property
+    def quantity(self) -> float:
+        return float(self.raw['q'])
+
+    @property
+    def trade_time(self) -> int:
+        return self.raw['T']
+
+    @property
+    def buyer_is_maker(self) -> bool:
+        return self.raw['m']
+
+    def __repr__(self):
+        return f"AggTrade({self.symbol} {self.raw['q']} @ {self.raw['p']})"
+
+
+class DepthUpdate:
+    """depthUpdate diff: update id range and changed [price, qty] levels (strings, as sent)."""
+
+    __slots__ = ("event_time", "symbol", "first_id", "final_id", "prev_final_id", "bids", "asks")
+
+    def __init__(self, event: dict):
+        self.event_time = event.get('E', 0)
+        self.symbol = event['s']
+        self.first_id = event['U']
+        self.final_id = event['u']
+        self.prev_final_id = event.get('pu')
+        self.bids = event['b']
+        self.asks = event['a']
+
+    def __repr__(self):
+        return f"DepthUpdate({self.symbol} {self.first_id}-{self.final_id})"
+
+
+# event type ('e') -> record; other event types are passed to handlers as the decoded dict
+RECORDS = {
+    'ORDER_TRADE_UPDATE': OrderUpdate,
+    'ACCOUNT_UPDATE': AccountUpdate,
+    'ACCOUNT_CONFIG_UPDATE': ConfigUpdate,
+    'aggTrade': AggTrade,
+    'depthUpdate': DepthUpdate,
+}
+
+
+def to_record(event: dict):
+    """Wraps a decoded event in its record type (the dict itself if it has none)."""
+    record = RECORDS.get(event.get('e'))
+    return record(event) if record is not None else event
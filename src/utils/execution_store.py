@@ -0,0 +1,292 @@
+import atexit
+import fcntl
+import os
+import queue
+import threading
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from utils.config import setup_logger
+from utils.events import OrderUpdate
+
+logger = setup_logger("execution_store")
+
+# Empty path disables the store
+STORE_PATH = os.getenv("EXECUTION_STORE_PATH", os.path.join(".state", "executions"))
+# Rows are appended to the column files at most once per flush window
+STORE_FLUSH_MS = float(os.getenv("EXECUTION_STORE_FLUSH_MS", "200"))
+
+# One little-endian file per column and table; strings (symbol, strategy, order type) are codes into strings.txt
+ORDER_COLUMNS = {
+    'time': '<i8',          # send time, ms
+    'symbol': '<u4',
+    'strategy': '<u4',      # strategy id (<kind>-<hex>, grid id, ...); 0 = none
+    'order_type': '<u4',
+    'side': 'i1',           # +1 BUY, -1 SELL
+    'order_id': '<i8',      # 0 = rejected / unknown
+    'quantity': '<f8',
+    'price': '<f8',         # limit price; NaN for market orders
+    'arrival': '<f8',       # reference price when the parent decided to trade; NaN if unknown
+    'latency_ms': '<f4',    # send to acknowledgement; NaN if unknown
+}
+FILL_COLUMNS = {
+    'time': '<i8',          # trade time, ms
+    'symbol': '<u4',
+    'strategy': '<u4',
+    'side': 'i1',
+    'maker': 'i1',          # 1 maker, 0 taker, -1 unknown
+    'order_id': '<i8',
+    'price': '<f8',
+    'quantity': '<f8',
+    'fee': '<f8',           # NaN if unknown (fills read from an order response)
+}
+TABLES = {'orders': ORDER_COLUMNS, 'fills': FILL_COLUMNS}
+STRINGS_FILE = "strings.txt"
+LOCK_FILE = ".lock"
+
+
+def strategy_of(client_order_id: Optional[str]) -> str:
+    """Strategy part of a clientOrderId (<strategy_id>-<tag>); '' for ids the bot did not make."""
+    if not client_order_id or "-" not in client_order_id:
+        return ""
+    return client_order_id.rsplit("-", 1)[0]
+
+
+class ExecutionStore:
+    """
+    Append-only columnar record of every order the bot sends and every fill
+    it gets, for transaction-cost analysis (see tca.py).
+
+    Each table is a directory of raw column files that readers memory-map
+    as NumPy arrays. Callers never wait for disk: rows go onto a queue and a
+    writer thread appends everything that arrived within STORE_FLUSH_MS as one
+    chunk per column, under a file lock shared with other processes. A crash
+    can leave the last chunk in only some columns; readers use the length of
+    the shortest column and the next write cuts the others back to it.
+
+    MARKET fills are recorded from the order response (newOrderRespType
+    RESULT); fills of resting and stop orders come from the user stream of
+    processes that track one (daemon, OCO monitor, grid engine).
+    """
+
+    def __init__(self, path: str = STORE_PATH, flush_ms: float = STORE_FLUSH_MS):
+        self.path = path
+        self.flush_interval = flush_ms / 1000
+        for table in TABLES:
+            os.makedirs(os.path.join(path, table), exist_ok=True)
+
+        self._codes: Dict[str, int] = {"": 0}
+        self._strings_offset = 0
+        self._tracked: Dict[int, int] = {}
+        self._tracked_lock = threading.Lock()
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._writer = threading.Thread(target=self._write_loop, name="execution-store", daemon=True)
+        self._writer.start()
+
+    # -- recording -----------------------------------------------------------
+
+    def record_order(self, symbol: str, side: str, order_type: str, quantity: float, price: Optional[float] = None,
+                     arrival: Optional[float] = None, latency_ms: Optional[float] = None, order_id: int = 0,
+                     client_order_id: Optional[str] = None, strategy: Optional[str] = None,
+                     time_ms: Optional[int] = None):
+        self._queue.put(('orders', (
+            time_ms or int(time.time() * 1000), symbol, strategy or strategy_of(client_order_id), order_type,
+            1 if side == "BUY" else -1, order_id or 0, float(quantity), _float(price), _float(arrival),
+            _float(latency_ms))))
+
+    def record_fill(self, symbol: str, side: str, price: float, quantity: float, fee: Optional[float] = None,
+                    maker: Optional[bool] = None, order_id: int = 0, client_order_id: Optional[str] = None,
+                    strategy: Optional[str] = None, time_ms: Optional[int] = None):
+        self._queue.put(('fills', (
+            time_ms or int(time.time() * 1000), symbol, strategy or strategy_of(client_order_id),
+            1 if side == "BUY" else -1, -1 if maker is None else int(maker), order_id or 0, float(price),
+            float(quantity), _float(fee))))
+
+    def record_response(self, response: dict, arrival: Optional[float] = None, latency_ms: Optional[float] = None,
+                        strategy: Optional[str] = None):
+        """Records an acknowledged order and, for a MARKET order, the fill its RESULT response reports."""
+        price = float(response.get('price') or 0)
+        self.record_order(response['symbol'], response['side'], response['type'], float(response['origQty']),
+                          price or None, arrival, latency_ms, response.get('orderId'),
+                          response.get('clientOrderId'), strategy, response.get('updateTime'))
+        executed = float(response.get('executedQty') or 0)
+        if response['type'] == "MARKET" and executed > 0:
+            self.record_fill(response['symbol'], response['side'], float(response['avgPrice']), executed,
+                             maker=False, order_id=response.get('orderId'),
+                             client_order_id=response.get('clientOrderId'), strategy=strategy,
+                             time_ms=response.get('updateTime'))
+
+    def track_stream(self, stream):
+        """Records the fills of non-MARKET orders from a user stream; several callers may track the same stream."""
+        with self._tracked_lock:
+            count = self._tracked.get(id(stream), 0)
+            self._tracked[id(stream)] = count + 1
+        if count == 0:
+            stream.subscribe('ORDER_TRADE_UPDATE', self._on_order_update)
+
+    def untrack_stream(self, stream):
+        with self._tracked_lock:
+            count = self._tracked.get(id(stream), 0) - 1
+            if count > 0:
+                self._tracked[id(stream)] = count
+                return
+            self._tracked.pop(id(stream), None)
+        if count == 0:
+            stream.unsubscribe('ORDER_TRADE_UPDATE', self._on_order_update)
+
+    def _on_order_update(self, update: OrderUpdate):
+        # MARKET fills were recorded from the order response
+        if update.exec_type != "TRADE" or update.orig_type == "MARKET":
+            return
+        self.record_fill(update.symbol, update.side, update.last_price, update.last_qty, update.commission,
+                         update.is_maker, update.order_id, update.client_order_id, time_ms=update.trade_time)
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until every row recorded so far is written."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._writer.join()
+
+    # -- writer thread -------------------------------------------------------
+
+    def _write_loop(self):
+        lock = open(os.path.join(self.path, LOCK_FILE), "a")
+        stopping = False
+        while not stopping:
+            rows: Dict[str, list] = {table: [] for table in TABLES}
+            waiters = []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    waiters.append(item)
+                    break
+                else:
+                    rows[item[0]].append(item[1])
+                if stopping:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if any(rows.values()):
+                try:
+                    # Other processes (daemon, CLI scripts) append to the same files
+                    fcntl.flock(lock, fcntl.LOCK_EX)
+                    try:
+                        self._sync_strings()
+                        for table, table_rows in rows.items():
+                            if table_rows:
+                                self._append(table, table_rows)
+                    finally:
+                        fcntl.flock(lock, fcntl.LOCK_UN)
+                except (OSError, ValueError) as e:
+                    logger.error("Execution store write failed (%s rows lost): %s",
+                                 sum(len(r) for r in rows.values()), e)
+            for waiter in waiters:
+                waiter.set()
+        lock.close()
+
+    def _sync_strings(self):
+        """Picks up strings other processes added since the last write. Caller holds the file lock."""
+        with open(os.path.join(self.path, STRINGS_FILE), "a+", encoding="utf-8") as f:
+            f.seek(self._strings_offset)
+            for value in f.read().split("\n")[:-1]:
+                self._codes.setdefault(value, len(self._codes))
+            self._strings_offset = f.tell()
+
+    def _append(self, table: str, rows: List[tuple]):
+        columns = TABLES[table]
+        values = list(zip(*rows))
+        added = []
+        for i, dtype in enumerate(columns.values()):
+            if dtype == '<u4':
+                values[i] = [self._code(s or "", added) for s in values[i]]
+        if added:
+            # New strings reach disk before any row that refers to them
+            with open(os.path.join(self.path, STRINGS_FILE), "a", encoding="utf-8") as f:
+                f.write("".join(s + "\n" for s in added))
+                self._strings_offset = f.tell()
+
+        paths = [os.path.join(self.path, table, column + ".bin") for column in columns]
+        sizes = [os.path.getsize(p) // np.dtype(d).itemsize if os.path.exists(p) else 0
+                 for p, d in zip(paths, columns.values())]
+        # Drops the tail of a write that a crash left in only some columns
+        complete = min(sizes)
+        for path, dtype, size in zip(paths, columns.values(), sizes):
+            if size > complete:
+                os.truncate(path, complete * np.dtype(dtype).itemsize)
+        for path, dtype, column_values in zip(paths, columns.values(), values):
+            with open(path, "ab") as f:
+                f.write(np.asarray(column_values, dtype=dtype).tobytes())
+
+    def _code(self, value: str, added: List[str]) -> int:
+        code = self._codes.get(value)
+        if code is None:
+            code = self._codes[value] = len(self._codes)
+            added.append(value)
+        return code
+
+
+def _float(value) -> float:
+    return float(value) if value is not None else float("nan")
+
+
+def load_strings(path: str = STORE_PATH) -> List[str]:
+    """String table of a store; code 0 is always ''."""
+    try:
+        with open(os.path.join(path, STRINGS_FILE), encoding="utf-8") as f:
+            strings = f.read().split("\n")[:-1]
+    except FileNotFoundError:
+        strings = []
+    return [""] + strings
+
+
+def load_table(table: str, path: str = STORE_PATH) -> Dict[str, np.ndarray]:
+    """Memory-maps every column of a table ('orders' or 'fills'), cut to the rows present in all of them."""
+    columns = TABLES[table]
+    mapped = {}
+    for column, dtype in columns.items():
+        file = os.path.join(path, table, column + ".bin")
+        size = os.path.getsize(file) // np.dtype(dtype).itemsize if os.path.exists(file) else 0
+        mapped[column] = np.memmap(file, dtype=dtype, mode='r', shape=(size,)) if size else np.empty(0, dtype)
+    rows = min(len(values) for values in mapped.values())
+    return {column: values[:rows] for column, values in mapped.items()}
+
+
+_store: Optional[ExecutionStore] = None
+_lock = threading.Lock()
+
+
+def get_execution_store() -> Optional[ExecutionStore]:
+    """Returns the process-wide execution store, or None if EXECUTION_STORE_PATH is empty."""
+    global _store
+    if not STORE_PATH:
+        return None
+    if _store is None:
+        with _lock:
+            if _store is None:
+                _store = ExecutionStore()
+                atexit.register(close_execution_store)
+    return _store
+
+
+def close_execution_store():
+    global _store
+    with _lock:
+        if _store is not None:
+            _store.close()
+            _store = None
@@ -0,0 +1,377 @@
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Dict, Optional
+
+from binance.error import ClientError
+
+from utils.config import setup_logger
+from utils.events import OrderUpdate
+
+logger = setup_logger("order_journal")
+
+# Empty path disables journaling
+JOURNAL_PATH = os.getenv("ORDER_JOURNAL_PATH", os.path.join(".state", "orders.db"))
+# Writes are grouped into one transaction (one WAL fsync) per flush window
+JOURNAL_FLUSH_MS = float(os.getenv("ORDER_JOURNAL_FLUSH_MS", "5"))
+MAX_BATCH = 1000
+
+# Order states that still need watching after a restart
+OPEN_STATUSES = {"NEW", "PARTIALLY_FILLED"}
+# Intent journaled, outcome unknown (crash between write and ack)
+STATUS_INTENT = "INTENT"
+# Intent that reconciliation proved never reached the exchange
+STATUS_LOST = "LOST"
+# Intent whose lookup failed during reconciliation: it may be live, so it is never resent.
+# Not journaled, so the next reconciliation looks it up again
+STATUS_UNKNOWN = "UNKNOWN"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS events (
+    seq INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    strategy_id TEXT NOT NULL,
+    kind TEXT NOT NULL,
+    client_order_id TEXT,
+    symbol TEXT,
+    data TEXT
+);
+CREATE INDEX IF NOT EXISTS events_strategy ON events (strategy_id, seq);
+CREATE INDEX IF NOT EXISTS events_kind ON events (kind, strategy_id);
+"""
+
+
+class JournaledOrder:
+    """Last known state of one order, folded from its journal events."""
+
+    __slots__ = ("client_order_id", "symbol", "tag", "params", "order_id", "status", "executed_qty", "avg_price")
+
+    def __init__(self, client_order_id: str, symbol: str, tag: str, params: dict):
+        self.client_order_id = client_order_id
+        self.symbol = symbol
+        self.tag = tag
+        self.params = params
+        self.order_id = None
+        self.status = STATUS_INTENT
+        self.executed_qty = 0.0
+        self.avg_price = 0.0
+
+    @property
+    def is_open(self) -> bool:
+        return self.status in OPEN_STATUSES
+
+    @property
+    def placed(self) -> bool:
+        """True if the exchange accepted the order (whatever happened to it since)."""
+        return self.status not in (STATUS_INTENT, STATUS_LOST, STATUS_UNKNOWN, "REJECTED")
+
+    @property
+    def unknown(self) -> bool:
+        """True if reconciliation could not tell whether the order reached the exchange."""
+        return self.status == STATUS_UNKNOWN
+
+    def __repr__(self):
+        return f"JournaledOrder({self.client_order_id} {self.tag} {self.status} id={self.order_id})"
+
+
+class StrategyRecord:
+    """An unfinished strategy run rebuilt from the journal."""
+
+    def __init__(self, strategy_id: str, kind: str, params: dict):
+        self.strategy_id = strategy_id
+        self.kind = kind
+        self.params = params
+        self.orders: Dict[str, JournaledOrder] = {}
+        self.progress: dict = {}
+
+    def orders_by_tag(self) -> Dict[str, JournaledOrder]:
+        return {order.tag: order for order in self.orders.values()}
+
+    def __repr__(self):
+        return f"StrategyRecord({self.strategy_id} {self.kind} orders={len(self.orders)})"
+
+
+def _apply(record: StrategyRecord, kind: str, client_order_id: Optional[str], symbol: Optional[str], data: dict):
+    if kind == "intent":
+        record.orders[client_order_id] = JournaledOrder(client_order_id, symbol, data.get('tag'), data.get('params', {}))
+        return
+    if kind == "progress":
+        record.progress.update(data)
+        return
+
+    order = record.orders.get(client_order_id)
+    if order is None:
+        return
+    if kind in ("ack", "update"):
+        order.order_id = data.get('order_id', order.order_id)
+        order.status = data.get('status', order.status)
+        order.executed_qty = float(data.get('executed_qty', order.executed_qty))
+        order.avg_price = float(data.get('avg_price', order.avg_price))
+    elif kind == "reject":
+        order.status = "REJECTED"
+    elif kind == "lost":
+        order.status = STATUS_LOST
+
+
+class OrderJournal:
+    """
+    Append-only SQLite (WAL) log of strategy starts, order intents, acks,
+    fills, cancels and completions, keyed by clientOrderId.
+
+    Callers never wait for disk: events go onto a queue and a writer thread
+    commits everything that arrived within JOURNAL_FLUSH_MS as one transaction,
+    so many orders share one fsync. flush() blocks until all earlier events
+    are durable.
+    """
+
+    def __init__(self, path: str = JOURNAL_PATH, flush_ms: float = JOURNAL_FLUSH_MS):
+        self.path = path
+        self.flush_interval = flush_ms / 1000
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._known: Dict[str, str] = {}
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._ready = threading.Event()
+        self._writer = threading.Thread(target=self._write_loop, name="order-journal", daemon=True)
+        self._writer.start()
+        self._ready.wait()
+
+    # -- recording -----------------------------------------------------------
+
+    def start_strategy(self, kind: str, params: dict) -> str:
+        """Journals the start of a strategy run and returns its id (also the clientOrderId prefix)."""
+        strategy_id = f"{kind}-{uuid.uuid4().hex[:8]}"
+        self._append(strategy_id, "start", data={'kind': kind, 'params': params})
+        return strategy_id
+
+    @staticmethod
+    def client_order_id(strategy_id: str, tag: str) -> str:
+        """Deterministic clientOrderId for one order of a strategy (max 36 chars on Binance)."""
+        client_order_id = f"{strategy_id}-{tag}"
+        if len(client_order_id) > 36:
+            raise ValueError(f"clientOrderId too long: {client_order_id}")
+        return client_order_id
+
+    def intent(self, strategy_id: str, tag: str, params: dict) -> str:
+        """Journals an order about to be sent; returns the clientOrderId to send it with."""
+        client_order_id = self.client_order_id(strategy_id, tag)
+        self._known[client_order_id] = strategy_id
+        self._append(strategy_id, "intent", client_order_id, params.get('symbol'), {'tag': tag, 'params': params})
+        return client_order_id
+
+    def ack(self, client_order_id: str, response: dict):
+        self._append(self._strategy_of(client_order_id), "ack", client_order_id, response.get('symbol'), {
+            'order_id': response.get('orderId'),
+            'status': response.get('status'),
+            'executed_qty': response.get('executedQty', 0),
+            'avg_price': response.get('avgPrice', 0),
+        })
+
+    def update(self, client_order_id: str, order_id, status: str, executed_qty=0, avg_price=0, symbol: str = None):
+        """Journals a fill, cancel or expiry reported by the exchange."""
+        self._append(self._strategy_of(client_order_id), "update", client_order_id, symbol, {
+            'order_id': order_id, 'status': status, 'executed_qty': executed_qty, 'avg_price': avg_price,
+        })
+
+    def reject(self, client_order_id: str, code, msg: str):
+        self._append(self._strategy_of(client_order_id), "reject", client_order_id, data={'code': code, 'msg': msg})
+
+    def lost(self, client_order_id: str):
+        self._append(self._strategy_of(client_order_id), "lost", client_order_id)
+
+    def progress(self, strategy_id: str, **fields):
+        self._append(strategy_id, "progress", data=fields)
+
+    def finish(self, strategy_id: str):
+        self._append(strategy_id, "done")
+        for client_order_id in [c for c, s in list(self._known.items()) if s == strategy_id]:
+            self._known.pop(client_order_id, None)
+
+    def track_stream(self, stream):
+        """Journals ORDER_TRADE_UPDATE events for every order this journal has seen an intent for."""
+        stream.subscribe('ORDER_TRADE_UPDATE', self._on_order_update)
+
+    def untrack_stream(self, stream):
+        stream.unsubscribe('ORDER_TRADE_UPDATE', self._on_order_update)
+
+    def _on_order_update(self, update: OrderUpdate):
+        if update.client_order_id in self._known and update.status != "NEW":
+            self.update(update.client_order_id, update.order_id, update.status, update.filled_qty, update.avg_price,
+                        update.symbol)
+
+    def _strategy_of(self, client_order_id: str) -> str:
+        strategy_id = self._known.get(client_order_id)
+        if strategy_id is None:
+            # Ids are <strategy_id>-<tag>, strategy ids are <kind>-<hex>
+            strategy_id = client_order_id.rsplit("-", 1)[0]
+        return strategy_id
+
+    def _append(self, strategy_id: str, kind: str, client_order_id: str = None, symbol: str = None, data=None):
+        self._queue.put((time.time(), strategy_id, kind, client_order_id, symbol,
+                         json.dumps(data, default=str) if data is not None else None))
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Blocks until every event appended so far is committed."""
+        done = threading.Event()
+        self._queue.put(done)
+        return done.wait(timeout)
+
+    def close(self):
+        self.flush()
+        self._queue.put(None)
+        self._writer.join()
+
+    # -- writer thread -------------------------------------------------------
+
+    def _write_loop(self):
+        conn = sqlite3.connect(self.path)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=FULL")
+        conn.executescript(SCHEMA)
+        self._ready.set()
+
+        stopping = False
+        while not stopping:
+            batch, waiters = [], []
+            item = self._queue.get()
+            deadline = time.monotonic() + self.flush_interval
+            while True:
+                if item is None:
+                    stopping = True
+                elif isinstance(item, threading.Event):
+                    # Someone is waiting on durability: commit now
+                    waiters.append(item)
+                    break
+                else:
+                    batch.append(item)
+                if stopping or len(batch) >= MAX_BATCH:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+
+            if batch:
+                try:
+                    with conn:
+                        conn.executemany(
+                            "INSERT INTO events (ts, strategy_id, kind, client_order_id, symbol, data) "
+                            "VALUES (?, ?, ?, ?, ?, ?)", batch)
+                except sqlite3.Error as e:
+                    logger.error("Journal write failed (%s events lost): %s", len(batch), e)
+            for waiter in waiters:
+                waiter.set()
+        conn.close()
+
+    # -- recovery ------------------------------------------------------------
+
+    def load_unfinished(self) -> Dict[str, StrategyRecord]:
+        """Rebuilds every strategy run that has no 'done' event, in start order."""
+        conn = sqlite3.connect(self.path)
+        try:
+            rows = conn.execute(
+                "SELECT strategy_id, kind, client_order_id, symbol, data FROM events WHERE strategy_id IN ("
+                " SELECT strategy_id FROM events WHERE kind = 'start'"
+                " EXCEPT SELECT strategy_id FROM events WHERE kind = 'done'"
+                ") ORDER BY seq").fetchall()
+        finally:
+            conn.close()
+
+        records: Dict[str, StrategyRecord] = {}
+        for strategy_id, kind, client_order_id, symbol, data in rows:
+            payload = json.loads(data) if data else {}
+            if kind == "start":
+                records[strategy_id] = StrategyRecord(strategy_id, payload['kind'], payload['params'])
+                continue
+            record = records.get(strategy_id)
+            if record is not None:
+                _apply(record, kind, client_order_id, symbol, payload)
+
+        for record in records.values():
+            for client_order_id in record.orders:
+                self._known[client_order_id] = record.strategy_id
+        return records
+
+    def reconcile(self, client, records: Dict[str, StrategyRecord]) -> Dict[str, StrategyRecord]:
+        """
+        Brings rebuilt records up to date with the exchange.
+
+        One open-orders query covers every order that is still live; only
+        orders the journal thinks are open (or never saw acked) but that are no
+        longer open are looked up individually by clientOrderId. An unacked
+        order whose lookup fails is marked STATUS_UNKNOWN: it may have
+        executed, so resumed runs hold its quantity back instead of resending it.
+        """
+        pending = [order for record in records.values() for order in record.orders.values()
+                   if order.is_open or order.status == STATUS_INTENT]
+        if not pending:
+            return records
+
+        open_orders = {o['clientOrderId']: o for o in client.get_orders()}
+
+        for order in pending:
+            live = open_orders.get(order.client_order_id)
+            if live is None:
+                try:
+                    live = client.query_order(symbol=order.symbol, origClientOrderId=order.client_order_id)
+                except ClientError as e:
+                    if e.error_code == -2013:
+                        # Order does not exist: the crash happened before it reached the exchange
+                        order.status = STATUS_LOST
+                        self.lost(order.client_order_id)
+                        continue
+                    self._unresolved(order, e.error_message)
+                    continue
+                except Exception as e:
+                    self._unresolved(order, e)
+                    continue
+
+            order.order_id = live.get('orderId')
+            order.status = live.get('status')
+            order.executed_qty = float(live.get('executedQty', 0))
+            order.avg_price = float(live.get('avgPrice', 0))
+            self.update(order.client_order_id, order.order_id, order.status, order.executed_qty, order.avg_price,
+                        order.symbol)
+
+        return records
+
+    @staticmethod
+    def _unresolved(order: JournaledOrder, error):
+        logger.error("Could not reconcile %s: %s", order.client_order_id, error)
+        if order.status == STATUS_INTENT:
+            order.status = STATUS_UNKNOWN
+
+
+_journal: Optional[OrderJournal] = None
+_lock = threading.Lock()
+
+
+def get_journal() -> Optional[OrderJournal]:
+    """Returns the process-wide order journal, or None if ORDER_JOURNAL_PATH is empty."""
+    global _journal
+    if not JOURNAL_PATH:
+        return None
+    if _journal is None:
+        with _lock:
+            if _journal is None:
+                _journal = OrderJournal()
+                atexit.register(close_journal)
+    return _journal
+
+
+def close_journal():
+    global _journal
+    with _lock:
+        if _journal is not None:
+            _journal.close()
+            _journal = None
@@ -0,0 +1,336 @@
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterable, Optional, Set
+
+from binance.error import ClientError
+
+from utils.config import get_client, setup_logger
+from utils.account_state import get_account_state, OPEN_STATUSES
+from utils.events import AccountUpdate, OrderUpdate
+from utils.execution_store import get_execution_store
+from utils.metrics import get_metrics
+from utils.rate_limiter import request_priority, PRIORITY_CANCEL
+
+logger = setup_logger("kill_switch")
+
+# Longest the kill switch waits for the user stream to confirm every symbol flat, in seconds
+KILL_SWITCH_TIMEOUT = float(os.getenv("KILL_SWITCH_TIMEOUT", "10"))
+# Symbols flattened at once
+KILL_SWITCH_CONCURRENCY = int(os.getenv("KILL_SWITCH_CONCURRENCY", "8"))
+# Exchange-side countdownCancelAll window in ms; 0 disables the dead-man timer
+DEAD_MAN_COUNTDOWN_MS = int(os.getenv("DEAD_MAN_COUNTDOWN_MS", "120000"))
+# Seconds between heartbeats that re-arm it (Binance suggests a quarter of the countdown)
+DEAD_MAN_HEARTBEAT_SECONDS = float(os.getenv("DEAD_MAN_HEARTBEAT_SECONDS", "30"))
+
+# -2022: ReduceOnly order rejected, i.e. the position is already closed
+REDUCE_ONLY_REJECTED = -2022
+
+
+class _Target:
+    """One symbol being flattened: the orders and position the user stream has yet to see closed."""
+
+    __slots__ = ("symbol", "open_orders", "amount", "flat_at", "result")
+
+    def __init__(self, symbol: str, open_orders: Set[int], amount: float):
+        self.symbol = symbol
+        self.open_orders = open_orders
+        self.amount = amount
+        self.flat_at: Optional[float] = None
+        self.result: dict = {}
+
+    @property
+    def flat(self) -> bool:
+        return not self.open_orders and self.amount == 0
+
+
+class KillSwitch:
+    """
+    Takes the account flat as fast as the exchange allows.
+
+    Every symbol with open orders or a position gets its own worker, which
+    cancels the symbol's orders with one DELETE allOpenOrders and then closes
+    the position with a reduce-only MARKET order; symbols run in parallel.
+    A symbol counts as flat once the user stream has reported each of its
+    orders closed and its position at zero. trigger() waits at most `timeout`
+    for that, re-checks symbols still open over REST, and returns a report
+    with the time from trigger to flat.
+
+    Strategies that could place new orders (scheduler parents, OCO pairs)
+    must be stopped first; the journal runs on the flattened symbols are
+    marked finished so recover.py does not bring them back.
+    """
+
+    def __init__(self, client=None, account_state=None, journal=None, timeout: float = KILL_SWITCH_TIMEOUT,
+                 concurrency: int = KILL_SWITCH_CONCURRENCY):
+        self.client = client or get_client()
+        self.account_state = account_state
+        self.journal = journal
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.store = get_execution_store()
+        self.metrics = get_metrics()
+        self._targets: Dict[str, _Target] = {}
+        self._lock = threading.Lock()
+        self._flat = threading.Event()
+        self._started = 0.0
+        self._close_positions = True
+
+    def trigger(self, symbols: Optional[Iterable[str]] = None, close_positions: bool = True) -> dict:
+        """
+        Cancels all open orders and, unless close_positions is False, closes
+        all positions, on `symbols` or on every symbol that has either.
+
+        Returns:
+            {'flat': bool, 'seconds': trigger to flat (or to giving up),
+             'symbols': {symbol: {'flat', 'seconds', 'cancelled', 'closed_qty', 'order_id', 'error', ...}}}
+        """
+        self._started = time.perf_counter()
+        self._close_positions = close_positions
+        account = self.account_state or get_account_state()
+        # Subscribed before the targets are read, so no close is missed in between
+        account.stream.subscribe('ORDER_TRADE_UPDATE', self._on_event)
+        account.stream.subscribe('ACCOUNT_UPDATE', self._on_event)
+        try:
+            with self._lock:
+                wanted = {s.upper() for s in symbols} if symbols else (
+                    {s for s, orders in list(account.orders.items()) if orders} |
+                    {s for s, p in list(account.positions.items()) if p.amount})
+                self._targets = {
+                    symbol: _Target(symbol, set(account.orders.get(symbol, ())),
+                                    account.position_amount(symbol) if close_positions else 0.0)
+                    for symbol in wanted}
+                self._flat.clear()
+                for target in self._targets.values():
+                    self._check(target)
+            if not self._targets:
+                logger.info("Kill switch: no open orders or positions.")
+                return {'flat': True, 'seconds': 0.0, 'symbols': {}}
+
+            logger.warning("Kill switch triggered for %s", ", ".join(sorted(self._targets)))
+            with ThreadPoolExecutor(max_workers=max(1, min(self.concurrency, len(self._targets)))) as pool:
+                list(pool.map(lambda t: self._flatten(t, close_positions), list(self._targets.values())))
+            self._flat.wait(max(self.timeout - (time.perf_counter() - self._started), 0))
+        finally:
+            account.stream.unsubscribe('ORDER_TRADE_UPDATE', self._on_event)
+            account.stream.unsubscribe('ACCOUNT_UPDATE', self._on_event)
+
+        for target in self._targets.values():
+            if target.flat_at is None:
+                self._recheck(target, account, close_positions)
+        return self._report()
+
+    # -- per symbol ----------------------------------------------------------
+
+    def _flatten(self, target: _Target, close_positions: bool):
+        symbol = target.symbol
+        try:
+            with request_priority(PRIORITY_CANCEL):
+                self.client.cancel_open_orders(symbol=symbol)
+            target.result['cancelled'] = True
+        except ClientError as e:
+            target.result.update(cancelled=False, error=e.error_message)
+            logger.error("Kill switch could not cancel %s orders: %s", symbol, e.error_message,
+                         extra={'symbol': symbol, 'error_code': e.error_code})
+        except Exception as e:
+            target.result.update(cancelled=False, error=str(e))
+            logger.error("Kill switch could not cancel %s orders: %s", symbol, e, extra={'symbol': symbol})
+
+        amount = target.amount
+        if close_positions and amount:
+            self._close(target, amount)
+
+    def _close(self, target: _Target, amount: float):
+        symbol = target.symbol
+        start = time.perf_counter()
+        try:
+            with request_priority(PRIORITY_CANCEL):
+                response = self.client.new_order(symbol=symbol, side="SELL" if amount > 0 else "BUY", type="MARKET",
+                                                 quantity=abs(amount), reduceOnly="true", newOrderRespType="RESULT")
+        except ClientError as e:
+            if e.error_code != REDUCE_ONLY_REJECTED:
+                target.result['error'] = e.error_message
+                logger.error("Kill switch could not close %s %s: %s", amount, symbol, e.error_message,
+                             extra={'symbol': symbol, 'error_code': e.error_code})
+            return
+        except Exception as e:
+            target.result['error'] = str(e)
+            logger.error("Kill switch could not close %s %s: %s", amount, symbol, e, extra={'symbol': symbol})
+            return
+
+        target.result.update(order_id=response.get('orderId'), closed_qty=float(response.get('executedQty') or 0),
+                             avg_price=float(response.get('avgPrice') or 0) or None)
+        logger.info("Kill switch closed %s %s. Order ID: %s | AvgPrice: %s", amount, symbol,
+                    response.get('orderId'), response.get('avgPrice'),
+                    extra={'order_id': response.get('orderId'), 'symbol': symbol})
+        if self.store:
+            self.store.record_response(response, latency_ms=(time.perf_counter() - start) * 1000, strategy="kill")
+
+    def _recheck(self, target: _Target, account, close_positions: bool, retry: bool = True):
+        """
+        The stream did not confirm the symbol in time: asks REST whether it is
+        flat after all, and closes a position that is still open once more
+        with the refreshed amount.
+        """
+        try:
+            amount = account.refresh_position(target.symbol).amount if close_positions else 0.0
+            open_orders = self.client.get_orders(symbol=target.symbol)
+        except ClientError as e:
+            logger.error("Kill switch could not re-check %s: %s", target.symbol, e.error_message,
+                         extra={'symbol': target.symbol, 'error_code': e.error_code})
+            return
+        except Exception as e:
+            logger.error("Kill switch could not re-check %s: %s", target.symbol, e, extra={'symbol': target.symbol})
+            return
+        with self._lock:
+            target.amount = amount
+            target.open_orders = {o['orderId'] for o in open_orders}
+            self._check(target)
+        if target.flat_at is not None:
+            return
+        if retry and amount:
+            logger.warning("Kill switch: %s still has a %s position; closing it again", target.symbol, amount,
+                           extra={'symbol': target.symbol})
+            target.result.pop('error', None)
+            self._close(target, amount)
+            self._recheck(target, account, close_positions, retry=False)
+            return
+        logger.error("Kill switch: %s is NOT flat (position %s, %s open order(s))", target.symbol, amount,
+                     len(open_orders), extra={'symbol': target.symbol})
+
+    # -- confirmation --------------------------------------------------------
+
+    def _on_event(self, event):
+        with self._lock:
+            if isinstance(event, OrderUpdate):
+                target = self._targets.get(event.symbol)
+                if target is None:
+                    return
+                if event.status in OPEN_STATUSES:
+                    target.open_orders.add(event.order_id)
+                else:
+                    target.open_orders.discard(event.order_id)
+                self._check(target)
+            elif isinstance(event, AccountUpdate):
+                for position in event.positions:
+                    target = self._targets.get(position['s'])
+                    if target is not None and self._close_positions and position.get('ps', "BOTH") == "BOTH":
+                        target.amount = float(position['pa'])
+                        self._check(target)
+
+    def _check(self, target: _Target):
+        """Caller holds the lock."""
+        if target.flat and target.flat_at is None:
+            target.flat_at = time.perf_counter()
+            if all(t.flat_at is not None for t in self._targets.values()):
+                self._flat.set()
+
+    def _report(self) -> dict:
+        symbols = {}
+        for symbol, target in sorted(self._targets.items()):
+            seconds = target.flat_at - self._started if target.flat_at is not None else None
+            symbols[symbol] = {'flat': target.flat_at is not None,
+                               'seconds': round(seconds, 4) if seconds is not None else None, **target.result}
+            if target.flat_at is None:
+                symbols[symbol].update(position=target.amount, open_orders=len(target.open_orders))
+
+        flat = all(s['flat'] for s in symbols.values())
+        if flat:
+            seconds = max(t.flat_at for t in self._targets.values()) - self._started
+            self.metrics.observe('kill_switch_flat_seconds', seconds)
+            logger.warning("Kill switch: %s symbol(s) flat in %.1f ms", len(symbols), seconds * 1000)
+        else:
+            seconds = time.perf_counter() - self._started
+        if self.journal:
+            self._finish_runs(set(symbols))
+        return {'flat': flat, 'seconds': round(seconds, 4), 'symbols': symbols}
+
+    def _finish_runs(self, symbols: Set[str]):
+        """Marks the journal runs on flattened symbols finished, so recover.py does not resume them."""
+        for record in self.journal.load_unfinished().values():
+            if str(record.params.get('symbol', "")).upper() in symbols:
+                self.journal.finish(record.strategy_id)
+                logger.info("Kill switch ended %s (%s)", record.strategy_id, record.kind)
+
+
+class DeadManSwitch:
+    """
+    Keeps Binance's countdownCancelAll timer armed on every symbol the bot
+    trades. A heartbeat thread re-arms each symbol every `interval` seconds;
+    if the process dies or hangs, the exchange cancels that symbol's open
+    orders (positions stay as they are) once `countdown_ms` passes without one.
+
+    `healthy`, if given, is asked before every heartbeat: a process whose
+    own loop is stuck stops re-arming even though this thread still runs.
+    stop() disarms the timers, for shutdowns that leave orders resting on
+    purpose (recover.py continues them).
+    """
+
+    def __init__(self, client=None, countdown_ms: int = DEAD_MAN_COUNTDOWN_MS,
+                 interval: float = DEAD_MAN_HEARTBEAT_SECONDS, healthy: Optional[Callable[[], bool]] = None):
+        self.client = client or get_client()
+        self.countdown_ms = countdown_ms
+        self.interval = interval
+        self.healthy = healthy
+        self.symbols: Set[str] = set()
+        self.last_beat: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+        self.metrics = get_metrics()
+
+    @property
+    def enabled(self) -> bool:
+        return self.countdown_ms > 0
+
+    def start(self):
+        if not self.enabled or self._thread is not None:
+            return
+        self._stopped.clear()
+        self._thread = threading.Thread(target=self._loop, name="dead-man", daemon=True)
+        self._thread.start()
+        logger.info("Dead-man timer: %s ms countdown, heartbeat every %s s", self.countdown_ms, self.interval)
+
+    def stop(self, disarm: bool = True):
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if disarm and self.enabled:
+            for symbol in sorted(self.symbols):
+                self._beat(symbol, 0)
+
+    def arm(self, symbol: str):
+        """Adds a symbol; the first call for it sends a heartbeat straight away."""
+        symbol = symbol.upper()
+        with self._lock:
+            if not self.enabled or symbol in self.symbols:
+                return
+            self.symbols.add(symbol)
+        self._beat(symbol)
+
+    def beat(self):
+        if self.healthy is not None and not self.healthy():
+            logger.error("Dead-man heartbeat skipped: process unhealthy; open orders are cancelled in %s ms "
+                         "unless it recovers", self.countdown_ms)
+            return
+        for symbol in sorted(self.symbols):
+            self._beat(symbol)
+
+    def _loop(self):
+        while not self._stopped.wait(self.interval):
+            self.beat()
+
+    def _beat(self, symbol: str, countdown_ms: Optional[int] = None):
+        try:
+            self.client.countdown_cancel_order(symbol=symbol, countdownTime=self.countdown_ms
+                                               if countdown_ms is None else countdown_ms)
+            self.last_beat[symbol] = time.time()
+        except ClientError as e:
+            self.metrics.inc('dead_man_heartbeat_failures_total', symbol=symbol)
+            logger.error("Dead-man heartbeat failed for %s: %s", symbol, e.error_message,
+                         extra={'symbol': symbol, 'error_code': e.error_code})
+        except Exception as e:
+            self.metrics.inc('dead_man_heartbeat_failures_total', symbol=symbol)
+            logger.error("Dead-man heartbeat failed for %s: %s", symbol, e, extra={'symbol': symbol})
@@ -0,0 +1,158 @@
+import json
+import logging
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+LOG_FILE = os.getenv("LOG_FILE", "bot.log")
+# Rotate when the file reaches LOG_MAX_BYTES or is older than LOG_ROTATE_HOURS, whichever comes first
+LOG_MAX_BYTES = int(os.getenv("LOG_MAX_BYTES", str(50 * 1024 * 1024)))
+LOG_ROTATE_HOURS = float(os.getenv("LOG_ROTATE_HOURS", "24"))
+LOG_BACKUP_COUNT = int(os.getenv("LOG_BACKUP_COUNT", "10"))
+LOG_CONSOLE_LEVEL = os.getenv("LOG_CONSOLE_LEVEL", "INFO").upper()
+
+CONSOLE_FORMAT = '%(asctime)s - %(levelname)s - [%(filename)s:%(lineno)d] - %(message)s'
+
+# Attributes every LogRecord has; anything else on a record came from `extra=`
+_RESERVED = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime", "taskName"}
+
+
+class JsonLinesFormatter(logging.Formatter):
+    """
+    One JSON object per line: ts, level, logger, src, msg, plus every field
+    passed through `extra=` (order_id, symbol, latency_ms, ...).
+    """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec="microseconds"),
+            'level': record.levelname,
+            'logger': record.name,
+            'src': f"{record.filename}:{record.lineno}",
+            'msg': record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RESERVED and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_info and not record.exc_text:
+            record.exc_text = self.formatException(record.exc_info)
+        if record.exc_text:
+            entry['exc'] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class RotatingLogFileHandler(logging.FileHandler):
+    """
+    File handler that rotates on size or age. Rotated files are named
+    <file>.<YYYYmmdd-HHMMSS>[.n] and only the newest `backup_count` are kept.
+    """
+
+    def __init__(self, filename: str, max_bytes: int = LOG_MAX_BYTES, rotate_hours: float = LOG_ROTATE_HOURS,
+                 backup_count: int = LOG_BACKUP_COUNT):
+        super().__init__(filename, encoding="utf-8")
+        self.max_bytes = max_bytes
+        self.interval = rotate_hours * 3600
+        self.backup_count = backup_count
+        self.rollover_at = time.time() + self.interval if self.interval else float("inf")
+
+    def emit(self, record: logging.LogRecord):
+        try:
+            if self._should_rollover():
+                self._rollover()
+        except OSError:
+            self.handleError(record)
+        super().emit(record)
+
+    def _should_rollover(self) -> bool:
+        if time.time() >= self.rollover_at:
+            return True
+        return bool(self.max_bytes and self.stream and self.stream.tell() >= self.max_bytes)
+
+    def _rollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        if os.path.exists(self.baseFilename) and os.path.getsize(self.baseFilename):
+            target = f"{self.baseFilename}.{time.strftime('%Y%m%d-%H%M%S')}"
+            candidate, n = target, 1
+            while os.path.exists(candidate):
+                candidate = f"{target}.{n}"
+                n += 1
+            os.replace(self.baseFilename, candidate)
+            self._prune()
+
+        self.stream = self._open()
+        self.rollover_at = time.time() + self.interval if self.interval else float("inf")
+
+    def _prune(self):
+        if self.backup_count <= 0:
+            return
+        directory, base = os.path.split(self.baseFilename)
+        backups = sorted(
+            (os.path.join(directory, name) for name in os.listdir(directory or ".") if name.startswith(base + ".")),
+            key=os.path.getmtime,
+        )
+        for path in backups[:-self.backup_count]:
+            os.remove(path)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler that hands the record over unformatted.
+
+    The stock handler renders the message on the calling thread; here %-args
+    are only interpolated on the listener thread, so a debug line that is
+    never written costs the caller a record allocation and a queue put.
+    Arguments are captured by reference - do not mutate them after logging.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+_queue_handler: Optional[DeferredQueueHandler] = None
+_listener: Optional[QueueListener] = None
+_lock = threading.Lock()
+
+
+def get_queue_handler() -> DeferredQueueHandler:
+    """
+    Returns the process-wide queue handler, starting the background listener
+    (JSON-lines file at DEBUG + human-readable console) on first use.
+    """
+    global _queue_handler, _listener
+    with _lock:
+        if _queue_handler is not None:
+            return _queue_handler
+
+        log_queue = queue.SimpleQueue()
+
+        file_handler = RotatingLogFileHandler(LOG_FILE)
+        file_handler.setLevel(logging.DEBUG)
+        file_handler.setFormatter(JsonLinesFormatter())
+
+        console_handler = logging.StreamHandler(sys.stderr)
+        console_handler.setLevel(LOG_CONSOLE_LEVEL)
+        console_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+
+        _listener = QueueListener(log_queue, file_handler, console_handler, respect_handler_level=True)
+        _listener.start()
+        _queue_handler = DeferredQueueHandler(log_queue)
+        return _queue_handler
+
+
+def stop_logging():
+    """Drains the queue and closes the log file."""
+    global _listener
+    with _lock:
+        if _listener is not None:
+            _listener.stop()
+            for handler in _listener.handlers:
+                handler.close()
+            _listener = None
@@ -0,0 +1,163 @@
+import itertools
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from binance.websocket.um_futures.websocket_client import UMFuturesWebsocketClient
+
+from utils.config import setup_logger, STREAM_URL
+from utils.metrics import get_metrics
+from utils.events import loads, RECORDS
+
+logger = setup_logger("market_stream")
+
+RECONNECT_DELAY = 1.0
+
+
+class MarketStream:
+    """
+    One public market-data websocket shared by every consumer in the process.
+
+    Handlers subscribe by stream name ('btcusdt@aggTrade', 'btcusdt@depth@100ms',
+    ...) and are called on the websocket thread with the event's record from
+    utils.events. The socket subscribes on first use and re-subscribes
+    everything after a drop.
+    """
+
+    def __init__(self, stream_url: str = STREAM_URL):
+        self.stream_url = stream_url
+        self.ws_client = None
+        # Replaced, never mutated, so the websocket thread iterates them without a lock
+        self._handlers: Dict[str, Tuple[Callable, ...]] = {}
+        # (event type, symbol) -> (stream name, lag histogram)
+        self._routes: Dict[Tuple[str, str], tuple] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._ids = itertools.count(1)
+        self.metrics = get_metrics()
+
+    def subscribe(self, stream: str, handler: Callable):
+        """Registers a handler and subscribes the socket to the stream if nobody was listening yet."""
+        with self._lock:
+            first = not self._handlers.get(stream)
+            self._handlers[stream] = self._handlers.get(stream, ()) + (handler,)
+            if self.ws_client is None:
+                self._stopped.clear()
+                self._connect()
+            elif first:
+                self.ws_client.subscribe(stream, id=next(self._ids))
+
+    def unsubscribe(self, stream: str, handler: Callable):
+        with self._lock:
+            handlers = list(self._handlers.get(stream, ()))
+            if handler in handlers:
+                handlers.remove(handler)
+                self._handlers[stream] = tuple(handlers)
+            if not handlers:
+                self._handlers.pop(stream, None)
+                if self.ws_client is not None:
+                    self.ws_client.unsubscribe(stream, id=next(self._ids))
+
+    def stop(self):
+        self._stopped.set()
+        with self._lock:
+            if self.ws_client is None:
+                return
+            self.ws_client.stop()
+            self.ws_client = None
+        logger.info("Market stream stopped.")
+
+    def _connect(self):
+        logger.info("Connecting to market stream...")
+        self.ws_client = UMFuturesWebsocketClient(
+            stream_url=self.stream_url,
+            on_message=self._on_message,
+            on_close=self._on_disconnect,
+            on_error=self._on_disconnect,
+        )
+        streams = list(self._handlers)
+        if streams:
+            self.ws_client.subscribe(streams, id=next(self._ids))
+
+    def _on_disconnect(self, socket_manager, *args):
+        current = self.ws_client.socket_manager if self.ws_client else None
+        if socket_manager is not current or self._stopped.is_set():
+            return
+        logger.error("Market stream disconnected: %s", args[0] if args else 'closed')
+        threading.Thread(target=self._reconnect, daemon=True).start()
+
+    def _reconnect(self):
+        time.sleep(RECONNECT_DELAY)
+        with self._lock:
+            if self._stopped.is_set():
+                return
+            logger.warning("Re-opening market stream...")
+            old_client, self.ws_client = self.ws_client, None
+            if old_client:
+                threading.Thread(target=old_client.stop, daemon=True).start()
+            self._connect()
+
+    def _on_message(self, _, message):
+        received = time.time()
+        try:
+            data = loads(message) if isinstance(message, (str, bytes)) else message
+        except ValueError as e:
+            self.metrics.inc('ws_bad_events_total', event="unparsed")
+            logger.error("WS Parse Error: %s", e)
+            return
+        try:
+            self._dispatch(data, received)
+        except Exception as e:
+            # A malformed or unexpected event must not reach the socket manager, whose error path reconnects
+            event_type = data.get('e') if isinstance(data, dict) else None
+            self.metrics.inc('ws_bad_events_total', event=event_type)
+            logger.error("Could not dispatch %s event: %r", event_type, e)
+
+    def _dispatch(self, data: dict, received: float):
+        event_type = data.get('e')
+        if event_type is None:
+            # Subscription acks
+            return
+        route_key = (event_type, data.get('s', ''))
+        route = self._routes.get(route_key)
+        if route is None:
+            route = self._routes[route_key] = (_stream_name(data),
+                                               self.metrics.histogram('ws_event_lag_seconds', event=event_type))
+        stream, lag = route
+        handlers = self._handlers.get(stream)
+        if not handlers:
+            return
+        if 'E' in data:
+            lag(max(received - data['E'] / 1000, 0.0))
+
+        record = RECORDS.get(event_type)
+        event = record(data) if record is not None else data
+        for handler in handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error("Handler error for %s: %s", stream, e)
+
+
+def _stream_name(data: dict) -> Optional[str]:
+    """Maps an event back to the stream it was subscribed under (raw streams carry no stream name)."""
+    symbol = data.get('s', '').lower()
+    event_type = data['e']
+    if event_type == 'aggTrade':
+        return f"{symbol}@aggTrade"
+    if event_type == 'depthUpdate':
+        return f"{symbol}@depth@100ms"
+    return f"{symbol}@{event_type}"
+
+
+_market_stream: Optional[MarketStream] = None
+_market_stream_lock = threading.Lock()
+
+
+def get_market_stream() -> MarketStream:
+    """Returns the shared market stream; it connects on the first subscribe()."""
+    global _market_stream
+    with _market_stream_lock:
+        if _market_stream is None:
+            _market_stream = MarketStream()
+        return _market_stream
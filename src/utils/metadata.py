@@ -0,0 +1,189 @@
+import json
+import os
+import threading
+import time
+from typing import Dict, Optional
+
+from utils.config import setup_logger
+
+logger = setup_logger("metadata")
+
+# Bump whenever the shape of a cached symbol entry changes so older cache
+# files are ignored instead of being read with missing fields.
+CACHE_VERSION = 2
+CACHE_PATH = os.getenv("SYMBOL_CACHE_PATH", os.path.join(".cache", "exchange_info.json"))
+CACHE_TTL_SECONDS = int(os.getenv("SYMBOL_CACHE_TTL", "21600"))
+
+
+class MetadataUnavailableError(ValueError):
+    """Raised when no fresh symbol metadata is available and it cannot be fetched."""
+
+
+def _parse_symbol(sym_info: dict) -> dict:
+    """Extracts the fields the order paths need from one exchange_info symbol entry."""
+    filters = {f['filterType']: f for f in sym_info.get('filters', [])}
+    min_notional = filters.get('MIN_NOTIONAL', {})
+
+    return {
+        'price_precision': sym_info['pricePrecision'],
+        'quantity_precision': sym_info['quantityPrecision'],
+        'tick_size': filters.get('PRICE_FILTER', {}).get('tickSize'),
+        'step_size': filters.get('LOT_SIZE', {}).get('stepSize'),
+        'min_notional': min_notional.get('notional', min_notional.get('minNotional')),
+        # Raw filters by type, compiled into pre-trade rules by utils.rules
+        'filters': filters,
+    }
+
+
+class SymbolMetadataStore:
+    """
+    Process-wide index of symbol metadata backed by a versioned on-disk cache.
+
+    Lookups are served from an in-memory dict keyed by symbol. The dict is
+    seeded from the cache file when it is younger than the TTL, otherwise from
+    a single exchange_info call. Once the cache is past half its TTL a
+    background thread refreshes it so the next launch still starts warm.
+    """
+
+    def __init__(self, path: str = CACHE_PATH, ttl: int = CACHE_TTL_SECONDS):
+        self.path = path
+        self.ttl = ttl
+        self._index: Dict[str, dict] = {}
+        self._fetched_at = 0.0
+        self._lock = threading.Lock()
+        self._refresh_thread: Optional[threading.Thread] = None
+
+    @property
+    def age(self) -> float:
+        return time.time() - self._fetched_at
+
+    def is_fresh(self) -> bool:
+        return bool(self._index) and self.age < self.ttl
+
+    def get(self, symbol: str, client=None) -> dict:
+        """
+        Returns the metadata entry for a symbol.
+
+        Args:
+            symbol: Trading pair (e.g., BTCUSDT)
+            client: Optional client used to refresh a stale or missing cache
+
+        Returns:
+            dict: price_precision, quantity_precision, tick_size, step_size, min_notional, filters
+
+        Raises:
+            MetadataUnavailableError: If the cache is stale or missing and cannot be refreshed
+            ValueError: If the symbol is not listed on the exchange
+        """
+        self.ensure_fresh(client)
+
+        entry = self._index.get(symbol)
+        if entry is None:
+            raise ValueError(f"Symbol {symbol} not found in exchange info")
+        return entry
+
+    def ensure_fresh(self, client=None):
+        """Loads the index from disk or the exchange if it is not fresh in memory."""
+        if not self.is_fresh():
+            with self._lock:
+                if not self.is_fresh():
+                    self._load()
+                if not self.is_fresh():
+                    if client is None:
+                        raise MetadataUnavailableError(
+                            f"Symbol metadata cache at {self.path} is stale or missing and no client was given to refresh it"
+                        )
+                    self._refresh_locked(client)
+
+        if client is not None and self.age > self.ttl / 2:
+            self._refresh_in_background(client)
+
+    def refresh(self, client):
+        """Fetches exchange_info once, rebuilds the index and persists it."""
+        with self._lock:
+            self._refresh_locked(client)
+
+    def start_background_refresh(self, client, interval: Optional[float] = None) -> threading.Thread:
+        """Keeps the index fresh from a daemon thread, for long-running processes."""
+        interval = interval or self.ttl / 2
+
+        def _loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh(client)
+                except Exception as e:
+                    # Keep serving the current index; ensure_fresh() raises once it expires
+                    logger.warning("Periodic metadata refresh failed: %r", e)
+
+        thread = threading.Thread(target=_loop, name="metadata-refresh", daemon=True)
+        thread.start()
+        return thread
+
+    def _refresh_locked(self, client):
+        try:
+            exchange_info = client.exchange_info()
+        except Exception as e:
+            raise MetadataUnavailableError(f"Could not fetch exchange info: {e}") from e
+
+        index = {s['symbol']: _parse_symbol(s) for s in exchange_info['symbols']}
+        self._index = index
+        self._fetched_at = time.time()
+        self._save()
+
+    def _refresh_in_background(self, client):
+        if self._refresh_thread is not None and self._refresh_thread.is_alive():
+            return
+
+        def _run():
+            try:
+                self.refresh(client)
+            except Exception as e:
+                # Keep serving the cached index; the next stale lookup starts another refresh
+                logger.warning("Background metadata refresh failed: %r", e)
+
+        self._refresh_thread = threading.Thread(target=_run, name="metadata-refresh-once", daemon=True)
+        self._refresh_thread.start()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r') as f:
+                payload = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        if payload.get('version') != CACHE_VERSION:
+            return
+
+        self._index = payload.get('symbols', {})
+        self._fetched_at = payload.get('fetched_at', 0.0)
+
+    def _save(self):
+        payload = {
+            'version': CACHE_VERSION,
+            'fetched_at': self._fetched_at,
+            'symbols': self._index,
+        }
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        # Write-then-rename so a concurrent reader never sees a partial file
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(payload, f)
+        os.replace(tmp_path, self.path)
+
+
+_store: Optional[SymbolMetadataStore] = None
+_store_lock = threading.Lock()
+
+
+def get_metadata_store() -> SymbolMetadataStore:
+    """Returns the process-wide symbol metadata store."""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SymbolMetadataStore()
+    return _store
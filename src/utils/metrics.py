@@ -0,0 +1,291 @@
+import bisect
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Dict, Optional, Tuple
+
+# 0 disables the HTTP endpoint / an empty path disables snapshot files
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_HOST = os.getenv("METRICS_HOST", "127.0.0.1")
+METRICS_SNAPSHOT_PATH = os.getenv("METRICS_SNAPSHOT_PATH", "")
+METRICS_SNAPSHOT_INTERVAL = float(os.getenv("METRICS_SNAPSHOT_INTERVAL", "60"))
+
+# Latency buckets in seconds, tuned for REST round trips and websocket handling
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HELP = {
+    'exchange_request_seconds': "Latency of REST calls to the exchange",
+    'exchange_errors_total': "Failed REST calls by Binance error code",
+    'ws_event_lag_seconds': "Exchange event time to local receipt of a websocket event",
+    'ws_handler_seconds': "Time spent in handlers for one websocket event",
+    'oco_fill_to_cancel_seconds': "Exchange fill time to sibling cancel acknowledgement",
+    'kill_switch_flat_seconds': "Kill switch trigger to every order and position confirmed closed",
+    'dead_man_heartbeat_failures_total': "countdownCancelAll heartbeats that failed, by symbol",
+    'order_submit_unknown_total': "Order requests that timed out or failed with an unknown outcome",
+    'order_submit_adopted_total': "Orders found on the exchange after an unknown outcome, adopted instead of resent",
+}
+
+
+def _logger() -> logging.Logger:
+    # utils.config imports this module, so its logger setup is looked up on first use
+    from utils.config import setup_logger
+    return setup_logger("metrics")
+
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (cumulative counts are built on export)."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def quantile(self, q: float) -> Optional[float]:
+        """Estimates a quantile by linear interpolation inside the matching bucket."""
+        if not self.count:
+            return None
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if seen + n >= rank and n:
+                lower = self.buckets[i - 1] if i > 0 else 0.0
+                upper = self.buckets[i] if i < len(self.buckets) else self.buckets[-1]
+                return lower + (upper - lower) * (rank - seen) / n
+            seen += n
+        return self.buckets[-1]
+
+
+class MetricsRegistry:
+    """
+    Process-wide counters and histograms, keyed by metric name and labels.
+
+    Recording is one dict lookup and a few additions under a lock, so it is
+    cheap enough for the order and websocket hot paths.
+    """
+
+    def __init__(self):
+        self._counters: Dict[Tuple[str, Labels], float] = {}
+        self._histograms: Dict[Tuple[str, Labels], Histogram] = {}
+        self._lock = threading.Lock()
+        self.started_at = time.time()
+
+    def inc(self, name: str, amount: float = 1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def observe(self, name: str, value: float, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def histogram(self, name: str, **labels) -> Callable[[float], None]:
+        """
+        Returns an observe(value) function bound to one histogram, for per-event
+        hot paths: it skips building and sorting the label key on every call.
+        """
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram()
+        lock = self._lock
+
+        def observe(value: float):
+            with lock:
+                histogram.observe(value)
+        return observe
+
+    @contextmanager
+    def timer(self, name: str, **labels):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    def render_prometheus(self) -> str:
+        """Formats every metric in the Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            counters = sorted(self._counters.items())
+            histograms = sorted((key, h.buckets, list(h.counts), h.sum, h.count)
+                                for key, h in self._histograms.items())
+
+        described = set()
+
+        def _header(name, kind):
+            if name not in described:
+                described.add(name)
+                if name in HELP:
+                    lines.append(f"# HELP {name} {HELP[name]}")
+                lines.append(f"# TYPE {name} {kind}")
+
+        for (name, labels), value in counters:
+            _header(name, "counter")
+            lines.append(f"{name}{_format_labels(labels)} {value}")
+
+        for (name, labels), buckets, counts, total, count in histograms:
+            _header(name, "histogram")
+            cumulative = 0
+            for bound, n in zip(buckets + (float("inf"),), counts):
+                cumulative += n
+                le = "+Inf" if bound == float("inf") else repr(bound)
+                lines.append(f"{name}_bucket{_format_labels(labels + (('le', le),))} {cumulative}")
+            lines.append(f"{name}_sum{_format_labels(labels)} {total}")
+            lines.append(f"{name}_count{_format_labels(labels)} {count}")
+
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> dict:
+        """Returns counters and histogram summaries (count, mean, p50/p90/p99) as plain data."""
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self._counters.items())]
+            histograms = []
+            for (name, labels), h in sorted(self._histograms.items()):
+                histograms.append({
+                    'name': name,
+                    'labels': dict(labels),
+                    'count': h.count,
+                    'mean': h.sum / h.count if h.count else None,
+                    'p50': h.quantile(0.50),
+                    'p90': h.quantile(0.90),
+                    'p99': h.quantile(0.99),
+                })
+        return {
+            'timestamp': time.time(),
+            'uptime_seconds': time.time() - self.started_at,
+            'counters': counters,
+            'histograms': histograms,
+        }
+
+    def write_snapshot(self, path: str):
+        """Writes snapshot() as JSON, replacing the file atomically."""
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.snapshot(), f, indent=2)
+        os.replace(tmp_path, path)
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    escaped = (k + '="' + str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n") + '"'
+               for k, v in labels)
+    return "{" + ",".join(escaped) + "}"
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        data = get_metrics().render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class MetricsExporter:
+    """Serves GET /metrics over HTTP and/or writes periodic JSON snapshots."""
+
+    def __init__(self, registry: MetricsRegistry, port: int = METRICS_PORT, host: str = METRICS_HOST,
+                 snapshot_path: str = METRICS_SNAPSHOT_PATH, snapshot_interval: float = METRICS_SNAPSHOT_INTERVAL):
+        self.registry = registry
+        self.port = port
+        self.host = host
+        self.snapshot_path = snapshot_path
+        self.snapshot_interval = snapshot_interval
+        self.server: Optional[ThreadingHTTPServer] = None
+        self._stopped = threading.Event()
+
+    def start(self):
+        if self.port:
+            self.server = ThreadingHTTPServer((self.host, self.port), _MetricsHandler)
+            self.server.daemon_threads = True
+            threading.Thread(target=self.server.serve_forever, name="metrics-http", daemon=True).start()
+            _logger().info("Metrics endpoint on http://%s:%s/metrics", self.host, self.server.server_address[1])
+        if self.snapshot_path:
+            threading.Thread(target=self._snapshot_loop, name="metrics-snapshot", daemon=True).start()
+
+    def stop(self):
+        self._stopped.set()
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+        if self.snapshot_path:
+            self._write()
+
+    def _snapshot_loop(self):
+        while not self._stopped.wait(self.snapshot_interval):
+            self._write()
+
+    def _write(self):
+        try:
+            self.registry.write_snapshot(self.snapshot_path)
+        except OSError as e:
+            _logger().error("Could not write metrics snapshot: %s", e)
+
+
+_registry: Optional[MetricsRegistry] = None
+_exporter: Optional[MetricsExporter] = None
+_lock = threading.RLock()
+
+
+def get_metrics() -> MetricsRegistry:
+    """Returns the process-wide metrics registry."""
+    global _registry
+    if _registry is None:
+        with _lock:
+            if _registry is None:
+                _registry = MetricsRegistry()
+    return _registry
+
+
+def start_exporter(port: int = METRICS_PORT, snapshot_path: str = METRICS_SNAPSHOT_PATH) -> Optional[MetricsExporter]:
+    """
+    Starts the process-wide exporter once. Does nothing (returns None) when
+    neither METRICS_PORT nor METRICS_SNAPSHOT_PATH is configured.
+    """
+    global _exporter
+    if not port and not snapshot_path:
+        return None
+    with _lock:
+        if _exporter is None:
+            _exporter = MetricsExporter(get_metrics(), port=port, snapshot_path=snapshot_path)
+            _exporter.start()
+    return _exporter
+
+
+def stop_exporter():
+    global _exporter
+    with _lock:
+        if _exporter is not None:
+            _exporter.stop()
+            _exporter = None
@@ -0,0 +1,258 @@
+import os
+import threading
+from bisect import bisect_left, bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from utils.config import get_client, setup_logger
+from utils.metrics import get_metrics
+from utils.events import DepthUpdate
+
+logger = setup_logger("order_book")
+
+# Levels requested with the REST snapshot (5, 10, 20, 50, 100, 500 or 1000)
+SNAPSHOT_LIMIT = int(os.getenv("ORDER_BOOK_SNAPSHOT_LIMIT", "1000"))
+# Diff events kept while a snapshot is in flight; more than this forces a new snapshot
+MAX_BUFFERED = 5000
+
+
+class _Side:
+    """
+    One side of the book as a sorted price list plus a price -> qty map.
+
+    Prices are kept ascending for both sides; bids read from the end.
+    Inserts and deletes are a bisect plus a memmove, lookups are O(1).
+    """
+
+    __slots__ = ("prices", "qty")
+
+    def __init__(self):
+        self.prices: List[float] = []
+        self.qty: Dict[float, float] = {}
+
+    def clear(self):
+        self.prices.clear()
+        self.qty.clear()
+
+    def set(self, price: float, qty: float):
+        if qty == 0.0:
+            if self.qty.pop(price, None) is not None:
+                del self.prices[bisect_left(self.prices, price)]
+        else:
+            if price not in self.qty:
+                self.prices.insert(bisect_left(self.prices, price), price)
+            self.qty[price] = qty
+
+
+class OrderBook:
+    """
+    Local L2 book for one symbol, kept in sync from the <symbol>@depth@100ms stream.
+
+    Follows Binance's procedure: buffer diffs, load a REST snapshot, drop
+    diffs older than it, then apply each diff only if its `pu` matches the
+    previous `u`. Any gap triggers a fresh snapshot. Queries never touch the
+    network; they return None (or zeros) until the book is synced.
+    """
+
+    def __init__(self, symbol: str, client=None, stream=None, snapshot_limit: int = SNAPSHOT_LIMIT):
+        self.symbol = symbol.upper()
+        # Imported here: reference_price() users should not pay for the websocket stack
+        from utils.market_stream import get_market_stream
+
+        self.client = client or get_client()
+        self.stream = stream or get_market_stream()
+        self.snapshot_limit = snapshot_limit
+        self.stream_name = f"{self.symbol.lower()}@depth@100ms"
+
+        self.bids = _Side()
+        self.asks = _Side()
+        self.last_update_id = 0
+        self._buffer: List[DepthUpdate] = []
+        self._syncing = False
+        self._straddle = False
+        self._synced = threading.Event()
+        self._lock = threading.Lock()
+        self._stopped = False
+        self.metrics = get_metrics()
+
+    # -- lifecycle -----------------------------------------------------------
+
+    def start(self):
+        self._stopped = False
+        self.stream.subscribe(self.stream_name, self._on_depth)
+        self._resync("start")
+
+    def stop(self):
+        self._stopped = True
+        self.stream.unsubscribe(self.stream_name, self._on_depth)
+        self._synced.clear()
+
+    @property
+    def synced(self) -> bool:
+        return self._synced.is_set()
+
+    def wait_synced(self, timeout: Optional[float] = None) -> bool:
+        return self._synced.wait(timeout)
+
+    # -- queries -------------------------------------------------------------
+
+    def best_bid(self) -> Optional[Tuple[float, float]]:
+        """(price, qty) of the best bid, or None."""
+        with self._lock:
+            if not self._synced.is_set() or not self.bids.prices:
+                return None
+            price = self.bids.prices[-1]
+            return price, self.bids.qty[price]
+
+    def best_ask(self) -> Optional[Tuple[float, float]]:
+        """(price, qty) of the best ask, or None."""
+        with self._lock:
+            if not self._synced.is_set() or not self.asks.prices:
+                return None
+            price = self.asks.prices[0]
+            return price, self.asks.qty[price]
+
+    def mid(self) -> Optional[float]:
+        with self._lock:
+            if not self._synced.is_set() or not self.bids.prices or not self.asks.prices:
+                return None
+            return (self.bids.prices[-1] + self.asks.prices[0]) / 2
+
+    def spread_bps(self) -> Optional[float]:
+        with self._lock:
+            if not self._synced.is_set() or not self.bids.prices or not self.asks.prices:
+                return None
+            bid, ask = self.bids.prices[-1], self.asks.prices[0]
+            return (ask - bid) / ((ask + bid) / 2) * 10000
+
+    def depth_within(self, bps: float) -> Tuple[float, float]:
+        """
+        Total (bid qty, ask qty) resting within `bps` basis points of the mid.
+        Both sides are 0.0 while the book is unsynced or one-sided.
+        """
+        with self._lock:
+            if not self._synced.is_set() or not self.bids.prices or not self.asks.prices:
+                return 0.0, 0.0
+            mid = (self.bids.prices[-1] + self.asks.prices[0]) / 2
+            band = mid * bps / 10000
+            bids, asks = self.bids, self.asks
+            bid_qty = sum((bids.qty[p] for p in bids.prices[bisect_left(bids.prices, mid - band):]), 0.0)
+            ask_qty = sum((asks.qty[p] for p in asks.prices[:bisect_right(asks.prices, mid + band)]), 0.0)
+            return bid_qty, ask_qty
+
+    def levels(self, side: str, n: int = 10) -> List[Tuple[float, float]]:
+        """Top n (price, qty) levels of "BUY" (bids, best first) or "SELL" (asks)."""
+        with self._lock:
+            if side == "BUY":
+                prices = self.bids.prices[:-n - 1:-1]
+                return [(p, self.bids.qty[p]) for p in prices]
+            return [(p, self.asks.qty[p]) for p in self.asks.prices[:n]]
+
+    # -- sync ----------------------------------------------------------------
+
+    def _on_depth(self, event: DepthUpdate):
+        """Websocket thread: apply the diff, or buffer it while a snapshot is loading."""
+        with self._lock:
+            if self._syncing:
+                self._buffer.append(event)
+                if len(self._buffer) > MAX_BUFFERED:
+                    self._buffer.clear()
+                return
+            if self._accept(event):
+                return
+            gap = (self.last_update_id, event.prev_final_id)
+        logger.warning("Depth gap on %s (have %s, event continues %s); resyncing", self.symbol, *gap,
+                       extra={'symbol': self.symbol})
+        self._resync("gap")
+
+    def _accept(self, event: DepthUpdate) -> bool:
+        """Applies a diff if it continues the book; False means a gap. Caller holds the lock."""
+        if self._straddle:
+            if event.final_id < self.last_update_id:
+                # Older than the snapshot
+                return True
+            # The first applied diff must straddle the snapshot
+            if event.first_id > self.last_update_id:
+                return False
+            self._straddle = False
+        elif event.prev_final_id != self.last_update_id:
+            return False
+        self._apply(event)
+        return True
+
+    def _resync(self, reason: str):
+        with self._lock:
+            if self._syncing or self._stopped:
+                return
+            self._syncing = True
+            self._synced.clear()
+        self.metrics.inc('order_book_resyncs_total', symbol=self.symbol, reason=reason)
+        threading.Thread(target=self._load_snapshot, name=f"book-{self.symbol}", daemon=True).start()
+
+    def _load_snapshot(self):
+        try:
+            snapshot = self.client.depth(symbol=self.symbol, limit=self.snapshot_limit)
+        except Exception as e:
+            logger.error("Depth snapshot for %s failed: %s", self.symbol, e, extra={'symbol': self.symbol})
+            with self._lock:
+                self._syncing = False
+                self._buffer.clear()
+            # The next diff finds last_update_id stale and retries
+            return
+
+        with self._lock:
+            self.bids.clear()
+            self.asks.clear()
+            for price, qty in snapshot['bids']:
+                self.bids.set(float(price), float(qty))
+            for price, qty in snapshot['asks']:
+                self.asks.set(float(price), float(qty))
+            self.last_update_id = snapshot['lastUpdateId']
+            self._straddle = True
+
+            buffered, self._buffer = self._buffer, []
+            self._syncing = False
+            if all(self._accept(event) for event in buffered):
+                self._synced.set()
+                logger.info("Order book %s synced at update %s (%s bids, %s asks)", self.symbol,
+                            self.last_update_id, len(self.bids.prices), len(self.asks.prices),
+                            extra={'symbol': self.symbol})
+                return
+
+        self._resync("snapshot")
+
+    def _apply(self, event: DepthUpdate):
+        for price, qty in event.bids:
+            self.bids.set(float(price), float(qty))
+        for price, qty in event.asks:
+            self.asks.set(float(price), float(qty))
+        self.last_update_id = event.final_id
+
+
+_books: Dict[str, OrderBook] = {}
+_books_lock = threading.Lock()
+
+
+def get_order_book(symbol: str, client=None) -> OrderBook:
+    """Returns the shared, started order book for a symbol."""
+    symbol = symbol.upper()
+    with _books_lock:
+        book = _books.get(symbol)
+        if book is None:
+            book = OrderBook(symbol, client)
+            _books[symbol] = book
+            book.start()
+        return book
+
+
+def local_mid(symbol: str) -> Optional[float]:
+    """Mid of the local book if one is running and two-sided; never touches the network."""
+    book = _books.get(symbol.upper())
+    return book.mid() if book is not None else None
+
+
+def reference_price(client, symbol: str) -> float:
+    """Mid of the local book if one is running and two-sided, otherwise the REST ticker price."""
+    mid = local_mid(symbol)
+    if mid is not None:
+        return mid
+    return float(client.ticker_price(symbol=symbol)['price'])
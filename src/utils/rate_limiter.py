@@ -0,0 +1,217 @@
+import heapq
+import itertools
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Tuple
+
+# Lower value = served first
+PRIORITY_CANCEL = 0
+PRIORITY_PROTECTIVE = 1
+PRIORITY_NORMAL = 2
+PRIORITY_BULK = 3
+
+# USDT-M futures defaults (GET /fapi/v1/exchangeInfo -> rateLimits)
+WEIGHT_LIMIT_1M = int(os.getenv("RATE_LIMIT_WEIGHT_1M", "2400"))
+ORDER_LIMIT_10S = int(os.getenv("RATE_LIMIT_ORDERS_10S", "300"))
+ORDER_LIMIT_1M = int(os.getenv("RATE_LIMIT_ORDERS_1M", "1200"))
+# Fraction of each budget we allow ourselves to use
+HEADROOM = float(os.getenv("RATE_LIMIT_HEADROOM", "0.9"))
+
+PROTECTIVE_TYPES = {"STOP", "STOP_MARKET", "TAKE_PROFIT", "TAKE_PROFIT_MARKET", "TRAILING_STOP_MARKET"}
+
+# (method, path) -> request weight; anything not listed costs 1
+ENDPOINT_WEIGHTS = {
+    ("GET", "/fapi/v1/exchangeInfo"): 1,
+    ("GET", "/fapi/v1/aggTrades"): 20,
+    ("GET", "/fapi/v3/account"): 5,
+    ("GET", "/fapi/v3/positionRisk"): 5,
+    ("GET", "/fapi/v3/balance"): 5,
+    ("POST", "/fapi/v1/batchOrders"): 5,
+    ("POST", "/fapi/v1/countdownCancelAll"): 10,
+}
+
+_local = threading.local()
+
+
+def request_cost(http_method: str, url_path: str, payload: Optional[dict]) -> Tuple[int, int]:
+    """Returns (request weight, order count) for one REST call."""
+    payload = payload or {}
+    path = url_path.split("?", 1)[0]
+    weight = ENDPOINT_WEIGHTS.get((http_method, path), 1)
+
+    if path == "/fapi/v1/openOrders" and not payload.get("symbol"):
+        weight = 40
+    elif path == "/fapi/v2/ticker/price" and not payload.get("symbol"):
+        weight = 2
+    elif path == "/fapi/v1/depth":
+        limit = int(payload.get("limit", 500))
+        weight = 2 if limit <= 50 else 5 if limit <= 100 else 10 if limit <= 500 else 20
+
+    orders = 0
+    if http_method == "POST" and path == "/fapi/v1/order":
+        orders = 1
+    elif http_method == "POST" and path == "/fapi/v1/batchOrders":
+        orders = len(payload.get("batchOrders") or [])
+    return weight, orders
+
+
+def classify_priority(http_method: str, url_path: str, payload: Optional[dict]) -> int:
+    """Picks a priority for a request unless the caller set one with request_priority()."""
+    explicit = getattr(_local, "priority", None)
+    if explicit is not None:
+        return explicit
+
+    payload = payload or {}
+    path = url_path.split("?", 1)[0]
+    if http_method == "DELETE" or path == "/fapi/v1/countdownCancelAll":
+        return PRIORITY_CANCEL
+    if http_method == "POST" and path == "/fapi/v1/order":
+        if payload.get("type") in PROTECTIVE_TYPES or str(payload.get("reduceOnly")).lower() == "true":
+            return PRIORITY_PROTECTIVE
+    return PRIORITY_NORMAL
+
+
+@contextmanager
+def request_priority(priority: int):
+    """Overrides the priority of every request made by the current thread inside the block."""
+    previous = getattr(_local, "priority", None)
+    _local.priority = priority
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+class TokenBucket:
+    """Continuously refilling budget of `limit` units per `window` seconds."""
+
+    def __init__(self, limit: int, window: float):
+        self.capacity = max(1.0, limit * HEADROOM)
+        self.limit = limit
+        self.rate = self.capacity / window
+        self.available = self.capacity
+        self.updated = time.monotonic()
+
+    def refill(self, now: float):
+        self.available = min(self.capacity, self.available + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        if amount <= self.available:
+            return 0.0
+        return (amount - self.available) / self.rate
+
+    def sync_used(self, used: int):
+        """Clamps the local budget to what the exchange says is left (covers other processes)."""
+        self.available = min(self.available, self.capacity - used)
+
+
+class RateLimitScheduler:
+    """
+    Process-wide admission control for REST calls.
+
+    Every request waits for weight and order-count tokens before it is sent.
+    Waiting requests are served strictly by priority, then arrival order, so a
+    cancel queued behind a burst of grid levels is sent as soon as budget frees
+    up. Budgets are corrected from the X-MBX-* response headers after each call.
+    """
+
+    def __init__(self):
+        self.weight_1m = TokenBucket(WEIGHT_LIMIT_1M, 60.0)
+        self.orders_10s = TokenBucket(ORDER_LIMIT_10S, 10.0)
+        self.orders_1m = TokenBucket(ORDER_LIMIT_1M, 60.0)
+        self.banned_until = 0.0
+        self._cond = threading.Condition()
+        self._waiting = []
+        self._seq = itertools.count()
+
+    def acquire(self, weight: int = 1, orders: int = 0, priority: int = PRIORITY_NORMAL):
+        """Blocks until the request fits in every budget and no higher-priority request is waiting."""
+        ticket = (priority, next(self._seq))
+        with self._cond:
+            heapq.heappush(self._waiting, ticket)
+            try:
+                while True:
+                    timeout = None
+                    if self._waiting[0] == ticket:
+                        timeout = self._wait_time(weight, orders)
+                        if timeout <= 0:
+                            self._consume(weight, orders)
+                            return
+                    self._cond.wait(timeout)
+            finally:
+                self._waiting.remove(ticket)
+                heapq.heapify(self._waiting)
+                self._cond.notify_all()
+
+    def update_from_headers(self, status_code: int, headers):
+        """Syncs budgets with X-MBX-USED-WEIGHT-1M / X-MBX-ORDER-COUNT-* and honours bans."""
+        with self._cond:
+            now = time.monotonic()
+            for key, value in headers.items():
+                key = key.lower()
+                try:
+                    used = int(value)
+                except (TypeError, ValueError):
+                    continue
+                if key == "x-mbx-used-weight-1m":
+                    self.weight_1m.refill(now)
+                    self.weight_1m.sync_used(used)
+                elif key == "x-mbx-order-count-10s":
+                    self.orders_10s.refill(now)
+                    self.orders_10s.sync_used(used)
+                elif key == "x-mbx-order-count-1m":
+                    self.orders_1m.refill(now)
+                    self.orders_1m.sync_used(used)
+
+            if status_code in (418, 429):
+                retry_after = headers.get("Retry-After")
+                delay = float(retry_after) if retry_after else 60.0
+                self.banned_until = max(self.banned_until, now + delay)
+
+            self._cond.notify_all()
+
+    def usage(self) -> dict:
+        with self._cond:
+            now = time.monotonic()
+            buckets = {"weight_1m": self.weight_1m, "orders_10s": self.orders_10s, "orders_1m": self.orders_1m}
+            for bucket in buckets.values():
+                bucket.refill(now)
+            usage = {name: round(b.capacity - b.available, 1) for name, b in buckets.items()}
+            usage["queued"] = len(self._waiting)
+            usage["banned_for"] = max(0.0, self.banned_until - now)
+            return usage
+
+    def _wait_time(self, weight: int, orders: int) -> float:
+        now = time.monotonic()
+        self.weight_1m.refill(now)
+        self.orders_10s.refill(now)
+        self.orders_1m.refill(now)
+
+        waits = [self.banned_until - now, self.weight_1m.wait_time(weight)]
+        if orders:
+            waits.append(self.orders_10s.wait_time(orders))
+            waits.append(self.orders_1m.wait_time(orders))
+        return max(waits)
+
+    def _consume(self, weight: int, orders: int):
+        self.weight_1m.available -= weight
+        if orders:
+            self.orders_10s.available -= orders
+            self.orders_1m.available -= orders
+
+
+_scheduler: Optional[RateLimitScheduler] = None
+_scheduler_lock = threading.Lock()
+
+
+def get_rate_limiter() -> RateLimitScheduler:
+    """Returns the process-wide rate limit scheduler."""
+    global _scheduler
+    if _scheduler is None:
+        with _scheduler_lock:
+            if _scheduler is None:
+                _scheduler = RateLimitScheduler()
+    return _scheduler
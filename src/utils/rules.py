@@ -0,0 +1,199 @@
+from decimal import Decimal, ROUND_DOWN, ROUND_HALF_UP
+from typing import Dict, Hashable, List, Optional, Sequence
+
+import numpy as np
+
+from utils.validation import get_symbol_info
+
+# Binance's generic "Filter failure" code, reported for orders rejected locally
+FILTER_FAILURE_CODE = -1013
+
+
+class RuleViolation(ValueError):
+    """An order the exchange would reject under the symbol's filters; caught before sending."""
+
+
+def _decimal(value, default: str = "0") -> Decimal:
+    return Decimal(str(value if value is not None else default))
+
+
+def _places(increment: Decimal) -> int:
+    return max(0, -increment.normalize().as_tuple().exponent)
+
+
+def _misaligned(values: np.ndarray, increment: Decimal) -> np.ndarray:
+    """True where a float is not a whole multiple of the increment, compared in scaled integers."""
+    places = _places(increment)
+    scaled = values * 10 ** places
+    units = np.rint(scaled)
+    step_units = int(increment.scaleb(places))
+    return (np.abs(scaled - units) > 1e-9 * np.maximum(1.0, np.abs(scaled))) | \
+        (units.astype(np.int64) % step_units != 0)
+
+
+class SymbolRules:
+    """
+    Pre-trade rule table for one symbol, compiled from its exchange filters:
+    PRICE_FILTER, LOT_SIZE, MARKET_LOT_SIZE, MIN_NOTIONAL and PERCENT_PRICE.
+
+    Quantization is exact (Decimal); validation runs over whole batches with
+    numpy, so orders the exchange would reject never cost a round trip.
+    """
+
+    def __init__(self, symbol: str, filters: Dict[str, dict]):
+        self.symbol = symbol
+        price = filters.get('PRICE_FILTER', {})
+        lot = filters.get('LOT_SIZE', {})
+        market_lot = filters.get('MARKET_LOT_SIZE', lot)
+        notional = filters.get('MIN_NOTIONAL', {})
+        percent = filters.get('PERCENT_PRICE', {})
+
+        self.tick_size = _decimal(price.get('tickSize'), "0.00000001")
+        self.min_price = _decimal(price.get('minPrice'))
+        # 0 means no upper bound
+        self.max_price = _decimal(price.get('maxPrice'))
+        self.step_size = _decimal(lot.get('stepSize'), "0.00000001")
+        self.min_qty = _decimal(lot.get('minQty'))
+        self.max_qty = _decimal(lot.get('maxQty'))
+        self.market_step_size = _decimal(market_lot.get('stepSize'), str(self.step_size))
+        self.market_min_qty = _decimal(market_lot.get('minQty'))
+        self.market_max_qty = _decimal(market_lot.get('maxQty'))
+        self.min_notional = _decimal(notional.get('notional', notional.get('minNotional')))
+        self.multiplier_up = _decimal(percent['multiplierUp']) if percent else None
+        self.multiplier_down = _decimal(percent['multiplierDown']) if percent else None
+
+    # -- quantization --------------------------------------------------------
+
+    def quantize_price(self, price, rounding: str = ROUND_HALF_UP) -> Decimal:
+        """Nearest multiple of the tick size (or rounded as given)."""
+        ticks = (Decimal(str(price)) / self.tick_size).to_integral_value(rounding)
+        return (ticks * self.tick_size).quantize(self.tick_size)
+
+    def quantize_qty(self, quantity, market: bool = False, rounding: str = ROUND_DOWN) -> Decimal:
+        """Quantity rounded down to the (market) lot step, so it never exceeds what was asked for."""
+        step = self.market_step_size if market else self.step_size
+        steps = (Decimal(str(quantity)) / step).to_integral_value(rounding)
+        return (steps * step).quantize(step)
+
+    def price_from_ticks(self, ticks: int) -> Decimal:
+        return (self.tick_size * int(ticks)).quantize(self.tick_size)
+
+    # -- validation ----------------------------------------------------------
+
+    def check(self, quantity: float, price: Optional[float] = None, order_type: str = "LIMIT",
+              stop_price: Optional[float] = None, reference: Optional[float] = None):
+        """Raises RuleViolation if one order breaks any filter."""
+        problems = self.check_batch([quantity], [price], [order_type == "MARKET"],
+                                    stop_prices=[stop_price], reference=reference)[0]
+        if problems:
+            raise RuleViolation(f"{self.symbol}: {problems}")
+
+    def check_batch(self, quantities: Sequence[float], prices: Sequence[Optional[float]],
+                    market: Sequence[bool], stop_prices: Optional[Sequence[Optional[float]]] = None,
+                    reference: Optional[float] = None) -> List[Optional[str]]:
+        """
+        Validates a batch of orders in one vectorized pass.
+
+        Args:
+            quantities: Order quantities
+            prices: Limit prices; None for market orders
+            market: True where the order is a MARKET order (MARKET_LOT_SIZE applies)
+            stop_prices: Optional trigger prices, checked against the tick size
+            reference: Current price (e.g. the local mid); enables PERCENT_PRICE and
+                the notional check of market orders
+
+        Returns:
+            One entry per order: None if it passes, otherwise a "; "-joined reason
+        """
+        qty = np.asarray(quantities, dtype=float)
+        price = np.array([np.nan if p is None else p for p in prices], dtype=float)
+        is_market = np.asarray(market, dtype=bool)
+        stop = np.array([np.nan if s is None else s for s in (stop_prices or [None] * len(qty))], dtype=float)
+        has_price = ~np.isnan(price)
+        has_stop = ~np.isnan(stop)
+
+        rules = []
+        min_qty = np.where(is_market, float(self.market_min_qty), float(self.min_qty))
+        max_qty = np.where(is_market, float(self.market_max_qty or self.max_qty), float(self.max_qty))
+        rules.append((qty < min_qty, lambda i: f"quantity {float(qty[i])} below minimum {float(min_qty[i])}"))
+        if self.max_qty:
+            rules.append((qty > max_qty, lambda i: f"quantity {float(qty[i])} above maximum {float(max_qty[i])}"))
+        rules.append((np.where(is_market, _misaligned(qty, self.market_step_size), _misaligned(qty, self.step_size)),
+                      lambda i: f"quantity {float(qty[i])} is not a multiple of step size "
+                                f"{self.market_step_size if is_market[i] else self.step_size}"))
+
+        priced = np.where(has_price, price, 0.0)
+        rules.append((has_price & _misaligned(priced, self.tick_size),
+                      lambda i: f"price {float(price[i])} is not a multiple of tick size {self.tick_size}"))
+        rules.append((has_price & (priced < float(self.min_price)),
+                      lambda i: f"price {float(price[i])} below minimum {self.min_price}"))
+        if self.max_price:
+            rules.append((has_price & (priced > float(self.max_price)),
+                          lambda i: f"price {float(price[i])} above maximum {self.max_price}"))
+        rules.append((has_stop & _misaligned(np.where(has_stop, stop, 0.0), self.tick_size),
+                      lambda i: f"stop price {float(stop[i])} is not a multiple of tick size {self.tick_size}"))
+
+        notional_price = np.where(has_price, price, reference if reference is not None else np.nan)
+        notional = qty * notional_price
+        rules.append((notional < float(self.min_notional),
+                      lambda i: f"notional {float(notional[i]):.8g} below minimum {self.min_notional}"))
+
+        if reference is not None and self.multiplier_up is not None:
+            upper = reference * float(self.multiplier_up)
+            lower = reference * float(self.multiplier_down)
+            rules.append((has_price & ((priced > upper) | (priced < lower)),
+                          lambda i: f"price {float(price[i])} outside {lower:.8g}-{upper:.8g} "
+                                    f"allowed around {reference:.8g}"))
+
+        failed = np.zeros(len(qty), dtype=bool)
+        for mask, _ in rules:
+            failed |= mask
+        reasons: List[Optional[str]] = [None] * len(qty)
+        for i in np.flatnonzero(failed):
+            reasons[i] = "; ".join(describe(i) for mask, describe in rules if mask[i])
+        return reasons
+
+
+_rules: Dict[str, tuple] = {}
+
+
+def get_rules(client, symbol: str) -> SymbolRules:
+    """Returns the compiled rules for a symbol, rebuilt whenever its metadata entry is refreshed."""
+    entry = get_symbol_info(client, symbol)
+    cached = _rules.get(symbol)
+    if cached is None or cached[0] is not entry:
+        cached = (entry, SymbolRules(symbol, entry['filters']))
+        _rules[symbol] = cached
+    return cached[1]
+
+
+def check_orders(client, orders: Dict[Hashable, dict], reference: Optional[Dict[str, float]] = None) -> Dict[Hashable, str]:
+    """
+    Validates new_order parameter sets locally, one vectorized pass per symbol.
+
+    Args:
+        client: Client used to load symbol metadata if it is not cached
+        orders: Mapping of caller-chosen key to new_order parameters
+        reference: Optional symbol -> current price, for PERCENT_PRICE and market notional
+
+    Returns:
+        Dict mapping the key of every order that would be rejected to the reason
+    """
+    by_symbol: Dict[str, list] = {}
+    for key, params in orders.items():
+        by_symbol.setdefault(params['symbol'], []).append((key, params))
+
+    rejected = {}
+    for symbol, items in by_symbol.items():
+        rules = get_rules(client, symbol)
+        reasons = rules.check_batch(
+            [float(p['quantity']) for _, p in items],
+            [float(p['price']) if p.get('price') is not None else None for _, p in items],
+            [p.get('type') == "MARKET" for _, p in items],
+            stop_prices=[float(p['stopPrice']) if p.get('stopPrice') is not None else None for _, p in items],
+            reference=(reference or {}).get(symbol),
+        )
+        for (key, _), reason in zip(items, reasons):
+            if reason:
+                rejected[key] = reason
+    return rejected
@@ -0,0 +1,140 @@
+import os
+import time
+import uuid
+from typing import Optional
+
+from binance.error import ClientError, ServerError
+from requests.exceptions import RequestException
+
+from utils.config import setup_logger
+from utils.client_registry import request_timeout
+from utils.metrics import get_metrics
+
+logger = setup_logger("submission")
+
+# Longest one order request is waited for, in seconds; it is also sent as the order's recvWindow
+SUBMIT_TIMEOUT = float(os.getenv("ORDER_SUBMIT_TIMEOUT", "2"))
+# Re-sends of an order whose status lookup shows it never reached the exchange
+SUBMIT_RETRIES = int(os.getenv("ORDER_SUBMIT_RETRIES", "1"))
+
+# Binance errors that leave an order's fate open: -1001 internal disconnect, -1007 backend timeout
+UNKNOWN_STATUS_CODES = {-1001, -1007}
+# -2013: order does not exist
+ORDER_NOT_FOUND = -2013
+# Binance caps recvWindow at 60 s
+MAX_RECV_WINDOW_MS = 60000
+# Binance rejects timestamps more than 1 s ahead of its clock, so a request can still be accepted
+# up to this long after its timestamp + recvWindow
+MAX_CLOCK_AHEAD = 1.0
+# First pause between lookups of an order that is not found (yet); doubled after each one
+LOOKUP_BACKOFF = float(os.getenv("ORDER_LOOKUP_BACKOFF", "0.25"))
+
+
+class SubmissionError(Exception):
+    """
+    An order that could not be placed. `unknown` is True when its fate is
+    still open (the status lookup failed too): it may be live on the
+    exchange, so it must be reconciled rather than sent again.
+    """
+
+    def __init__(self, message: str, client_order_id: str, unknown: bool):
+        super().__init__(message)
+        self.client_order_id = client_order_id
+        self.unknown = unknown
+
+
+def new_client_order_id(prefix: str) -> str:
+    """A fresh clientOrderId (<prefix>-<hex>), fixed before the first attempt so retries reuse it."""
+    return f"{prefix}-{uuid.uuid4().hex[:16]}"
+
+
+def outcome_unknown(error: Exception) -> bool:
+    """True if a failed request may still have been carried out by the exchange."""
+    if isinstance(error, ClientError):
+        return error.error_code in UNKNOWN_STATUS_CODES
+    return isinstance(error, (ServerError, RequestException, TimeoutError))
+
+
+def settle_time(recv_window_ms: float) -> float:
+    """Seconds after a request failed until the exchange can no longer accept it."""
+    return recv_window_ms / 1000 + MAX_CLOCK_AHEAD
+
+
+def lookup_order(orders, symbol: str, client_order_id: str, timeout: float = SUBMIT_TIMEOUT,
+                 settle: float = 0.0) -> Optional[dict]:
+    """
+    The exchange's record of an order, or None if it never arrived. Other failures propagate.
+
+    An order request can still be in the exchange's pipeline when a lookup
+    misses it (-2013), so "not found" is only trusted after `settle` seconds
+    (see settle_time()); until then the lookup is repeated with backoff.
+    """
+    deadline = time.monotonic() + settle
+    delay = LOOKUP_BACKOFF
+    while True:
+        try:
+            with request_timeout(timeout):
+                return orders.query_order(symbol=symbol, origClientOrderId=client_order_id)
+        except ClientError as e:
+            if e.error_code != ORDER_NOT_FOUND:
+                raise
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return None
+        time.sleep(min(delay, remaining))
+        delay *= 2
+
+
+def submit_order(orders, timeout: float = SUBMIT_TIMEOUT, retries: int = SUBMIT_RETRIES, **params) -> dict:
+    """
+    Places one order at most once, waiting at most `timeout` seconds per attempt.
+
+    `orders` is the REST client or a websocket transport. The order is sent
+    with a fixed newClientOrderId (one is made if params has none) and with
+    recvWindow equal to the deadline, so a request still in flight when we
+    stop waiting is rejected by the exchange if it arrives later. An attempt
+    that times out or fails with an unknown outcome is settled by looking the
+    order up by clientOrderId until its recvWindow has passed: an order that
+    exists is adopted (the lookup's response is returned), one that does not
+    is sent again, up to `retries` more times. If the lookup itself fails the
+    order is reported as unknown and never resent here.
+
+    Raises:
+        ClientError: the exchange rejected the order
+        SubmissionError: the order was not placed, or its fate is still unknown
+    """
+    if not params.get('newClientOrderId'):
+        params['newClientOrderId'] = new_client_order_id(params.get('type', "order").lower())
+    params.setdefault('recvWindow', min(max(int(timeout * 1000), 1), MAX_RECV_WINDOW_MS))
+    client_order_id = params['newClientOrderId']
+    metrics = get_metrics()
+
+    for attempt in range(retries + 1):
+        try:
+            with request_timeout(timeout):
+                return orders.new_order(**params)
+        except Exception as e:
+            if not outcome_unknown(e):
+                raise
+            error = e
+        metrics.inc('order_submit_unknown_total', symbol=params['symbol'])
+        logger.warning("Order %s timed out or failed with an unknown outcome (%s); looking it up", client_order_id,
+                       error, extra={'symbol': params['symbol']})
+
+        try:
+            order = lookup_order(orders, params['symbol'], client_order_id, timeout,
+                                 settle=settle_time(int(params['recvWindow'])))
+        except Exception as e:
+            raise SubmissionError(f"Order {client_order_id} may or may not be live: lookup failed ({e})",
+                                  client_order_id, unknown=True) from error
+        if order is not None:
+            metrics.inc('order_submit_adopted_total', symbol=params['symbol'])
+            logger.info("Order %s reached the exchange; adopting it", client_order_id,
+                        extra={'order_id': order.get('orderId'), 'symbol': params['symbol']})
+            return order
+        if attempt < retries:
+            logger.info("Order %s never reached the exchange; sending it again", client_order_id,
+                        extra={'symbol': params['symbol']})
+
+    raise SubmissionError(f"Order {client_order_id} was not placed after {retries + 1} attempt(s): {error}",
+                          client_order_id, unknown=False)
@@ -0,0 +1,217 @@
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from binance.websocket.um_futures.websocket_client import UMFuturesWebsocketClient
+
+from utils.config import get_client, setup_logger, STREAM_URL
+from utils.metrics import get_metrics
+from utils.events import loads, RECORDS, OrderUpdate
+
+logger = setup_logger("user_stream")
+
+# Listen keys expire after 60 minutes without a keepalive
+KEEPALIVE_INTERVAL = 30 * 60
+# Published to its subscribers (as {'e': STREAM_RESUMED, 'E': ms}) after the socket is re-opened:
+# events of the gap are lost, so state kept from them must be reconciled over REST
+STREAM_RESUMED = 'streamResumed'
+
+
+class UserDataStream:
+    """
+    One user-data websocket per account, shared by every strategy in the process.
+
+    Handlers subscribe by event type ('ORDER_TRADE_UPDATE', 'ACCOUNT_UPDATE',
+    ...) and are called on the websocket thread with the event's record from
+    utils.events (the decoded dict for types without one). A strategy that only
+    cares about its own orders routes them by clientOrderId instead, so it is
+    called for those orders alone. Events nobody listens to are dropped right
+    after JSON decoding. The listen key is renewed on a timer and the socket is
+    re-opened with a new key if it expires or drops; STREAM_RESUMED subscribers
+    are then told to catch up on what they missed.
+    """
+
+    def __init__(self, client=None, stream_url: str = STREAM_URL):
+        self.client = client or get_client()
+        self.stream_url = stream_url
+        self.listen_key: Optional[str] = None
+        self.ws_client = None
+        # Replaced, never mutated, so the websocket thread iterates them without a lock
+        self._handlers: Dict[str, Tuple[Callable, ...]] = {}
+        self._order_routes: Dict[str, Callable[[OrderUpdate], None]] = {}
+        self._timers: Dict[str, tuple] = {}
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._keepalive_thread: Optional[threading.Thread] = None
+        self.metrics = get_metrics()
+
+    def subscribe(self, event_type: str, handler: Callable):
+        with self._lock:
+            self._handlers[event_type] = self._handlers.get(event_type, ()) + (handler,)
+
+    def unsubscribe(self, event_type: str, handler: Callable):
+        with self._lock:
+            handlers = list(self._handlers.get(event_type, ()))
+            if handler in handlers:
+                handlers.remove(handler)
+                self._handlers[event_type] = tuple(handlers)
+
+    def route_order(self, client_order_id: str, handler: Callable[[OrderUpdate], None]):
+        """
+        Sends the ORDER_TRADE_UPDATEs of one order to `handler`, after the
+        event type's subscribers. Route before sending the order: its first
+        event can arrive before the REST acknowledgement does.
+        """
+        self._order_routes[client_order_id] = handler
+
+    def unroute_order(self, client_order_id: str):
+        self._order_routes.pop(client_order_id, None)
+
+    @property
+    def running(self) -> bool:
+        return self.ws_client is not None and not self._stopped.is_set()
+
+    def start(self):
+        """Opens the stream; safe to call more than once."""
+        with self._lock:
+            if self.running:
+                return
+            self._stopped.clear()
+            self._connect()
+
+        self._keepalive_thread = threading.Thread(target=self._keepalive_loop, name="listen-key-keepalive", daemon=True)
+        self._keepalive_thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        if self.ws_client:
+            self.ws_client.stop()
+            self.ws_client = None
+        if self.listen_key:
+            try:
+                self.client.close_listen_key(self.listen_key)
+            except Exception as e:
+                logger.debug("Could not close listen key: %s", e)
+        logger.info("User data stream stopped.")
+
+    def _connect(self):
+        logger.info("Connecting to Binance user data stream...")
+        self.listen_key = self.client.new_listen_key()['listenKey']
+        logger.info("Listen Key retrieved: %s...", self.listen_key[:10])
+
+        self.ws_client = UMFuturesWebsocketClient(
+            stream_url=self.stream_url,
+            on_message=self._on_message,
+            on_close=self._on_disconnect,
+            on_error=self._on_disconnect,
+        )
+        self.ws_client.user_data(listen_key=self.listen_key, id=1)
+        logger.info("WebSocket connection started.")
+
+    def _reconnect(self):
+        with self._lock:
+            if self._stopped.is_set():
+                return
+            logger.warning("Re-opening user data stream...")
+            old_client, self.ws_client = self.ws_client, None
+            if old_client:
+                # Close from a helper thread: we may be running on the socket's own thread
+                threading.Thread(target=old_client.stop, daemon=True).start()
+            self._connect()
+        self._publish_resumed()
+
+    def _publish_resumed(self):
+        # After _connect(), so nothing that happens during the catch-up is missed either
+        event = {'e': STREAM_RESUMED, 'E': int(time.time() * 1000)}
+        for handler in self._handlers.get(STREAM_RESUMED, ()):
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error("Handler error for %s: %s", STREAM_RESUMED, e)
+
+    def _keepalive_loop(self):
+        while not self._stopped.wait(KEEPALIVE_INTERVAL):
+            try:
+                self.client.renew_listen_key(self.listen_key)
+                logger.debug("Listen key renewed.")
+            except Exception as e:
+                logger.error("Listen key renewal failed: %s", e)
+                self._reconnect()
+
+    def _on_disconnect(self, socket_manager, *args):
+        current = self.ws_client.socket_manager if self.ws_client else None
+        if socket_manager is not current:
+            # Close of a socket we already replaced
+            return
+        if not self._stopped.is_set():
+            logger.error("User data stream disconnected: %s", args[0] if args else 'closed')
+            threading.Thread(target=self._reconnect, daemon=True).start()
+
+    def _on_message(self, _, message):
+        received = time.time()
+        try:
+            data = loads(message) if isinstance(message, (str, bytes)) else message
+        except ValueError as e:
+            self.metrics.inc('ws_bad_events_total', event="unparsed")
+            logger.error("WS Parse Error: %s", e)
+            return
+        try:
+            self._dispatch(data, received)
+        except Exception as e:
+            # A malformed or unexpected event must not reach the socket manager, whose error path reconnects
+            event_type = data.get('e') if isinstance(data, dict) else None
+            self.metrics.inc('ws_bad_events_total', event=event_type)
+            logger.error("Could not dispatch %s event: %r", event_type, e)
+
+    def _dispatch(self, data: dict, received: float):
+        event_type = data.get('e')
+        if event_type is None:
+            # Subscription acks ({"result": null, "id": 1})
+            return
+        if event_type == 'listenKeyExpired':
+            threading.Thread(target=self._reconnect, daemon=True).start()
+            return
+
+        handlers = self._handlers.get(event_type, ())
+        route = None
+        if event_type == 'ORDER_TRADE_UPDATE' and self._order_routes:
+            route = self._order_routes.get(data['o']['c'])
+        if not handlers and route is None:
+            return
+
+        record = RECORDS.get(event_type)
+        event = record(data) if record is not None else data
+        timers = self._timers.get(event_type)
+        if timers is None:
+            timers = self._timers[event_type] = (self.metrics.histogram('ws_event_lag_seconds', event=event_type),
+                                                 self.metrics.histogram('ws_handler_seconds', event=event_type))
+        if 'E' in data:
+            # Includes local clock skew against the exchange
+            timers[0](max(received - data['E'] / 1000, 0.0))
+
+        start = time.perf_counter()
+        for handler in handlers:
+            try:
+                handler(event)
+            except Exception as e:
+                logger.error("Handler error for %s: %s", event_type, e)
+        if route is not None:
+            try:
+                route(event)
+            except Exception as e:
+                logger.error("Order handler error for %s: %s", data['o']['c'], e)
+        timers[1](time.perf_counter() - start)
+
+
+_streams: Dict[str, UserDataStream] = {}
+_streams_lock = threading.Lock()
+
+
+def get_user_stream(account: str = "default") -> UserDataStream:
+    """Returns the shared user-data stream for an account (not started until start() is called)."""
+    with _streams_lock:
+        stream = _streams.get(account)
+        if stream is None:
+            stream = UserDataStream(get_client(account))
+            _streams[account] = stream
+        return stream
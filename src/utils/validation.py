@@ -1,4 +1,7 @@
-from typing import Literal, Tuple
+from datetime import datetime, timezone
+from typing import Literal, Optional, Tuple
+
+from utils.metadata import get_metadata_store
 
 def validate_side(side: str) -> str:
     """Validates and normalizes order side."""
@@ -19,9 +22,27 @@ def validate_symbol(symbol: str) -> str:
         raise ValueError(f"Invalid symbol format: {symbol}")
     return symbol.upper()
 
+def parse_timestamp(value: Optional[str]) -> Optional[float]:
+    """ISO date or datetime, UTC unless it carries an offset, as epoch seconds."""
+    if value is None:
+        return None
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.timestamp()
+
+def get_symbol_info(client, symbol: str) -> dict:
+    """
+    Returns cached metadata (precision, tick size, step size, min notional) for a symbol.
+
+    Served from the process-wide metadata store; the exchange is only queried
+    when the on-disk cache is stale or missing.
+    """
+    return get_metadata_store().get(symbol, client)
+
 def get_symbol_precision(client, symbol: str) -> Tuple[int, int]:
     """
-    Fetches price and quantity precision from exchange info.
+    Fetches price and quantity precision from the symbol metadata cache.
     
     Args:
         client: Binance futures client instance
@@ -32,21 +53,7 @@ def get_symbol_precision(client, symbol: str) -> Tuple[int, int]:
     
     Raises:
         ValueError: If symbol not found in exchange info
+        MetadataUnavailableError: If the cache is stale or missing and cannot be refreshed
     """
-    try:
-        exchange_info = client.exchange_info()
-        
-        for sym_info in exchange_info['symbols']:
-            if sym_info['symbol'] == symbol:
-                price_precision = sym_info['pricePrecision']
-                quantity_precision = sym_info['quantityPrecision']
-                return (price_precision, quantity_precision)
-        
-        # If symbol not found
-        raise ValueError(f"Symbol {symbol} not found in exchange info")
-    
-    except Exception as e:
-        # Fallback to default precisions if API call fails
-        # BTCUSDT typical: price=2, qty=3
-        print(f"Warning: Could not fetch precision for {symbol}, using defaults: {e}")
-        return (2, 3)  # Conservative defaults
\ No newline at end of file
+    info = get_symbol_info(client, symbol)
+    return (info['price_precision'], info['quantity_precision'])
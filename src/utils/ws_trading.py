@@ -0,0 +1,359 @@
+import itertools
+import json
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import Future, TimeoutError as FutureTimeout
+from typing import Dict, Optional, Tuple
+
+import websocket
+from binance.error import ClientError
+
+from utils.config import get_client, setup_logger, WS_API_URL
+from utils.metrics import get_metrics
+from utils.submission import lookup_order, settle_time
+
+logger = setup_logger("ws_trading")
+
+# 'rest' or 'ws': how strategies send orders unless they choose a transport themselves
+ORDER_TRANSPORT = os.getenv("ORDER_TRANSPORT", "rest").lower()
+# Seconds to wait for a websocket API response before the session is considered broken
+WS_API_TIMEOUT = float(os.getenv("WS_API_TIMEOUT", "5"))
+# After a failed connect, orders go straight to REST for this many seconds before the socket is retried
+WS_API_RETRY_SECONDS = 5.0
+
+# websocket API method -> the REST call it replaces (rate limit cost and priority)
+WS_METHODS = {
+    'order.place': ("POST", "/fapi/v1/order"),
+    'order.cancel': ("DELETE", "/fapi/v1/order"),
+    'order.status': ("GET", "/fapi/v1/order"),
+}
+
+# rateLimits entries of a response -> the X-MBX-* header the rate limiter already understands
+LIMIT_HEADERS = {
+    ('REQUEST_WEIGHT', 'MINUTE', 1): "X-MBX-USED-WEIGHT-1M",
+    ('ORDERS', 'SECOND', 10): "X-MBX-ORDER-COUNT-10S",
+    ('ORDERS', 'MINUTE', 1): "X-MBX-ORDER-COUNT-1M",
+}
+
+
+class WsTransportError(Exception):
+    """
+    The websocket session could not carry a request. `sent` tells whether it
+    may have reached the exchange (no response before the timeout or the
+    disconnect), in which case its outcome is unknown.
+    """
+
+    def __init__(self, message: str, sent: bool):
+        super().__init__(message)
+        self.sent = sent
+
+
+def _wire_value(value) -> str:
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    return str(value)
+
+
+class WsTradingSession:
+    """
+    One persistent, authenticated connection to the Binance futures websocket
+    API (order.place, order.cancel, order.status).
+
+    Requests carry an id and are answered out of band on a reader thread, so
+    any number can be in flight at once (pipelining) and a caller only waits
+    for its own response. Each request is HMAC-signed with the client's key
+    and synchronized clock, admitted by the process-wide rate limiter like the
+    REST call it replaces, and the rateLimits of every response are fed back
+    into it. After a drop the connection is re-opened in the background while
+    requests are refused, so callers fall back instead of waiting on a handshake.
+    """
+
+    def __init__(self, client, url: str = WS_API_URL, timeout: float = WS_API_TIMEOUT):
+        self.client = client
+        self.url = url
+        self.timeout = timeout
+        self.ws: Optional[websocket.WebSocket] = None
+        self._pending: Dict[int, Tuple[Future, str, float]] = {}
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+        self._retry_at = 0.0
+        self._connecting = False
+        self.metrics = get_metrics()
+
+    @property
+    def connected(self) -> bool:
+        ws = self.ws
+        return ws is not None and ws.connected
+
+    def connect(self):
+        """Opens the session if it is not open. Raises WsTransportError (never sent) on failure."""
+        with self._lock:
+            if self.connected:
+                return
+            if time.monotonic() < self._retry_at:
+                raise WsTransportError("Websocket API unavailable, retrying later", sent=False)
+            try:
+                ws = websocket.create_connection(self.url, timeout=self.timeout,
+                                                 sockopt=((socket.IPPROTO_TCP, socket.TCP_NODELAY, 1),))
+            except Exception as e:
+                self._retry_at = time.monotonic() + WS_API_RETRY_SECONDS
+                logger.warning("Websocket API connect to %s failed: %s", self.url, e)
+                raise WsTransportError(f"Websocket API connect failed: {e}", sent=False)
+            # Responses may be minutes apart; only requests time out
+            ws.settimeout(None)
+            self.ws = ws
+        threading.Thread(target=self._read_loop, args=(ws,), name="ws-trading", daemon=True).start()
+        logger.info("Websocket API session open: %s", self.url)
+
+    def close(self):
+        ws = self.ws
+        if ws is not None:
+            self._drop(ws, "session closed")
+
+    def submit(self, method: str, params: dict) -> Future:
+        """Signs and sends one request without waiting; the Future resolves to its result or ClientError."""
+        return self._send(method, params)[0]
+
+    def _send(self, method: str, params: dict) -> Tuple[Future, websocket.WebSocket]:
+        """submit(), also returning the connection the request went out on."""
+        if not self.connected:
+            # An order never waits for a handshake: this one goes over REST while the session reopens
+            self._reconnect_in_background()
+            raise WsTransportError("Websocket API session is not open", sent=False)
+        request_id = next(self._ids)
+        future: Future = Future()
+        message = json.dumps({'id': request_id, 'method': method, 'params': self._sign(params)})
+        with self._lock:
+            ws = self.ws
+            if ws is None:
+                raise WsTransportError("Websocket API session dropped", sent=False)
+            self._pending[request_id] = (future, method, time.perf_counter())
+        try:
+            ws.send(message)
+        except Exception as e:
+            with self._lock:
+                self._pending.pop(request_id, None)
+            self._drop(ws, e)
+            raise WsTransportError(f"Websocket API send failed: {e}", sent=False)
+        return future, ws
+
+    def request(self, method: str, params: dict, timeout: Optional[float] = None) -> dict:
+        """
+        Sends one request and waits for its result, at most `timeout` seconds
+        (default: the session's). Like a signed REST call, a -1021 resyncs the
+        clock and resends once.
+
+        Raises:
+            ClientError: The exchange answered with an error
+            WsTransportError: The session failed; see `sent`
+        """
+        timeout = timeout or self.timeout
+        http_method, path = WS_METHODS[method]
+        for attempt in range(2):
+            self.client._admit(http_method, path, params)
+            future, ws = self._send(method, params)
+            try:
+                return future.result(timeout)
+            except FutureTimeout:
+                # A session that leaves a request unanswered this long is not trusted with the next one.
+                # Only the connection it went out on: another thread may already have reconnected
+                self._drop(ws, f"no response to {method} within {timeout}s")
+                raise WsTransportError(f"No response to {method} within {timeout}s", sent=True)
+            except ClientError as e:
+                if e.error_code != -1021 or attempt:
+                    raise
+                self.metrics.inc('clock_resyncs_total', endpoint=method)
+                self.client.clock.sync()
+
+    def _reconnect_in_background(self):
+        with self._lock:
+            if self._connecting or time.monotonic() < self._retry_at:
+                return
+            self._connecting = True
+
+        def reconnect():
+            try:
+                self.connect()
+            except WsTransportError:
+                pass
+            finally:
+                self._connecting = False
+
+        threading.Thread(target=reconnect, name="ws-trading-connect", daemon=True).start()
+
+    def _sign(self, params: dict) -> dict:
+        signed = {key: _wire_value(value) for key, value in params.items() if value is not None}
+        signed['apiKey'] = self.client.key
+        signed.setdefault('recvWindow', str(self.client.recv_window))
+        signed['timestamp'] = str(self.client.clock.timestamp())
+        # Same HMAC as REST, over the parameters sorted by name
+        signed['signature'] = self.client._get_sign("&".join(f"{k}={v}" for k, v in sorted(signed.items())))
+        return signed
+
+    def _read_loop(self, ws: websocket.WebSocket):
+        while True:
+            try:
+                message = ws.recv()
+            except Exception as e:
+                self._drop(ws, e)
+                return
+            if not message:
+                self._drop(ws, "closed by server")
+                return
+            try:
+                response = json.loads(message)
+            except ValueError:
+                continue
+
+            with self._lock:
+                entry = self._pending.pop(response.get('id'), None)
+            if entry is None:
+                # Answer to a request that already timed out
+                continue
+            future, method, started = entry
+            self.metrics.observe('exchange_request_seconds', time.perf_counter() - started,
+                                 method="WS", endpoint=method)
+            status = response.get('status', 0)
+            self._update_limits(status, response.get('rateLimits'))
+            if status == 200:
+                future.set_result(response.get('result'))
+            else:
+                error = response.get('error') or {}
+                self.metrics.inc('exchange_errors_total', method="WS", endpoint=method, code=error.get('code'))
+                future.set_exception(ClientError(status, error.get('code'), error.get('msg'), {}))
+
+    def _update_limits(self, status: int, rate_limits):
+        headers = {}
+        for limit in rate_limits or []:
+            header = LIMIT_HEADERS.get((limit.get('rateLimitType'), limit.get('interval'), limit.get('intervalNum')))
+            if header:
+                headers[header] = limit.get('count')
+        if headers or status in (418, 429):
+            self.client.rate_limiter.update_from_headers(status, headers)
+
+    def _drop(self, ws, reason):
+        """Closes a broken connection and fails every request still waiting on it."""
+        with self._lock:
+            if ws is None or self.ws is not ws:
+                return
+            self.ws = None
+            pending, self._pending = self._pending, {}
+        try:
+            ws.close()
+        except Exception:
+            pass
+        if pending:
+            logger.warning("Websocket API session lost with %s request(s) in flight: %s", len(pending), reason)
+        else:
+            logger.info("Websocket API session closed: %s", reason)
+        for future, method, _ in pending.values():
+            future.set_exception(WsTransportError(f"Session lost before {method} was answered: {reason}", sent=True))
+
+
+class WsOrderTransport:
+    """
+    Order entry over a WsTradingSession, with the new_order / cancel_order /
+    query_order signatures of the REST client so strategies can use either.
+
+    Whenever the session cannot carry a request the REST client takes over.
+    A new order whose request may have reached the exchange is looked up by
+    its clientOrderId until its recvWindow has passed, and only resent over
+    REST if it still does not exist, so a dropped connection never places an
+    order twice.
+    """
+
+    def __init__(self, client, session: Optional[WsTradingSession] = None):
+        self.client = client
+        self.session = session or WsTradingSession(client)
+        self.metrics = get_metrics()
+
+    def new_order(self, **params) -> dict:
+        if not params.get('newClientOrderId'):
+            # Needed to reconcile an order whose response was lost
+            params['newClientOrderId'] = f"ws-{uuid.uuid4().hex[:24]}"
+        # An order sent with a recvWindow (submit_order's deadline) is not waited for longer than that
+        timeout = int(params['recvWindow']) / 1000 if params.get('recvWindow') else None
+        try:
+            return self.session.request('order.place', params, timeout)
+        except WsTransportError as e:
+            self._fell_back('order.place', e)
+            if e.sent:
+                return self._reconcile_order(params)
+        return self.client.new_order(**params)
+
+    def cancel_order(self, symbol: str, orderId: int = None, origClientOrderId: str = None, **kwargs) -> dict:
+        params = {'symbol': symbol, 'orderId': orderId, 'origClientOrderId': origClientOrderId, **kwargs}
+        try:
+            return self.session.request('order.cancel', params)
+        except WsTransportError as e:
+            # Resending is safe: if the first cancel went through this one fails with -2011
+            self._fell_back('order.cancel', e)
+        return self.client.cancel_order(**params)
+
+    def query_order(self, symbol: str, orderId: int = None, origClientOrderId: str = None, **kwargs) -> dict:
+        params = {'symbol': symbol, 'orderId': orderId, 'origClientOrderId': origClientOrderId, **kwargs}
+        try:
+            return self.session.request('order.status', params)
+        except WsTransportError as e:
+            self._fell_back('order.status', e)
+        return self.client.query_order(**params)
+
+    def close(self):
+        self.session.close()
+
+    def _reconcile_order(self, params: dict) -> dict:
+        # The request may still be in the exchange's pipeline: keep looking until its recvWindow has passed.
+        # A failing lookup propagates, leaving the unknown order to the caller instead of resending it.
+        recv_window = int(params.get('recvWindow') or self.client.recv_window)
+        order = lookup_order(self.client, params['symbol'], params['newClientOrderId'], settle=settle_time(recv_window))
+        if order is not None:
+            logger.info("Order %s reached the exchange before the websocket dropped", params['newClientOrderId'],
+                        extra={'order_id': order.get('orderId'), 'symbol': params['symbol']})
+            return order
+        return self.client.new_order(**params)
+
+    def _fell_back(self, method: str, error: WsTransportError):
+        self.metrics.inc('order_transport_fallbacks_total', method=method, sent=error.sent)
+        logger.warning("%s falling back to REST: %s", method, error)
+
+
+_transports: Dict[Tuple[str, str], WsOrderTransport] = {}
+_transports_lock = threading.Lock()
+
+
+def get_order_transport(client=None, transport: Optional[str] = None):
+    """
+    Returns what a strategy should call new_order / cancel_order / query_order
+    on: the REST client itself for 'rest', or the websocket transport shared
+    by every strategy of the same account for 'ws' (connected on first use).
+    Defaults to ORDER_TRANSPORT.
+    """
+    client = client or get_client()
+    transport = (transport or ORDER_TRANSPORT).lower()
+    if transport == "rest":
+        return client
+    if transport != "ws":
+        raise ValueError(f"Unknown order transport '{transport}' (use 'rest' or 'ws')")
+
+    key = (client.base_url, client.key)
+    with _transports_lock:
+        orders = _transports.get(key)
+        if orders is None:
+            orders = WsOrderTransport(client)
+            _transports[key] = orders
+    try:
+        # Opened now so the first order does not pay for the handshake
+        orders.session.connect()
+    except WsTransportError:
+        pass
+    return orders
+
+
+def close_transports():
+    with _transports_lock:
+        for orders in _transports.values():
+            orders.close()
+        _transports.clear()
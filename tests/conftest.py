@@ -0,0 +1,16 @@
+import os
+import sys
+import tempfile
+
+# Modules import each other as top-level packages (utils, advanced, simulator), like the scripts do
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src"))
+
+# Read at import time: keep tests off the working tree's journal, store, cache and log
+_scratch = tempfile.mkdtemp(prefix="cli-trader-tests-")
+os.environ.setdefault("ORDER_JOURNAL_PATH", "")
+os.environ.setdefault("EXECUTION_STORE_PATH", "")
+os.environ.setdefault("SYMBOL_CACHE_PATH", os.path.join(_scratch, "exchange_info.json"))
+os.environ.setdefault("LOG_FILE", os.path.join(_scratch, "bot.log"))
+os.environ.setdefault("LOG_CONSOLE_LEVEL", "CRITICAL")
+os.environ.setdefault("BINANCE_API_KEY", "test")
+os.environ.setdefault("BINANCE_SECRET_KEY", "test")
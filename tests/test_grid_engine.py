@@ -0,0 +1,71 @@
+from requests.exceptions import ConnectionError, ReadTimeout
+
+from advanced.grid_engine import GridEngine
+from simulator.client import SimulatedClient
+from utils.account_state import AccountState
+from utils.user_stream import UserDataStream
+
+
+class SimStream(UserDataStream):
+    """The real user stream's dispatch, fed straight from the simulator."""
+
+    def __init__(self, client):
+        super().__init__(client)
+        client.add_listener(lambda event: self._on_message(None, event))
+
+    def start(self):
+        pass
+
+
+class LostBatch(SimulatedClient):
+    """The first batchOrders request executes but its response is lost; lookups fail while `lookups_fail` is set."""
+
+    def __init__(self):
+        super().__init__()
+        self.batches = 0
+        self.lookups_fail = True
+
+    def new_batch_order(self, batchOrders: list):
+        self.batches += 1
+        response = super().new_batch_order(batchOrders)
+        if self.batches == 1:
+            raise ReadTimeout("simulated lost response")
+        return response
+
+    def query_order(self, symbol: str, orderId: int = None, origClientOrderId: str = None, **kwargs):
+        if self.lookups_fail:
+            raise ConnectionError("simulated lookup failure")
+        return super().query_order(symbol, orderId, origClientOrderId, **kwargs)
+
+
+def engine_on(client) -> GridEngine:
+    stream = SimStream(client)
+    account_state = AccountState(client=client, stream=stream)
+    account_state.start()
+    # 6 levels 88000-92000, gap at the one nearest 90000: every other level holds an order
+    engine = GridEngine("BTCUSDT", 88000, 92000, 5, 0.002, client=client, stream=stream, account_state=account_state)
+    engine.start(adopt=False)
+    return engine
+
+
+def test_unknown_placement_is_tracked_not_placed_twice():
+    client = LostBatch()
+    engine = engine_on(client)
+    assert len(client.get_orders(symbol="BTCUSDT")) == len(engine.live) == 5
+
+    client.lookups_fail = False
+    counts = engine.recenter(88000, 92000)
+    assert counts['placed'] == 0
+    assert len(client.get_orders(symbol="BTCUSDT")) == 5
+    assert all(order.order_id is not None for order in engine.live.values())
+
+    engine.stop(cancel=True)
+    assert client.get_orders(symbol="BTCUSDT") == []
+
+
+def test_stop_cancels_orders_settled_by_its_lookup():
+    client = LostBatch()
+    engine = engine_on(client)
+    client.lookups_fail = False
+    engine.stop(cancel=True)
+    assert client.get_orders(symbol="BTCUSDT") == []
@@ -0,0 +1,80 @@
+import pytest
+from binance.error import ClientError
+from requests.exceptions import ReadTimeout
+
+from advanced.scheduler import TWAPOrder, run_parents
+from advanced.twap import twap_from_record
+from simulator.client import SimulatedClient
+from utils.journal import OrderJournal, STATUS_UNKNOWN
+
+
+class InstantClock:
+    def __init__(self):
+        self.t = 0.0
+
+    def now(self) -> float:
+        return self.t
+
+    async def sleep_until(self, deadline: float):
+        self.t = max(self.t, deadline)
+
+
+class BrokenLookups(SimulatedClient):
+    """Every status lookup by clientOrderId fails with `error`."""
+
+    def __init__(self, error: Exception):
+        super().__init__()
+        self.error = error
+        self.sent = []
+
+    def new_order(self, symbol: str, side: str, type: str, **kwargs):
+        self.sent.append(float(kwargs['quantity']))
+        return super().new_order(symbol, side, type, **kwargs)
+
+    def query_order(self, symbol: str, orderId: int = None, origClientOrderId: str = None, **kwargs):
+        raise self.error
+
+
+def position(client, symbol="BTCUSDT") -> float:
+    return next(float(p['positionAmt']) for p in client.get_position_risk() if p['symbol'] == symbol)
+
+
+@pytest.fixture
+def journal(tmp_path):
+    journal = OrderJournal(str(tmp_path / "orders.db"))
+    yield journal
+    journal.close()
+
+
+def crashed_twap(client, journal) -> str:
+    """A 0.01 TWAP in 5 chunks that crashed after chunk 2 executed on the exchange but before its ack was journaled."""
+    parent = TWAPOrder("BTCUSDT", "BUY", 0.01, 60, 5, transport="rest")
+    strategy_id = journal.start_strategy("twap", parent.journal_params())
+    for tag in ("c0", "c1"):
+        order = {'symbol': "BTCUSDT", 'side': "BUY", 'type': "MARKET", 'quantity': 0.002}
+        client_order_id = journal.intent(strategy_id, tag, order)
+        response = client.new_order(newClientOrderId=client_order_id, newOrderRespType="RESULT", **order)
+        if tag == "c0":
+            journal.ack(client_order_id, response)
+    journal.flush()
+    return strategy_id
+
+
+@pytest.mark.parametrize("error", [ReadTimeout("simulated timeout"),
+                                   ClientError(400, -1021, "Timestamp outside of the recvWindow.", {})])
+def test_unsettled_intent_is_not_resent_on_resume(journal, error):
+    client = BrokenLookups(error)
+    strategy_id = crashed_twap(client, journal)
+
+    records = journal.reconcile(client, journal.load_unfinished())
+    assert records[strategy_id].orders_by_tag()["c1"].status == STATUS_UNKNOWN
+
+    parent = twap_from_record(records[strategy_id], journal)
+    assert parent.first_slice == 2
+    assert parent.unknown_qty == pytest.approx(0.002)
+    run_parents([parent], client=client, journal=journal, clock=InstantClock())
+
+    assert position(client) == pytest.approx(0.01)
+    assert client.sent == [0.002] * 5
+    # Still unfinished: the next recovery looks chunk 2 up again
+    assert strategy_id in journal.load_unfinished()
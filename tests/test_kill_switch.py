@@ -0,0 +1,88 @@
+import pytest
+from requests.exceptions import ConnectionError
+
+from simulator.client import SimulatedClient
+from utils.account_state import AccountState
+from utils.kill_switch import KillSwitch
+from utils.user_stream import UserDataStream
+
+
+class SimStream(UserDataStream):
+    """The real user stream's dispatch, fed straight from the simulator."""
+
+    def __init__(self, client):
+        super().__init__(client)
+        client.add_listener(lambda event: self._on_message(None, event))
+
+    def start(self):
+        pass
+
+
+class FailingCloses(SimulatedClient):
+    """The first `fails` reduce-only orders never reach the exchange; with `recheck_fails`, neither do later reads."""
+
+    def __init__(self, fails: int, recheck_fails: bool = False):
+        super().__init__()
+        self.fails = fails
+        self.recheck_fails = recheck_fails
+        self.closes = 0
+
+    def new_order(self, symbol: str, side: str, type: str, **kwargs):
+        if kwargs.get('reduceOnly') == "true":
+            self.closes += 1
+            if self.fails > 0:
+                self.fails -= 1
+                raise ConnectionError("simulated connection reset")
+        return super().new_order(symbol, side, type, **kwargs)
+
+    def get_orders(self, **kwargs):
+        if self.recheck_fails and self.closes:
+            raise ConnectionError("simulated connection reset")
+        return super().get_orders(**kwargs)
+
+
+def kill(client) -> dict:
+    client.new_order(symbol="BTCUSDT", side="BUY", type="MARKET", quantity=0.02)
+    account_state = AccountState(client=client, stream=SimStream(client))
+    account_state.start()
+    try:
+        return KillSwitch(client, account_state=account_state, journal=False, timeout=0.2).trigger()
+    finally:
+        account_state.stop()
+
+
+def position(client, symbol="BTCUSDT") -> float:
+    return next(float(p['positionAmt']) for p in client.get_position_risk() if p['symbol'] == symbol)
+
+
+def test_flattens_and_reports_the_close():
+    client = FailingCloses(fails=0)
+    report = kill(client)
+    assert report['flat']
+    assert report['symbols']['BTCUSDT']['closed_qty'] == pytest.approx(0.02)
+    assert position(client) == 0
+
+
+def test_failed_close_is_retried_once_after_the_recheck():
+    client = FailingCloses(fails=1)
+    report = kill(client)
+    assert report['flat']
+    assert client.closes == 2
+    assert 'error' not in report['symbols']['BTCUSDT']
+    assert position(client) == 0
+
+
+def test_reports_not_flat_when_the_retry_fails_too():
+    client = FailingCloses(fails=2)
+    report = kill(client)
+    assert not report['flat']
+    assert client.closes == 2
+    assert report['symbols']['BTCUSDT']['position'] == pytest.approx(0.02)
+    assert position(client) == pytest.approx(0.02)
+
+
+def test_failed_recheck_is_reported_not_raised():
+    client = FailingCloses(fails=1, recheck_fails=True)
+    report = kill(client)
+    assert not report['flat']
+    assert report['symbols']['BTCUSDT']['error'] == "simulated connection reset"
@@ -0,0 +1,34 @@
+import threading
+import time
+
+from simulator.client import SimulatedClient
+from utils.metadata import SymbolMetadataStore
+
+
+class CountingClient(SimulatedClient):
+    def __init__(self):
+        super().__init__()
+        self.fetches = 0
+
+    def exchange_info(self):
+        self.fetches += 1
+        return super().exchange_info()
+
+
+def test_failed_background_refresh_keeps_the_cache_and_is_retried(tmp_path, monkeypatch):
+    escaped = []
+    monkeypatch.setattr(threading, "excepthook", escaped.append)
+    # The cache directory is a file, so every save fails with an OSError
+    (tmp_path / "blocked").write_text("")
+    client = CountingClient()
+    store = SymbolMetadataStore(path=str(tmp_path / "blocked" / "exchange_info.json"), ttl=60)
+    store._index = {'BTCUSDT': {'tick_size': "0.10"}}
+    store._fetched_at = time.time() - 45
+
+    for _ in range(2):
+        assert store.get("BTCUSDT", client)['tick_size'] == "0.10"
+        store._refresh_thread.join()
+        store._fetched_at = time.time() - 45
+
+    assert client.fetches == 2
+    assert escaped == []
@@ -0,0 +1,88 @@
+import pytest
+
+from advanced.oco import OCOEngine
+from simulator.client import SimulatedClient
+from utils.account_state import AccountState
+from utils.user_stream import UserDataStream
+
+
+class GappyStream(UserDataStream):
+    """The real user stream's dispatch, fed by the simulator, with a switch to drop events like a dead socket."""
+
+    def __init__(self, client):
+        super().__init__(client)
+        self.up = True
+        client.add_listener(self._deliver)
+
+    def _deliver(self, event):
+        if self.up:
+            self._on_message(None, event)
+
+    def start(self):
+        pass
+
+    def resume(self):
+        self.up = True
+        self._publish_resumed()
+
+
+@pytest.fixture
+def sim():
+    client = SimulatedClient()
+    # Long 0.02 BTC (filled against the simulated market): after a 0.01 leg fills, its sibling stays live
+    client.new_order(symbol="BTCUSDT", side="BUY", type="MARKET", quantity=0.02)
+    return client
+
+
+@pytest.fixture
+def engine(sim):
+    stream = GappyStream(sim)
+    account_state = AccountState(client=sim, stream=stream)
+    account_state.start()
+    engine = OCOEngine(client=sim, stream=stream, journal=False, account_state=account_state, transport="rest")
+    engine.start()
+    yield engine
+    engine.stop()
+    account_state.stop()
+
+
+def _open_ids(sim):
+    return {order['orderId'] for order in sim.get_orders(symbol="BTCUSDT")}
+
+
+def test_fill_cancels_sibling(sim, engine):
+    pair = engine.add_pair("BTCUSDT", 0.01, 91000, 89000)
+    sim.print_trade("BTCUSDT", 91000.1, through=True)
+    assert engine.wait(2)
+    assert pair.filled_order_id == pair.tp_order_id
+    assert _open_ids(sim) == set()
+
+
+def test_fill_during_stream_gap_is_reconciled_on_resume(sim, engine):
+    pair = engine.add_pair("BTCUSDT", 0.01, 91000, 89000)
+    engine.stream.up = False
+    sim.print_trade("BTCUSDT", 91000.1, through=True)
+    assert not engine.wait(0.1)
+    assert _open_ids(sim) == {pair.sl_order_id}
+
+    engine.stream.resume()
+    assert engine.wait(2)
+    assert pair.filled_order_id == pair.tp_order_id
+    assert _open_ids(sim) == set()
+
+
+def test_external_tp_cancel_keeps_the_stop(sim, engine):
+    pair = engine.add_pair("BTCUSDT", 0.01, 91000, 89000)
+    sim.cancel_order(symbol="BTCUSDT", orderId=pair.tp_order_id)
+    assert engine.wait(2)
+    assert pair.filled_order_id is None
+    assert _open_ids(sim) == {pair.sl_order_id}
+
+
+def test_external_cancel_during_gap_keeps_the_stop(sim, engine):
+    pair = engine.add_pair("BTCUSDT", 0.01, 91000, 89000)
+    engine.stream.up = False
+    sim.cancel_order(symbol="BTCUSDT", orderId=pair.tp_order_id)
+    engine.stream.resume()
+    assert engine.wait(2)
+    assert _open_ids(sim) == {pair.sl_order_id}
@@ -0,0 +1,123 @@
+import threading
+import time
+
+import pytest
+
+from utils.rate_limiter import (
+    PRIORITY_BULK, PRIORITY_CANCEL, PRIORITY_NORMAL, PRIORITY_PROTECTIVE,
+    RateLimitScheduler, TokenBucket, classify_priority, request_cost, request_priority,
+)
+
+
+def test_request_cost_weights():
+    assert request_cost("GET", "/fapi/v3/account", {}) == (5, 0)
+    assert request_cost("GET", "/fapi/v3/positionRisk", None) == (5, 0)
+    assert request_cost("GET", "/fapi/v1/openOrders", {'symbol': "BTCUSDT"}) == (1, 0)
+    assert request_cost("GET", "/fapi/v1/openOrders", {}) == (40, 0)
+    assert request_cost("GET", "/fapi/v1/depth?symbol=BTCUSDT", {'limit': 1000}) == (20, 0)
+    assert request_cost("GET", "/fapi/v1/depth", {'limit': 50}) == (2, 0)
+    assert request_cost("GET", "/fapi/v1/unlisted", {}) == (1, 0)
+
+
+def test_request_cost_order_count():
+    assert request_cost("POST", "/fapi/v1/order", {'type': "LIMIT"}) == (1, 1)
+    assert request_cost("POST", "/fapi/v1/batchOrders", {'batchOrders': [{}, {}, {}]}) == (5, 3)
+    assert request_cost("DELETE", "/fapi/v1/order", {}) == (1, 0)
+
+
+@pytest.mark.parametrize("method, path, payload, expected", [
+    ("DELETE", "/fapi/v1/order", {}, PRIORITY_CANCEL),
+    ("POST", "/fapi/v1/countdownCancelAll", {}, PRIORITY_CANCEL),
+    ("POST", "/fapi/v1/order", {'type': "STOP_MARKET"}, PRIORITY_PROTECTIVE),
+    ("POST", "/fapi/v1/order", {'type': "MARKET", 'reduceOnly': "true"}, PRIORITY_PROTECTIVE),
+    ("POST", "/fapi/v1/order", {'type': "LIMIT"}, PRIORITY_NORMAL),
+    ("GET", "/fapi/v3/account", {}, PRIORITY_NORMAL),
+])
+def test_classify_priority(method, path, payload, expected):
+    assert classify_priority(method, path, payload) == expected
+
+
+def test_request_priority_overrides_and_restores():
+    with request_priority(PRIORITY_BULK):
+        assert classify_priority("DELETE", "/fapi/v1/order", {}) == PRIORITY_BULK
+        with request_priority(PRIORITY_CANCEL):
+            assert classify_priority("POST", "/fapi/v1/order", {}) == PRIORITY_CANCEL
+        assert classify_priority("POST", "/fapi/v1/order", {}) == PRIORITY_BULK
+    assert classify_priority("DELETE", "/fapi/v1/order", {}) == PRIORITY_CANCEL
+
+
+def test_token_bucket_headroom_refill_and_sync():
+    bucket = TokenBucket(100, 10.0)
+    assert bucket.capacity == pytest.approx(90)
+    bucket.available = 0
+    assert bucket.wait_time(9) == pytest.approx(1.0)
+    bucket.refill(bucket.updated + 0.5)
+    assert bucket.available == pytest.approx(4.5)
+    bucket.refill(bucket.updated + 60)
+    assert bucket.available == pytest.approx(90)
+    # Usage reported by the exchange (e.g. another process) lowers what is left
+    bucket.sync_used(80)
+    assert bucket.available == pytest.approx(10)
+    bucket.sync_used(5)
+    assert bucket.available == pytest.approx(10)
+
+
+def _small_scheduler(weight_per_second: float) -> RateLimitScheduler:
+    scheduler = RateLimitScheduler()
+    scheduler.weight_1m = TokenBucket(1, 1.0)
+    scheduler.weight_1m.capacity = scheduler.weight_1m.available = 10
+    scheduler.weight_1m.rate = weight_per_second
+    return scheduler
+
+
+def test_acquire_consumes_weight_and_orders():
+    scheduler = RateLimitScheduler()
+    before = scheduler.usage()
+    scheduler.acquire(weight=5, orders=3)
+    usage = scheduler.usage()
+    assert usage['weight_1m'] - before['weight_1m'] == pytest.approx(5, abs=0.5)
+    assert usage['orders_10s'] == pytest.approx(3, abs=0.5)
+    assert usage['orders_1m'] == pytest.approx(3, abs=0.5)
+    assert usage['queued'] == 0
+
+
+def test_acquire_waits_for_budget():
+    scheduler = _small_scheduler(weight_per_second=50)
+    scheduler.acquire(weight=10)
+    start = time.monotonic()
+    scheduler.acquire(weight=5)
+    assert time.monotonic() - start >= 0.08
+
+
+def test_waiting_requests_served_by_priority():
+    scheduler = _small_scheduler(weight_per_second=40)
+    scheduler.acquire(weight=10)
+    served = []
+
+    def request(name, priority):
+        scheduler.acquire(weight=5, priority=priority)
+        served.append(name)
+
+    bulk = threading.Thread(target=request, args=("bulk", PRIORITY_BULK))
+    bulk.start()
+    time.sleep(0.02)
+    cancel = threading.Thread(target=request, args=("cancel", PRIORITY_CANCEL))
+    cancel.start()
+    bulk.join(2)
+    cancel.join(2)
+    # The bulk request queued first, but the cancel overtakes it
+    assert served == ["cancel", "bulk"]
+
+
+def test_headers_sync_budget_and_ban():
+    scheduler = RateLimitScheduler()
+    scheduler.update_from_headers(200, {'X-MBX-USED-WEIGHT-1M': "2000", 'X-MBX-ORDER-COUNT-10S': "bad"})
+    capacity = scheduler.weight_1m.capacity
+    assert scheduler.usage()['weight_1m'] == pytest.approx(2000, abs=1)
+    assert scheduler.weight_1m.available <= capacity - 2000 + 1
+
+    scheduler.update_from_headers(429, {'Retry-After': "0.2"})
+    assert 0 < scheduler.usage()['banned_for'] <= 0.2
+    start = time.monotonic()
+    scheduler.acquire(weight=1)
+    assert time.monotonic() - start >= 0.15
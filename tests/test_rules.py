@@ -0,0 +1,79 @@
+from decimal import Decimal
+
+import pytest
+
+from simulator.client import SimulatedClient
+from utils.rules import RuleViolation, check_orders, get_rules
+
+# Simulator BTCUSDT: tick 0.10, step 0.001, min notional 100, market max qty 120, PERCENT_PRICE 0.95-1.05
+REFERENCE = 90000.0
+
+
+@pytest.fixture
+def rules():
+    return get_rules(SimulatedClient(), "BTCUSDT")
+
+
+def test_filters_compiled_from_exchange_info(rules):
+    assert rules.tick_size == Decimal("0.10")
+    assert rules.step_size == Decimal("0.001")
+    assert rules.min_notional == Decimal("100")
+    assert rules.market_max_qty == Decimal("120")
+    assert rules.multiplier_down == Decimal("0.9500")
+
+
+def test_quantization_is_exact(rules):
+    assert rules.quantize_qty(0.0029999) == Decimal("0.002")
+    assert rules.quantize_price(90000.05) == Decimal("90000.1")
+    assert rules.price_from_ticks(900001) == Decimal("90000.1")
+
+
+def test_valid_orders_pass(rules):
+    assert rules.check_batch([0.002, 0.002, 0.5], [89000.0, None, 90000.1], [False, True, False],
+                             reference=REFERENCE) == [None, None, None]
+
+
+@pytest.mark.parametrize("quantity, price, market, stop, expected", [
+    (0.0005, 90000.0, False, None, "below minimum 0.001"),
+    (1001.0, 90000.0, False, None, "above maximum 1000"),
+    (121.0, None, True, None, "above maximum 120"),
+    (0.0025, 90000.0, False, None, "not a multiple of step size"),
+    (0.002, 90000.05, False, None, "not a multiple of tick size"),
+    (0.002, 90000.0, False, 89000.05, "stop price 89000.05 is not a multiple"),
+    (0.001, 90000.0, False, None, "notional 90 below minimum 100"),
+    (0.001, None, True, None, "notional 90 below minimum 100"),
+    (0.002, 80000.0, False, None, "outside"),
+    (0.002, 95000.0, False, None, "outside"),
+])
+def test_each_filter_rejects(rules, quantity, price, market, stop, expected):
+    reasons = rules.check_batch([0.002, quantity], [89000.0, price], [False, market],
+                                stop_prices=[None, stop], reference=REFERENCE)
+    assert reasons[0] is None
+    assert expected in reasons[1]
+
+
+def test_every_failing_filter_is_reported(rules):
+    reason = rules.check_batch([0.0005], [90000.05], [False], reference=REFERENCE)[0]
+    assert reason.count("; ") >= 2
+    assert "tick size" in reason and "below minimum 0.001" in reason and "notional" in reason
+
+
+def test_market_notional_and_percent_price_need_a_reference(rules):
+    assert rules.check_batch([0.001, 0.002], [None, 80000.0], [True, False]) == [None, None]
+
+
+def test_check_raises_rule_violation(rules):
+    with pytest.raises(RuleViolation, match="BTCUSDT"):
+        rules.check(0.001, 80000.0)
+
+
+def test_check_orders_keys_rejections():
+    orders = {
+        'ok': {'symbol': "BTCUSDT", 'side': "BUY", 'type': "LIMIT", 'quantity': 0.002, 'price': 89000.0},
+        'small': {'symbol': "BTCUSDT", 'side': "BUY", 'type': "LIMIT", 'quantity': 0.001, 'price': 80000.0},
+        'stop': {'symbol': "BTCUSDT", 'side': "SELL", 'type': "STOP", 'quantity': 0.002, 'price': 88000.0,
+                 'stopPrice': 88000.05},
+    }
+    rejected = check_orders(SimulatedClient(), orders, reference={'BTCUSDT': REFERENCE})
+    assert set(rejected) == {'small', 'stop'}
+    assert "outside" in rejected['small']
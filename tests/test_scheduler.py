@@ -0,0 +1,85 @@
+from decimal import Decimal
+
+import pytest
+from requests.exceptions import ConnectionError, ReadTimeout
+
+from advanced.scheduler import TWAPOrder, run_parents
+from simulator.client import SimulatedClient
+
+
+class InstantClock:
+    """Scheduler clock whose waits return at once, moving time to the deadline."""
+
+    def __init__(self):
+        self.t = 0.0
+
+    def now(self) -> float:
+        return self.t
+
+    async def sleep_until(self, deadline: float):
+        self.t = max(self.t, deadline)
+
+
+class PartialFills(SimulatedClient):
+    """Fills the first `partial` market orders only halfway; the rest of each is EXPIRED."""
+
+    def __init__(self, partial: int = 1):
+        super().__init__()
+        self.partial = partial
+        self.sent = []
+
+    def new_order(self, symbol: str, side: str, type: str, **kwargs):
+        self.sent.append(float(kwargs['quantity']))
+        if type != "MARKET" or self.partial <= 0:
+            return super().new_order(symbol, side, type, **kwargs)
+        self.partial -= 1
+        half = float(Decimal(str(kwargs['quantity'])) / 2)
+        response = super().new_order(symbol, side, type, **dict(kwargs, quantity=half))
+        return dict(response, origQty=str(kwargs['quantity']), status="EXPIRED")
+
+
+class LostChild(SimulatedClient):
+    """The `lost`-th market order (1-based) executes but its response is lost, and every status lookup fails."""
+
+    def __init__(self, lost: int):
+        super().__init__()
+        self.lost = lost
+        self.sent = []
+
+    def new_order(self, symbol: str, side: str, type: str, **kwargs):
+        self.sent.append(float(kwargs['quantity']))
+        response = super().new_order(symbol, side, type, **kwargs)
+        if len(self.sent) == self.lost:
+            raise ReadTimeout("simulated lost response")
+        return response
+
+    def query_order(self, symbol: str, orderId: int = None, origClientOrderId: str = None, **kwargs):
+        raise ConnectionError("simulated lookup failure")
+
+
+def position(client, symbol="BTCUSDT") -> float:
+    return next(float(p['positionAmt']) for p in client.get_position_risk() if p['symbol'] == symbol)
+
+
+def test_twap_counts_actual_fills_and_makes_up_partial_children():
+    client = PartialFills(partial=1)
+    parent = TWAPOrder("BTCUSDT", "BUY", 0.01, 60, 5, transport="rest")
+    run_parents([parent], client=client, journal=False, clock=InstantClock())
+
+    assert parent.executed_qty == pytest.approx(0.01)
+    assert position(client) == pytest.approx(0.01)
+    # Child 1 filled 0.001 of 0.002, so child 2 topped up to the schedule
+    assert client.sent[:2] == [0.002, 0.003]
+
+
+def test_twap_does_not_resend_a_child_with_an_unknown_outcome():
+    client = LostChild(lost=2)
+    parent = TWAPOrder("BTCUSDT", "BUY", 0.01, 60, 5, transport="rest")
+    run_parents([parent], client=client, journal=False, clock=InstantClock())
+
+    # Child 2 filled on the exchange; later slices must not send its quantity again
+    assert position(client) == pytest.approx(0.01)
+    assert client.sent == [0.002] * 5
+    assert parent.executed_qty == pytest.approx(0.008)
+    assert parent.unknown_qty == pytest.approx(0.002)
+    assert parent.remaining == 0
@@ -0,0 +1,133 @@
+import threading
+
+import pytest
+from binance.error import ClientError
+from requests.exceptions import ConnectionError, ReadTimeout
+
+from simulator.client import SimulatedClient
+from utils import submission
+from utils.bulk_orders import place_orders_bulk
+from utils.submission import SubmissionError, submit_order
+
+
+class Flaky(SimulatedClient):
+    """
+    Scripted network faults in front of the simulator, one mode per new_order call:
+    'ok'; 'lost' (executed, response lost); 'dropped' (never arrived); 'late' (response
+    lost and still in the pipeline: it executes only after `late_misses` lookups missed it).
+    """
+
+    def __init__(self, modes, late_misses: int = 1, lookup_fails: bool = False):
+        super().__init__()
+        self.modes = list(modes)
+        self.late_misses = late_misses
+        self.lookup_fails = lookup_fails
+        self.sent = 0
+        self.lookups = 0
+        self._late = None
+        self._faults = threading.Lock()
+
+    def _fault(self, send):
+        mode = self.modes.pop(0) if self.modes else "ok"
+        self.sent += 1
+        if mode == "ok":
+            return send()
+        if mode == "lost":
+            send()
+        elif mode == "late":
+            self._late = send
+        raise ReadTimeout(f"simulated {mode} request")
+
+    def new_order(self, symbol: str, side: str, type: str, **kwargs):
+        return self._fault(lambda: super(Flaky, self).new_order(symbol, side, type, **kwargs))
+
+    def new_batch_order(self, batchOrders: list):
+        return self._fault(lambda: super(Flaky, self).new_batch_order(batchOrders))
+
+    def query_order(self, symbol: str, orderId: int = None, origClientOrderId: str = None, **kwargs):
+        with self._faults:
+            self.lookups += 1
+            if self.lookup_fails:
+                raise ConnectionError("simulated lookup failure")
+            if self._late is not None and self.lookups > self.late_misses:
+                self._late, late = None, self._late
+                late()
+        return super().query_order(symbol, orderId, origClientOrderId, **kwargs)
+
+
+def position(client, symbol="BTCUSDT") -> float:
+    return next(float(p['positionAmt']) for p in client.get_position_risk() if p['symbol'] == symbol)
+
+
+@pytest.fixture(autouse=True)
+def fast_settle(monkeypatch):
+    # recvWindow follows the 0.2 s timeout below; no clock-skew allowance against the simulator
+    monkeypatch.setattr(submission, "MAX_CLOCK_AHEAD", 0.0)
+    monkeypatch.setattr(submission, "LOOKUP_BACKOFF", 0.01)
+
+
+def market(client, **kwargs):
+    return submit_order(client, timeout=0.2, symbol="BTCUSDT", side="BUY", type="MARKET", quantity=0.002, **kwargs)
+
+
+def test_lost_response_is_adopted():
+    client = Flaky(["lost"])
+    order = market(client)
+    assert order['status'] == "FILLED"
+    assert client.sent == 1
+    assert position(client) == pytest.approx(0.002)
+
+
+def test_order_still_in_flight_is_not_sent_twice():
+    client = Flaky(["late"], late_misses=2)
+    order = market(client)
+    assert order['status'] == "FILLED"
+    assert client.sent == 1
+    assert client.lookups == 3
+    assert position(client) == pytest.approx(0.002)
+
+
+def test_order_that_never_arrived_is_resent_with_the_same_id():
+    client = Flaky(["dropped"])
+    order = market(client, newClientOrderId="twap-abc")
+    assert order['clientOrderId'] == "twap-abc"
+    assert client.sent == 2
+    assert position(client) == pytest.approx(0.002)
+
+
+def test_retries_exhausted_means_not_placed():
+    client = Flaky(["dropped", "dropped"])
+    with pytest.raises(SubmissionError) as info:
+        market(client, retries=1)
+    assert not info.value.unknown
+    assert client.sent == 2
+    assert position(client) == 0
+
+
+def test_failed_lookup_leaves_the_outcome_unknown():
+    client = Flaky(["lost"], lookup_fails=True)
+    with pytest.raises(SubmissionError) as info:
+        market(client, retries=3)
+    assert info.value.unknown
+    assert client.sent == 1
+
+
+def test_exchange_rejection_is_not_retried():
+    client = Flaky([])
+    # Nothing to reduce: -2022
+    with pytest.raises(ClientError):
+        market(client, reduceOnly="true")
+    assert client.sent == 1
+    assert client.lookups == 0
+
+
+@pytest.mark.parametrize("mode, sent", [("lost", 1), ("late", 1), ("dropped", 2)])
+def test_bulk_unknown_batch_is_resolved_before_any_retry(monkeypatch, mode, sent):
+    monkeypatch.setattr("utils.bulk_orders.RECV_WINDOW", 200)
+    client = Flaky([mode])
+    orders = {level: {'symbol': "BTCUSDT", 'side': "BUY", 'type': "LIMIT", 'timeInForce': "GTC",
+                      'quantity': 0.002, 'price': 89000.0 + level * 100} for level in range(3)}
+    results = place_orders_bulk(client, orders, retries=1, validate=False)
+    assert all(result['ok'] for result in results.values())
+    assert client.sent == sent
+    assert len(client.get_orders()) == 3
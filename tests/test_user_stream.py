@@ -0,0 +1,54 @@
+import json
+
+import pytest
+
+from utils.events import loads
+from utils.market_stream import MarketStream
+from utils.user_stream import UserDataStream
+
+ORDER_TRADE_UPDATE = {"e": "ORDER_TRADE_UPDATE", "E": 1700000000001, "T": 1700000000000,
+                      "o": {"s": "BTCUSDT", "c": "twap-1234abcd-c1", "S": "BUY", "X": "FILLED", "i": 1,
+                            "z": "0.002", "ap": "90000"}}
+
+
+@pytest.fixture
+def stream():
+    stream = UserDataStream(client=object())
+    stream.received = []
+    stream.subscribe('ORDER_TRADE_UPDATE', lambda update: stream.received.append(update.client_order_id))
+    stream.route_order("twap-1234abcd-c1", lambda update: None)
+    return stream
+
+
+@pytest.mark.parametrize("bad", [
+    {"e": "ORDER_TRADE_UPDATE", "E": 1700000000001},
+    {"e": "ORDER_TRADE_UPDATE", "o": {"c": "twap-1234abcd-c1"}},
+    {"e": "ORDER_TRADE_UPDATE", "o": []},
+    [],
+])
+def test_malformed_event_is_dropped_and_the_stream_keeps_working(stream, bad):
+    stream._on_message(None, json.dumps(bad))
+    stream._on_message(None, json.dumps(ORDER_TRADE_UPDATE))
+    assert stream.received == ["twap-1234abcd-c1"]
+
+
+def test_market_stream_survives_a_malformed_event():
+    stream = MarketStream()
+    trades = []
+    # Registered directly so no socket is opened
+    stream._handlers['btcusdt@aggTrade'] = (lambda trade: trades.append(trade.quantity),)
+    stream._on_message(None, json.dumps({"e": "aggTrade", "s": "BTCUSDT", "E": "not a number"}))
+    stream._on_message(None, json.dumps({"e": "aggTrade", "s": "BTCUSDT", "E": 1700000000001, "p": "90000.1",
+                                         "q": "0.005", "T": 1700000000000, "m": True}))
+    assert trades == [0.005]
+
+
+def test_unparseable_message_is_dropped(stream):
+    stream._on_message(None, '{"e": "ORDER_TRADE_UPDATE"')
+    assert stream.received == []
+
+
+def test_loads_rejects_trailing_garbage():
+    assert loads(' {"e": "aggTrade"} ') == {"e": "aggTrade"}
+    with pytest.raises(ValueError):
+        loads('{"e": "aggTrade"} garbage')
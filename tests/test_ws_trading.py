@@ -0,0 +1,150 @@
+import time
+
+import pytest
+from requests.exceptions import ConnectionError
+
+from simulator.client import SimulatedClient
+from utils import submission
+from utils.ws_trading import WsOrderTransport, WsTradingSession, WsTransportError
+
+
+class SlowExchange(SimulatedClient):
+    """REST side of the transport; an order handed over by the session only executes after `misses` lookups."""
+
+    recv_window = 100
+
+    def __init__(self, misses: int = 0, lookup_fails: bool = False):
+        super().__init__()
+        self.misses = misses
+        self.lookup_fails = lookup_fails
+        self.pipeline = None
+        self.rest_orders = 0
+
+    def new_order(self, symbol: str, side: str, type: str, **kwargs):
+        self.rest_orders += 1
+        return super().new_order(symbol, side, type, **kwargs)
+
+    def query_order(self, symbol: str, orderId: int = None, origClientOrderId: str = None, **kwargs):
+        if self.lookup_fails:
+            raise ConnectionError("simulated lookup failure")
+        if self.pipeline is not None:
+            if self.misses <= 0:
+                self.pipeline, params = None, self.pipeline
+                super().new_order(**params)
+            self.misses -= 1
+        return super().query_order(symbol, orderId, origClientOrderId, **kwargs)
+
+
+class DroppedSession:
+    """A session that loses the connection after the order went out (or, with `arrives=False`, before)."""
+
+    def __init__(self, exchange: SlowExchange, arrives: bool = True):
+        self.exchange = exchange
+        self.arrives = arrives
+
+    def request(self, method: str, params: dict, timeout=None):
+        if self.arrives:
+            self.exchange.pipeline = dict(params)
+        raise WsTransportError("Session lost before order.place was answered", sent=True)
+
+    def close(self):
+        pass
+
+
+class SilentSocket:
+    """A connection that swallows requests; `on_send` runs after each one is written."""
+
+    def __init__(self, on_send=None):
+        self.connected = True
+        self.on_send = on_send
+
+    def send(self, message):
+        if self.on_send:
+            self.on_send()
+
+    def close(self):
+        self.connected = False
+
+
+class SigningClient:
+    """The bits of the exchange client a session uses to admit and sign requests."""
+
+    key = "test"
+    recv_window = 5000
+
+    class clock:
+        @staticmethod
+        def timestamp() -> int:
+            return int(time.time() * 1000)
+
+    def _admit(self, method, path, params):
+        pass
+
+    def _get_sign(self, payload: str) -> str:
+        return "signature"
+
+
+@pytest.fixture(autouse=True)
+def fast_settle(monkeypatch):
+    monkeypatch.setattr(submission, "MAX_CLOCK_AHEAD", 0.0)
+    monkeypatch.setattr(submission, "LOOKUP_BACKOFF", 0.01)
+
+
+def place(exchange: SlowExchange, arrives: bool = True) -> dict:
+    orders = WsOrderTransport(exchange, session=DroppedSession(exchange, arrives))
+    return orders.new_order(symbol="BTCUSDT", side="BUY", type="MARKET", quantity=0.002)
+
+
+def position(client, symbol="BTCUSDT") -> float:
+    return next(float(p['positionAmt']) for p in client.get_position_risk() if p['symbol'] == symbol)
+
+
+def test_order_still_in_the_pipeline_is_adopted_not_resent():
+    exchange = SlowExchange(misses=2)
+    order = place(exchange)
+    assert order['status'] == "FILLED"
+    assert exchange.rest_orders == 0
+    assert position(exchange) == pytest.approx(0.002)
+
+
+def test_order_that_never_arrived_is_resent_over_rest():
+    exchange = SlowExchange()
+    place(exchange, arrives=False)
+    assert exchange.rest_orders == 1
+    assert position(exchange) == pytest.approx(0.002)
+
+
+def test_failed_lookup_propagates_instead_of_resending():
+    exchange = SlowExchange(lookup_fails=True)
+    with pytest.raises(ConnectionError):
+        place(exchange)
+    assert exchange.rest_orders == 0
+
+
+def test_order_waits_for_its_recv_window_not_the_session_timeout():
+    exchange = SlowExchange()
+    session = WsTradingSession(SigningClient(), timeout=5)
+    session.ws = SilentSocket()
+    orders = WsOrderTransport(exchange, session=session)
+    start = time.perf_counter()
+    order = orders.new_order(symbol="BTCUSDT", side="BUY", type="MARKET", quantity=0.002, recvWindow=100)
+    # Unanswered for its 0.1 s recvWindow, not found by the lookup, then placed over REST
+    assert time.perf_counter() - start < 1
+    assert order['status'] == "FILLED"
+    assert exchange.rest_orders == 1
+
+
+def test_timeout_drops_only_the_connection_the_request_used():
+    session = WsTradingSession(SigningClient(), timeout=5)
+    fresh = SilentSocket()
+
+    def reconnected():
+        # Another thread replaced the connection while this request was waiting
+        session.ws = fresh
+
+    stale = SilentSocket(on_send=reconnected)
+    session.ws = stale
+    with pytest.raises(WsTransportError):
+        session.request('order.status', {'symbol': "BTCUSDT"}, timeout=0.05)
+    assert session.ws is fresh
+    assert fresh.connected